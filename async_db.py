@@ -13,7 +13,7 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/4/6 14:21
 # @Desc    : 异步Aiomysql的增删改查封装
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Sequence, Tuple, Union
 
 import aiomysql
 
@@ -94,6 +94,43 @@ class AsyncMysqlDB:
                 rows = await cur.execute(sql, values)
                 return rows
 
+    async def upsert_many(self, table_name: str, fields: List[str], rows: List[Sequence[Any]],
+                          unique_fields: List[str], skip_update_fields: Sequence[str] = ()) -> int:
+        """
+        批量写入数据，唯一键冲突时更新已有记录 (INSERT ... ON DUPLICATE KEY UPDATE)
+        :param table_name: 表名
+        :param fields: 字段名列表
+        :param rows: 与字段名顺序一致的多行数据
+        :param unique_fields: 表的唯一键字段，冲突时这些字段不更新
+        :param skip_update_fields: 冲突时不更新的其他字段，例如 add_ts
+        :return:
+        """
+        fieldstr = ','.join([f'`{field}`' for field in fields])
+        valstr = ','.join(['%s'] * len(fields))
+        update_fields = [f for f in fields if f not in unique_fields and f not in skip_update_fields]
+        if update_fields:
+            updatestr = ','.join([f'`{f}`=VALUES(`{f}`)' for f in update_fields])
+            sql = "INSERT INTO %s (%s) VALUES(%s) ON DUPLICATE KEY UPDATE %s" % (table_name, fieldstr, valstr, updatestr)
+        else:
+            sql = "INSERT IGNORE INTO %s (%s) VALUES(%s)" % (table_name, fieldstr, valstr)
+        async with self.__pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                effect_rows = await cur.executemany(sql, rows)
+                return effect_rows
+
+    async def get_unique_keys(self, table_name: str) -> List[Tuple[str, ...]]:
+        """
+        查询表上的唯一索引（不包括主键），表不存在时返回空列表
+        :param table_name: 表名
+        :return: 每个唯一索引包含的字段
+        """
+        sql = ("SELECT INDEX_NAME AS index_name, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS columns "
+               "FROM information_schema.STATISTICS "
+               "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0 AND INDEX_NAME <> 'PRIMARY' "
+               "GROUP BY INDEX_NAME")
+        rows = await self.query(sql, table_name)
+        return [tuple(row["columns"].split(",")) for row in rows]
+
     async def execute(self, sql: str, *args: Union[str, int]) -> int:
         """
         需要更新、写入等操作的 excute 执行语句
@@ -0,0 +1,275 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 数据库写入缓冲，按表收集数据后批量upsert，减少逐条 查询+插入/更新 的数据库往返
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from async_db import AsyncMysqlDB
+from async_sqlite_db import AsyncSqliteDB
+from tools import utils
+from var import db_write_buffer_var
+
+# 各表的唯一键，需要与 schema/tables.sql、schema/sqlite_tables.sql 中的唯一索引保持一致
+TABLE_UNIQUE_KEYS: Dict[str, Tuple[str, ...]] = {
+    "bilibili_video": ("video_id",),
+    "bilibili_video_comment": ("comment_id",),
+    "bilibili_up_info": ("user_id",),
+    "bilibili_contact_info": ("up_id", "fan_id"),
+    "bilibili_up_dynamic": ("dynamic_id",),
+    "douyin_aweme": ("aweme_id",),
+    "douyin_aweme_comment": ("comment_id",),
+    "dy_creator": ("user_id",),
+    "kuaishou_video": ("video_id",),
+    "kuaishou_video_comment": ("comment_id",),
+    "weibo_note": ("note_id",),
+    "weibo_note_comment": ("comment_id",),
+    "weibo_creator": ("user_id",),
+    "xhs_note": ("note_id",),
+    "xhs_note_comment": ("comment_id",),
+    "xhs_creator": ("user_id",),
+    "tieba_note": ("note_id",),
+    "tieba_comment": ("comment_id",),
+    "tieba_creator": ("user_id",),
+    "zhihu_content": ("content_id",),
+    "zhihu_comment": ("comment_id",),
+    "zhihu_creator": ("user_id",),
+}
+
+# 记录已存在时不覆盖的字段
+SKIP_UPDATE_FIELDS: Tuple[str, ...] = ("add_ts",)
+
+
+class AsyncDbWriteBuffer:
+    """
+    数据库写入缓冲
+    - 数据按表缓存，同一唯一键的多次写入在缓冲中合并为一条
+    - 单表缓冲条数达到阈值或距上次写入超过指定秒数时，以 executemany 批量upsert
+    - 表上没有对应的唯一索引时不使用缓冲，由调用方逐条写入（见 ensure_unique_keys 迁移）
+    - 写入失败的数据放回缓冲区，下次写入时重试
+    - 爬虫结束时调用 close 将剩余数据全部写入
+    """
+
+    def __init__(self, async_db: Union[AsyncMysqlDB, AsyncSqliteDB], batch_size: int = 100,
+                 flush_interval: float = 2.0):
+        """
+        Args:
+            async_db: 数据库CRUD封装对象
+            batch_size: 单张表缓冲的数据条数达到该值时写入数据库
+            flush_interval: 距上次写入超过该秒数时写入数据库
+        """
+        self.async_db = async_db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict[Tuple, Dict[str, Any]]] = {}
+        self._last_flush_time = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closed = False
+        # 表上是否有批量upsert需要的唯一索引，每张表只检查一次
+        self._unique_key_ready: Dict[str, bool] = {}
+
+    def pending_count(self, table_name: Optional[str] = None) -> int:
+        if table_name:
+            return len(self._pending.get(table_name, {}))
+        return sum(len(rows) for rows in self._pending.values())
+
+    async def is_table_ready(self, table_name: str) -> bool:
+        """
+        检查表上是否有 TABLE_UNIQUE_KEYS 对应的唯一索引，旧版建表语句创建的表没有，需要先执行迁移
+        Args:
+            table_name: 表名
+
+        Returns:
+
+        """
+        ready = self._unique_key_ready.get(table_name)
+        if ready is None:
+            unique_fields = TABLE_UNIQUE_KEYS.get(table_name)
+            ready = bool(unique_fields) and unique_fields in await self.async_db.get_unique_keys(table_name)
+            self._unique_key_ready[table_name] = ready
+            if not ready:
+                utils.logger.warning(
+                    f"[AsyncDbWriteBuffer.is_table_ready] table {table_name} has no unique key on {unique_fields}, "
+                    f"fall back to row-by-row writes. Run `python db.py` and choose migrate to add the unique keys"
+                )
+        return ready
+
+    async def add(self, table_name: str, item: Dict[str, Any]):
+        """
+        写入一条数据到缓冲区
+        Args:
+            table_name: 表名，必须在 TABLE_UNIQUE_KEYS 中
+            item: 一条记录的字典信息
+
+        Returns:
+
+        """
+        unique_fields = TABLE_UNIQUE_KEYS[table_name]
+        key = tuple(item.get(field) for field in unique_fields)
+        rows = self._pending.setdefault(table_name, {})
+        if key in rows:
+            rows[key].update(item)
+        else:
+            rows[key] = dict(item)
+            rows[key].setdefault("add_ts", utils.get_current_timestamp())
+        self._ensure_flush_task()
+        if len(rows) >= self.batch_size:
+            await self.flush(table_name)
+
+    def _ensure_flush_task(self):
+        if self._closed or (self._flush_task and not self._flush_task.done()):
+            return
+        self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while not self._closed:
+            await asyncio.sleep(self.flush_interval)
+            if time.monotonic() - self._last_flush_time < self.flush_interval:
+                continue
+            try:
+                await self.flush()
+            except Exception as e:
+                utils.logger.error(f"[AsyncDbWriteBuffer._flush_periodically] flush error: {e}")
+
+    async def flush(self, table_name: Optional[str] = None):
+        """
+        将缓冲区数据批量upsert到数据库
+        Args:
+            table_name: 只写入指定表，为None时写入全部表
+
+        Returns:
+
+        """
+        async with self._lock:
+            self._last_flush_time = time.monotonic()
+            table_names = [table_name] if table_name else list(self._pending.keys())
+            pending = [(name, self._pending.pop(name, None)) for name in table_names]
+            pending = [(name, rows) for name, rows in pending if rows]
+            if not pending:
+                return
+            written = 0
+            try:
+                if isinstance(self.async_db, AsyncSqliteDB):
+                    # SQLite 所有表的写入合并为一个事务提交，失败时整个事务回滚
+                    async with self.async_db.transaction():
+                        for name, rows in pending:
+                            await self._write_rows(name, list(rows.values()))
+                    written = len(pending)
+                else:
+                    for name, rows in pending:
+                        await self._write_rows(name, list(rows.values()))
+                        written += 1
+            except Exception:
+                for name, rows in pending[written:]:
+                    self._requeue(name, rows)
+                raise
+
+    def _requeue(self, table_name: str, rows: Dict[Tuple, Dict[str, Any]]):
+        # 写入期间新加入缓冲区的同一条记录更新，以新数据为准
+        current = self._pending.get(table_name, {})
+        for key, row in current.items():
+            if key in rows:
+                rows[key].update(row)
+            else:
+                rows[key] = row
+        self._pending[table_name] = rows
+
+    async def _write_rows(self, table_name: str, items: List[Dict[str, Any]]):
+        # executemany 要求每行的字段一致，按字段组合分组写入
+        groups: Dict[Tuple[str, ...], List[Tuple]] = {}
+        for item in items:
+            fields = tuple(item.keys())
+            groups.setdefault(fields, []).append(tuple(item[field] for field in fields))
+        unique_fields = list(TABLE_UNIQUE_KEYS[table_name])
+        for fields, values in groups.items():
+            await self.async_db.upsert_many(table_name, list(fields), values, unique_fields, SKIP_UPDATE_FIELDS)
+        utils.logger.info(f"[AsyncDbWriteBuffer._write_rows] upsert {len(items)} rows into {table_name}")
+
+    async def close(self):
+        """
+        停止定时写入并将剩余数据全部写入数据库
+        Returns:
+
+        """
+        self._closed = True
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+
+async def enqueue_item(table_name: str, item: Dict[str, Any]) -> bool:
+    """
+    将数据写入当前的数据库写入缓冲
+    Args:
+        table_name: 表名
+        item: 一条记录的字典信息
+
+    Returns:
+        未开启写入缓冲或表上没有唯一索引时返回False，调用方需要自行逐条写入
+    """
+    write_buffer: Optional[AsyncDbWriteBuffer] = db_write_buffer_var.get()
+    if write_buffer is None or not await write_buffer.is_table_ready(table_name):
+        return False
+    await write_buffer.add(table_name, item)
+    return True
+
+
+async def close_write_buffer():
+    """
+    爬虫结束时调用，将缓冲区剩余数据写入数据库
+    Returns:
+
+    """
+    write_buffer: Optional[AsyncDbWriteBuffer] = db_write_buffer_var.get()
+    if write_buffer is None:
+        return
+    try:
+        await write_buffer.close()
+    finally:
+        db_write_buffer_var.set(None)
+
+
+async def ensure_unique_keys(async_db: Union[AsyncMysqlDB, AsyncSqliteDB]) -> List[str]:
+    """
+    迁移已有的表：为 TABLE_UNIQUE_KEYS 中缺少唯一索引的表创建唯一索引，开启写入缓冲前执行一次
+    表中已有重复记录时创建会失败，需要先手动清理重复记录再重新执行
+    Args:
+        async_db: 数据库CRUD封装对象
+
+    Returns:
+        创建失败的表名列表
+
+    """
+    failed_tables = []
+    for table_name, unique_fields in TABLE_UNIQUE_KEYS.items():
+        try:
+            if unique_fields in await async_db.get_unique_keys(table_name):
+                continue
+            index_name = f"uk_{table_name}_{'_'.join(unique_fields)}"
+            if isinstance(async_db, AsyncSqliteDB):
+                columns = ",".join(f'"{field}"' for field in unique_fields)
+                await async_db.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" ({columns})')
+            else:
+                columns = ",".join(f"`{field}`" for field in unique_fields)
+                await async_db.execute(f"ALTER TABLE `{table_name}` ADD UNIQUE KEY `{index_name}` ({columns})")
+            utils.logger.info(f"[ensure_unique_keys] add unique key {index_name} to {table_name}")
+        except Exception as e:
+            failed_tables.append(table_name)
+            utils.logger.error(f"[ensure_unique_keys] add unique key to {table_name} error: {e}")
+    return failed_tables
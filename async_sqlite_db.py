@@ -13,14 +13,109 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/4/6 14:21
 # @Desc    : 异步SQLite的增删改查封装
-from typing import Any, Dict, List, Union
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import aiosqlite
 
 
+@lru_cache(maxsize=256)
+def _build_insert_sql(table_name: str, fields: Tuple[str, ...]) -> str:
+    fieldstr = ','.join(fields)
+    valstr = ','.join(['?'] * len(fields))
+    return f"INSERT INTO {table_name} ({fieldstr}) VALUES({valstr})"
+
+
+@lru_cache(maxsize=256)
+def _build_update_sql(table_name: str, fields: Tuple[str, ...], field_where: str) -> str:
+    upsets_str = ','.join([f'{field}=?' for field in fields])
+    return f'UPDATE {table_name} SET {upsets_str} WHERE {field_where}=?'
+
+
+@lru_cache(maxsize=256)
+def _build_upsert_sql(table_name: str, fields: Tuple[str, ...], unique_fields: Tuple[str, ...],
+                      skip_update_fields: Tuple[str, ...]) -> str:
+    fieldstr = ','.join([f'"{field}"' for field in fields])
+    valstr = ','.join(['?'] * len(fields))
+    conflictstr = ','.join([f'"{field}"' for field in unique_fields])
+    update_fields = [f for f in fields if f not in unique_fields and f not in skip_update_fields]
+    if update_fields:
+        updatestr = ','.join([f'"{f}"=excluded."{f}"' for f in update_fields])
+        action = f"DO UPDATE SET {updatestr}"
+    else:
+        action = "DO NOTHING"
+    return f"INSERT INTO {table_name} ({fieldstr}) VALUES({valstr}) ON CONFLICT({conflictstr}) {action}"
+
+
 class AsyncSqliteDB:
+    """
+    异步SQLite封装，整个运行期间复用同一个连接
+    - 连接开启 WAL 日志模式和 synchronous=NORMAL，减少每次提交的刷盘开销
+    - 写操作通过锁串行执行，在 transaction() 中的多次写入合并为一个事务提交
+    - 相同表和字段组合的sql语句只拼接一次，配合sqlite3的语句缓存复用预编译语句
+    """
+
     def __init__(self, db_path: str) -> None:
         self.__db_path = db_path
+        self.__conn: Optional[aiosqlite.Connection] = None
+        self.__connect_lock = asyncio.Lock()
+        self.__write_lock = asyncio.Lock()
+        self.__tx_task: Optional[asyncio.Task] = None
+
+    async def _get_conn(self) -> aiosqlite.Connection:
+        if self.__conn is not None:
+            return self.__conn
+        async with self.__connect_lock:
+            if self.__conn is None:
+                conn = await aiosqlite.connect(self.__db_path, cached_statements=256)
+                conn.row_factory = aiosqlite.Row
+                await conn.execute("PRAGMA journal_mode=WAL")
+                await conn.execute("PRAGMA synchronous=NORMAL")
+                self.__conn = conn
+        return self.__conn
+
+    async def _execute_write(self, sql: str, params: Union[Sequence[Any], List[Sequence[Any]]],
+                             many: bool = False) -> Tuple[int, int]:
+        """
+        执行写操作，不在事务中时执行后立即提交
+        :return: (lastrowid, rowcount)
+        """
+        conn = await self._get_conn()
+        if self.__tx_task is not None and self.__tx_task is asyncio.current_task():
+            return await self._run_write(conn, sql, params, many)
+        async with self.__write_lock:
+            result = await self._run_write(conn, sql, params, many)
+            await conn.commit()
+            return result
+
+    @staticmethod
+    async def _run_write(conn: aiosqlite.Connection, sql: str, params, many: bool) -> Tuple[int, int]:
+        if many:
+            cursor = await conn.executemany(sql, params)
+        else:
+            cursor = await conn.execute(sql, params)
+        async with cursor:
+            return cursor.lastrowid, cursor.rowcount
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        将多次写操作合并为一个事务，退出时提交，发生异常时回滚
+        :return:
+        """
+        conn = await self._get_conn()
+        async with self.__write_lock:
+            self.__tx_task = asyncio.current_task()
+            try:
+                yield self
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+            finally:
+                self.__tx_task = None
 
     async def query(self, sql: str, *args: Union[str, int]) -> List[Dict[str, Any]]:
         """
@@ -29,11 +124,10 @@ class AsyncSqliteDB:
         :param args: sql中传递动态参数列表
         :return:
         """
-        async with aiosqlite.connect(self.__db_path) as conn:
-            conn.row_factory = aiosqlite.Row
-            async with conn.execute(sql, args) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows] if rows else []
+        conn = await self._get_conn()
+        async with conn.execute(sql, args) as cursor:
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows] if rows else []
 
     async def get_first(self, sql: str, *args: Union[str, int]) -> Union[Dict[str, Any], None]:
         """
@@ -42,11 +136,10 @@ class AsyncSqliteDB:
         :param args:sql中传递动态参数列表
         :return:
         """
-        async with aiosqlite.connect(self.__db_path) as conn:
-            conn.row_factory = aiosqlite.Row
-            async with conn.execute(sql, args) as cursor:
-                row = await cursor.fetchone()
-                return dict(row) if row else None
+        conn = await self._get_conn()
+        async with conn.execute(sql, args) as cursor:
+            row = await cursor.fetchone()
+            return dict(row) if row else None
 
     async def item_to_table(self, table_name: str, item: Dict[str, Any]) -> int:
         """
@@ -55,15 +148,9 @@ class AsyncSqliteDB:
         :param item: 一条记录的字典信息
         :return:
         """
-        fields = list(item.keys())
-        values = list(item.values())
-        fieldstr = ','.join(fields)
-        valstr = ','.join(['?'] * len(item))
-        sql = f"INSERT INTO {table_name} ({fieldstr}) VALUES({valstr})"
-        async with aiosqlite.connect(self.__db_path) as conn:
-            async with conn.execute(sql, values) as cursor:
-                await conn.commit()
-                return cursor.lastrowid
+        sql = _build_insert_sql(table_name, tuple(item.keys()))
+        lastrowid, _ = await self._execute_write(sql, list(item.values()))
+        return lastrowid
 
     async def update_table(self, table_name: str, updates: Dict[str, Any], field_where: str,
                            value_where: Union[str, int, float]) -> int:
@@ -75,18 +162,40 @@ class AsyncSqliteDB:
         :param value_where: update 语句 where 条件中的字段值
         :return:
         """
-        upsets = []
-        values = []
-        for k, v in updates.items():
-            upsets.append(f'{k}=?')
-            values.append(v)
-        upsets_str = ','.join(upsets)
+        sql = _build_update_sql(table_name, tuple(updates.keys()), field_where)
+        values = list(updates.values())
         values.append(value_where)
-        sql = f'UPDATE {table_name} SET {upsets_str} WHERE {field_where}=?'
-        async with aiosqlite.connect(self.__db_path) as conn:
-            async with conn.execute(sql, values) as cursor:
-                await conn.commit()
-                return cursor.rowcount
+        _, rowcount = await self._execute_write(sql, values)
+        return rowcount
+
+    async def upsert_many(self, table_name: str, fields: List[str], rows: List[Sequence[Any]],
+                          unique_fields: List[str], skip_update_fields: Sequence[str] = ()) -> int:
+        """
+        批量写入数据，唯一键冲突时更新已有记录 (INSERT ... ON CONFLICT DO UPDATE)
+        :param table_name: 表名
+        :param fields: 字段名列表
+        :param rows: 与字段名顺序一致的多行数据
+        :param unique_fields: 表的唯一键字段，需要有对应的唯一索引
+        :param skip_update_fields: 冲突时不更新的其他字段，例如 add_ts
+        :return:
+        """
+        sql = _build_upsert_sql(table_name, tuple(fields), tuple(unique_fields), tuple(skip_update_fields))
+        _, rowcount = await self._execute_write(sql, rows, many=True)
+        return rowcount
+
+    async def get_unique_keys(self, table_name: str) -> List[Tuple[str, ...]]:
+        """
+        查询表上的唯一索引，表不存在时返回空列表
+        :param table_name: 表名
+        :return: 每个唯一索引包含的字段
+        """
+        unique_keys = []
+        for index in await self.query(f'PRAGMA index_list("{table_name}")'):
+            if not index["unique"]:
+                continue
+            columns = await self.query(f'PRAGMA index_info("{index["name"]}")')
+            unique_keys.append(tuple(column["name"] for column in sorted(columns, key=lambda c: c["seqno"])))
+        return unique_keys
 
     async def execute(self, sql: str, *args: Union[str, int]) -> int:
         """
@@ -95,10 +204,8 @@ class AsyncSqliteDB:
         :param args:
         :return:
         """
-        async with aiosqlite.connect(self.__db_path) as conn:
-            async with conn.execute(sql, args) as cursor:
-                await conn.commit()
-                return cursor.rowcount
+        _, rowcount = await self._execute_write(sql, args)
+        return rowcount
 
     async def executescript(self, sql_script: str) -> None:
         """
@@ -106,6 +213,19 @@ class AsyncSqliteDB:
         :param sql_script: SQL脚本内容
         :return:
         """
-        async with aiosqlite.connect(self.__db_path) as conn:
+        conn = await self._get_conn()
+        async with self.__write_lock:
             await conn.executescript(sql_script)
-            await conn.commit()
\ No newline at end of file
+            await conn.commit()
+
+    async def close(self) -> None:
+        """
+        提交未完成的写入并关闭连接
+        :return:
+        """
+        if self.__conn is None:
+            return
+        async with self.__write_lock:
+            conn, self.__conn = self.__conn, None
+            await conn.commit()
+            await conn.close()
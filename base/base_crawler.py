@@ -8,11 +8,20 @@
 # 详细许可条款请参阅项目根目录下的LICENSE文件。
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
+import copy
+import hashlib
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Awaitable, Callable, Dict, Optional
 
+import httpx
 from playwright.async_api import BrowserContext, BrowserType, Playwright
 
+import config
+from cache.response_cache import get_response_cache
+from cache.tiered_cache import TieredCache, get_shared_cache
+from tools import rate_limiter
+
 
 class AbstractCrawler(ABC):
 
@@ -108,6 +117,18 @@ class AbstractStoreVideo(ABC):
 
 
 class AbstractApiClient(ABC):
+    # 平台名称，用于全局限速分桶，与 config.PLATFORM 的取值一致
+    platform: str = ""
+    # httpx格式的代理地址，由各平台客户端在初始化时设置，None表示不使用代理
+    proxy: Optional[str] = None
+    # 请求头，由各平台客户端在初始化时设置
+    headers: Dict[str, str]
+
+    def __init__(self):
+        # 按代理地址缓存的长连接客户端，key为None表示直连
+        self._http_clients: Dict[Optional[str], httpx.AsyncClient] = {}
+        # 本次运行中详情请求的合并与结果备忘，同一个id并发请求时只发出一次
+        self._fetch_memo = TieredCache(l1_max_entries=config.DETAIL_FETCH_MEMO_MAX_ENTRIES)
 
     @abstractmethod
     async def request(self, method, url, **kwargs):
@@ -116,3 +137,116 @@ class AbstractApiClient(ABC):
     @abstractmethod
     async def update_cookies(self, browser_context: BrowserContext):
         pass
+
+    def get_http_client(self, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        """
+        获取指定代理对应的httpx客户端，同一代理下的请求复用连接池(keep-alive/HTTP2)
+        :param proxy: httpx格式的代理地址，None表示不使用代理
+        :return: httpx.AsyncClient
+        """
+        client = self._http_clients.get(proxy)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                proxy=proxy,
+                http2=_http2_enabled(),
+                limits=httpx.Limits(
+                    max_connections=config.HTTPX_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.HTTPX_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=config.HTTPX_KEEPALIVE_EXPIRY,
+                ),
+                # cookie统一由请求头携带，不让连接池里的cookie jar在请求之间串用
+                cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            )
+            self._http_clients[proxy] = client
+        return client
+
+    def get_media_headers(self) -> Dict[str, str]:
+        """
+        下载图片/视频时携带的请求头，只保留UA和防盗链需要的Referer，不携带cookie等登录态
+        :return:
+        """
+        return {name: value for name, value in self.headers.items() if name.lower() in ("user-agent", "referer")}
+
+    async def wait_rate_limit(self, url: str, cookie: str = "", proxy: Optional[str] = None,
+                              endpoint_class: Optional[str] = None):
+        """
+        发出请求前调用，按 (平台, 接口类别, 账号cookie, 代理IP) 等待全局限速的令牌
+        :param url: 请求的URL
+        :param cookie: 当前账号的cookie
+        :param proxy: 请求使用的代理地址
+        :param endpoint_class: 指定接口类别，为None时根据URL归类
+        :return:
+        """
+        await rate_limiter.acquire(self.platform, url, cookie=cookie, proxy=proxy, endpoint_class=endpoint_class)
+
+    async def check_login_state(self, cookie: str, pong: Callable[[], Awaitable[bool]]) -> bool:
+        """
+        检查登录态，结果按 (平台, cookie) 缓存在共享缓存中，多个进程使用同一个cookie时只检查一次
+        检查失败只短时间缓存，避免网络抖动导致长时间判定为未登录
+        :param cookie: 当前账号的cookie
+        :param pong: 客户端的登录态检查方法
+        :return:
+        """
+        if config.LOGIN_STATE_CACHE_SEC <= 0:
+            return await pong()
+
+        async def load() -> Optional[bool]:
+            return True if await pong() else None
+
+        cache_key = f"login_state:{self.platform}:{hashlib.md5(cookie.encode()).hexdigest()}"
+        return bool(await get_shared_cache().get_or_load(
+            cache_key, load, config.LOGIN_STATE_CACHE_SEC, negative_expire_time=min(60, config.LOGIN_STATE_CACHE_SEC)
+        ))
+
+    async def cached_request(self, endpoint: str, url: str, params: Optional[Any],
+                             fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        幂等接口的请求通过这里发出，开启 config.ENABLE_RESPONSE_CACHE 时优先使用缓存的响应
+        :param endpoint: 接口类别，对应 config.RESPONSE_CACHE_TTLS 中的key
+        :param url: 请求的URL，与params一起组成缓存key
+        :param params: 查询参数或请求体
+        :param fetch: 实际发出请求的函数
+        :return:
+        """
+        response_cache = get_response_cache()
+        if response_cache is None:
+            return await fetch()
+        return await response_cache.fetch(self.platform, endpoint, url, params, fetch)
+
+    async def coalesce(self, endpoint: str, item_id: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        合并同一个 (接口, id) 的请求：并发调用共用一次请求的结果，结果在 config.DETAIL_FETCH_MEMO_SEC 内直接复用
+        返回的字典是浅拷贝，调用方可以修改
+        :param endpoint: 接口名称
+        :param item_id: 内容id
+        :param fetch: 实际发出请求的函数
+        :return: 请求结果，结果为空（None、{}、[]）时不备忘，返回None
+        """
+        if config.DETAIL_FETCH_MEMO_SEC <= 0:
+            return await fetch() or None
+
+        async def load() -> Any:
+            # 爬取频繁时详情可能暂时为空，不能在备忘期内一直返回空结果
+            return await fetch() or None
+
+        result = await self._fetch_memo.get_or_load(f"{endpoint}:{item_id}", load, config.DETAIL_FETCH_MEMO_SEC)
+        return copy.copy(result) if isinstance(result, dict) else result
+
+    async def close(self):
+        """
+        关闭所有复用的httpx客户端
+        """
+        http_clients, self._http_clients = self._http_clients, {}
+        for client in http_clients.values():
+            await client.aclose()
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 依赖 h2 包（pip install httpx[http2]），未安装时退回 HTTP/1.1"""
+    if not config.ENABLE_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
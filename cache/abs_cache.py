@@ -16,7 +16,7 @@
 # @Desc    : 抽象类
 
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 
 class AbstractCache(ABC):
@@ -51,3 +51,90 @@ class AbstractCache(ABC):
         :return:
         """
         raise NotImplementedError
+
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        批量获取键的值，返回值与keys一一对应，不存在的键为None
+        子类可以覆盖为一次往返的实现
+        :param keys: 键列表
+        :return:
+        """
+        return [self.get(key) for key in keys]
+
+    def mset(self, mapping: Dict[str, Any], expire_time: int) -> None:
+        """
+        批量设置键的值，所有键使用相同的过期时间
+        子类可以覆盖为一次往返的实现
+        :param mapping: 键值对
+        :param expire_time: 过期时间
+        :return:
+        """
+        for key, value in mapping.items():
+            self.set(key, value, expire_time)
+
+
+class AbstractAsyncCache(ABC):
+    """
+    异步缓存抽象类，供在事件循环中使用的远程缓存实现，接口与 AbstractCache 一致
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        从缓存中获取键的值
+        :param key: 键
+        :return:
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, expire_time: int) -> None:
+        """
+        将键的值设置到缓存中
+        :param key: 键
+        :param value: 值
+        :param expire_time: 过期时间
+        :return:
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def keys(self, pattern: str) -> List[str]:
+        """
+        获取所有符合pattern的key
+        :param pattern: 匹配模式
+        :return:
+        """
+        raise NotImplementedError
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        批量获取键的值，返回值与keys一一对应，不存在的键为None
+        :param keys: 键列表
+        :return:
+        """
+        return [await self.get(key) for key in keys]
+
+    async def mset(self, mapping: Dict[str, Any], expire_time: int) -> None:
+        """
+        批量设置键的值，所有键使用相同的过期时间
+        :param mapping: 键值对
+        :param expire_time: 过期时间
+        :return:
+        """
+        for key, value in mapping.items():
+            await self.set(key, value, expire_time)
+
+    async def delete(self, key: str) -> None:
+        """
+        删除键
+        :param key: 键
+        :return:
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """
+        关闭连接
+        :return:
+        """
@@ -31,10 +31,31 @@ class CacheFactory:
         :return:
         """
         if cache_type == 'memory':
-            from .local_cache import ExpiringLocalCache
-            return ExpiringLocalCache(*args, **kwargs)
+            import config
+            from .lru_cache import LruExpiringCache
+            kwargs.setdefault('max_entries', config.CACHE_MEMORY_MAX_ENTRIES)
+            kwargs.setdefault('max_bytes', config.CACHE_MEMORY_MAX_BYTES)
+            return LruExpiringCache(*args, **kwargs)
         elif cache_type == 'redis':
             from .redis_cache import RedisCache
             return RedisCache()
         else:
             raise ValueError(f'Unknown cache type: {cache_type}')
+
+    @staticmethod
+    def create_async_cache(cache_type: str, *args, **kwargs):
+        """
+        创建异步缓存对象
+        :param cache_type: 缓存类型，redis 或 tiered（进程内LRU + redis）
+        :param args: 参数
+        :param kwargs: 关键字参数
+        :return:
+        """
+        if cache_type == 'redis':
+            from .redis_cache import AsyncRedisCache
+            return AsyncRedisCache(*args, **kwargs)
+        elif cache_type == 'tiered':
+            from .tiered_cache import TieredCache
+            return TieredCache(*args, **kwargs)
+        else:
+            raise ValueError(f'Unknown async cache type: {cache_type}')
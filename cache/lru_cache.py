@@ -0,0 +1,248 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 有容量上限的本地缓存，LRU淘汰 + 最小堆过期
+
+import bisect
+import heapq
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cache.abs_cache import AbstractCache
+
+GLOB_SPECIAL_CHARS = "*?[\\"
+
+
+def glob_literal_prefix(pattern: str) -> str:
+    """
+    取出glob模式中第一个通配符之前的字面前缀
+    :param pattern: glob模式
+    :return:
+    """
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            prefix.append(pattern[i + 1])
+            i += 2
+            continue
+        if char in GLOB_SPECIAL_CHARS:
+            break
+        prefix.append(char)
+        i += 1
+    return "".join(prefix)
+
+
+def compile_glob(pattern: str) -> "re.Pattern":
+    """
+    将redis风格的glob模式编译为正则: * 任意字符串, ? 单个字符, [abc] [^a] [a-z] 字符集合, \\ 转义
+    :param pattern: glob模式
+    :return:
+    """
+    regex = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "*":
+            regex.append(".*")
+        elif char == "?":
+            regex.append(".")
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex.append(re.escape(pattern[i]))
+        elif char == "[":
+            end = pattern.find("]", i + 2 if pattern[i + 1:i + 2] in ("^", "!") else i + 1)
+            if end == -1:
+                regex.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                negate = body[:1] in ("^", "!")
+                if negate:
+                    body = body[1:]
+                body = body.replace("\\", "\\\\")
+                regex.append(f"[{'^' if negate else ''}{body}]")
+                i = end
+        else:
+            regex.append(re.escape(char))
+        i += 1
+    return re.compile("".join(regex) + r"\Z", re.DOTALL)
+
+
+def estimate_size(value: Any) -> int:
+    """
+    估算缓存值占用的字节数，bytes/str按长度计算，容器只计算第一层
+    :param value:
+    :return:
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+class LruExpiringCache(AbstractCache):
+    """
+    有容量上限的本地缓存
+    - 条目数或估算字节数超过上限时按LRU淘汰最久未访问的键
+    - 过期时间放在最小堆中，每次读写时只弹出已经过期的条目，不需要定时任务全量扫描
+    - keys 支持redis的glob语义，按模式的字面前缀在有序键列表中二分定位候选键
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 0,
+        size_of: Callable[[Any], int] = estimate_size,
+    ):
+        """
+        初始化本地缓存
+        :param max_entries: 最大条目数，0表示不限制
+        :param max_bytes: 所有值的估算字节数上限，0表示不限制
+        :param size_of: 估算值大小的函数
+        :return:
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._size_of = size_of
+        # key -> (value, expire_at, size)，顺序即LRU顺序，最后的最近访问
+        self._cache_container: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._expire_heap: List[Tuple[float, str]] = []
+        self._sorted_keys: List[str] = []
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        self._purge_expired()
+        return len(self._cache_container)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        从缓存中获取键的值，命中时刷新LRU顺序
+        :param key:
+        :return:
+        """
+        self._purge_expired()
+        item = self._cache_container.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._cache_container.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def set(self, key: str, value: Any, expire_time: int) -> None:
+        """
+        将键的值设置到缓存中
+        :param key:
+        :param value:
+        :param expire_time: 过期时间（秒），小于等于0表示不过期，只受容量淘汰
+        :return:
+        """
+        self._purge_expired()
+        expire_at = time.time() + expire_time if expire_time > 0 else float("inf")
+        size = self._size_of(value) if self.max_bytes else 0
+        if key in self._cache_container:
+            self._remove(key)
+        self._cache_container[key] = (value, expire_at, size)
+        bisect.insort(self._sorted_keys, key)
+        self._bytes += size
+        if expire_at != float("inf"):
+            heapq.heappush(self._expire_heap, (expire_at, key))
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        """
+        删除键
+        :param key:
+        :return:
+        """
+        if key in self._cache_container:
+            self._remove(key)
+
+    def keys(self, pattern: str) -> List[str]:
+        """
+        获取所有符合pattern的key
+        :param pattern: redis风格的glob模式
+        :return:
+        """
+        self._purge_expired()
+        prefix = glob_literal_prefix(pattern)
+        start = bisect.bisect_left(self._sorted_keys, prefix)
+        if prefix:
+            end = bisect.bisect_left(self._sorted_keys, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        else:
+            end = len(self._sorted_keys)
+        candidates = self._sorted_keys[start:end]
+        if len(prefix) == len(pattern):
+            return [key for key in candidates if key == pattern]
+        matcher = compile_glob(pattern)
+        return [key for key in candidates if matcher.match(key)]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        命中、未命中、淘汰、过期计数
+        :return:
+        """
+        return {
+            "entries": len(self._cache_container),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._cache_container.pop(key)
+        self._bytes -= size
+        index = bisect.bisect_left(self._sorted_keys, key)
+        del self._sorted_keys[index]
+
+    def _purge_expired(self) -> None:
+        """
+        弹出堆顶所有已经过期的条目，堆中的条目可能已经被覆盖或删除，过期时间对不上时直接丢弃
+        :return:
+        """
+        now = time.time()
+        while self._expire_heap and self._expire_heap[0][0] <= now:
+            expire_at, key = heapq.heappop(self._expire_heap)
+            item = self._cache_container.get(key)
+            if item is not None and item[1] == expire_at:
+                self._remove(key)
+                self.expirations += 1
+        # 覆盖写入留下的失效堆条目过多时重建堆，避免堆无限增长
+        if len(self._expire_heap) > 2 * len(self._cache_container) + 64:
+            self._expire_heap = [(item[1], key) for key, item in self._cache_container.items()
+                                 if item[1] != float("inf")]
+            heapq.heapify(self._expire_heap)
+
+    def _evict(self) -> None:
+        while self._cache_container and (
+            (self.max_entries and len(self._cache_container) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._cache_container))
+            self._remove(key)
+            self.evictions += 1
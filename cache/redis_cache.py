@@ -14,15 +14,55 @@
 # @Name    : 程序员阿江-Relakkes
 # @Time    : 2024/5/29 22:57
 # @Desc    : RedisCache实现
-import pickle
 import time
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 
+import msgpack
 from redis import Redis
+from redis import asyncio as aioredis
 
-from cache.abs_cache import AbstractCache
+from cache.abs_cache import AbstractAsyncCache, AbstractCache
 from config import db_config
 
+# SCAN 每次迭代建议返回的键数量
+SCAN_COUNT = 1000
+
+
+def _dumps(value: Any) -> bytes:
+    """
+    使用msgpack序列化，比pickle更紧凑，也不会在反序列化时执行任意代码
+    :param value:
+    :return:
+    """
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _loads(value: Optional[bytes]) -> Any:
+    """
+    反序列化，无法解析的旧数据（如pickle格式）当作不存在
+    :param value:
+    :return:
+    """
+    if value is None:
+        return None
+    try:
+        return msgpack.unpackb(value, raw=False)
+    except (ValueError, msgpack.UnpackException):
+        return None
+
+
+def _redis_kwargs() -> Dict[str, Any]:
+    """
+    redis连接信息, 这里按需配置
+    :return:
+    """
+    return dict(
+        host=db_config.REDIS_DB_HOST,
+        port=db_config.REDIS_DB_PORT,
+        db=db_config.REDIS_DB_NUM,
+        password=db_config.REDIS_DB_PWD,
+    )
+
 
 class RedisCache(AbstractCache):
 
@@ -36,12 +76,7 @@ class RedisCache(AbstractCache):
         连接redis, 返回redis客户端, 这里按需配置redis连接信息
         :return:
         """
-        return Redis(
-            host=db_config.REDIS_DB_HOST,
-            port=db_config.REDIS_DB_PORT,
-            db=db_config.REDIS_DB_NUM,
-            password=db_config.REDIS_DB_PWD,
-        )
+        return Redis(**_redis_kwargs())
 
     def get(self, key: str) -> Any:
         """
@@ -49,10 +84,7 @@ class RedisCache(AbstractCache):
         :param key:
         :return:
         """
-        value = self._redis_client.get(key)
-        if value is None:
-            return None
-        return pickle.loads(value)
+        return _loads(self._redis_client.get(key))
 
     def set(self, key: str, value: Any, expire_time: int) -> None:
         """
@@ -62,13 +94,117 @@ class RedisCache(AbstractCache):
         :param expire_time:
         :return:
         """
-        self._redis_client.set(key, pickle.dumps(value), ex=expire_time)
+        self._redis_client.set(key, _dumps(value), ex=expire_time)
 
     def keys(self, pattern: str) -> List[str]:
         """
-        获取所有符合pattern的key
+        获取所有符合pattern的key，使用游标SCAN，不会像KEYS一样长时间阻塞redis
         """
-        return [key.decode() for key in self._redis_client.keys(pattern)]
+        return [key.decode() for key in self._redis_client.scan_iter(match=pattern, count=SCAN_COUNT)]
+
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        一次MGET获取多个键的值
+        :param keys:
+        :return:
+        """
+        if not keys:
+            return []
+        return [_loads(value) for value in self._redis_client.mget(keys)]
+
+    def mset(self, mapping: Dict[str, Any], expire_time: int) -> None:
+        """
+        通过一次pipeline往返设置多个带过期时间的键
+        :param mapping:
+        :param expire_time:
+        :return:
+        """
+        if not mapping:
+            return
+        pipe = self._redis_client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(key, _dumps(value), ex=expire_time)
+        pipe.execute()
+
+
+class AsyncRedisCache(AbstractAsyncCache):
+    """
+    基于 redis.asyncio 的异步缓存，在爬虫的事件循环中使用，不阻塞其他协程
+    """
+
+    def __init__(self) -> None:
+        self._redis_client = aioredis.Redis(**_redis_kwargs())
+
+    async def get(self, key: str) -> Any:
+        """
+        从缓存中获取键的值, 并且反序列化
+        :param key:
+        :return:
+        """
+        return _loads(await self._redis_client.get(key))
+
+    async def set(self, key: str, value: Any, expire_time: int) -> None:
+        """
+        将键的值设置到缓存中, 并且序列化
+        :param key:
+        :param value:
+        :param expire_time:
+        :return:
+        """
+        await self._redis_client.set(key, _dumps(value), ex=expire_time)
+
+    async def keys(self, pattern: str) -> List[str]:
+        """
+        获取所有符合pattern的key，使用游标SCAN
+        :param pattern:
+        :return:
+        """
+        return [key.decode() async for key in self._redis_client.scan_iter(match=pattern, count=SCAN_COUNT)]
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        一次MGET获取多个键的值
+        :param keys:
+        :return:
+        """
+        if not keys:
+            return []
+        return [_loads(value) for value in await self._redis_client.mget(keys)]
+
+    async def mset(self, mapping: Dict[str, Any], expire_time: int) -> None:
+        """
+        通过一次pipeline往返设置多个带过期时间的键
+        :param mapping:
+        :param expire_time:
+        :return:
+        """
+        if not mapping:
+            return
+        async with self._redis_client.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, _dumps(value), ex=expire_time)
+            await pipe.execute()
+
+    async def delete(self, key: str) -> None:
+        """
+        删除键
+        :param key:
+        :return:
+        """
+        await self._redis_client.delete(key)
+
+    async def load(self, pattern: str) -> Dict[str, Any]:
+        """
+        批量加载所有符合pattern的键值：SCAN取出键后一次MGET取值，期间过期的键不返回
+        :param pattern:
+        :return:
+        """
+        keys = await self.keys(pattern)
+        values = await self.mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    async def close(self) -> None:
+        await self._redis_client.close()
 
 
 if __name__ == '__main__':
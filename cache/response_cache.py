@@ -0,0 +1,174 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 幂等接口（创作者信息、内容详情、HTML详情页）的响应缓存
+
+import hashlib
+import json
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import config
+from cache.tiered_cache import TieredCache, get_shared_cache
+from tools import utils
+
+# 接口类别
+ENDPOINT_CREATOR = "creator"
+ENDPOINT_DETAIL = "detail"
+ENDPOINT_HTML = "html"
+
+# 每次请求都会变化的签名、时间戳、访问令牌等参数，不参与缓存key
+VOLATILE_PARAMS = frozenset({
+    "w_rid", "wts", "a_bogus", "x-bogus", "mstoken", "verifyfp", "fp", "_signature",
+    "x-s", "x-t", "x-s-common", "xsec_token", "xsec_source", "search_id", "_", "t", "timestamp",
+})
+
+response_cache_bypass_var: ContextVar[bool] = ContextVar("response_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_response_cache():
+    """
+    在这个上下文中发出的请求跳过响应缓存，既不读取也不写入
+    Returns:
+
+    """
+    token = response_cache_bypass_var.set(True)
+    try:
+        yield
+    finally:
+        response_cache_bypass_var.reset(token)
+
+
+def normalize_request(url: str, params: Optional[Any] = None) -> str:
+    """
+    规范化请求：域名小写，查询参数和请求体参数合并后去掉易变参数并排序
+    Args:
+        url: 请求的URL
+        params: 查询参数或请求体
+
+    Returns:
+
+    """
+    parsed = urlparse(url)
+    items = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)]
+    if isinstance(params, dict):
+        items.extend((str(k), json.dumps(v, sort_keys=True, ensure_ascii=False) if isinstance(v, (dict, list)) else str(v))
+                     for k, v in params.items())
+    elif params:
+        items.append(("", str(params)))
+    items = sorted((k, v) for k, v in items if k.lower() not in VOLATILE_PARAMS)
+    return f"{parsed.netloc.lower()}{parsed.path}?{urlencode(items)}"
+
+
+def _encode(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(payload: bytes) -> Any:
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+class ResponseCache:
+    """
+    响应缓存，只缓存非空的响应，按接口类别设置过期时间，值经过json序列化和zlib压缩后保存
+    后端是单独的两级缓存，L1按字节数限制大小，响应再多也不会挤掉共享缓存中的代理IP和登录态
+    开启 ENABLE_SHARED_CACHE 时L2与共享缓存使用同一个redis，可以跨进程、跨运行复用
+    """
+
+    def __init__(self, backend: TieredCache, ttls: Dict[str, int]):
+        """
+        Args:
+            backend: 缓存后端
+            ttls: 过期时间（秒），key 为 "接口类别" 或 "平台:接口类别"，越具体的优先
+        """
+        self.backend = backend
+        self.ttls = ttls
+        self.hits = 0
+        self.misses = 0
+
+    def get_ttl(self, platform: str, endpoint: str) -> int:
+        return self.ttls.get(f"{platform}:{endpoint}", self.ttls.get(endpoint, 0))
+
+    async def fetch(
+        self,
+        platform: str,
+        endpoint: str,
+        url: str,
+        params: Optional[Any],
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        先查缓存，未命中时调用 fetch 请求并缓存结果，同一个请求的并发未命中只请求一次
+        Args:
+            platform: 平台
+            endpoint: 接口类别
+            url: 请求的URL
+            params: 查询参数或请求体
+            fetch: 实际发出请求的函数
+
+        Returns:
+
+        """
+        ttl = self.get_ttl(platform, endpoint)
+        if ttl <= 0 or response_cache_bypass_var.get():
+            return await fetch()
+
+        normalized = normalize_request(url, params)
+        key = f"resp:{platform}:{endpoint}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+        fetched = []
+
+        async def load() -> Optional[bytes]:
+            value = await fetch()
+            fetched.append(value)
+            return _encode(value) if value else None
+
+        payload = await self.backend.get_or_load(key, load, ttl)
+        if fetched:
+            self.misses += 1
+            return fetched[0]
+        if payload is None:
+            # 合并到的请求结果为空，不缓存，自己再请求一次
+            return await fetch()
+        self.hits += 1
+        utils.logger.debug(f"[ResponseCache.fetch] hit {platform} {endpoint} {normalized}")
+        return _decode(payload)
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    获取响应缓存，没有开启 config.ENABLE_RESPONSE_CACHE 时返回None
+    Returns:
+
+    """
+    global _response_cache
+    if not config.ENABLE_RESPONSE_CACHE:
+        return None
+    # redis连接由共享缓存持有，共享缓存关闭后重新创建
+    l2 = get_shared_cache().l2
+    if _response_cache is None or _response_cache.backend.l2 is not l2:
+        from cache.cache_factory import CacheFactory
+        backend = CacheFactory.create_async_cache(
+            config.CACHE_TYPE_TIERED,
+            l2=l2,
+            l1_max_entries=config.RESPONSE_CACHE_L1_MAX_ENTRIES,
+            l1_expire_time=config.SHARED_CACHE_L1_EXPIRE_SEC,
+            l1_max_bytes=config.RESPONSE_CACHE_L1_MAX_MB * 1024 * 1024,
+        )
+        _response_cache = ResponseCache(backend, config.RESPONSE_CACHE_TTLS)
+    return _response_cache
@@ -0,0 +1,227 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 两级缓存，进程内LRU(L1) + redis(L2)，读穿透加载并合并同一个键的并发加载
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import config
+from cache.abs_cache import AbstractAsyncCache
+from cache.lru_cache import LruExpiringCache
+
+# 负缓存的占位值，表示加载过但没有结果
+NEGATIVE_VALUE = "__mediacrawler_negative__"
+
+
+class TieredCache(AbstractAsyncCache):
+    """
+    两级缓存
+    - 读取时先查进程内的L1，未命中再查L2，L2命中的值回填L1（L1的过期时间不超过 l1_expire_time）
+    - 同一个键并发未命中时只有一个协程访问L2或调用loader，其他协程等待它的结果（single-flight）
+    - loader 返回None时按 negative_expire_time 缓存负结果，期间不再调用loader
+    - l2 为None时只使用进程内缓存，没有配置redis的单进程部署也可以使用
+    """
+
+    def __init__(
+        self,
+        l2: Optional[AbstractAsyncCache] = None,
+        l1_max_entries: int = 1000,
+        l1_expire_time: int = 30,
+        l1_max_bytes: int = 0,
+    ):
+        """
+        Args:
+            l2: 二级缓存，通常是 AsyncRedisCache
+            l1_max_entries: L1的最大条目数
+            l1_expire_time: L1中的值最多保留的时间（秒），多进程时决定其他进程的更新多久可见
+            l1_max_bytes: L1中所有值的估算字节数上限，0表示不限制
+        """
+        self.l1 = LruExpiringCache(max_entries=l1_max_entries, max_bytes=l1_max_bytes)
+        self.l2 = l2
+        self.l1_expire_time = l1_expire_time
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _l1_set(self, key: str, value: Any, expire_time: int):
+        self.l1.set(key, value, min(expire_time, self.l1_expire_time) if self.l2 else expire_time)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        从缓存中获取键的值，负缓存也返回None
+        :param key:
+        :return:
+        """
+        value = await self._get(key)
+        return None if value == NEGATIVE_VALUE else value
+
+    async def _get(self, key: str) -> Optional[Any]:
+        value = self.l1.get(key)
+        if value is not None or self.l2 is None:
+            return value
+        value = await self._single_flight(key, lambda: self.l2.get(key))
+        if value is not None:
+            self._l1_set(key, value, self.l1_expire_time)
+        return value
+
+    async def set(self, key: str, value: Any, expire_time: int) -> None:
+        """
+        同时写入L1和L2
+        :param key:
+        :param value:
+        :param expire_time:
+        :return:
+        """
+        if self.l2 is not None:
+            await self.l2.set(key, value, expire_time)
+        self._l1_set(key, value, expire_time)
+
+    async def keys(self, pattern: str) -> List[str]:
+        """
+        L1只保存部分键，有L2时以L2为准
+        :param pattern:
+        :return:
+        """
+        if self.l2 is None:
+            return self.l1.keys(pattern)
+        return await self.l2.keys(pattern)
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        L1未命中的键通过一次L2的mget获取
+        :param keys:
+        :return:
+        """
+        values = [self.l1.get(key) for key in keys]
+        missing = [key for key, value in zip(keys, values) if value is None]
+        if missing and self.l2 is not None:
+            loaded = dict(zip(missing, await self.l2.mget(missing)))
+            for index, key in enumerate(keys):
+                if values[index] is None and loaded.get(key) is not None:
+                    values[index] = loaded[key]
+                    self._l1_set(key, values[index], self.l1_expire_time)
+        return [None if value == NEGATIVE_VALUE else value for value in values]
+
+    async def mset(self, mapping: Dict[str, Any], expire_time: int) -> None:
+        """
+        同时写入L1和L2
+        :param mapping:
+        :param expire_time:
+        :return:
+        """
+        if self.l2 is not None:
+            await self.l2.mset(mapping, expire_time)
+        for key, value in mapping.items():
+            self._l1_set(key, value, expire_time)
+
+    async def delete(self, key: str) -> None:
+        """
+        删除键，只能删除本进程的L1，其他进程的L1在 l1_expire_time 后过期
+        :param key:
+        :return:
+        """
+        self.l1.delete(key)
+        if self.l2 is not None:
+            await self.l2.delete(key)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        expire_time: int,
+        negative_expire_time: int = 0,
+    ) -> Optional[Any]:
+        """
+        读穿透：缓存未命中时调用loader加载并写入两级缓存，同一个键的并发加载只调用一次loader
+        :param key:
+        :param loader: 加载函数，返回None表示没有结果
+        :param expire_time: 结果的过期时间（秒）
+        :param negative_expire_time: 负结果的过期时间（秒），0表示不缓存负结果
+        :return:
+        """
+        value = await self._get(key)
+        if value is None:
+            value = await self._single_flight(f"load:{key}", lambda: self._load(key, loader, expire_time,
+                                                                             negative_expire_time))
+        return None if value == NEGATIVE_VALUE else value
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], expire_time: int,
+                    negative_expire_time: int) -> Any:
+        # 排队期间可能已经有其他进程写入了L2
+        value = self.l1.get(key)
+        if value is None and self.l2 is not None:
+            value = await self.l2.get(key)
+        if value is not None:
+            return value
+        value = await loader()
+        if value is not None:
+            await self.set(key, value, expire_time)
+        elif negative_expire_time > 0:
+            await self.set(key, NEGATIVE_VALUE, negative_expire_time)
+        return value
+
+    async def _single_flight(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def close(self) -> None:
+        if self.l2 is not None:
+            await self.l2.close()
+
+
+_shared_cache: Optional[TieredCache] = None
+
+
+def get_shared_cache() -> TieredCache:
+    """
+    获取进程内共享的两级缓存，开启 config.ENABLE_SHARED_CACHE 时使用redis作为L2，
+    同一台机器上的多个爬虫进程共享代理IP、登录态和签名密钥
+    :return:
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        from cache.cache_factory import CacheFactory
+        _shared_cache = CacheFactory.create_async_cache(
+            config.CACHE_TYPE_TIERED,
+            l2=CacheFactory.create_async_cache(config.CACHE_TYPE_REDIS) if config.ENABLE_SHARED_CACHE else None,
+            l1_max_entries=config.SHARED_CACHE_L1_MAX_ENTRIES,
+            l1_expire_time=config.SHARED_CACHE_L1_EXPIRE_SEC,
+        )
+    return _shared_cache
+
+
+async def close_shared_cache():
+    """
+    爬虫结束时调用，关闭redis连接
+    :return:
+    """
+    global _shared_cache
+    cache, _shared_cache = _shared_cache, None
+    if cache is not None:
+        await cache.close()
@@ -61,8 +61,52 @@ BROWSER_LAUNCH_TIMEOUT = 30
 # 设置为False可以保持浏览器运行，便于调试
 AUTO_CLOSE_BROWSER = True
 
-# 数据保存类型选项配置,支持四种类型：csv、db、json、sqlite, 最好保存到DB，有排重的功能。
-SAVE_DATA_OPTION = "json"  # csv or db or json or sqlite
+# 数据保存类型选项配置,支持六种类型：csv、db、json、jsonl、parquet、sqlite, 最好保存到DB，有排重的功能。
+# 数据量较大时推荐使用jsonl，逐行追加写入，不会每保存一条数据都重写整个文件
+# 需要用pandas等工具做数据分析时推荐使用parquet，列式压缩存储，数值字段保存为整数
+SAVE_DATA_OPTION = "json"  # csv or db or json or jsonl or parquet or sqlite
+
+# ==================== JSONL 存储配置 ====================
+# 缓冲的数据条数达到该值时批量写入磁盘
+JSONL_FLUSH_BATCH_SIZE = 100
+
+# 距离上次写入磁盘超过该秒数时写入磁盘
+JSONL_FLUSH_INTERVAL_SEC = 5
+
+# 单个jsonl文件的最大大小（MB），超过后切换到新的分片文件，0表示不切分
+JSONL_MAX_FILE_SIZE_MB = 0
+
+# 爬虫结束时是否将当天的全部jsonl分片转换为json数组文件（与json存储格式一致，供web界面等读取）
+# 导出的文件名以 _jsonl.json 结尾，不会覆盖json存储写入的同名文件
+JSONL_EXPORT_JSON_ON_CLOSE = True
+
+# ==================== CSV 存储配置 ====================
+# 每个csv文件在运行期间保持打开，缓冲的数据条数达到该值时批量写入磁盘
+CSV_FLUSH_BATCH_SIZE = 100
+
+# 距离上次写入磁盘超过该秒数时写入磁盘
+CSV_FLUSH_INTERVAL_SEC = 5
+
+# 单个csv文件的最大大小（MB），超过后切换到新的分片文件，0表示不切分
+CSV_MAX_FILE_SIZE_MB = 0
+
+# ==================== Parquet 存储配置 ====================
+# 缓存的数据条数达到该值时写入一个行组(row group)，行组越大压缩率和读取性能越好，占用的内存也越多
+PARQUET_ROW_GROUP_SIZE = 5000
+
+# 压缩算法，zstd | snappy | gzip | none
+PARQUET_COMPRESSION = "zstd"
+
+# ==================== 数据库写入缓冲配置（db / sqlite） ====================
+# 是否开启写入缓冲，开启后数据按表缓存并批量upsert，需要表上有对应的唯一索引（见schema目录下的建表语句）
+# 旧版建表语句创建的数据库需要先执行 python db.py 选择 migrate 添加唯一索引，没有唯一索引的表仍然逐条写入
+ENABLE_DB_WRITE_BUFFER = False
+
+# 单张表缓冲的数据条数达到该值时批量写入数据库
+DB_WRITE_BATCH_SIZE = 100
+
+# 距离上次写入数据库超过该秒数时写入数据库
+DB_WRITE_FLUSH_INTERVAL_SEC = 2
 
 # 用户浏览器缓存的浏览器文件配置
 USER_DATA_DIR = "%s_user_data_dir"  # %s will be replaced by platform name
@@ -79,6 +123,71 @@ MAX_CONCURRENCY_NUM = 1
 # 是否开启爬媒体模式（包含图片或视频资源），默认不开启爬媒体
 ENABLE_GET_MEIDAS = False
 
+# 媒体文件流式下载的临时目录，下载完成后移动到 data/<平台>/images|videos 下，需要与data目录在同一个磁盘上
+MEDIA_DOWNLOAD_TMP_DIR = "data/.media_tmp"
+
+# 媒体文件流式下载时每次读取写入的字节数
+MEDIA_DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# ==================== 媒体下载池配置 ====================
+# 爬取详情时只把图片/视频下载任务写入持久化队列，由独立的下载池并发下载，不阻塞元数据和评论的爬取
+# 下载任务队列文件，未完成的任务在下次启动时继续下载
+MEDIA_QUEUE_DB_PATH = "data/media_queue.db"
+
+# 是否在爬虫进程中下载媒体，设置为False时只入队，
+# 由单独的只下载媒体的进程下载: python main.py --media_only true
+MEDIA_DOWNLOAD_IN_PROCESS = True
+
+# 只下载媒体队列中未完成的任务，不爬取数据，也可以通过命令行参数 --media_only 指定
+MEDIA_ONLY = False
+
+# 同时下载的媒体文件数
+MEDIA_DOWNLOAD_CONCURRENCY = 4
+
+# 每个CDN域名每秒的下载请求数，0表示不限速
+MEDIA_DOWNLOAD_CDN_QPS = 5.0
+
+# 每个CDN域名的突发请求数
+MEDIA_DOWNLOAD_CDN_BURST = 5
+
+# 下载失败的最大重试次数，重试时断点续传
+MEDIA_DOWNLOAD_MAX_RETRIES = 3
+
+# 大视频分段并发下载的分段数（并发连接数），CDN不支持Range请求时自动退回单连接下载
+MEDIA_RANGED_DOWNLOAD_SEGMENTS = 4
+
+# 大于该字节数的视频才分段下载
+MEDIA_RANGED_DOWNLOAD_MIN_SIZE = 8 * 1024 * 1024
+
+# 单个分段失败后的重试次数，重试时从该分段已下载的位置继续
+MEDIA_RANGED_SEGMENT_RETRIES = 2
+
+# 第一次重试的等待时间（秒），之后每次翻倍
+MEDIA_DOWNLOAD_RETRY_BACKOFF_SEC = 5
+
+# 单个媒体文件下载的超时时间（秒），指的是连接和两次读取之间的最长等待时间
+MEDIA_DOWNLOAD_TIMEOUT_SEC = 30
+
+# 下载任务被领取后超过该时间仍未完成（进程崩溃）时，允许被其他进程重新领取
+MEDIA_JOB_LEASE_SEC = 600
+
+# 是否按内容去重保存媒体文件：文件按sha256保存在 MEDIA_BLOB_DIR 下，
+# 笔记目录下的文件是指向它的链接，已经下载过的URL不再请求，适合定期重复爬取
+ENABLE_MEDIA_DEDUP = True
+
+# 按内容保存的媒体文件目录，需要与data目录在同一个磁盘上才能创建硬链接
+MEDIA_BLOB_DIR = "data/media_blobs"
+
+# 媒体URL索引文件，记录每个URL对应的文件sha256以及ETag/Last-Modified
+MEDIA_INDEX_DB_PATH = "data/media_blobs/index.db"
+
+# 笔记目录下的文件使用的链接类型，hardlink | symlink，硬链接失败时自动退化为软链接，再失败时复制
+MEDIA_LINK_TYPE = "hardlink"
+
+# 已经下载过的URL是否发起条件请求(If-None-Match/If-Modified-Since)确认文件没有变化，
+# False时直接跳过不发请求，True时文件有变化会重新下载
+MEDIA_REVALIDATE = False
+
 # 是否开启爬评论模式, 默认开启爬评论
 ENABLE_GET_COMMENTS = True
 
@@ -89,6 +198,79 @@ CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES = 10
 # 老版本项目使用了 db, 则需参考 schema/tables.sql line 287 增加表字段
 ENABLE_GET_SUB_COMMENTS = False
 
+# 二级评论展开的最大并发数，与下一页一级评论的请求同时进行，请求间隔仍然由 CRAWLER_MAX_SLEEP_SEC 控制
+SUB_COMMENT_CONCURRENCY_NUM = 2
+
+# 评论爬取与保存之间的缓冲队列长度（按页计），队列满时暂停拉取等待保存
+COMMENT_PIPELINE_QUEUE_SIZE = 10
+
+# ==================== 已爬取索引配置 ====================
+# 是否开启跨运行的已爬取索引，开启后记录每个平台已经保存过的内容id和评论id：
+# 新鲜期内爬取过的内容不再请求详情和评论，已经保存过的评论不再重复写入，适合定期运行的关键词监控
+ENABLE_SEEN_INDEX = False
+
+# 已爬取索引文件
+SEEN_INDEX_DB_PATH = "data/seen_index.db"
+
+# 内容的新鲜期（秒），上一次运行在新鲜期内爬取过的内容跳过详情和评论，0表示不跳过，只对评论去重
+SEEN_CONTENT_FRESHNESS_SEC = 24 * 3600
+
+# 内存中布隆过滤器的容量（内容id和评论id各一个），已有的id更多时自动扩大
+SEEN_INDEX_BLOOM_CAPACITY = 1000000
+
+# 布隆过滤器的误判率，误判时会再查一次索引文件，不会导致漏爬
+SEEN_INDEX_BLOOM_ERROR_RATE = 0.001
+
+# 是否增量爬取评论，开启后在索引文件中记录每个内容爬到的最新评论，再次爬取时遇到已经保存过的评论就停止翻页
+# 只对按时间排序返回评论的平台生效：B站和知乎按时间倒序请求评论，贴吧从上一次爬到的页码继续
+# 小红书、抖音和微博的评论接口按热度排序，仍然完整翻页，通过已见索引对评论去重
+ENABLE_INCREMENTAL_COMMENTS = False
+
+# ==================== 本地缓存配置 ====================
+# 本地缓存（CacheFactory.create_cache("memory")）的最大条目数，超过后淘汰最久未访问的键，0表示不限制
+CACHE_MEMORY_MAX_ENTRIES = 10000
+
+# 本地缓存中所有值的估算字节数上限，0表示不限制
+CACHE_MEMORY_MAX_BYTES = 256 * 1024 * 1024
+
+# 是否使用redis作为共享缓存的二级缓存，开启后同一台机器上的多个爬虫进程共享代理IP、登录态和B站wbi签名密钥
+# 关闭时共享缓存只在进程内生效
+ENABLE_SHARED_CACHE = False
+
+# 共享缓存的进程内一级缓存的最大条目数
+SHARED_CACHE_L1_MAX_ENTRIES = 1000
+
+# 开启redis时一级缓存中的值最多保留的时间（秒），决定其他进程的更新多久后可见
+SHARED_CACHE_L1_EXPIRE_SEC = 30
+
+# 登录态检查结果的缓存时间（秒），期间同一个cookie不再重复检查，0表示不缓存
+LOGIN_STATE_CACHE_SEC = 600
+
+# 是否缓存幂等接口（创作者信息、内容详情、HTML详情页）的响应，同一个内容出现在多个关键词下时不再重复请求
+# 开启 ENABLE_SHARED_CACHE 后缓存保存在redis中，可以跨进程、跨运行复用
+ENABLE_RESPONSE_CACHE = False
+
+# 响应缓存的进程内一级缓存的最大条目数，与共享缓存分开，不会挤掉代理IP和登录态
+RESPONSE_CACHE_L1_MAX_ENTRIES = 5000
+
+# 响应缓存的进程内一级缓存的最大大小（MB），按压缩后的响应大小计算
+RESPONSE_CACHE_L1_MAX_MB = 64
+
+# 响应缓存的过期时间（秒），key 为 "接口类别" 或 "平台:接口类别"，越具体的规则优先，0表示不缓存
+# 平台: xhs | dy | ks | bili | wb | tieba | zhihu
+# 接口类别: creator | detail | html
+RESPONSE_CACHE_TTLS = {
+    "creator": 24 * 3600,
+    "detail": 6 * 3600,
+    "html": 6 * 3600,
+}
+
+# 同一次运行中详情请求结果的备忘时间（秒），多个关键词搜到同一个内容时只请求一次详情，0表示不合并
+DETAIL_FETCH_MEMO_SEC = 3600
+
+# 每个平台客户端备忘的详情结果的最大条数
+DETAIL_FETCH_MEMO_MAX_ENTRIES = 2000
+
 # ==================== 页面元素定位超时配置 ====================
 # 页面元素等待超时时间（毫秒）
 # 如果网络较慢或页面加载缓慢，可以适当增加这个值
@@ -117,9 +299,60 @@ STOP_WORDS_FILE = "./docs/hit_stopwords.txt"
 # 中文字体文件路径
 FONT_PATH = "./docs/STZHONGS.TTF"
 
+# 词频按增量统计，距离上次写入超过该秒数时将词频文件写入磁盘，词云图在爬虫结束时生成
+WORDCLOUD_SAVE_INTERVAL_SEC = 30
+
+# 生成词云图的进程数，绘图在子进程中执行，不阻塞爬虫
+WORDCLOUD_RENDER_PROCESS_NUM = 1
+
 # 爬取间隔时间
 CRAWLER_MAX_SLEEP_SEC = 2
 
+# ==================== 全局限速配置 ====================
+# 是否开启全局令牌桶限速，开启后所有平台客户端的请求按 (平台, 接口类别, 账号, 代理IP) 限速，
+# 代替各处的随机sleep，可以放心调大 MAX_CONCURRENCY_NUM；关闭后恢复原来的随机sleep
+ENABLE_RATE_LIMIT = True
+
+# 默认每秒请求数
+RATE_LIMIT_DEFAULT_QPS = 1.0
+
+# 默认突发容量，即空闲一段时间后允许连续发出的请求数
+RATE_LIMIT_DEFAULT_BURST = 2
+
+# 限速规则，key 为 "平台" 或 "平台:接口类别"，value 为 (每秒请求数, 突发容量)，越具体的规则优先
+# 平台: xhs | dy | ks | bili | wb | tieba | zhihu
+# 接口类别: search | comment | creator | media | default
+RATE_LIMIT_RULES = {
+    "xhs:search": (0.5, 1),
+    "dy:search": (0.5, 1),
+    "bili:media": (2.0, 4),
+    "wb:media": (2.0, 4),
+}
+
+# ==================== HTTP 连接池配置 ====================
+# 每个平台的API客户端按代理复用同一个httpx连接池，避免每次请求重新建立TCP/TLS连接
+# 连接池最大连接数
+HTTPX_MAX_CONNECTIONS = 100
+
+# 连接池最大保持的空闲长连接数
+HTTPX_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# 空闲长连接的保持时间（秒）
+HTTPX_KEEPALIVE_EXPIRY = 30
+
+# 是否启用HTTP/2，需要额外安装 h2 依赖: pip install "httpx[http2]"，未安装时自动使用HTTP/1.1
+ENABLE_HTTP2 = False
+
+# ==================== JS签名进程池配置（抖音 a_bogus、知乎 x-zse-96） ====================
+# 是否使用常驻的node进程执行签名js，关闭或者没有安装node时回退到execjs
+ENABLE_NODE_SIGN_WORKER = True
+
+# 每个签名js文件启动的node进程数
+NODE_SIGN_WORKER_POOL_SIZE = 2
+
+# 单次签名调用的超时时间（秒），超时后重启对应的node进程
+NODE_SIGN_WORKER_TIMEOUT_SEC = 5
+
 from .bilibili_config import *
 from .xhs_config import *
 from .dy_config import *
@@ -45,3 +45,6 @@ CRAWLER_MAX_CONTACTS_COUNT_SINGLENOTES = 100
 
 # 单个视频/帖子最大爬取动态数
 CRAWLER_MAX_DYNAMICS_COUNT_SINGLENOTES = 50
+
+# WBI签名 img_key/sub_key 的缓存时间（秒），过期或签名校验失败时重新获取
+BILI_WBI_KEYS_TTL_SEC = 24 * 60 * 60
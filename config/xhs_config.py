@@ -26,3 +26,13 @@ XHS_CREATOR_ID_LIST = [
     "63e36c9a000000002703502b",
     # ........................
 ]
+
+# 关键词搜索调度：所有关键词的搜索页 -> 笔记详情 -> 笔记评论 三个阶段流水线执行，各阶段独立控制并发
+# 同时翻页搜索的关键词数
+XHS_SEARCH_KEYWORD_CONCURRENCY = 2
+
+# 获取笔记详情的并发数
+XHS_SEARCH_DETAIL_CONCURRENCY = 2
+
+# 获取笔记评论的并发数
+XHS_SEARCH_COMMENT_CONCURRENCY = 2
@@ -22,9 +22,11 @@ import aiomysql
 
 import config
 from async_db import AsyncMysqlDB
+from async_db_buffer import (AsyncDbWriteBuffer, close_write_buffer,
+                             ensure_unique_keys)
 from async_sqlite_db import AsyncSqliteDB
 from tools import utils
-from var import db_conn_pool_var, media_crawler_db_var
+from var import db_conn_pool_var, db_write_buffer_var, media_crawler_db_var
 
 
 async def init_mediacrawler_db():
@@ -73,6 +75,12 @@ async def init_db():
     else:
         await init_mediacrawler_db()
         utils.logger.info("[init_db] end init mysql db connect object")
+    if config.ENABLE_DB_WRITE_BUFFER:
+        db_write_buffer_var.set(AsyncDbWriteBuffer(
+            media_crawler_db_var.get(),
+            batch_size=config.DB_WRITE_BATCH_SIZE,
+            flush_interval=config.DB_WRITE_FLUSH_INTERVAL_SEC,
+        ))
 
 
 async def close():
@@ -82,12 +90,17 @@ async def close():
 
     """
     utils.logger.info("[close] close mediacrawler db connection")
+    # 关闭连接前先写入缓冲区剩余数据
+    await close_write_buffer()
     if config.SAVE_DATA_OPTION == "sqlite":
-        # SQLite数据库连接会在AsyncSqliteDB对象销毁时自动关闭
-        utils.logger.info("[close] sqlite db connection will be closed automatically")
+        # SQLite复用同一个长连接，需要显式关闭
+        async_db_obj: AsyncSqliteDB = media_crawler_db_var.get(None)
+        if async_db_obj is not None:
+            await async_db_obj.close()
+            utils.logger.info("[close] sqlite db connection closed")
     else:
         # MySQL连接池关闭
-        db_pool: aiomysql.Pool = db_conn_pool_var.get()
+        db_pool: aiomysql.Pool = db_conn_pool_var.get(None)
         if db_pool is not None:
             db_pool.close()
             utils.logger.info("[close] mysql db pool closed")
@@ -132,6 +145,7 @@ async def init_table_schema(db_type: str = None):
             schema_sql = await f.read()
             await async_db_obj.executescript(schema_sql)
             utils.logger.info("[init_table_schema] sqlite table schema init successful")
+            await async_db_obj.close()
     elif db_type == "mysql":
         utils.logger.info("[init_table_schema] begin init mysql table schema ...")
         await init_mediacrawler_db()
@@ -146,6 +160,32 @@ async def init_table_schema(db_type: str = None):
         raise ValueError(f"不支持的数据库类型: {db_type}，支持的类型: sqlite, mysql")
 
 
+async def migrate_unique_keys(db_type: str = None):
+    """
+    迁移已有的数据库：为写入缓冲批量upsert需要的字段添加唯一索引，不会删除已有数据
+    Args:
+        db_type: 数据库类型，可选值为 'sqlite' 或 'mysql'，如果不指定则使用配置文件中的设置
+    Returns:
+
+    """
+    if db_type is None:
+        db_type = config.SAVE_DATA_OPTION
+    if db_type == "sqlite":
+        await init_sqlite_db()
+    elif db_type in ("mysql", "db"):
+        await init_mediacrawler_db()
+    else:
+        raise ValueError(f"不支持的数据库类型: {db_type}，支持的类型: sqlite, mysql")
+    utils.logger.info(f"[migrate_unique_keys] begin add unique keys to {db_type} tables ...")
+    try:
+        failed_tables = await ensure_unique_keys(media_crawler_db_var.get())
+    finally:
+        await close()
+    if failed_tables:
+        raise RuntimeError(f"以下表添加唯一索引失败，请先清理重复记录后重新执行: {failed_tables}")
+    utils.logger.info("[migrate_unique_keys] add unique keys successful")
+
+
 def show_database_options():
     """
     显示支持的数据库选项
@@ -155,7 +195,8 @@ def show_database_options():
     print("1. sqlite  - SQLite 数据库 (轻量级，无需额外配置)")
     print("2. mysql   - MySQL 数据库 (需要配置数据库连接信息)")
     print("3. config  - 使用配置文件中的设置")
-    print("4. exit    - 退出程序")
+    print("4. migrate - 为已有的表添加唯一索引 (开启写入缓冲前执行，不删除数据)")
+    print("5. exit    - 退出程序")
     print("="*50)
 
 
@@ -166,12 +207,12 @@ def get_user_choice():
         str: 用户选择的数据库类型
     """
     while True:
-        choice = input("请输入数据库类型 (sqlite/mysql/config/exit): ").strip().lower()
+        choice = input("请输入数据库类型 (sqlite/mysql/config/migrate/exit): ").strip().lower()
         
-        if choice in ['sqlite', 'mysql', 'config', 'exit']:
+        if choice in ['sqlite', 'mysql', 'config', 'migrate', 'exit']:
             return choice
         else:
-            print("❌ 无效的选择，请输入: sqlite, mysql, config 或 exit")
+            print("❌ 无效的选择，请输入: sqlite, mysql, config, migrate 或 exit")
 
 
 async def main():
@@ -192,6 +233,11 @@ async def main():
                 await init_table_schema()
                 print("✅ 数据库表结构初始化完成！")
                 break
+            elif choice == 'migrate':
+                print(f"📋 为配置文件中的数据库添加唯一索引: {config.SAVE_DATA_OPTION}")
+                await migrate_unique_keys()
+                print("✅ 唯一索引添加完成！")
+                break
             else:
                 print(f"🚀 开始初始化 {choice.upper()} 数据库...")
                 await init_table_schema(choice)
@@ -0,0 +1,44 @@
+// 常驻的签名进程：启动时加载一次签名js文件，之后通过stdin/stdout逐行收发JSON完成签名调用
+// 请求: {"id": 1, "fn": "get_sign", "args": [...]}
+// 响应: {"id": 1, "result": ...} 或 {"id": 1, "error": "..."}
+
+const fs = require('fs');
+const vm = require('vm');
+const readline = require('readline');
+
+const jsPath = process.argv[2];
+const source = fs.readFileSync(jsPath, 'utf-8').replace(/^﻿/, '');
+
+// 签名js文件按execjs的方式编写，顶层函数声明需要成为全局函数
+global.require = require;
+vm.runInThisContext(source, {filename: jsPath});
+
+function reply(message) {
+    process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+const rl = readline.createInterface({input: process.stdin, terminal: false});
+rl.on('line', (line) => {
+    if (!line.trim()) {
+        return;
+    }
+    let request;
+    try {
+        request = JSON.parse(line);
+    } catch (e) {
+        return;
+    }
+    try {
+        const fn = globalThis[request.fn];
+        if (typeof fn !== 'function') {
+            throw new Error(`function ${request.fn} not found in ${jsPath}`);
+        }
+        const result = fn.apply(null, request.args || []);
+        reply({id: request.id, result: result === undefined ? null : result});
+    } catch (e) {
+        reply({id: request.id, error: String(e && e.stack || e)});
+    }
+});
+rl.on('close', () => process.exit(0));
+
+reply({id: 0, result: 'ready'});
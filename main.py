@@ -10,40 +10,40 @@
 
 
 import asyncio
+import importlib
 import sys
 from typing import Optional
 
 import cmd_arg
 import config
 import db
+import store
 from base.base_crawler import AbstractCrawler
-from media_platform.bilibili import BilibiliCrawler
-from media_platform.douyin import DouYinCrawler
-from media_platform.kuaishou import KuaishouCrawler
-from media_platform.tieba import TieBaCrawler
-from media_platform.weibo import WeiboCrawler
-from media_platform.xhs import XiaoHongShuCrawler
-from media_platform.zhihu import ZhihuCrawler
+from cache.tiered_cache import close_shared_cache
+from tools import js_sign_pool, media_queue, seen_index, utils
 
 
 class CrawlerFactory:
+    # 各平台的爬虫类按需导入，启动时只加载当前平台的依赖（签名js、pandas等）
     CRAWLERS = {
-        "xhs": XiaoHongShuCrawler,
-        "dy": DouYinCrawler,
-        "ks": KuaishouCrawler,
-        "bili": BilibiliCrawler,
-        "wb": WeiboCrawler,
-        "tieba": TieBaCrawler,
-        "zhihu": ZhihuCrawler,
+        "xhs": "media_platform.xhs.XiaoHongShuCrawler",
+        "dy": "media_platform.douyin.DouYinCrawler",
+        "ks": "media_platform.kuaishou.KuaishouCrawler",
+        "bili": "media_platform.bilibili.BilibiliCrawler",
+        "wb": "media_platform.weibo.WeiboCrawler",
+        "tieba": "media_platform.tieba.TieBaCrawler",
+        "zhihu": "media_platform.zhihu.ZhihuCrawler",
     }
 
     @staticmethod
     def create_crawler(platform: str) -> AbstractCrawler:
-        crawler_class = CrawlerFactory.CRAWLERS.get(platform)
-        if not crawler_class:
+        crawler_path = CrawlerFactory.CRAWLERS.get(platform)
+        if not crawler_path:
             raise ValueError(
                 "Invalid Media Platform Currently only supported xhs or dy or ks or bili ..."
             )
+        module_name, class_name = crawler_path.rsplit(".", 1)
+        crawler_class = getattr(importlib.import_module(module_name), class_name)
         return crawler_class()
 
 
@@ -57,18 +57,34 @@ async def main():
     # parse cmd
     await cmd_arg.parse_cmd()
 
+    if config.MEDIA_ONLY:
+        await media_queue.run_media_only()
+        return
+
     # init db
     if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
         await db.init_db()
 
     crawler = CrawlerFactory.create_crawler(platform=config.PLATFORM)
-    await crawler.start()
+    try:
+        await crawler.start()
+    finally:
+        # 媒体下载复用爬虫的httpx连接池，先等待下载完成，再关闭爬虫的连接池和浏览器，最后关闭存储和数据库
+        await media_queue.close_media_pool()
+        try:
+            await crawler.close()
+        except Exception as e:
+            # 浏览器可能已经随playwright退出而关闭，不影响后续的清理
+            utils.logger.warning(f"[main] close crawler error: {e}")
+        await store.close_all_stores()
+        await js_sign_pool.close_all_pools()
+        await seen_index.close_seen_indexes()
+        await close_shared_cache()
+        if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
+            await db.close()
 
 
 def cleanup():
-    if crawler:
-        # asyncio.run(crawler.close())
-        pass
     if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
         asyncio.run(db.close())
 
@@ -15,22 +15,34 @@
 import asyncio
 import json
 import random
+import time
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
+from cache.response_cache import ENDPOINT_CREATOR, ENDPOINT_DETAIL
+from cache.tiered_cache import get_shared_cache
 from tools import utils
+from tools.comment_pipeline import CommentPipeline
+from tools.comment_watermark import CommentWatermark
+from tools.rate_limiter import crawl_sleep
 
-from .exception import DataFetchError
+from .exception import DataFetchError, WbiSignError
 from .field import CommentOrderType, SearchOrderType
 from .help import BilibiliSign
 
+# wbi签名校验失败的错误码
+WBI_SIGN_ERROR_CODES = (-403, -352)
+
+# 共享缓存中 img_key/sub_key 的键
+WBI_KEYS_CACHE_KEY = "bili_wbi_keys"
+
 
 class BilibiliClient(AbstractApiClient):
+    platform = "bili"
 
     def __init__(
         self,
@@ -41,21 +53,29 @@ class BilibiliClient(AbstractApiClient):
         playwright_page: Page,
         cookie_dict: Dict[str, str],
     ):
+        super().__init__()
         self.proxy = proxy
         self.timeout = timeout
         self.headers = headers
         self._host = "https://api.bilibili.com"
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
+        # wbi签名对象缓存，img_key/sub_key 过期前复用预先计算好的 salt
+        self._wbi_sign: Optional[BilibiliSign] = None
+        self._wbi_sign_expire_at: float = 0
+        self._wbi_keys_lock = asyncio.Lock()
 
     async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        await self.wait_rate_limit(url, cookie=self.headers.get("Cookie", ""), proxy=self.proxy)
+        client = self.get_http_client(self.proxy)
+        response = await client.request(method, url, timeout=self.timeout, **kwargs)
         try:
             data: Dict = response.json()
         except json.JSONDecodeError:
             utils.logger.error(f"[BilibiliClient.request] Failed to decode JSON from response. status_code: {response.status_code}, response_text: {response.text}")
             raise DataFetchError(f"Failed to decode JSON, content: {response.text}")
+        if data.get("code") in WBI_SIGN_ERROR_CODES and "w_rid" in str(response.request.url):
+            raise WbiSignError(data.get("message", "unkonw error"))
         if data.get("code") != 0:
             raise DataFetchError(data.get("message", "unkonw error"))
         else:
@@ -71,15 +91,43 @@ class BilibiliClient(AbstractApiClient):
         """
         if not req_data:
             return {}
-        img_key, sub_key = await self.get_wbi_keys()
-        return BilibiliSign(img_key, sub_key).sign(req_data)
+        return (await self.get_wbi_sign()).sign(req_data)
+
+    async def get_wbi_sign(self) -> BilibiliSign:
+        """
+        获取缓存的wbi签名对象，缓存过期后重新获取 img_key 和 sub_key
+        :return:
+        """
+        if self._wbi_sign and time.monotonic() < self._wbi_sign_expire_at:
+            return self._wbi_sign
+        async with self._wbi_keys_lock:
+            if not self._wbi_sign or time.monotonic() >= self._wbi_sign_expire_at:
+                # 首次从 localStorage 读取，之后的刷新直接请求 nav 接口拿最新的key
+                # 开启共享缓存时多个进程共用同一对key，只有一个进程去获取
+                from_nav = self._wbi_sign is not None
+                img_key, sub_key = await get_shared_cache().get_or_load(
+                    WBI_KEYS_CACHE_KEY, lambda: self.get_wbi_keys(from_nav=from_nav), config.BILI_WBI_KEYS_TTL_SEC
+                )
+                self._wbi_sign = BilibiliSign(img_key, sub_key)
+                self._wbi_sign_expire_at = time.monotonic() + config.BILI_WBI_KEYS_TTL_SEC
+                utils.logger.info(f"[BilibiliClient.get_wbi_sign] refresh wbi keys, img_key: {img_key}, sub_key: {sub_key}")
+        return self._wbi_sign
+
+    async def invalidate_wbi_keys(self):
+        """
+        签名校验失败时调用，下次签名时重新获取 img_key 和 sub_key
+        :return:
+        """
+        self._wbi_sign_expire_at = 0
+        await get_shared_cache().delete(WBI_KEYS_CACHE_KEY)
 
-    async def get_wbi_keys(self) -> Tuple[str, str]:
+    async def get_wbi_keys(self, from_nav: bool = False) -> Tuple[str, str]:
         """
         获取最新的 img_key 和 sub_key
+        :param from_nav: 是否跳过 localStorage 直接请求 nav 接口
         :return:
         """
-        local_storage = await self.playwright_page.evaluate("() => window.localStorage")
+        local_storage = {} if from_nav else await self.playwright_page.evaluate("() => window.localStorage")
         wbi_img_urls = local_storage.get("wbi_img_urls", "")
         if not wbi_img_urls:
             img_url_from_storage = local_storage.get("wbi_img_url")
@@ -97,6 +145,15 @@ class BilibiliClient(AbstractApiClient):
         return img_key, sub_key
 
     async def get(self, uri: str, params=None, enable_params_sign: bool = True) -> Dict:
+        try:
+            return await self._get(uri, params, enable_params_sign)
+        except WbiSignError as e:
+            # img_key/sub_key 可能已经过期，刷新后重试一次
+            utils.logger.warning(f"[BilibiliClient.get] wbi sign verification failed: {e}, refresh wbi keys and retry")
+            await self.invalidate_wbi_keys()
+            return await self._get(uri, params, enable_params_sign)
+
+    async def _get(self, uri: str, params=None, enable_params_sign: bool = True) -> Dict:
         final_uri = uri
         if enable_params_sign:
             params = await self.pre_request_data(params)
@@ -177,7 +234,10 @@ class BilibiliClient(AbstractApiClient):
             params.update({"aid": aid})
         else:
             params.update({"bvid": bvid})
-        return await self.get(uri, params, enable_params_sign=False)
+        # 多个关键词搜到同一个视频时只请求一次
+        return await self.coalesce(ENDPOINT_DETAIL, str(aid or bvid), lambda: self.cached_request(
+            ENDPOINT_DETAIL, self._host + uri, params, lambda: self.get(uri, params, enable_params_sign=False)
+        )) or {}
 
     async def get_video_play_url(self, aid: int, cid: int) -> Dict:
         """
@@ -200,20 +260,6 @@ class BilibiliClient(AbstractApiClient):
 
         return await self.get(uri, params, enable_params_sign=True)
 
-    async def get_video_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            try:
-                response = await client.request("GET", url, timeout=self.timeout, headers=self.headers)
-                response.raise_for_status()
-                if not response.reason_phrase == "OK":
-                    utils.logger.error(f"[BilibiliClient.get_video_media] request {url} err, res:{response.text}")
-                    return None
-                else:
-                    return response.content
-            except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
-                utils.logger.error(f"[BilibiliClient.get_video_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")  # 保留原始异常类型名称，以便开发者调试
-                return None
-
     async def get_video_comments(
         self,
         video_id: str,
@@ -252,55 +298,65 @@ class BilibiliClient(AbstractApiClient):
         is_end = False
         next_page = 0
         max_retries = 3
-        while not is_end and len(result) < max_count:
-            comments_res = None
-            for attempt in range(max_retries):
-                try:
-                    comments_res = await self.get_video_comments(video_id, CommentOrderType.DEFAULT, next_page)
-                    break  # Success
-                except DataFetchError as e:
-                    if attempt < max_retries - 1:
-                        delay = 5 * (2**attempt) + random.uniform(0, 1)
-                        utils.logger.warning(f"[BilibiliClient.get_video_all_comments] Retrying video_id {video_id} in {delay:.2f}s... (Attempt {attempt + 1}/{max_retries})")
-                        await asyncio.sleep(delay)
-                    else:
-                        utils.logger.error(f"[BilibiliClient.get_video_all_comments] Max retries reached for video_id: {video_id}. Skipping comments. Error: {e}")
-                        is_end = True
-                        break
-            if not comments_res:
-                break
-
-            cursor_info: Dict = comments_res.get("cursor")
-            if not cursor_info:
-                utils.logger.warning(f"[BilibiliClient.get_video_all_comments] Could not find 'cursor' in response for video_id: {video_id}. Skipping.")
-                break
-
-            comment_list: List[Dict] = comments_res.get("replies", [])
-
-            # 检查 is_end 和 next 是否存在
-            if "is_end" not in cursor_info or "next" not in cursor_info:
-                utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' or 'next' not in cursor for video_id: {video_id}. Assuming end of comments.")
-                is_end = True
-            else:
-                is_end = cursor_info.get("is_end")
-                next_page = cursor_info.get("next")
-
-            if not isinstance(is_end, bool):
-                utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' is not a boolean for video_id: {video_id}. Assuming end of comments.")
-                is_end = True
-            if is_fetch_sub_comments:
-                for comment in comment_list:
-                    comment_id = comment['rpid']
-                    if (comment.get("rcount", 0) > 0):
-                        {await self.get_video_all_level_two_comments(video_id, comment_id, CommentOrderType.DEFAULT, 10, crawl_interval, callback)}
-            if len(result) + len(comment_list) > max_count:
-                comment_list = comment_list[:max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(video_id, comment_list)
-            await asyncio.sleep(crawl_interval)
-            if not is_fetch_sub_comments:
-                result.extend(comment_list)
-                continue
+        watermark = await CommentWatermark(
+            "bili", video_id, get_time=lambda comment: comment.get("ctime"), get_id=lambda comment: comment.get("rpid")
+        ).load()
+        # 增量爬取时按时间倒序请求，才能在遇到已经保存过的评论时停止翻页
+        order_mode = CommentOrderType.TIME if watermark.enabled else CommentOrderType.DEFAULT
+        async with CommentPipeline(callback, crawl_interval) as pipeline:
+            while not is_end and not watermark.reached and len(result) < max_count:
+                comments_res = None
+                for attempt in range(max_retries):
+                    try:
+                        await pipeline.pace()
+                        comments_res = await self.get_video_comments(video_id, order_mode, next_page)
+                        break  # Success
+                    except DataFetchError as e:
+                        if attempt < max_retries - 1:
+                            delay = 5 * (2**attempt) + random.uniform(0, 1)
+                            utils.logger.warning(f"[BilibiliClient.get_video_all_comments] Retrying video_id {video_id} in {delay:.2f}s... (Attempt {attempt + 1}/{max_retries})")
+                            await asyncio.sleep(delay)
+                        else:
+                            utils.logger.error(f"[BilibiliClient.get_video_all_comments] Max retries reached for video_id: {video_id}. Skipping comments. Error: {e}")
+                            is_end = True
+                            break
+                if not comments_res:
+                    # 没有爬完就失败时不更新水位线
+                    return result
+
+                cursor_info: Dict = comments_res.get("cursor")
+                if not cursor_info:
+                    utils.logger.warning(f"[BilibiliClient.get_video_all_comments] Could not find 'cursor' in response for video_id: {video_id}. Skipping.")
+                    break
+
+                comment_list: List[Dict] = watermark.filter_page(comments_res.get("replies") or [])
+
+                # 检查 is_end 和 next 是否存在
+                if "is_end" not in cursor_info or "next" not in cursor_info:
+                    utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' or 'next' not in cursor for video_id: {video_id}. Assuming end of comments.")
+                    is_end = True
+                else:
+                    is_end = cursor_info.get("is_end")
+                    next_page = cursor_info.get("next")
+
+                if not isinstance(is_end, bool):
+                    utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' is not a boolean for video_id: {video_id}. Assuming end of comments.")
+                    is_end = True
+                if is_fetch_sub_comments:
+                    # 二级评论在后台展开，同时继续请求下一页一级评论
+                    for comment in comment_list:
+                        comment_id = comment['rpid']
+                        if (comment.get("rcount", 0) > 0):
+                            pipeline.submit(self.get_video_all_level_two_comments(
+                                video_id, comment_id, CommentOrderType.DEFAULT, 10, crawl_interval, callback, pipeline
+                            ))
+                if len(result) + len(comment_list) > max_count:
+                    comment_list = comment_list[:max_count - len(result)]
+                await pipeline.store(video_id, comment_list)
+                if not is_fetch_sub_comments:
+                    result.extend(comment_list)
+                    continue
+        await watermark.save()
         return result
 
     async def get_video_all_level_two_comments(
@@ -311,6 +367,7 @@ class BilibiliClient(AbstractApiClient):
         ps: int = 10,
         crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
+        pipeline: Optional[CommentPipeline] = None,
     ) -> Dict:
         """
         get video all level two comments for a level one comment
@@ -320,16 +377,21 @@ class BilibiliClient(AbstractApiClient):
         :param ps: 一页评论数
         :param crawl_interval:
         :param callback:
+        :param pipeline: 所属的评论爬取流水线，为None时单独创建
         :return:
         """
+        if pipeline is None:
+            async with CommentPipeline(callback, crawl_interval) as pipeline:
+                return await self.get_video_all_level_two_comments(
+                    video_id, level_one_comment_id, order_mode, ps, crawl_interval, callback, pipeline
+                )
 
         pn = 1
         while True:
+            await pipeline.pace()
             result = await self.get_video_level_two_comments(video_id, level_one_comment_id, pn, ps, order_mode)
             comment_list: List[Dict] = result.get("replies", [])
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(video_id, comment_list)
-            await asyncio.sleep(crawl_interval)
+            await pipeline.store(video_id, comment_list)
             if (int(result["page"]["count"]) <= pn * ps):
                 break
 
@@ -389,7 +451,7 @@ class BilibiliClient(AbstractApiClient):
         post_data = {
             "mid": creator_id,
         }
-        return await self.get(uri, post_data)
+        return await self.cached_request(ENDPOINT_CREATOR, self._host + uri, post_data, lambda: self.get(uri, post_data))
 
     async def get_creator_fans(
         self,
@@ -479,7 +541,7 @@ class BilibiliClient(AbstractApiClient):
                 fans_list = fans_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(creator_info, fans_list)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             if not fans_list:
                 break
             result.extend(fans_list)
@@ -513,7 +575,7 @@ class BilibiliClient(AbstractApiClient):
                 followings_list = followings_list[:max_count - len(result)]
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(creator_info, followings_list)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             if not followings_list:
                 break
             result.extend(followings_list)
@@ -548,6 +610,6 @@ class BilibiliClient(AbstractApiClient):
                 dynamics_list = dynamics_list[:max_count - len(result)]
             if callback:
                 await callback(creator_info, dynamics_list)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             result.extend(dynamics_list)
         return result
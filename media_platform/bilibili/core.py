@@ -19,7 +19,6 @@ import random
 from asyncio import Task
 from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
-import pandas as pd
 
 from playwright.async_api import (
     BrowserContext,
@@ -34,8 +33,10 @@ import config
 from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import bilibili as bilibili_store
-from tools import utils
+from tools import media_queue, seen_index, utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.media_queue import MediaJob
+from tools.rate_limiter import crawl_sleep
 from var import crawler_type_var, source_keyword_var
 
 from .client import BilibiliClient
@@ -215,6 +216,9 @@ class BilibiliCrawler(AbstractCrawler):
         Search bilibili video with keywords in a given time range.
         :param daily_limit: if True, strictly limit the number of notes per day and total.
         """
+        # pandas导入较慢，只在按时间范围搜索时才需要
+        import pandas as pd
+
         utils.logger.info(f"[BilibiliCrawler.search_by_keywords_in_time_range] Begin search with daily_limit={daily_limit}")
         bili_limit_count = 20
         start_page = config.START_PAGE
@@ -315,10 +319,12 @@ class BilibiliCrawler(AbstractCrawler):
         :param semaphore:
         :return:
         """
+        if await seen_index.is_content_fresh("bili", video_id):
+            return
         async with semaphore:
             try:
                 utils.logger.info(f"[BilibiliCrawler.get_comments] begin get video_id: {video_id} comments ...")
-                await asyncio.sleep(random.uniform(0.5, 1.5))
+                await crawl_sleep(random.uniform(0.5, 1.5))
                 await self.bili_client.get_video_all_comments(
                     video_id=video_id,
                     crawl_interval=random.random(),
@@ -326,6 +332,7 @@ class BilibiliCrawler(AbstractCrawler):
                     callback=bilibili_store.batch_update_bilibili_video_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
                 )
+                await seen_index.mark_comments_done("bili", video_id)
 
             except DataFetchError as ex:
                 utils.logger.error(f"[BilibiliCrawler.get_comments] get video_id: {video_id} comment error: {ex}")
@@ -347,7 +354,7 @@ class BilibiliCrawler(AbstractCrawler):
             await self.get_specified_videos(video_bvids_list)
             if int(result["page"]["count"]) <= pn * ps:
                 break
-            await asyncio.sleep(random.random())
+            await crawl_sleep(random.random())
             pn += 1
 
     async def get_specified_videos(self, bvids_list: List[str]):
@@ -378,6 +385,9 @@ class BilibiliCrawler(AbstractCrawler):
         :param semaphore:
         :return:
         """
+        # 指定bvid爬取时还不知道aid，只能在获取详情后再判断
+        if aid and await seen_index.is_content_fresh("bili", aid):
+            return None
         async with semaphore:
             try:
                 result = await self.bili_client.get_video_info(aid=aid, bvid=bvid)
@@ -501,6 +511,9 @@ class BilibiliCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        # 关闭API客户端复用的httpx连接池
+        if hasattr(self, "bili_client"):
+            await self.bili_client.close()
         try:
             # 如果使用CDP模式，需要特殊处理
             if self.cdp_manager:
@@ -543,12 +556,10 @@ class BilibiliCrawler(AbstractCrawler):
             utils.logger.info("[BilibiliCrawler.get_bilibili_video] get video url failed")
             return
 
-        content = await self.bili_client.get_video_media(video_url)
-        await asyncio.sleep(random.random())
-        if content is None:
-            return
-        extension_file_name = f"video.mp4"
-        await bilibili_store.store_video(aid, content, extension_file_name)
+        # B站视频CDN有防盗链，下载时带上API客户端的UA和Referer
+        await media_queue.enqueue_media(MediaJob(
+            platform="bili", media_type="video", owner_id=str(aid), extension_file_name="video.mp4", url=video_url,
+        ), self.bili_client)
 
     async def get_all_creator_details(self, creator_id_list: List[int]):
         """
@@ -23,3 +23,7 @@ class DataFetchError(RequestError):
 
 class IPBlockError(RequestError):
     """fetch so fast that the server block us ip"""
+
+
+class WbiSignError(DataFetchError):
+    """wbi sign verification failed, maybe the img_key/sub_key is expired"""
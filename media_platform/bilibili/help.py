@@ -21,27 +21,36 @@ from typing import Dict
 from tools import utils
 
 
+# wbi 签名的 mixin key 重排表
+MIXIN_KEY_ENC_TAB = [
+    46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
+    33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
+    61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
+    36, 20, 34, 44, 52
+]
+
+# 过滤 value 中的 "!'()*" 字符
+_FILTER_CHARS_TABLE = str.maketrans("", "", "!'()*")
+
+
 class BilibiliSign:
     def __init__(self, img_key: str, sub_key: str):
         self.img_key = img_key
         self.sub_key = sub_key
-        self.map_table = [
-            46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
-            33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
-            61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
-            36, 20, 34, 44, 52
-        ]
+        self.map_table = MIXIN_KEY_ENC_TAB
+        # img_key 和 sub_key 不变时 salt 也不变，只在初始化时计算一次
+        self.salt = self._compute_salt()
+
+    def _compute_salt(self) -> str:
+        mixin_key = self.img_key + self.sub_key
+        return "".join(mixin_key[mt] for mt in self.map_table)[:32]
 
     def get_salt(self) -> str:
         """
         获取加盐的 key
         :return:
         """
-        salt = ""
-        mixin_key = self.img_key + self.sub_key
-        for mt in self.map_table:
-            salt += mixin_key[mt]
-        return salt[:32]
+        return self.salt
 
     def sign(self, req_data: Dict) -> Dict:
         """
@@ -52,16 +61,9 @@ class BilibiliSign:
         """
         current_ts = utils.get_unix_timestamp()
         req_data.update({"wts": current_ts})
-        req_data = dict(sorted(req_data.items()))
-        req_data = {
-            # 过滤 value 中的 "!'()*" 字符
-            k: ''.join(filter(lambda ch: ch not in "!'()*", str(v)))
-            for k, v
-            in req_data.items()
-        }
+        req_data = {k: str(v).translate(_FILTER_CHARS_TABLE) for k, v in sorted(req_data.items())}
         query = urllib.parse.urlencode(req_data)
-        salt = self.get_salt()
-        wbi_sign = md5((query + salt).encode()).hexdigest()  # 计算 w_rid
+        wbi_sign = md5((query + self.salt).encode()).hexdigest()  # 计算 w_rid
         req_data['w_rid'] = wbi_sign
         return req_data
 
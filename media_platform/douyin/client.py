@@ -8,17 +8,17 @@
 # 详细许可条款请参阅项目根目录下的LICENSE文件。
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
-import asyncio
 import copy
 import json
 import urllib.parse
-from typing import Any, Callable, Dict, Union, Optional
+from typing import Any, Callable, Dict, List, Optional
 
-import httpx
 from playwright.async_api import BrowserContext
 
 from base.base_crawler import AbstractApiClient
+from cache.response_cache import ENDPOINT_CREATOR, ENDPOINT_DETAIL
 from tools import utils
+from tools.comment_pipeline import CommentPipeline
 from var import request_keyword_var
 
 from .exception import *
@@ -27,6 +27,7 @@ from .help import *
 
 
 class DouYinClient(AbstractApiClient):
+    platform = "dy"
 
     def __init__(
         self,
@@ -37,6 +38,7 @@ class DouYinClient(AbstractApiClient):
         playwright_page: Optional[Page],
         cookie_dict: Dict,
     ):
+        super().__init__()
         self.proxy = proxy
         self.timeout = timeout
         self.headers = headers
@@ -95,8 +97,9 @@ class DouYinClient(AbstractApiClient):
         params["a_bogus"] = a_bogus
 
     async def request(self, method, url, **kwargs):
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        await self.wait_rate_limit(url, cookie=self.headers.get("Cookie", ""), proxy=self.proxy)
+        client = self.get_http_client(self.proxy)
+        response = await client.request(method, url, timeout=self.timeout, **kwargs)
         try:
             if response.text == "" or response.text == "blocked":
                 utils.logger.error(f"request params incrr, response.text: {response.text}")
@@ -182,8 +185,15 @@ class DouYinClient(AbstractApiClient):
         params = {"aweme_id": aweme_id}
         headers = copy.copy(self.headers)
         del headers["Origin"]
-        res = await self.get("/aweme/v1/web/aweme/detail/", params, headers)
-        return res.get("aweme_detail", {})
+        uri = "/aweme/v1/web/aweme/detail/"
+
+        async def fetch() -> Optional[Dict]:
+            res = await self.cached_request(ENDPOINT_DETAIL, self._host + uri, params,
+                                            lambda: self.get(uri, params, headers))
+            return res.get("aweme_detail")
+
+        # 多个关键词搜到同一个视频时只请求一次
+        return await self.coalesce(ENDPOINT_DETAIL, aweme_id, fetch) or {}
 
     async def get_aweme_comments(self, aweme_id: str, cursor: int = 0):
         """get note comments
@@ -235,43 +245,51 @@ class DouYinClient(AbstractApiClient):
         result = []
         comments_has_more = 1
         comments_cursor = 0
-        while comments_has_more and len(result) < max_count:
-            comments_res = await self.get_aweme_comments(aweme_id, comments_cursor)
-            comments_has_more = comments_res.get("has_more", 0)
-            comments_cursor = comments_res.get("cursor", 0)
-            comments = comments_res.get("comments", [])
-            if not comments:
-                continue
-            if len(result) + len(comments) > max_count:
-                comments = comments[:max_count - len(result)]
-            result.extend(comments)
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(aweme_id, comments)
-
-            await asyncio.sleep(crawl_interval)
-            if not is_fetch_sub_comments:
-                continue
-            # 获取二级评论
-            for comment in comments:
-                reply_comment_total = comment.get("reply_comment_total")
-
-                if reply_comment_total > 0:
-                    comment_id = comment.get("cid")
-                    sub_comments_has_more = 1
-                    sub_comments_cursor = 0
+        async with CommentPipeline(callback, crawl_interval) as pipeline:
+            while comments_has_more and len(result) < max_count:
+                await pipeline.pace()
+                comments_res = await self.get_aweme_comments(aweme_id, comments_cursor)
+                comments_has_more = comments_res.get("has_more", 0)
+                comments_cursor = comments_res.get("cursor", 0)
+                comments = comments_res.get("comments", [])
+                if not comments:
+                    continue
+                if len(result) + len(comments) > max_count:
+                    comments = comments[:max_count - len(result)]
+                result.extend(comments)
+                await pipeline.store(aweme_id, comments)
+                if not is_fetch_sub_comments:
+                    continue
+                # 二级评论在后台展开，同时继续请求下一页一级评论
+                for comment in comments:
+                    reply_comment_total = comment.get("reply_comment_total")
+                    if reply_comment_total > 0:
+                        pipeline.submit(self.get_aweme_all_sub_comments(aweme_id, comment.get("cid"), pipeline))
+        result.extend(pipeline.sub_results)
+        return result
 
-                    while sub_comments_has_more:
-                        sub_comments_res = await self.get_sub_comments(aweme_id, comment_id, sub_comments_cursor)
-                        sub_comments_has_more = sub_comments_res.get("has_more", 0)
-                        sub_comments_cursor = sub_comments_res.get("cursor", 0)
-                        sub_comments = sub_comments_res.get("comments", [])
+    async def get_aweme_all_sub_comments(self, aweme_id: str, comment_id: str, pipeline: CommentPipeline) -> List[Dict]:
+        """
+        获取一条一级评论下的所有二级评论
+        :param aweme_id: 帖子ID
+        :param comment_id: 一级评论ID
+        :param pipeline: 所属的评论爬取流水线
+        :return: 二级评论列表
+        """
+        result = []
+        sub_comments_has_more = 1
+        sub_comments_cursor = 0
+        while sub_comments_has_more:
+            await pipeline.pace()
+            sub_comments_res = await self.get_sub_comments(aweme_id, comment_id, sub_comments_cursor)
+            sub_comments_has_more = sub_comments_res.get("has_more", 0)
+            sub_comments_cursor = sub_comments_res.get("cursor", 0)
+            sub_comments = sub_comments_res.get("comments", [])
 
-                        if not sub_comments:
-                            continue
-                        result.extend(sub_comments)
-                        if callback:  # 如果有回调函数，就执行回调函数
-                            await callback(aweme_id, sub_comments)
-                        await asyncio.sleep(crawl_interval)
+            if not sub_comments:
+                continue
+            result.extend(sub_comments)
+            await pipeline.store(aweme_id, sub_comments)
         return result
 
     async def get_user_info(self, sec_user_id: str):
@@ -281,7 +299,7 @@ class DouYinClient(AbstractApiClient):
             "publish_video_strategy_type": 2,
             "personal_center_strategy": 1,
         }
-        return await self.get(uri, params)
+        return await self.cached_request(ENDPOINT_CREATOR, self._host + uri, params, lambda: self.get(uri, params))
 
     async def get_user_aweme_posts(self, sec_user_id: str, max_cursor: str = "") -> Dict:
         uri = "/aweme/v1/web/aweme/post/"
@@ -310,17 +328,3 @@ class DouYinClient(AbstractApiClient):
                 await callback(aweme_list)
             result.extend(aweme_list)
         return result
-
-    async def get_aweme_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            try:
-                response = await client.request("GET", url, timeout=self.timeout, follow_redirects=True)
-                response.raise_for_status()
-                if not response.reason_phrase == "OK":
-                    utils.logger.error(f"[DouYinClient.get_aweme_media] request {url} err, res:{response.text}")
-                    return None
-                else:
-                    return response.content
-            except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
-                utils.logger.error(f"[DouYinClient.get_aweme_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")  # 保留原始异常类型名称，以便开发者调试
-                return None
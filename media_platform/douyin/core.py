@@ -26,8 +26,9 @@ import config
 from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import douyin as douyin_store
-from tools import utils
+from tools import js_sign_pool, media_queue, seen_index, utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.media_queue import MediaJob
 from var import crawler_type_var, source_keyword_var
 
 from .client import DouYinClient
@@ -163,6 +164,8 @@ class DouYinCrawler(AbstractCrawler):
 
     async def get_aweme_detail(self, aweme_id: str, semaphore: asyncio.Semaphore) -> Any:
         """Get note detail"""
+        if await seen_index.is_content_fresh("dy", aweme_id):
+            return None
         async with semaphore:
             try:
                 return await self.dy_client.get_video_by_id(aweme_id)
@@ -190,6 +193,8 @@ class DouYinCrawler(AbstractCrawler):
             await asyncio.wait(task_list)
 
     async def get_comments(self, aweme_id: str, semaphore: asyncio.Semaphore) -> None:
+        if await seen_index.is_content_fresh("dy", aweme_id):
+            return
         async with semaphore:
             try:
                 # 将关键词列表传递给 get_aweme_all_comments 方法
@@ -200,6 +205,7 @@ class DouYinCrawler(AbstractCrawler):
                     callback=douyin_store.batch_update_dy_aweme_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
                 )
+                await seen_index.mark_comments_done("dy", aweme_id)
                 utils.logger.info(f"[DouYinCrawler.get_comments] aweme_id: {aweme_id} comments have all been obtained and filtered ...")
             except DataFetchError as e:
                 utils.logger.error(f"[DouYinCrawler.get_comments] aweme_id: {aweme_id} get comments failed, error: {e}")
@@ -314,6 +320,11 @@ class DouYinCrawler(AbstractCrawler):
 
     async def close(self) -> None:
         """Close browser context"""
+        # 关闭API客户端复用的httpx连接池
+        if hasattr(self, "dy_client"):
+            await self.dy_client.close()
+        # 关闭常驻的node签名进程
+        await js_sign_pool.close_all_pools()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -361,13 +372,11 @@ class DouYinCrawler(AbstractCrawler):
         for url in note_download_url:
             if not url:
                 continue
-            content = await self.dy_client.get_aweme_media(url)
-            await asyncio.sleep(random.random())
-            if content is None:
-                continue
             extension_file_name = f"{picNum:>03d}.jpeg"
             picNum += 1
-            await douyin_store.update_dy_aweme_image(aweme_id, content, extension_file_name)
+            await media_queue.enqueue_media(MediaJob(
+                platform="dy", media_type="image", owner_id=aweme_id, extension_file_name=extension_file_name, url=url,
+            ), self.dy_client)
 
     async def get_aweme_video(self, aweme_item: Dict):
         """
@@ -385,9 +394,7 @@ class DouYinCrawler(AbstractCrawler):
 
         if not video_download_url:
             return
-        content = await self.dy_client.get_aweme_media(video_download_url)
-        await asyncio.sleep(random.random())
-        if content is None:
-            return
-        extension_file_name = f"video.mp4"
-        await douyin_store.update_dy_aweme_video(aweme_id, content, extension_file_name)
+        await media_queue.enqueue_media(MediaJob(
+            platform="dy", media_type="video", owner_id=aweme_id, extension_file_name="video.mp4",
+            url=video_download_url,
+        ), self.dy_client)
@@ -17,10 +17,13 @@
 
 import random
 
-import execjs
 from playwright.async_api import Page
 
-douyin_sign_obj = execjs.compile(open('libs/douyin.js', encoding='utf-8-sig').read())
+from tools import js_sign_pool, utils
+
+DOUYIN_SIGN_JS_PATH = 'libs/douyin.js'
+# 签名js在第一次回退到execjs时才编译，不在导入模块时启动node
+douyin_sign_obj = None
 
 def get_web_id():
     """
@@ -48,8 +51,29 @@ async def get_a_bogus(url: str, params: str, post_data: dict, user_agent: str, p
     """
     获取 a_bogus 参数, 目前不支持post请求类型的签名
     """
+    sign_pool = js_sign_pool.get_pool(DOUYIN_SIGN_JS_PATH)
+    if sign_pool is not None:
+        try:
+            return await sign_pool.call(get_sign_js_name(url), params, user_agent)
+        except js_sign_pool.JsSignError as e:
+            utils.logger.warning(f"[get_a_bogus] node sign worker failed, fallback to execjs, error: {e}")
     return get_a_bogus_from_js(url, params, user_agent)
 
+
+def get_sign_js_name(url: str) -> str:
+    """
+    根据请求地址选择签名函数
+    Args:
+        url:
+
+    Returns:
+
+    """
+    if "/reply" in url:
+        return "sign_reply"
+    return "sign_datail"
+
+
 def get_a_bogus_from_js(url: str, params: str, user_agent: str):
     """
     通过js获取 a_bogus 参数
@@ -61,10 +85,13 @@ def get_a_bogus_from_js(url: str, params: str, user_agent: str):
     Returns:
 
     """
-    sign_js_name = "sign_datail"
-    if "/reply" in url:
-        sign_js_name = "sign_reply"
-    return douyin_sign_obj.call(sign_js_name, params, user_agent)
+    global douyin_sign_obj
+    if not douyin_sign_obj:
+        import execjs
+
+        with open(DOUYIN_SIGN_JS_PATH, encoding='utf-8-sig') as f:
+            douyin_sign_obj = execjs.compile(f.read())
+    return douyin_sign_obj.call(get_sign_js_name(url), params, user_agent)
 
 
 
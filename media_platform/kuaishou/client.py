@@ -10,23 +10,26 @@
 
 
 # -*- coding: utf-8 -*-
-import asyncio
 import json
 from typing import Any, Callable, Dict, List, Optional
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
+from cache.response_cache import ENDPOINT_DETAIL
 from tools import utils
+from tools.comment_pipeline import CommentPipeline
+from tools.rate_limiter import crawl_sleep
 
 from .exception import DataFetchError
 from .graphql import KuaiShouGraphQL
 
 
 class KuaiShouClient(AbstractApiClient):
+    platform = "ks"
+
     def __init__(
         self,
         timeout=10,
@@ -36,6 +39,7 @@ class KuaiShouClient(AbstractApiClient):
         playwright_page: Page,
         cookie_dict: Dict[str, str],
     ):
+        super().__init__()
         self.proxy = proxy
         self.timeout = timeout
         self.headers = headers
@@ -45,8 +49,9 @@ class KuaiShouClient(AbstractApiClient):
         self.graphql = KuaiShouGraphQL()
 
     async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        await self.wait_rate_limit(url, cookie=self.headers.get("Cookie", ""), proxy=self.proxy)
+        client = self.get_http_client(self.proxy)
+        response = await client.request(method, url, timeout=self.timeout, **kwargs)
         data: Dict = response.json()
         if data.get("errors"):
             raise DataFetchError(data.get("errors", "unkonw error"))
@@ -127,7 +132,7 @@ class KuaiShouClient(AbstractApiClient):
             "variables": {"photoId": photo_id, "page": "search"},
             "query": self.graphql.get("video_detail"),
         }
-        return await self.post("", post_data)
+        return await self.cached_request(ENDPOINT_DETAIL, self._host, post_data, lambda: self.post("", post_data))
 
     async def get_video_comments(self, photo_id: str, pcursor: str = "") -> Dict:
         """get video comments
@@ -196,21 +201,22 @@ class KuaiShouClient(AbstractApiClient):
         result = []
         pcursor = ""
 
-        while pcursor != "no_more" and len(result) < max_count:
-            comments_res = await self.get_video_comments(photo_id, pcursor)
-            vision_commen_list = comments_res.get("visionCommentList", {})
-            pcursor = vision_commen_list.get("pcursor", "")
-            comments = vision_commen_list.get("rootComments", [])
-            if len(result) + len(comments) > max_count:
-                comments = comments[: max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(photo_id, comments)
-            result.extend(comments)
-            await asyncio.sleep(crawl_interval)
-            sub_comments = await self.get_comments_all_sub_comments(
-                comments, photo_id, crawl_interval, callback
-            )
-            result.extend(sub_comments)
+        async with CommentPipeline(callback, crawl_interval) as pipeline:
+            while pcursor != "no_more" and len(result) < max_count:
+                await pipeline.pace()
+                comments_res = await self.get_video_comments(photo_id, pcursor)
+                vision_commen_list = comments_res.get("visionCommentList", {})
+                pcursor = vision_commen_list.get("pcursor", "")
+                comments = vision_commen_list.get("rootComments", [])
+                if len(result) + len(comments) > max_count:
+                    comments = comments[: max_count - len(result)]
+                await pipeline.store(photo_id, comments)
+                result.extend(comments)
+                # 二级评论在后台展开，同时继续请求下一页一级评论
+                pipeline.submit(self.get_comments_all_sub_comments(
+                    comments, photo_id, crawl_interval, callback, pipeline
+                ))
+        result.extend(pipeline.sub_results)
         return result
 
     async def get_comments_all_sub_comments(
@@ -219,6 +225,7 @@ class KuaiShouClient(AbstractApiClient):
         photo_id,
         crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
+        pipeline: Optional[CommentPipeline] = None,
     ) -> List[Dict]:
         """
         获取指定一级评论下的所有二级评论, 该方法会一直查找一级评论下的所有二级评论信息
@@ -227,6 +234,7 @@ class KuaiShouClient(AbstractApiClient):
             photo_id: 视频id
             crawl_interval: 爬取一次评论的延迟单位（秒）
             callback: 一次评论爬取结束后
+            pipeline: 所属的评论爬取流水线，为None时单独创建
         Returns:
 
         """
@@ -235,12 +243,15 @@ class KuaiShouClient(AbstractApiClient):
                 f"[KuaiShouClient.get_comments_all_sub_comments] Crawling sub_comment mode is not enabled"
             )
             return []
+        if pipeline is None:
+            async with CommentPipeline(callback, crawl_interval) as pipeline:
+                return await self.get_comments_all_sub_comments(comments, photo_id, crawl_interval, callback, pipeline)
 
         result = []
         for comment in comments:
             sub_comments = comment.get("subComments")
-            if sub_comments and callback:
-                await callback(photo_id, sub_comments)
+            if sub_comments:
+                await pipeline.store(photo_id, sub_comments)
 
             sub_comment_pcursor = comment.get("subCommentsPcursor")
             if sub_comment_pcursor == "no_more":
@@ -250,6 +261,7 @@ class KuaiShouClient(AbstractApiClient):
             sub_comment_pcursor = ""
 
             while sub_comment_pcursor != "no_more":
+                await pipeline.pace()
                 comments_res = await self.get_video_sub_comments(
                     photo_id, root_comment_id, sub_comment_pcursor
                 )
@@ -257,9 +269,7 @@ class KuaiShouClient(AbstractApiClient):
                 sub_comment_pcursor = vision_sub_comment_list.get("pcursor", "no_more")
 
                 comments = vision_sub_comment_list.get("subComments", {})
-                if callback:
-                    await callback(photo_id, comments)
-                await asyncio.sleep(crawl_interval)
+                await pipeline.store(photo_id, comments)
                 result.extend(comments)
         return result
 
@@ -308,6 +318,6 @@ class KuaiShouClient(AbstractApiClient):
 
             if callback:
                 await callback(videos)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             result.extend(videos)
         return result
@@ -28,7 +28,7 @@ import config
 from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import kuaishou as kuaishou_store
-from tools import utils
+from tools import seen_index, utils
 from tools.cdp_browser import CDPBrowserManager
 from var import comment_tasks_var, crawler_type_var, source_keyword_var
 
@@ -83,7 +83,7 @@ class KuaishouCrawler(AbstractCrawler):
 
             # Create a client to interact with the kuaishou website.
             self.ks_client = await self.create_ks_client(httpx_proxy_format)
-            if not await self.ks_client.pong():
+            if not await self.ks_client.check_login_state(self.ks_client.headers.get("Cookie", ""), self.ks_client.pong):
                 login_obj = KuaishouLogin(
                     login_type=config.LOGIN_TYPE,
                     login_phone=httpx_proxy_format,
@@ -178,6 +178,8 @@ class KuaishouCrawler(AbstractCrawler):
         self, video_id: str, semaphore: asyncio.Semaphore
     ) -> Optional[Dict]:
         """Get video detail task"""
+        if await seen_index.is_content_fresh("ks", video_id):
+            return None
         async with semaphore:
             try:
                 result = await self.ks_client.get_video_info(video_id)
@@ -229,6 +231,8 @@ class KuaishouCrawler(AbstractCrawler):
         :param semaphore:
         :return:
         """
+        if await seen_index.is_content_fresh("ks", video_id):
+            return
         async with semaphore:
             try:
                 utils.logger.info(
@@ -240,6 +244,7 @@ class KuaishouCrawler(AbstractCrawler):
                     callback=kuaishou_store.batch_update_ks_video_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
                 )
+                await seen_index.mark_comments_done("ks", video_id)
             except DataFetchError as ex:
                 utils.logger.error(
                     f"[KuaishouCrawler.get_comments] get video_id: {video_id} comment error: {ex}"
@@ -387,6 +392,9 @@ class KuaishouCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        # 关闭API客户端复用的httpx连接池
+        if hasattr(self, "ks_client"):
+            await self.ks_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
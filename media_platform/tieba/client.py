@@ -13,21 +13,25 @@ import json
 from typing import Any, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext
 from tenacity import RetryError, retry, stop_after_attempt, wait_fixed
 
 import config
 from base.base_crawler import AbstractApiClient
+from cache.response_cache import ENDPOINT_HTML
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
 from proxy.proxy_ip_pool import ProxyIpPool
 from tools import utils
+from tools.comment_pipeline import CommentPipeline
+from tools.comment_watermark import CommentWatermark
+from tools.rate_limiter import crawl_sleep
 
 from .field import SearchNoteType, SearchSortType
 from .help import TieBaExtractor
 
 
 class BaiduTieBaClient(AbstractApiClient):
+    platform = "tieba"
 
     def __init__(
         self,
@@ -35,6 +39,7 @@ class BaiduTieBaClient(AbstractApiClient):
         ip_pool=None,
         default_ip_proxy=None,
     ):
+        super().__init__()
         self.ip_pool: Optional[ProxyIpPool] = ip_pool
         self.timeout = timeout
         self.headers = {
@@ -60,8 +65,9 @@ class BaiduTieBaClient(AbstractApiClient):
 
         """
         actual_proxy = proxy if proxy else self.default_ip_proxy
-        async with httpx.AsyncClient(proxy=actual_proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, headers=self.headers, **kwargs)
+        await self.wait_rate_limit(url, proxy=actual_proxy)
+        client = self.get_http_client(actual_proxy)
+        response = await client.request(method, url, timeout=self.timeout, headers=self.headers, **kwargs)
 
         if response.status_code != 200:
             utils.logger.error(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
@@ -192,7 +198,9 @@ class BaiduTieBaClient(AbstractApiClient):
 
         """
         uri = f"/p/{note_id}"
-        page_content = await self.get(uri, return_ori_content=True)
+        page_content = await self.cached_request(
+            ENDPOINT_HTML, self._host + uri, None, lambda: self.get(uri, return_ori_content=True)
+        )
         return self._page_extractor.extract_note_detail(page_content)
 
     async def get_note_all_comments(
@@ -214,24 +222,29 @@ class BaiduTieBaClient(AbstractApiClient):
         """
         uri = f"/p/{note_detail.note_id}"
         result: List[TiebaComment] = []
-        current_page = 1
-        while note_detail.total_replay_page >= current_page and len(result) < max_count:
-            params = {
-                "pn": current_page,
-            }
-            page_content = await self.get(uri, params=params, return_ori_content=True)
-            comments = self._page_extractor.extract_tieba_note_parment_comments(page_content, note_id=note_detail.note_id)
-            if not comments:
-                break
-            if len(result) + len(comments) > max_count:
-                comments = comments[:max_count - len(result)]
-            if callback:
-                await callback(note_detail.note_id, comments)
-            result.extend(comments)
-            # 获取所有子评论
-            await self.get_comments_all_sub_comments(comments, crawl_interval=crawl_interval, callback=callback)
-            await asyncio.sleep(crawl_interval)
-            current_page += 1
+        # 贴吧的楼层按时间正序分页，增量爬取时从上一次爬到的最后一页继续（这一页可能有新的楼层）
+        watermark = await CommentWatermark("tieba", note_detail.note_id).load()
+        current_page = max(watermark.last_page, 1)
+        async with CommentPipeline(callback, crawl_interval) as pipeline:
+            while note_detail.total_replay_page >= current_page and len(result) < max_count:
+                params = {
+                    "pn": current_page,
+                }
+                await pipeline.pace()
+                page_content = await self.get(uri, params=params, return_ori_content=True)
+                comments = self._page_extractor.extract_tieba_note_parment_comments(page_content, note_id=note_detail.note_id)
+                if not comments:
+                    break
+                if len(result) + len(comments) > max_count:
+                    comments = comments[:max_count - len(result)]
+                await pipeline.store(note_detail.note_id, comments)
+                result.extend(comments)
+                # 子评论在后台获取，同时继续请求下一页评论
+                pipeline.submit(self.get_comments_all_sub_comments(
+                    comments, crawl_interval=crawl_interval, callback=callback, pipeline=pipeline
+                ))
+                current_page += 1
+        await watermark.save(last_page=current_page - 1)
         return result
 
     async def get_comments_all_sub_comments(
@@ -239,6 +252,7 @@ class BaiduTieBaClient(AbstractApiClient):
         comments: List[TiebaComment],
         crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
+        pipeline: Optional[CommentPipeline] = None,
     ) -> List[TiebaComment]:
         """
         获取指定评论下的所有子评论
@@ -246,6 +260,7 @@ class BaiduTieBaClient(AbstractApiClient):
             comments: 评论列表
             crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后
+            pipeline: 所属的评论爬取流水线，为None时单独创建
 
         Returns:
 
@@ -253,6 +268,9 @@ class BaiduTieBaClient(AbstractApiClient):
         uri = "/p/comment"
         if not config.ENABLE_GET_SUB_COMMENTS:
             return []
+        if pipeline is None:
+            async with CommentPipeline(callback, crawl_interval) as pipeline:
+                return await self.get_comments_all_sub_comments(comments, crawl_interval, callback, pipeline)
 
         # # 贴吧获取所有子评论需要登录态
         # if self.headers.get("Cookies") == "" or not self.pong():
@@ -272,15 +290,14 @@ class BaiduTieBaClient(AbstractApiClient):
                     "fid": parment_comment.tieba_id,  # 贴吧ID
                     "pn": current_page  # 页码
                 }
+                await pipeline.pace()
                 page_content = await self.get(uri, params=params, return_ori_content=True)
                 sub_comments = self._page_extractor.extract_tieba_note_sub_comments(page_content, parent_comment=parment_comment)
 
                 if not sub_comments:
                     break
-                if callback:
-                    await callback(parment_comment.note_id, sub_comments)
+                await pipeline.store(parment_comment.note_id, sub_comments)
                 all_sub_comments.extend(sub_comments)
-                await asyncio.sleep(crawl_interval)
                 current_page += 1
         return all_sub_comments
 
@@ -378,7 +395,7 @@ class BaiduTieBaClient(AbstractApiClient):
             notes = await asyncio.gather(*note_detail_task)
             if callback:
                 await callback(notes)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             result.extend(notes)
             page_number += 1
             total_get_count += page_per_count
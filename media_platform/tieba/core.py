@@ -28,7 +28,7 @@ from base.base_crawler import AbstractCrawler
 from model.m_baidu_tieba import TiebaCreator, TiebaNote
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import tieba as tieba_store
-from tools import utils
+from tools import seen_index, utils
 from tools.cdp_browser import CDPBrowserManager
 from var import crawler_type_var, source_keyword_var
 
@@ -216,6 +216,8 @@ class TieBaCrawler(AbstractCrawler):
         Returns:
 
         """
+        if await seen_index.is_content_fresh("tieba", note_id):
+            return None
         async with semaphore:
             try:
                 utils.logger.info(
@@ -273,6 +275,8 @@ class TieBaCrawler(AbstractCrawler):
         Returns:
 
         """
+        if await seen_index.is_content_fresh("tieba", note_detail.note_id):
+            return
         async with semaphore:
             utils.logger.info(
                 f"[BaiduTieBaCrawler.get_comments] Begin get note id comments {note_detail.note_id}"
@@ -283,6 +287,7 @@ class TieBaCrawler(AbstractCrawler):
                 callback=tieba_store.batch_update_tieba_note_comments,
                 max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
             )
+            await seen_index.mark_comments_done("tieba", note_detail.note_id)
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -409,6 +414,9 @@ class TieBaCrawler(AbstractCrawler):
         Returns:
 
         """
+        # 关闭API客户端复用的httpx连接池
+        if hasattr(self, "tieba_client"):
+            await self.tieba_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -13,25 +13,28 @@
 # @Time    : 2023/12/23 15:40
 # @Desc    : 微博爬虫 API 请求 client
 
-import asyncio
 import copy
 import json
 import re
 from typing import Callable, Dict, List, Optional, Union
 from urllib.parse import parse_qs, unquote, urlencode
 
-import httpx
 from httpx import Response
 from playwright.async_api import BrowserContext, Page
 
 import config
+from base.base_crawler import AbstractApiClient
+from cache.response_cache import ENDPOINT_HTML
 from tools import utils
+from tools.comment_pipeline import CommentPipeline
+from tools.rate_limiter import crawl_sleep
 
 from .exception import DataFetchError
 from .field import SearchType
 
 
-class WeiboClient:
+class WeiboClient(AbstractApiClient):
+    platform = "wb"
 
     def __init__(
         self,
@@ -42,6 +45,7 @@ class WeiboClient:
         playwright_page: Page,
         cookie_dict: Dict[str, str],
     ):
+        super().__init__()
         self.proxy = proxy
         self.timeout = timeout
         self.headers = headers
@@ -52,8 +56,9 @@ class WeiboClient:
 
     async def request(self, method, url, **kwargs) -> Union[Response, Dict]:
         enable_return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        await self.wait_rate_limit(url, cookie=self.headers.get("Cookie", ""), proxy=self.proxy)
+        client = self.get_http_client(self.proxy)
+        response = await client.request(method, url, timeout=self.timeout, **kwargs)
 
         if enable_return_response:
             return response
@@ -166,20 +171,21 @@ class WeiboClient:
         is_end = False
         max_id = -1
         max_id_type = 0
-        while not is_end and len(result) < max_count:
-            comments_res = await self.get_note_comments(note_id, max_id, max_id_type)
-            max_id: int = comments_res.get("max_id")
-            max_id_type: int = comments_res.get("max_id_type")
-            comment_list: List[Dict] = comments_res.get("data", [])
-            is_end = max_id == 0
-            if len(result) + len(comment_list) > max_count:
-                comment_list = comment_list[:max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(note_id, comment_list)
-            await asyncio.sleep(crawl_interval)
-            result.extend(comment_list)
-            sub_comment_result = await self.get_comments_all_sub_comments(note_id, comment_list, callback)
-            result.extend(sub_comment_result)
+        async with CommentPipeline(callback, crawl_interval) as pipeline:
+            while not is_end and len(result) < max_count:
+                await pipeline.pace()
+                comments_res = await self.get_note_comments(note_id, max_id, max_id_type)
+                max_id: int = comments_res.get("max_id")
+                max_id_type: int = comments_res.get("max_id_type")
+                comment_list: List[Dict] = comments_res.get("data", [])
+                is_end = max_id == 0
+                if len(result) + len(comment_list) > max_count:
+                    comment_list = comment_list[:max_count - len(result)]
+                # 保存在后台进行，同时继续请求下一页评论
+                await pipeline.store(note_id, comment_list)
+                result.extend(comment_list)
+                sub_comment_result = await self.get_comments_all_sub_comments(note_id, comment_list, callback, pipeline)
+                result.extend(sub_comment_result)
         return result
 
     @staticmethod
@@ -187,6 +193,7 @@ class WeiboClient:
         note_id: str,
         comment_list: List[Dict],
         callback: Optional[Callable] = None,
+        pipeline: Optional[CommentPipeline] = None,
     ) -> List[Dict]:
         """
         获取评论的所有子评论
@@ -194,6 +201,7 @@ class WeiboClient:
             note_id:
             comment_list:
             callback:
+            pipeline: 所属的评论爬取流水线，不为None时子评论交给流水线保存
 
         Returns:
 
@@ -206,7 +214,10 @@ class WeiboClient:
         for comment in comment_list:
             sub_comments = comment.get("comments")
             if sub_comments and isinstance(sub_comments, list):
-                await callback(note_id, sub_comments)
+                if pipeline is not None:
+                    await pipeline.store(note_id, sub_comments)
+                elif callback:
+                    await callback(note_id, sub_comments)
                 res_sub_comments.extend(sub_comments)
         return res_sub_comments
 
@@ -217,22 +228,36 @@ class WeiboClient:
         :return:
         """
         url = f"{self._host}/detail/{note_id}"
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
+
+        async def fetch_html() -> str:
+            await self.wait_rate_limit(url, cookie=self.headers.get("Cookie", ""), proxy=self.proxy)
+            client = self.get_http_client(self.proxy)
             response = await client.request("GET", url, timeout=self.timeout, headers=self.headers)
             if response.status_code != 200:
                 raise DataFetchError(f"get weibo detail err: {response.text}")
-            match = re.search(r'var \$render_data = (\[.*?\])\[0\]', response.text, re.DOTALL)
-            if match:
-                render_data_json = match.group(1)
-                render_data_dict = json.loads(render_data_json)
-                note_detail = render_data_dict[0].get("status")
-                note_item = {"mblog": note_detail}
-                return note_item
-            else:
-                utils.logger.info(f"[WeiboClient.get_note_info_by_id] 未找到$render_data的值")
-                return dict()
+            return response.text
+
+        html = await self.cached_request(ENDPOINT_HTML, url, None, fetch_html)
+        match = re.search(r'var \$render_data = (\[.*?\])\[0\]', html, re.DOTALL)
+        if match:
+            render_data_json = match.group(1)
+            render_data_dict = json.loads(render_data_json)
+            note_detail = render_data_dict[0].get("status")
+            note_item = {"mblog": note_detail}
+            return note_item
+        else:
+            utils.logger.info(f"[WeiboClient.get_note_info_by_id] 未找到$render_data的值")
+            return dict()
+
+    def get_note_image_url(self, image_url: str) -> str:
+        """
+        获取微博图片的高清大图下载地址
+        Args:
+            image_url: 图片地址
 
-    async def get_note_image(self, image_url: str) -> bytes:
+        Returns:
+            通过图片代理访问的下载地址
+        """
         image_url = image_url[8:]  # 去掉 https://
         sub_url = image_url.split("/")
         image_url = ""
@@ -245,20 +270,7 @@ class WeiboClient:
                 image_url += sub_url[i] + "/"
         # 微博图床对外存在防盗链，所以需要代理访问
         # 由于微博图片是通过 i1.wp.com 来访问的，所以需要拼接一下
-        final_uri = (f"{self._image_agent_host}"
-                     f"{image_url}")
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            try:
-                response = await client.request("GET", final_uri, timeout=self.timeout)
-                response.raise_for_status()
-                if not response.reason_phrase == "OK":
-                    utils.logger.error(f"[WeiboClient.get_note_image] request {final_uri} err, res:{response.text}")
-                    return None
-                else:
-                    return response.content
-            except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
-                utils.logger.error(f"[DouYinClient.get_aweme_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")    # 保留原始异常类型名称，以便开发者调试
-                return None
+        return f"{self._image_agent_host}{image_url}"
 
     async def get_creator_container_info(self, creator_id: str) -> Dict:
         """
@@ -374,7 +386,7 @@ class WeiboClient:
             notes = [note for note in notes if note.get("card_type") == 9]
             if callback:
                 await callback(notes)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
             result.extend(notes)
             crawler_total_count += 10
             notes_has_more = notes_res.get("cardlistInfo", {}).get("total", 0) > crawler_total_count
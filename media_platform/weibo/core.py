@@ -31,8 +31,9 @@ import config
 from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import weibo as weibo_store
-from tools import utils
+from tools import media_queue, seen_index, utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.media_queue import MediaJob
 from var import crawler_type_var, source_keyword_var
 
 from .client import WeiboClient
@@ -84,7 +85,7 @@ class WeiboCrawler(AbstractCrawler):
 
             # Create a client to interact with the xiaohongshu website.
             self.wb_client = await self.create_weibo_client(httpx_proxy_format)
-            if not await self.wb_client.pong():
+            if not await self.wb_client.check_login_state(self.wb_client.headers.get("Cookie", ""), self.wb_client.pong):
                 login_obj = WeiboLogin(
                     login_type=config.LOGIN_TYPE,
                     login_phone="",  # your phone number
@@ -182,6 +183,8 @@ class WeiboCrawler(AbstractCrawler):
         :param semaphore:
         :return:
         """
+        if await seen_index.is_content_fresh("wb", note_id):
+            return None
         async with semaphore:
             try:
                 result = await self.wb_client.get_note_info_by_id(note_id)
@@ -218,6 +221,8 @@ class WeiboCrawler(AbstractCrawler):
         :param semaphore:
         :return:
         """
+        if await seen_index.is_content_fresh("wb", note_id):
+            return
         async with semaphore:
             try:
                 utils.logger.info(f"[WeiboCrawler.get_note_comments] begin get note_id: {note_id} comments ...")
@@ -227,6 +232,7 @@ class WeiboCrawler(AbstractCrawler):
                     callback=weibo_store.batch_update_weibo_note_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
                 )
+                await seen_index.mark_comments_done("wb", note_id)
             except DataFetchError as ex:
                 utils.logger.error(f"[WeiboCrawler.get_note_comments] get note_id: {note_id} comment error: {ex}")
             except Exception as e:
@@ -249,11 +255,11 @@ class WeiboCrawler(AbstractCrawler):
             url = pic.get("url")
             if not url:
                 continue
-            content = await self.wb_client.get_note_image(url)
-            await asyncio.sleep(random.random())
-            if content != None:
-                extension_file_name = url.split(".")[-1]
-                await weibo_store.update_weibo_note_image(pic["pid"], content, extension_file_name)
+            extension_file_name = url.split(".")[-1]
+            await media_queue.enqueue_media(MediaJob(
+                platform="wb", media_type="image", owner_id=pic["pid"], extension_file_name=extension_file_name,
+                url=self.wb_client.get_note_image_url(url),
+            ), self.wb_client)
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -364,6 +370,9 @@ class WeiboCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        # 关闭API客户端复用的httpx连接池
+        if hasattr(self, "wb_client"):
+            await self.wb_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
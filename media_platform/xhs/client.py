@@ -8,27 +8,29 @@
 # 详细许可条款请参阅项目根目录下的LICENSE文件。
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
-import asyncio
 import json
 import re
 from typing import Any, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext, Page
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_result
 
 import config
 from base.base_crawler import AbstractApiClient
+from cache.response_cache import ENDPOINT_CREATOR, ENDPOINT_DETAIL, ENDPOINT_HTML
 from tools import utils
+from tools.comment_pipeline import CommentPipeline
+from tools.rate_limiter import crawl_sleep
 from html import unescape
 
 from .exception import DataFetchError, IPBlockError
 from .field import SearchNoteType, SearchSortType
-from .help import get_search_id, sign
+from .help import XhsSignService, get_search_id
 
 
 class XiaoHongShuClient(AbstractApiClient):
+    platform = "xhs"
 
     def __init__(
         self,
@@ -39,6 +41,7 @@ class XiaoHongShuClient(AbstractApiClient):
         playwright_page: Page,
         cookie_dict: Dict[str, str],
     ):
+        super().__init__()
         self.proxy = proxy
         self.timeout = timeout
         self.headers = headers
@@ -50,6 +53,7 @@ class XiaoHongShuClient(AbstractApiClient):
         self.NOTE_ABNORMAL_CODE = -510001
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
+        self.sign_service = XhsSignService(playwright_page)
 
     async def _pre_headers(self, url: str, data=None) -> Dict:
         """
@@ -61,23 +65,9 @@ class XiaoHongShuClient(AbstractApiClient):
         Returns:
 
         """
-        encrypt_params = await self.playwright_page.evaluate("([url, data]) => window._webmsxyw(url,data)", [url, data])
-        local_storage = await self.playwright_page.evaluate("() => window.localStorage")
-        signs = sign(
-            a1=self.cookie_dict.get("a1", ""),
-            b1=local_storage.get("b1", ""),
-            x_s=encrypt_params.get("X-s", ""),
-            x_t=str(encrypt_params.get("X-t", "")),
-        )
-
-        headers = {
-            "X-S": signs["x-s"],
-            "X-T": signs["x-t"],
-            "x-S-Common": signs["x-s-common"],
-            "X-B3-Traceid": signs["x-b3-traceid"],
-        }
-        self.headers.update(headers)
-        return self.headers
+        signed_headers = await self.sign_service.sign_headers(url, data, a1=self.cookie_dict.get("a1", ""))
+        # 返回每个请求独立的请求头，避免并发时互相覆盖签名
+        return {**self.headers, **signed_headers}
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
     async def request(self, method, url, **kwargs) -> Union[str, Any]:
@@ -93,8 +83,9 @@ class XiaoHongShuClient(AbstractApiClient):
         """
         # return response.text
         return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        await self.wait_rate_limit(url, cookie=self.headers.get("Cookie", ""), proxy=self.proxy)
+        client = self.get_http_client(self.proxy)
+        response = await client.request(method, url, timeout=self.timeout, **kwargs)
 
         if response.status_code == 471 or response.status_code == 461:
             # someday someone maybe will bypass captcha
@@ -150,20 +141,6 @@ class XiaoHongShuClient(AbstractApiClient):
             **kwargs,
         )
 
-    async def get_note_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            try:
-                response = await client.request("GET", url, timeout=self.timeout)
-                response.raise_for_status()
-                if not response.reason_phrase == "OK":
-                    utils.logger.error(f"[XiaoHongShuClient.get_note_media] request {url} err, res:{response.text}")
-                    return None
-                else:
-                    return response.content
-            except httpx.HTTPError as exc:  # some wrong when call httpx.request method, such as connection error, client error, server error or response status code is not 2xx
-                utils.logger.error(f"[DouYinClient.get_aweme_media] {exc.__class__.__name__} for {exc.request.url} - {exc}")  # 保留原始异常类型名称，以便开发者调试
-                return None
-
     async def pong(self) -> bool:
         """
         用于检查登录态是否失效了
@@ -194,6 +171,7 @@ class XiaoHongShuClient(AbstractApiClient):
         cookie_str, cookie_dict = utils.convert_cookies(await browser_context.cookies())
         self.headers["Cookie"] = cookie_str
         self.cookie_dict = cookie_dict
+        self.sign_service.invalidate()
 
     async def get_note_by_keyword(
         self,
@@ -256,13 +234,18 @@ class XiaoHongShuClient(AbstractApiClient):
             "xsec_token": xsec_token,
         }
         uri = "/api/sns/web/v1/feed"
-        res = await self.post(uri, data)
-        if res and res.get("items"):
-            res_dict: Dict = res["items"][0]["note_card"]
-            return res_dict
-        # 爬取频繁了可能会出现有的笔记能有结果有的没有
-        utils.logger.error(f"[XiaoHongShuClient.get_note_by_id] get note id:{note_id} empty and res:{res}")
-        return dict()
+
+        async def fetch() -> Optional[Dict]:
+            res = await self.cached_request(ENDPOINT_DETAIL, self._host + uri, data, lambda: self.post(uri, data))
+            if res and res.get("items"):
+                res_dict: Dict = res["items"][0]["note_card"]
+                return res_dict
+            # 爬取频繁了可能会出现有的笔记能有结果有的没有
+            utils.logger.error(f"[XiaoHongShuClient.get_note_by_id] get note id:{note_id} empty and res:{res}")
+            return None
+
+        # 多个关键词搜到同一篇笔记时只请求一次
+        return await self.coalesce(ENDPOINT_DETAIL, note_id, fetch) or dict()
 
     async def get_note_comments(
         self,
@@ -344,27 +327,29 @@ class XiaoHongShuClient(AbstractApiClient):
         result = []
         comments_has_more = True
         comments_cursor = ""
-        while comments_has_more and len(result) < max_count:
-            comments_res = await self.get_note_comments(note_id=note_id, xsec_token=xsec_token, cursor=comments_cursor)
-            comments_has_more = comments_res.get("has_more", False)
-            comments_cursor = comments_res.get("cursor", "")
-            if "comments" not in comments_res:
-                utils.logger.info(f"[XiaoHongShuClient.get_note_all_comments] No 'comments' key found in response: {comments_res}")
-                break
-            comments = comments_res["comments"]
-            if len(result) + len(comments) > max_count:
-                comments = comments[:max_count - len(result)]
-            if callback:
-                await callback(note_id, comments)
-            await asyncio.sleep(crawl_interval)
-            result.extend(comments)
-            sub_comments = await self.get_comments_all_sub_comments(
-                comments=comments,
-                xsec_token=xsec_token,
-                crawl_interval=crawl_interval,
-                callback=callback,
-            )
-            result.extend(sub_comments)
+        async with CommentPipeline(callback, crawl_interval) as pipeline:
+            while comments_has_more and len(result) < max_count:
+                await pipeline.pace()
+                comments_res = await self.get_note_comments(note_id=note_id, xsec_token=xsec_token, cursor=comments_cursor)
+                comments_has_more = comments_res.get("has_more", False)
+                comments_cursor = comments_res.get("cursor", "")
+                if "comments" not in comments_res:
+                    utils.logger.info(f"[XiaoHongShuClient.get_note_all_comments] No 'comments' key found in response: {comments_res}")
+                    break
+                comments = comments_res["comments"]
+                if len(result) + len(comments) > max_count:
+                    comments = comments[:max_count - len(result)]
+                await pipeline.store(note_id, comments)
+                result.extend(comments)
+                # 二级评论在后台展开，同时继续请求下一页一级评论
+                pipeline.submit(self.get_comments_all_sub_comments(
+                    comments=comments,
+                    xsec_token=xsec_token,
+                    crawl_interval=crawl_interval,
+                    callback=callback,
+                    pipeline=pipeline,
+                ))
+        result.extend(pipeline.sub_results)
         return result
 
     async def get_comments_all_sub_comments(
@@ -373,6 +358,7 @@ class XiaoHongShuClient(AbstractApiClient):
         xsec_token: str,
         crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
+        pipeline: Optional[CommentPipeline] = None,
     ) -> List[Dict]:
         """
         获取指定一级评论下的所有二级评论, 该方法会一直查找一级评论下的所有二级评论信息
@@ -381,6 +367,7 @@ class XiaoHongShuClient(AbstractApiClient):
             xsec_token: 验证token
             crawl_interval: 爬取一次评论的延迟单位（秒）
             callback: 一次评论爬取结束后
+            pipeline: 所属的评论爬取流水线，为None时单独创建
 
         Returns:
 
@@ -388,13 +375,16 @@ class XiaoHongShuClient(AbstractApiClient):
         if not config.ENABLE_GET_SUB_COMMENTS:
             utils.logger.info(f"[XiaoHongShuCrawler.get_comments_all_sub_comments] Crawling sub_comment mode is not enabled")
             return []
+        if pipeline is None:
+            async with CommentPipeline(callback, crawl_interval) as pipeline:
+                return await self.get_comments_all_sub_comments(comments, xsec_token, crawl_interval, callback, pipeline)
 
         result = []
         for comment in comments:
             note_id = comment.get("note_id")
             sub_comments = comment.get("sub_comments")
-            if sub_comments and callback:
-                await callback(note_id, sub_comments)
+            if sub_comments:
+                await pipeline.store(note_id, sub_comments)
 
             sub_comment_has_more = comment.get("sub_comment_has_more")
             if not sub_comment_has_more:
@@ -404,6 +394,7 @@ class XiaoHongShuClient(AbstractApiClient):
             sub_comment_cursor = comment.get("sub_comment_cursor")
 
             while sub_comment_has_more:
+                await pipeline.pace()
                 comments_res = await self.get_note_sub_comments(
                     note_id=note_id,
                     root_comment_id=root_comment_id,
@@ -421,9 +412,7 @@ class XiaoHongShuClient(AbstractApiClient):
                     utils.logger.info(f"[XiaoHongShuClient.get_comments_all_sub_comments] No 'comments' key found in response: {comments_res}")
                     break
                 comments = comments_res["comments"]
-                if callback:
-                    await callback(note_id, comments)
-                await asyncio.sleep(crawl_interval)
+                await pipeline.store(note_id, comments)
                 result.extend(comments)
         return result
 
@@ -434,7 +423,10 @@ class XiaoHongShuClient(AbstractApiClient):
         eg: https://www.xiaohongshu.com/user/profile/59d8cb33de5fb4696bf17217
         """
         uri = f"/user/profile/{user_id}"
-        html_content = await self.request("GET", self._domain + uri, return_response=True, headers=self.headers)
+        html_content = await self.cached_request(
+            ENDPOINT_CREATOR, self._domain + uri, None,
+            lambda: self.request("GET", self._domain + uri, return_response=True, headers=self.headers),
+        )
         match = re.search(r"<script>window.__INITIAL_STATE__=(.+)<\/script>", html_content, re.M)
 
         if match is None:
@@ -513,7 +505,7 @@ class XiaoHongShuClient(AbstractApiClient):
                 await callback(notes_to_add)
 
             result.extend(notes_to_add)
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
 
         utils.logger.info(f"[XiaoHongShuClient.get_all_notes_by_creator] Finished getting notes for user {user_id}, total: {len(result)}")
         return result
@@ -576,7 +568,9 @@ class XiaoHongShuClient(AbstractApiClient):
         if not enable_cookie:
             del copy_headers["Cookie"]
 
-        html = await self.request(method="GET", url=url, return_response=True, headers=copy_headers)
+        html = await self.cached_request(
+            ENDPOINT_HTML, url, None, lambda: self.request(method="GET", url=url, return_response=True, headers=copy_headers)
+        )
 
         def get_note_dict(html):
             state = re.findall(r"window.__INITIAL_STATE__=({.*})</script>", html)[0].replace("undefined", '""')
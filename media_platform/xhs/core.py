@@ -9,6 +9,7 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
 import asyncio
+import functools
 import os
 import random
 import time
@@ -30,8 +31,10 @@ from config import CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES
 from model.m_xiaohongshu import NoteUrlInfo
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import xhs as xhs_store
-from tools import utils
+from tools import media_queue, seen_index, utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.crawl_scheduler import WorkerStage, run_producers
+from tools.media_queue import MediaJob
 from var import crawler_type_var, source_keyword_var
 
 from .client import XiaoHongShuClient
@@ -87,7 +90,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
 
             # Create a client to interact with the xiaohongshu website.
             self.xhs_client = await self.create_xhs_client(httpx_proxy_format)
-            if not await self.xhs_client.pong():
+            if not await self.xhs_client.check_login_state(self.xhs_client.headers.get("Cookie", ""), self.xhs_client.pong):
                 login_obj = XiaoHongShuLogin(
                     login_type=config.LOGIN_TYPE,
                     login_phone="",  # input your phone number
@@ -114,59 +117,101 @@ class XiaoHongShuCrawler(AbstractCrawler):
             utils.logger.info("[XiaoHongShuCrawler.start] Xhs Crawler finished ...")
 
     async def search(self) -> None:
-        """Search for notes and retrieve their comment information."""
+        """
+        Search for notes and retrieve their comment information.
+        Search pages of all keywords feed a shared note detail worker pool, which feeds a shared comment worker pool,
+        so one slow keyword or note no longer blocks the others.
+        """
         utils.logger.info("[XiaoHongShuCrawler.search] Begin search xiaohongshu keywords")
         xhs_limit_count = 20  # xhs limit page fixed value
         if config.CRAWLER_MAX_NOTES_COUNT < xhs_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = xhs_limit_count
+        comment_stage = WorkerStage("xhs_comment", self.search_comment_worker, config.XHS_SEARCH_COMMENT_CONCURRENCY)
+        detail_stage = WorkerStage(
+            "xhs_detail",
+            functools.partial(self.search_detail_worker, comment_stage=comment_stage),
+            config.XHS_SEARCH_DETAIL_CONCURRENCY,
+        )
+        keyword_semaphore = asyncio.Semaphore(config.XHS_SEARCH_KEYWORD_CONCURRENCY)
+
+        async def search_keyword(keyword: str):
+            async with keyword_semaphore:
+                await self.search_keyword_pages(keyword, detail_stage)
+
+        # the comment stage is the outer one, so it is drained after the detail stage stops producing.
+        # if one keyword fails, the others are cancelled before the stages shut down
+        async with comment_stage, detail_stage:
+            await run_producers([search_keyword(keyword) for keyword in config.KEYWORDS.split(",")])
+
+    async def search_keyword_pages(self, keyword: str, detail_stage: WorkerStage) -> None:
+        """
+        Search pages of a keyword and put the notes into the detail stage
+        Args:
+            keyword: search keyword
+            detail_stage: note detail worker pool
+
+        Returns:
+
+        """
+        utils.logger.info(f"[XiaoHongShuCrawler.search_keyword_pages] Current search keyword: {keyword}")
+        xhs_limit_count = 20
         start_page = config.START_PAGE
-        for keyword in config.KEYWORDS.split(","):
-            source_keyword_var.set(keyword)
-            utils.logger.info(f"[XiaoHongShuCrawler.search] Current search keyword: {keyword}")
-            page = 1
-            search_id = get_search_id()
-            while (page - start_page + 1) * xhs_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
-                if page < start_page:
-                    utils.logger.info(f"[XiaoHongShuCrawler.search] Skip page {page}")
-                    page += 1
-                    continue
-
-                try:
-                    utils.logger.info(f"[XiaoHongShuCrawler.search] search xhs keyword: {keyword}, page: {page}")
-                    note_ids: List[str] = []
-                    xsec_tokens: List[str] = []
-                    notes_res = await self.xhs_client.get_note_by_keyword(
-                        keyword=keyword,
-                        search_id=search_id,
-                        page=page,
-                        sort=(SearchSortType(config.SORT_TYPE) if config.SORT_TYPE != "" else SearchSortType.GENERAL),
-                    )
-                    utils.logger.info(f"[XiaoHongShuCrawler.search] Search notes res:{notes_res}")
-                    if not notes_res or not notes_res.get("has_more", False):
-                        utils.logger.info("No more content!")
-                        break
-                    semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
-                    task_list = [
-                        self.get_note_detail_async_task(
-                            note_id=post_item.get("id"),
-                            xsec_source=post_item.get("xsec_source"),
-                            xsec_token=post_item.get("xsec_token"),
-                            semaphore=semaphore,
-                        ) for post_item in notes_res.get("items", {}) if post_item.get("model_type") not in ("rec_query", "hot_query")
-                    ]
-                    note_details = await asyncio.gather(*task_list)
-                    for note_detail in note_details:
-                        if note_detail:
-                            await xhs_store.update_xhs_note(note_detail)
-                            await self.get_notice_media(note_detail)
-                            note_ids.append(note_detail.get("note_id"))
-                            xsec_tokens.append(note_detail.get("xsec_token"))
-                    page += 1
-                    utils.logger.info(f"[XiaoHongShuCrawler.search] Note details: {note_details}")
-                    await self.batch_get_note_comments(note_ids, xsec_tokens)
-                except DataFetchError:
-                    utils.logger.error("[XiaoHongShuCrawler.search] Get note detail error")
+        page = 1
+        search_id = get_search_id()
+        while (page - start_page + 1) * xhs_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
+            if page < start_page:
+                utils.logger.info(f"[XiaoHongShuCrawler.search_keyword_pages] Skip page {page}")
+                page += 1
+                continue
+
+            try:
+                utils.logger.info(f"[XiaoHongShuCrawler.search_keyword_pages] search xhs keyword: {keyword}, page: {page}")
+                notes_res = await self.xhs_client.get_note_by_keyword(
+                    keyword=keyword,
+                    search_id=search_id,
+                    page=page,
+                    sort=(SearchSortType(config.SORT_TYPE) if config.SORT_TYPE != "" else SearchSortType.GENERAL),
+                )
+                utils.logger.info(f"[XiaoHongShuCrawler.search_keyword_pages] Search notes res:{notes_res}")
+                if not notes_res or not notes_res.get("has_more", False):
+                    utils.logger.info("No more content!")
                     break
+                for post_item in notes_res.get("items", {}):
+                    if post_item.get("model_type") not in ("rec_query", "hot_query"):
+                        await detail_stage.put(keyword, post_item)
+                page += 1
+            except DataFetchError:
+                utils.logger.error("[XiaoHongShuCrawler.search_keyword_pages] Get note detail error")
+                break
+
+    async def search_detail_worker(self, keyword: str, post_item: Dict, comment_stage: WorkerStage) -> None:
+        """
+        Get and save the detail of a searched note, then put it into the comment stage
+        Args:
+            keyword: the keyword the note was searched by
+            post_item: note item of the search result
+            comment_stage: note comment worker pool
+
+        Returns:
+
+        """
+        # workers are shared by all keywords, so the source keyword is set per note before saving
+        source_keyword_var.set(keyword)
+        note_detail = await self.get_note_detail(
+            note_id=post_item.get("id"),
+            xsec_source=post_item.get("xsec_source"),
+            xsec_token=post_item.get("xsec_token"),
+        )
+        if not note_detail:
+            return
+        await xhs_store.update_xhs_note(note_detail)
+        await self.get_notice_media(note_detail)
+        if config.ENABLE_GET_COMMENTS:
+            await comment_stage.put(note_detail.get("note_id"), note_detail.get("xsec_token"))
+
+    async def search_comment_worker(self, note_id: str, xsec_token: str) -> None:
+        """Get the comments of a searched note"""
+        await self.get_note_comments(note_id=note_id, xsec_token=xsec_token)
 
     async def get_creators_and_notes(self) -> None:
         """Get creator's notes and retrieve their comment information."""
@@ -264,30 +309,45 @@ class XiaoHongShuCrawler(AbstractCrawler):
         Returns:
             Dict: note detail
         """
-        note_detail = None
         async with semaphore:
-            try:
-                utils.logger.info(f"[get_note_detail_async_task] Begin get note detail, note_id: {note_id}")
+            return await self.get_note_detail(note_id, xsec_source, xsec_token)
 
-                try:
-                    note_detail = await self.xhs_client.get_note_by_id(note_id, xsec_source, xsec_token)
-                except RetryError as e:
-                    pass
+    async def get_note_detail(self, note_id: str, xsec_source: str, xsec_token: str) -> Optional[Dict]:
+        """Get note detail, fall back to the note html page when the api fails
 
+        Args:
+            note_id:
+            xsec_source:
+            xsec_token:
+
+        Returns:
+            Dict: note detail
+        """
+        if await seen_index.is_content_fresh("xhs", note_id):
+            return None
+        note_detail = None
+        try:
+            utils.logger.info(f"[get_note_detail_async_task] Begin get note detail, note_id: {note_id}")
+
+            try:
+                note_detail = await self.xhs_client.get_note_by_id(note_id, xsec_source, xsec_token)
+            except RetryError as e:
+                pass
+
+            if not note_detail:
+                note_detail = await self.xhs_client.get_note_by_id_from_html(note_id, xsec_source, xsec_token, enable_cookie=True)
                 if not note_detail:
-                    note_detail = await self.xhs_client.get_note_by_id_from_html(note_id, xsec_source, xsec_token, enable_cookie=True)
-                    if not note_detail:
-                        raise Exception(f"[get_note_detail_async_task] Failed to get note detail, Id: {note_id}")
+                    raise Exception(f"[get_note_detail_async_task] Failed to get note detail, Id: {note_id}")
 
-                note_detail.update({"xsec_token": xsec_token, "xsec_source": xsec_source})
-                return note_detail
+            note_detail.update({"xsec_token": xsec_token, "xsec_source": xsec_source})
+            return note_detail
 
-            except DataFetchError as ex:
-                utils.logger.error(f"[XiaoHongShuCrawler.get_note_detail_async_task] Get note detail error: {ex}")
-                return None
-            except KeyError as ex:
-                utils.logger.error(f"[XiaoHongShuCrawler.get_note_detail_async_task] have not fund note detail note_id:{note_id}, err: {ex}")
-                return None
+        except DataFetchError as ex:
+            utils.logger.error(f"[XiaoHongShuCrawler.get_note_detail_async_task] Get note detail error: {ex}")
+            return None
+        except KeyError as ex:
+            utils.logger.error(f"[XiaoHongShuCrawler.get_note_detail_async_task] have not fund note detail note_id:{note_id}, err: {ex}")
+            return None
 
     async def batch_get_note_comments(self, note_list: List[str], xsec_tokens: List[str]):
         """Batch get note comments"""
@@ -309,19 +369,26 @@ class XiaoHongShuCrawler(AbstractCrawler):
     async def get_comments(self, note_id: str, xsec_token: str, semaphore: asyncio.Semaphore):
         """Get note comments with keyword filtering and quantity limitation"""
         async with semaphore:
-            utils.logger.info(f"[XiaoHongShuCrawler.get_comments] Begin get note id comments {note_id}")
-            # When proxy is not enabled, increase the crawling interval
-            if config.ENABLE_IP_PROXY:
-                crawl_interval = random.random()
-            else:
-                crawl_interval = random.uniform(1, config.CRAWLER_MAX_SLEEP_SEC)
-            await self.xhs_client.get_note_all_comments(
-                note_id=note_id,
-                xsec_token=xsec_token,
-                crawl_interval=crawl_interval,
-                callback=xhs_store.batch_update_xhs_note_comments,
-                max_count=CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-            )
+            await self.get_note_comments(note_id, xsec_token)
+
+    async def get_note_comments(self, note_id: str, xsec_token: str):
+        """Get and save the comments of a note"""
+        if await seen_index.is_content_fresh("xhs", note_id):
+            return
+        utils.logger.info(f"[XiaoHongShuCrawler.get_comments] Begin get note id comments {note_id}")
+        # When proxy is not enabled, increase the crawling interval
+        if config.ENABLE_IP_PROXY:
+            crawl_interval = random.random()
+        else:
+            crawl_interval = random.uniform(1, config.CRAWLER_MAX_SLEEP_SEC)
+        await self.xhs_client.get_note_all_comments(
+            note_id=note_id,
+            xsec_token=xsec_token,
+            crawl_interval=crawl_interval,
+            callback=xhs_store.batch_update_xhs_note_comments,
+            max_count=CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
+        )
+        await seen_index.mark_comments_done("xhs", note_id)
 
     async def create_xhs_client(self, httpx_proxy: Optional[str]) -> XiaoHongShuClient:
         """Create xhs client"""
@@ -415,6 +482,9 @@ class XiaoHongShuCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        # 关闭API客户端复用的httpx连接池
+        if hasattr(self, "xhs_client"):
+            await self.xhs_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -452,13 +522,11 @@ class XiaoHongShuCrawler(AbstractCrawler):
             url = pic.get("url")
             if not url:
                 continue
-            content = await self.xhs_client.get_note_media(url)
-            await asyncio.sleep(random.random())
-            if content is None:
-                continue
             extension_file_name = f"{picNum}.jpg"
             picNum += 1
-            await xhs_store.update_xhs_note_image(note_id, content, extension_file_name)
+            await media_queue.enqueue_media(MediaJob(
+                platform="xhs", media_type="image", owner_id=note_id, extension_file_name=extension_file_name, url=url,
+            ), self.xhs_client)
 
     async def get_notice_video(self, note_item: Dict):
         """
@@ -476,10 +544,8 @@ class XiaoHongShuCrawler(AbstractCrawler):
             return
         videoNum = 0
         for url in videos:
-            content = await self.xhs_client.get_note_media(url)
-            await asyncio.sleep(random.random())
-            if content is None:
-                continue
             extension_file_name = f"{videoNum}.mp4"
             videoNum += 1
-            await xhs_store.update_xhs_note_video(note_id, content, extension_file_name)
+            await media_queue.enqueue_media(MediaJob(
+                platform="xhs", media_type="video", owner_id=note_id, extension_file_name=extension_file_name, url=url,
+            ), self.xhs_client)
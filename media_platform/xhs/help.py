@@ -9,15 +9,21 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。  
 
 
+import asyncio
 import ctypes
 import json
 import random
 import time
 import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright.async_api import Page
 
 from model.m_xiaohongshu import NoteUrlInfo
 from tools.crawler_util import extract_url_params_to_dict
 
+from .exception import DataFetchError
+
 
 def sign(a1="", b1="", x_s="", x_t=""):
     """
@@ -306,6 +312,100 @@ def parse_note_info_from_note_url(url: str) -> NoteUrlInfo:
     return NoteUrlInfo(note_id=note_id, xsec_token=xsec_token, xsec_source=xsec_source)
 
 
+
+class XhsSignService:
+    """
+    小红书请求头签名服务
+    - 同一时刻排队的多个签名请求合并为一次 page.evaluate 调用
+    - localStorage 中的 b1 只在首次签名时读取并缓存，cookie 刷新后失效重新读取
+    - 每个请求返回独立的签名头，不修改共享的 headers
+    """
+
+    _SIGN_JS = """([items, needB1]) => ({
+        signs: items.map(([url, data]) => window._webmsxyw(url, data)),
+        b1: needB1 ? (window.localStorage.getItem("b1") || "") : null,
+    })"""
+
+    def __init__(self, playwright_page: Page, max_batch_size: int = 50):
+        """
+        Args:
+            playwright_page: 已经打开小红书页面的playwright page对象
+            max_batch_size: 一次 page.evaluate 最多签名的请求数
+        """
+        self.playwright_page = playwright_page
+        self.max_batch_size = max_batch_size
+        self._b1: Optional[str] = None
+        # invalidate 时递增，在途批次读取到的旧 b1 不再写回缓存
+        self._b1_version = 0
+        self._queue: List[Tuple[str, Any, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def invalidate(self):
+        """
+        cookie 刷新后调用，下次签名时重新读取 b1
+        Returns:
+
+        """
+        self._b1 = None
+        self._b1_version += 1
+
+    async def sign_headers(self, url: str, data: Any = None, a1: str = "") -> Dict[str, str]:
+        """
+        获取单个请求的签名头，并发调用时会与其他排队的请求合并签名
+        Args:
+            url: 请求路由，GET请求包含查询参数
+            data: POST请求体
+            a1: cookie中的a1
+
+        Returns:
+            X-S、X-T、x-S-Common、X-B3-Traceid 签名头
+        """
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queue.append((url, data, future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_queue())
+        encrypt_params, b1 = await future
+        signs = sign(
+            a1=a1,
+            b1=b1,
+            x_s=encrypt_params.get("X-s", ""),
+            x_t=str(encrypt_params.get("X-t", "")),
+        )
+        return {
+            "X-S": signs["x-s"],
+            "X-T": signs["x-t"],
+            "x-S-Common": signs["x-s-common"],
+            "X-B3-Traceid": signs["x-b3-traceid"],
+        }
+
+    async def _flush_queue(self):
+        # 让出一次事件循环，等待同一批并发的签名请求入队
+        await asyncio.sleep(0)
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch_size], self._queue[self.max_batch_size:]
+            # 同一批次的签名使用同一个 b1，不受签名期间 invalidate 的影响
+            b1, b1_version = self._b1, self._b1_version
+            try:
+                result = await self.playwright_page.evaluate(
+                    self._SIGN_JS, [[[url, data] for url, data, _ in batch], b1 is None]
+                )
+                signs = (result or {}).get("signs") or []
+                if len(signs) != len(batch):
+                    raise DataFetchError(f"sign {len(batch)} requests but got {len(signs)} signs")
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            if b1 is None:
+                b1 = result.get("b1") or ""
+                if b1_version == self._b1_version:
+                    self._b1 = b1
+            for (_, _, future), encrypt_params in zip(batch, signs):
+                if not future.done():
+                    future.set_result((encrypt_params or {}, b1))
+
+
 if __name__ == '__main__':
     _img_url = "https://sns-img-bd.xhscdn.com/7a3abfaf-90c1-a828-5de7-022c80b92aa3"
     # 获取一个图片地址在多个cdn下的url地址
@@ -9,12 +9,10 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
 # -*- coding: utf-8 -*-
-import asyncio
 import json
 from typing import Any, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
-import httpx
 from httpx import Response
 from playwright.async_api import BrowserContext, Page
 from tenacity import retry, stop_after_attempt, wait_fixed
@@ -24,13 +22,17 @@ from base.base_crawler import AbstractApiClient
 from constant import zhihu as zhihu_constant
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
 from tools import utils
+from tools.comment_pipeline import CommentPipeline
+from tools.comment_watermark import CommentWatermark
+from tools.rate_limiter import crawl_sleep
 
 from .exception import DataFetchError, ForbiddenError
 from .field import SearchSort, SearchTime, SearchType
-from .help import ZhihuExtractor, sign
+from .help import ZhihuExtractor, async_sign
 
 
 class ZhiHuClient(AbstractApiClient):
+    platform = "zhihu"
 
     def __init__(
         self,
@@ -41,6 +43,7 @@ class ZhiHuClient(AbstractApiClient):
         playwright_page: Page,
         cookie_dict: Dict[str, str],
     ):
+        super().__init__()
         self.proxy = proxy
         self.timeout = timeout
         self.default_headers = headers
@@ -58,7 +61,7 @@ class ZhiHuClient(AbstractApiClient):
         d_c0 = self.cookie_dict.get("d_c0")
         if not d_c0:
             raise Exception("d_c0 not found in cookies")
-        sign_res = sign(url, self.default_headers["cookie"])
+        sign_res = await async_sign(url, self.default_headers["cookie"])
         headers = self.default_headers.copy()
         headers['x-zst-81'] = sign_res["x-zst-81"]
         headers['x-zse-96'] = sign_res["x-zse-96"]
@@ -79,8 +82,9 @@ class ZhiHuClient(AbstractApiClient):
         # return response.text
         return_response = kwargs.pop('return_response', False)
 
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        await self.wait_rate_limit(url, cookie=self.default_headers.get("cookie", ""), proxy=self.proxy)
+        client = self.get_http_client(self.proxy)
+        response = await client.request(method, url, timeout=self.timeout, **kwargs)
 
         if response.status_code != 200:
             utils.logger.error(f"[ZhiHuClient.request] Requset Url: {url}, Request error: {response.text}")
@@ -281,24 +285,37 @@ class ZhiHuClient(AbstractApiClient):
         is_end: bool = False
         offset: str = ""
         limit: int = 10
-        while not is_end:
-            root_comment_res = await self.get_root_comments(content.content_id, content.content_type, offset, limit)
-            if not root_comment_res:
-                break
-            paging_info = root_comment_res.get("paging", {})
-            is_end = paging_info.get("is_end")
-            offset = self._extractor.extract_offset(paging_info)
-            comments = self._extractor.extract_comments(content, root_comment_res.get("data"))
+        watermark = await CommentWatermark(
+            "zhihu", content.content_id,
+            get_time=lambda comment: comment.publish_time, get_id=lambda comment: comment.comment_id,
+        ).load()
+        # 增量爬取时按时间倒序请求，才能在遇到已经保存过的评论时停止翻页
+        order_by = "ts" if watermark.enabled else "score"
+        async with CommentPipeline(callback, crawl_interval) as pipeline:
+            while not is_end and not watermark.reached:
+                await pipeline.pace()
+                root_comment_res = await self.get_root_comments(
+                    content.content_id, content.content_type, offset, limit, order_by
+                )
+                if not root_comment_res:
+                    break
+                paging_info = root_comment_res.get("paging", {})
+                is_end = paging_info.get("is_end")
+                offset = self._extractor.extract_offset(paging_info)
+                comments = self._extractor.extract_comments(content, root_comment_res.get("data"))
 
-            if not comments:
-                break
+                if not comments:
+                    break
+                comments = watermark.filter_page(comments)
 
-            if callback:
-                await callback(comments)
+                await pipeline.store(comments)
 
-            result.extend(comments)
-            await self.get_comments_all_sub_comments(content, comments, crawl_interval=crawl_interval, callback=callback)
-            await asyncio.sleep(crawl_interval)
+                result.extend(comments)
+                # 子评论在后台获取，同时继续请求下一页评论
+                pipeline.submit(self.get_comments_all_sub_comments(
+                    content, comments, crawl_interval=crawl_interval, callback=callback, pipeline=pipeline
+                ))
+        await watermark.save()
         return result
 
     async def get_comments_all_sub_comments(
@@ -307,6 +324,7 @@ class ZhiHuClient(AbstractApiClient):
         comments: List[ZhihuComment],
         crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
+        pipeline: Optional[CommentPipeline] = None,
     ) -> List[ZhihuComment]:
         """
         获取指定评论下的所有子评论
@@ -315,12 +333,16 @@ class ZhiHuClient(AbstractApiClient):
             comments: 评论列表
             crawl_interval: 爬取一次笔记的延迟单位（秒）
             callback: 一次笔记爬取结束后
+            pipeline: 所属的评论爬取流水线，为None时单独创建
 
         Returns:
 
         """
         if not config.ENABLE_GET_SUB_COMMENTS:
             return []
+        if pipeline is None:
+            async with CommentPipeline(callback, crawl_interval) as pipeline:
+                return await self.get_comments_all_sub_comments(content, comments, crawl_interval, callback, pipeline)
 
         all_sub_comments: List[ZhihuComment] = []
         for parment_comment in comments:
@@ -331,6 +353,7 @@ class ZhiHuClient(AbstractApiClient):
             offset: str = ""
             limit: int = 10
             while not is_end:
+                await pipeline.pace()
                 child_comment_res = await self.get_child_comments(parment_comment.comment_id, offset, limit)
                 if not child_comment_res:
                     break
@@ -342,11 +365,9 @@ class ZhiHuClient(AbstractApiClient):
                 if not sub_comments:
                     break
 
-                if callback:
-                    await callback(sub_comments)
+                await pipeline.store(sub_comments)
 
                 all_sub_comments.extend(sub_comments)
-                await asyncio.sleep(crawl_interval)
         return all_sub_comments
 
     async def get_creator_info(self, url_token: str) -> Optional[ZhihuCreator]:
@@ -452,7 +473,7 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(contents)
             all_contents.extend(contents)
             offset += limit
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
         return all_contents
 
     async def get_all_articles_by_creator(
@@ -486,7 +507,7 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(contents)
             all_contents.extend(contents)
             offset += limit
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
         return all_contents
 
     async def get_all_videos_by_creator(
@@ -520,7 +541,7 @@ class ZhiHuClient(AbstractApiClient):
                 await callback(contents)
             all_contents.extend(contents)
             offset += limit
-            await asyncio.sleep(crawl_interval)
+            await crawl_sleep(crawl_interval)
         return all_contents
 
     async def get_answer_info(
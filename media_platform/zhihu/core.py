@@ -30,7 +30,7 @@ from base.base_crawler import AbstractCrawler
 from model.m_zhihu import ZhihuContent, ZhihuCreator
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import zhihu as zhihu_store
-from tools import utils
+from tools import js_sign_pool, seen_index, utils
 from tools.cdp_browser import CDPBrowserManager
 from var import crawler_type_var, source_keyword_var
 
@@ -94,7 +94,7 @@ class ZhihuCrawler(AbstractCrawler):
 
             # Create a client to interact with the zhihu website.
             self.zhihu_client = await self.create_zhihu_client(httpx_proxy_format)
-            if not await self.zhihu_client.pong():
+            if not await self.zhihu_client.check_login_state(self.zhihu_client.default_headers.get("cookie", ""), self.zhihu_client.pong):
                 login_obj = ZhiHuLogin(
                     login_type=config.LOGIN_TYPE,
                     login_phone="",  # input your phone number
@@ -215,6 +215,8 @@ class ZhihuCrawler(AbstractCrawler):
         Returns:
 
         """
+        if await seen_index.is_content_fresh("zhihu", content_item.content_id):
+            return
         async with semaphore:
             utils.logger.info(
                 f"[ZhihuCrawler.get_comments] Begin get note id comments {content_item.content_id}"
@@ -224,6 +226,7 @@ class ZhihuCrawler(AbstractCrawler):
                 crawl_interval=random.random(),
                 callback=zhihu_store.batch_update_zhihu_note_comments,
             )
+            await seen_index.mark_comments_done("zhihu", content_item.content_id)
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -292,6 +295,9 @@ class ZhihuCrawler(AbstractCrawler):
         Returns:
 
         """
+        # 回答、文章、视频链接的最后一段都是内容id
+        if await seen_index.is_content_fresh("zhihu", full_note_url.split("/")[-1]):
+            return None
         async with semaphore:
             utils.logger.info(
                 f"[ZhihuCrawler.get_specified_notes] Begin get specified note {full_note_url}"
@@ -446,6 +452,11 @@ class ZhihuCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        # 关闭API客户端复用的httpx连接池
+        if hasattr(self, "zhihu_client"):
+            await self.zhihu_client.close()
+        # 关闭常驻的node签名进程
+        await js_sign_pool.close_all_pools()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
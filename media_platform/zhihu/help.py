@@ -14,14 +14,14 @@ import json
 from typing import Dict, List, Optional
 from urllib.parse import parse_qs, urlparse
 
-import execjs
 from parsel import Selector
 
 from constant import zhihu as zhihu_constant
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
-from tools import utils
+from tools import js_sign_pool, utils
 from tools.crawler_util import extract_text_from_html
 
+ZHIHU_SIGN_JS_PATH = "libs/zhihu.js"
 ZHIHU_SGIN_JS = None
 
 
@@ -37,12 +37,33 @@ def sign(url: str, cookies: str) -> Dict:
     """
     global ZHIHU_SGIN_JS
     if not ZHIHU_SGIN_JS:
-        with open("libs/zhihu.js", mode="r", encoding="utf-8-sig") as f:
+        import execjs
+
+        with open(ZHIHU_SIGN_JS_PATH, mode="r", encoding="utf-8-sig") as f:
             ZHIHU_SGIN_JS = execjs.compile(f.read())
 
     return ZHIHU_SGIN_JS.call("get_sign", url, cookies)
 
 
+async def async_sign(url: str, cookies: str) -> Dict:
+    """
+    zhihu sign algorithm, 优先使用常驻的node进程签名，失败时回退到execjs
+    Args:
+        url: request url with query string
+        cookies: request cookies with d_c0 key
+
+    Returns:
+
+    """
+    sign_pool = js_sign_pool.get_pool(ZHIHU_SIGN_JS_PATH)
+    if sign_pool is not None:
+        try:
+            return await sign_pool.call("get_sign", url, cookies)
+        except js_sign_pool.JsSignError as e:
+            utils.logger.warning(f"[async_sign] node sign worker failed, fallback to execjs, error: {e}")
+    return sign(url, cookies)
+
+
 class ZhihuExtractor:
     def __init__(self):
         pass
@@ -30,7 +30,7 @@ CREATE TABLE bilibili_video (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_bilibili_vi_video_i_31c36e ON bilibili_video(video_id);
+CREATE UNIQUE INDEX idx_bilibili_vi_video_i_31c36e ON bilibili_video(video_id);
 CREATE INDEX idx_bilibili_vi_create__73e0ec ON bilibili_video(create_time);
 
 -- ----------------------------
@@ -55,7 +55,7 @@ CREATE TABLE bilibili_video_comment (
     like_count TEXT NOT NULL DEFAULT '0'
 );
 
-CREATE INDEX idx_bilibili_vi_comment_41c34e ON bilibili_video_comment(comment_id);
+CREATE UNIQUE INDEX idx_bilibili_vi_comment_41c34e ON bilibili_video_comment(comment_id);
 CREATE INDEX idx_bilibili_vi_video_i_f22873 ON bilibili_video_comment(video_id);
 
 -- ----------------------------
@@ -77,7 +77,7 @@ CREATE TABLE bilibili_up_info (
     is_official INTEGER DEFAULT NULL
 );
 
-CREATE INDEX idx_bilibili_vi_user_123456 ON bilibili_up_info(user_id);
+CREATE UNIQUE INDEX idx_bilibili_vi_user_123456 ON bilibili_up_info(user_id);
 
 -- ----------------------------
 -- Table structure for bilibili_contact_info
@@ -99,6 +99,7 @@ CREATE TABLE bilibili_contact_info (
 
 CREATE INDEX idx_bilibili_contact_info_up_id ON bilibili_contact_info(up_id);
 CREATE INDEX idx_bilibili_contact_info_fan_id ON bilibili_contact_info(fan_id);
+CREATE UNIQUE INDEX idx_bilibili_contact_info_up_fan ON bilibili_contact_info(up_id, fan_id);
 
 -- ----------------------------
 -- Table structure for bilibili_up_dynamic
@@ -119,7 +120,7 @@ CREATE TABLE bilibili_up_dynamic (
     last_modify_ts INTEGER NOT NULL
 );
 
-CREATE INDEX idx_bilibili_up_dynamic_dynamic_id ON bilibili_up_dynamic(dynamic_id);
+CREATE UNIQUE INDEX idx_bilibili_up_dynamic_dynamic_id ON bilibili_up_dynamic(dynamic_id);
 
 -- ----------------------------
 -- Table structure for douyin_aweme
@@ -154,7 +155,7 @@ CREATE TABLE douyin_aweme (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_douyin_awem_aweme_i_6f7bc6 ON douyin_aweme(aweme_id);
+CREATE UNIQUE INDEX idx_douyin_awem_aweme_i_6f7bc6 ON douyin_aweme(aweme_id);
 CREATE INDEX idx_douyin_awem_create__299dfe ON douyin_aweme(create_time);
 
 -- ----------------------------
@@ -183,7 +184,7 @@ CREATE TABLE douyin_aweme_comment (
     pictures TEXT NOT NULL DEFAULT ''
 );
 
-CREATE INDEX idx_douyin_awem_comment_fcd7e4 ON douyin_aweme_comment(comment_id);
+CREATE UNIQUE INDEX idx_douyin_awem_comment_fcd7e4 ON douyin_aweme_comment(comment_id);
 CREATE INDEX idx_douyin_awem_aweme_i_c50049 ON douyin_aweme_comment(aweme_id);
 
 -- ----------------------------
@@ -206,6 +207,8 @@ CREATE TABLE dy_creator (
     videos_count TEXT DEFAULT NULL
 );
 
+CREATE UNIQUE INDEX idx_dy_creator_user_id ON dy_creator(user_id);
+
 -- ----------------------------
 -- Table structure for kuaishou_video
 -- ----------------------------
@@ -230,7 +233,7 @@ CREATE TABLE kuaishou_video (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_kuaishou_vi_video_i_c5c6a6 ON kuaishou_video(video_id);
+CREATE UNIQUE INDEX idx_kuaishou_vi_video_i_c5c6a6 ON kuaishou_video(video_id);
 CREATE INDEX idx_kuaishou_vi_create__a10dee ON kuaishou_video(create_time);
 
 -- ----------------------------
@@ -251,7 +254,7 @@ CREATE TABLE kuaishou_video_comment (
     sub_comment_count TEXT NOT NULL
 );
 
-CREATE INDEX idx_kuaishou_vi_comment_ed48fa ON kuaishou_video_comment(comment_id);
+CREATE UNIQUE INDEX idx_kuaishou_vi_comment_ed48fa ON kuaishou_video_comment(comment_id);
 CREATE INDEX idx_kuaishou_vi_video_i_e50914 ON kuaishou_video_comment(video_id);
 
 -- ----------------------------
@@ -279,7 +282,7 @@ CREATE TABLE weibo_note (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_weibo_note_note_id_f95b1a ON weibo_note(note_id);
+CREATE UNIQUE INDEX idx_weibo_note_note_id_f95b1a ON weibo_note(note_id);
 CREATE INDEX idx_weibo_note_create__692709 ON weibo_note(create_time);
 CREATE INDEX idx_weibo_note_create__d05ed2 ON weibo_note(create_date_time);
 
@@ -307,7 +310,7 @@ CREATE TABLE weibo_note_comment (
     parent_comment_id TEXT DEFAULT NULL
 );
 
-CREATE INDEX idx_weibo_note__comment_c7611c ON weibo_note_comment(comment_id);
+CREATE UNIQUE INDEX idx_weibo_note__comment_c7611c ON weibo_note_comment(comment_id);
 CREATE INDEX idx_weibo_note__note_id_24f108 ON weibo_note_comment(note_id);
 CREATE INDEX idx_weibo_note__create__667fe3 ON weibo_note_comment(create_date_time);
 
@@ -330,6 +333,8 @@ CREATE TABLE weibo_creator (
     tag_list TEXT
 );
 
+CREATE UNIQUE INDEX idx_weibo_creator_user_id ON weibo_creator(user_id);
+
 -- ----------------------------
 -- Table structure for xhs_creator
 -- ----------------------------
@@ -350,6 +355,8 @@ CREATE TABLE xhs_creator (
     tag_list TEXT
 );
 
+CREATE UNIQUE INDEX idx_xhs_creator_user_id ON xhs_creator(user_id);
+
 -- ----------------------------
 -- Table structure for xhs_note
 -- ----------------------------
@@ -380,7 +387,7 @@ CREATE TABLE xhs_note (
     xsec_token TEXT DEFAULT NULL
 );
 
-CREATE INDEX idx_xhs_note_note_id_209457 ON xhs_note(note_id);
+CREATE UNIQUE INDEX idx_xhs_note_note_id_209457 ON xhs_note(note_id);
 CREATE INDEX idx_xhs_note_time_eaa910 ON xhs_note(time);
 
 -- ----------------------------
@@ -405,7 +412,7 @@ CREATE TABLE xhs_note_comment (
     like_count TEXT DEFAULT NULL
 );
 
-CREATE INDEX idx_xhs_note_co_comment_8e8349 ON xhs_note_comment(comment_id);
+CREATE UNIQUE INDEX idx_xhs_note_co_comment_8e8349 ON xhs_note_comment(comment_id);
 CREATE INDEX idx_xhs_note_co_create__204f8d ON xhs_note_comment(create_time);
 
 -- ----------------------------
@@ -433,7 +440,7 @@ CREATE TABLE tieba_note (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_tieba_note_note_id ON tieba_note(note_id);
+CREATE UNIQUE INDEX idx_tieba_note_note_id ON tieba_note(note_id);
 CREATE INDEX idx_tieba_note_publish_time ON tieba_note(publish_time);
 
 -- ----------------------------
@@ -460,7 +467,7 @@ CREATE TABLE tieba_comment (
     last_modify_ts INTEGER NOT NULL
 );
 
-CREATE INDEX idx_tieba_comment_comment_id ON tieba_comment(comment_id);
+CREATE UNIQUE INDEX idx_tieba_comment_comment_id ON tieba_comment(comment_id);
 CREATE INDEX idx_tieba_comment_note_id ON tieba_comment(note_id);
 CREATE INDEX idx_tieba_comment_publish_time ON tieba_comment(publish_time);
 
@@ -483,6 +490,8 @@ CREATE TABLE tieba_creator (
     registration_duration TEXT DEFAULT NULL
 );
 
+CREATE UNIQUE INDEX idx_tieba_creator_user_id ON tieba_creator(user_id);
+
 -- ----------------------------
 -- Table structure for zhihu_content
 -- ----------------------------
@@ -510,7 +519,7 @@ CREATE TABLE zhihu_content (
     last_modify_ts INTEGER NOT NULL
 );
 
-CREATE INDEX idx_zhihu_content_content_id ON zhihu_content(content_id);
+CREATE UNIQUE INDEX idx_zhihu_content_content_id ON zhihu_content(content_id);
 CREATE INDEX idx_zhihu_content_created_time ON zhihu_content(created_time);
 
 -- ----------------------------
@@ -537,7 +546,7 @@ CREATE TABLE zhihu_comment (
     last_modify_ts INTEGER NOT NULL
 );
 
-CREATE INDEX idx_zhihu_comment_comment_id ON zhihu_comment(comment_id);
+CREATE UNIQUE INDEX idx_zhihu_comment_comment_id ON zhihu_comment(comment_id);
 CREATE INDEX idx_zhihu_comment_content_id ON zhihu_comment(content_id);
 CREATE INDEX idx_zhihu_comment_publish_time ON zhihu_comment(publish_time);
 
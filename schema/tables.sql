@@ -595,3 +595,29 @@ alter table douyin_aweme_comment add column `like_count` varchar(255) NOT NULL D
 alter table xhs_note add column xsec_token varchar(50) default null comment '签名算法';
 alter table douyin_aweme_comment add column `pictures` varchar(500) NOT NULL DEFAULT '' COMMENT '评论图片列表';
 alter table bilibili_video_comment add column `like_count` varchar(255) NOT NULL DEFAULT '0' COMMENT '点赞数';
+
+-- ----------------------------
+-- add unique keys for batched upsert (INSERT ... ON DUPLICATE KEY UPDATE)
+-- 已有数据的表需要先清理重复记录再执行
+-- ----------------------------
+ALTER TABLE `bilibili_video` DROP INDEX `idx_bilibili_vi_video_i_31c36e`, ADD UNIQUE KEY `idx_bilibili_vi_video_i_31c36e` (`video_id`);
+ALTER TABLE `bilibili_video_comment` DROP INDEX `idx_bilibili_vi_comment_41c34e`, ADD UNIQUE KEY `idx_bilibili_vi_comment_41c34e` (`comment_id`);
+ALTER TABLE `bilibili_up_info` DROP INDEX `idx_bilibili_vi_user_123456`, ADD UNIQUE KEY `idx_bilibili_vi_user_123456` (`user_id`);
+ALTER TABLE `bilibili_contact_info` ADD UNIQUE KEY `idx_bilibili_contact_info_up_fan` (`up_id`, `fan_id`);
+ALTER TABLE `bilibili_up_dynamic` DROP INDEX `idx_bilibili_up_dynamic_dynamic_id`, ADD UNIQUE KEY `idx_bilibili_up_dynamic_dynamic_id` (`dynamic_id`);
+ALTER TABLE `douyin_aweme` DROP INDEX `idx_douyin_awem_aweme_i_6f7bc6`, ADD UNIQUE KEY `idx_douyin_awem_aweme_i_6f7bc6` (`aweme_id`);
+ALTER TABLE `douyin_aweme_comment` DROP INDEX `idx_douyin_awem_comment_fcd7e4`, ADD UNIQUE KEY `idx_douyin_awem_comment_fcd7e4` (`comment_id`);
+ALTER TABLE `dy_creator` ADD UNIQUE KEY `idx_dy_creator_user_id` (`user_id`);
+ALTER TABLE `kuaishou_video` DROP INDEX `idx_kuaishou_vi_video_i_c5c6a6`, ADD UNIQUE KEY `idx_kuaishou_vi_video_i_c5c6a6` (`video_id`);
+ALTER TABLE `kuaishou_video_comment` DROP INDEX `idx_kuaishou_vi_comment_ed48fa`, ADD UNIQUE KEY `idx_kuaishou_vi_comment_ed48fa` (`comment_id`);
+ALTER TABLE `weibo_note` DROP INDEX `idx_weibo_note_note_id_f95b1a`, ADD UNIQUE KEY `idx_weibo_note_note_id_f95b1a` (`note_id`);
+ALTER TABLE `weibo_note_comment` DROP INDEX `idx_weibo_note__comment_c7611c`, ADD UNIQUE KEY `idx_weibo_note__comment_c7611c` (`comment_id`);
+ALTER TABLE `weibo_creator` ADD UNIQUE KEY `idx_weibo_creator_user_id` (`user_id`);
+ALTER TABLE `xhs_creator` ADD UNIQUE KEY `idx_xhs_creator_user_id` (`user_id`);
+ALTER TABLE `xhs_note` DROP INDEX `idx_xhs_note_note_id_209457`, ADD UNIQUE KEY `idx_xhs_note_note_id_209457` (`note_id`);
+ALTER TABLE `xhs_note_comment` DROP INDEX `idx_xhs_note_co_comment_8e8349`, ADD UNIQUE KEY `idx_xhs_note_co_comment_8e8349` (`comment_id`);
+ALTER TABLE `tieba_note` DROP INDEX `idx_tieba_note_note_id`, ADD UNIQUE KEY `idx_tieba_note_note_id` (`note_id`);
+ALTER TABLE `tieba_comment` DROP INDEX `idx_tieba_comment_comment_id`, ADD UNIQUE KEY `idx_tieba_comment_comment_id` (`comment_id`);
+ALTER TABLE `tieba_creator` ADD UNIQUE KEY `idx_tieba_creator_user_id` (`user_id`);
+ALTER TABLE `zhihu_content` DROP INDEX `idx_zhihu_content_content_id`, ADD UNIQUE KEY `idx_zhihu_content_content_id` (`content_id`);
+ALTER TABLE `zhihu_comment` DROP INDEX `idx_zhihu_comment_comment_id`, ADD UNIQUE KEY `idx_zhihu_comment_comment_id` (`comment_id`);
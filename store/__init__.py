@@ -13,3 +13,79 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/1/14 17:29
 # @Desc    :
+
+from typing import Optional
+
+
+async def close_all_stores():
+    """
+    爬虫运行结束时调用，将各存储方式中缓冲的数据写入磁盘并释放文件句柄
+    Returns:
+
+    """
+    import async_db_buffer
+    from tools import csv_writer, jsonl_writer, parquet_writer, words
+
+    await csv_writer.close_all_writers()
+    await jsonl_writer.close_all_writers()
+    await parquet_writer.close_all_writers()
+    await async_db_buffer.close_write_buffer()
+    # 词云图只在爬虫结束时生成一次
+    await words.close_word_cloud_generator()
+
+
+async def store_media(job, media_content):
+    """
+    媒体下载池下载完成后调用，按平台和媒体类型保存到对应的目录
+    Args:
+        job: tools.media_queue.MediaJob
+        media_content: 下载好的临时文件路径，开启去重时为按内容保存的 MediaBlob
+
+    Returns:
+
+    """
+    from store import bilibili as bilibili_store
+    from store import douyin as douyin_store
+    from store import weibo as weibo_store
+    from store import xhs as xhs_store
+
+    media_handlers = {
+        ("xhs", "image"): xhs_store.update_xhs_note_image,
+        ("xhs", "video"): xhs_store.update_xhs_note_video,
+        ("dy", "image"): douyin_store.update_dy_aweme_image,
+        ("dy", "video"): douyin_store.update_dy_aweme_video,
+        ("bili", "video"): bilibili_store.store_video,
+        ("wb", "image"): weibo_store.update_weibo_note_image,
+    }
+    handler = media_handlers.get((job.platform, job.media_type))
+    if handler is None:
+        raise ValueError(f"unsupported media job, platform: {job.platform}, media_type: {job.media_type}")
+    await handler(job.owner_id, media_content, job.extension_file_name)
+
+
+def media_file_path(job) -> Optional[str]:
+    """
+    媒体下载任务保存到本地的文件路径，媒体下载池用来判断已经下载完成的文件是否被删除
+    Args:
+        job: tools.media_queue.MediaJob
+
+    Returns:
+        不支持的平台和媒体类型返回None
+    """
+    from store.bilibili import BilibiliVideo
+    from store.douyin import DouYinImage, DouYinVideo
+    from store.weibo import WeiboStoreImage
+    from store.xhs import XiaoHongShuImage, XiaoHongShuVideo
+
+    media_stores = {
+        ("xhs", "image"): XiaoHongShuImage,
+        ("xhs", "video"): XiaoHongShuVideo,
+        ("dy", "image"): DouYinImage,
+        ("dy", "video"): DouYinVideo,
+        ("bili", "video"): BilibiliVideo,
+        ("wb", "image"): WeiboStoreImage,
+    }
+    media_store = media_stores.get((job.platform, job.media_type))
+    if media_store is None:
+        return None
+    return media_store().make_save_file_name(job.owner_id, job.extension_file_name)
@@ -16,6 +16,7 @@
 from typing import List
 
 import config
+from tools import seen_index
 from var import source_keyword_var
 
 from .bilibili_store_impl import *
@@ -27,6 +28,8 @@ class BiliStoreFactory:
         "csv": BiliCsvStoreImplement,
         "db": BiliDbStoreImplement,
         "json": BiliJsonStoreImplement,
+        "jsonl": BiliJsonlStoreImplement,
+        "parquet": BiliParquetStoreImplement,
         "sqlite": BiliSqliteStoreImplement,
     }
 
@@ -34,7 +37,7 @@ class BiliStoreFactory:
     def create_store() -> AbstractStore:
         store_class = BiliStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[BiliStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+            raise ValueError("[BiliStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or parquet or sqlite ...")
         return store_class()
 
 
@@ -67,6 +70,7 @@ async def update_bilibili_video(video_item: Dict):
     }
     utils.logger.info(f"[store.bilibili.update_bilibili_video] bilibili video id:{video_id}, title:{save_content_item.get('title')}")
     await BiliStoreFactory.create_store().store_content(content_item=save_content_item)
+    await seen_index.mark_content_seen("bili", video_id)
 
 
 async def update_up_info(video_item: Dict):
@@ -96,6 +100,9 @@ async def batch_update_bilibili_video_comments(video_id: str, comments: List[Dic
 
 
 async def update_bilibili_video_comment(video_id: str, comment_item: Dict):
+    # 已经保存过的评论不再重复写入
+    if not await seen_index.is_new_comment("bili", comment_item.get("rpid")):
+        return
     comment_id = str(comment_item.get("rpid"))
     parent_comment_id = str(comment_item.get("parent", 0))
     content: Dict = comment_item.get("content")
@@ -118,6 +125,7 @@ async def update_bilibili_video_comment(video_id: str, comment_item: Dict):
     }
     utils.logger.info(f"[store.bilibili.update_bilibili_video_comment] Bilibili video comment: {comment_id}, content: {save_comment_item.get('content')}")
     await BiliStoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    await seen_index.mark_comment_seen("bili", comment_id)
 
 
 async def store_video(aid, video_content, extension_file_name):
@@ -14,7 +14,6 @@
 # @Time    : 2024/1/14 19:34
 # @Desc    : B站存储实现类
 import asyncio
-import csv
 import json
 import os
 import pathlib
@@ -23,8 +22,9 @@ from typing import Dict
 import aiofiles
 
 import config
+from async_db_buffer import enqueue_item
 from base.base_crawler import AbstractStore
-from tools import utils, words
+from tools import csv_writer, jsonl_writer, parquet_writer, utils, words
 from var import crawler_type_var
 
 
@@ -66,13 +66,9 @@ class BiliCsvStoreImplement(AbstractStore):
         Returns: no returns
 
         """
-        pathlib.Path(self.csv_store_path).mkdir(parents=True, exist_ok=True)
         save_file_name = self.make_save_file_name(store_type=store_type)
-        async with aiofiles.open(save_file_name, mode='a+', encoding="utf-8-sig", newline="") as f:
-            writer = csv.writer(f)
-            if await f.tell() == 0:
-                await writer.writerow(save_item.keys())
-            await writer.writerow(save_item.values())
+        # 同一个文件共用一个写入器，保持文件句柄打开并批量写入
+        await csv_writer.get_writer(save_file_name).write(save_item)
 
     async def store_content(self, content_item: Dict):
         """
@@ -143,6 +139,8 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_video", content_item):
+            return
         from .bilibili_store_sql import (add_new_content,
                                          query_content_by_content_id,
                                          update_content_by_content_id)
@@ -164,6 +162,8 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_video_comment", comment_item):
+            return
         from .bilibili_store_sql import (add_new_comment,
                                          query_comment_by_comment_id,
                                          update_comment_by_comment_id)
@@ -185,6 +185,8 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_up_info", creator):
+            return
         from .bilibili_store_sql import (add_new_creator,
                                          query_creator_by_creator_id,
                                          update_creator_by_creator_id)
@@ -206,6 +208,8 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_contact_info", contact_item):
+            return
         from .bilibili_store_sql import (add_new_contact,
                                          query_contact_by_up_and_fan,
                                          update_contact_by_id, )
@@ -230,6 +234,8 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_up_dynamic", dynamic_item):
+            return
         from .bilibili_store_sql import (add_new_dynamic,
                                          query_dynamic_by_dynamic_id,
                                          update_dynamic_by_dynamic_id)
@@ -248,7 +254,6 @@ class BiliJsonStoreImplement(AbstractStore):
     words_store_path: str = "data/bilibili/words"
     lock = asyncio.Lock()
     file_count:int=calculate_number_of_files(json_store_path)
-    WordCloud = words.AsyncWordCloudGenerator()
 
 
     def make_save_file_name(self, store_type: str) -> (str,str):
@@ -292,9 +297,9 @@ class BiliJsonStoreImplement(AbstractStore):
 
             if config.ENABLE_GET_COMMENTS and config.ENABLE_GET_WORDCLOUD:
                 try:
-                    await self.WordCloud.generate_word_frequency_and_cloud(save_data, words_file_name_prefix)
-                except:
-                    pass
+                    await words.get_word_cloud_generator().add_item(save_item, words_file_name_prefix)
+                except Exception as e:
+                    utils.logger.error(f"[{self.__class__.__name__}.save_data_to_json] word frequency error: {e}")
 
     async def store_content(self, content_item: Dict):
         """
@@ -354,6 +359,182 @@ class BiliJsonStoreImplement(AbstractStore):
         await self.save_data_to_json(save_item=dynamic_item, store_type="dynamics")
 
 
+class BiliJsonlStoreImplement(AbstractStore):
+    jsonl_store_path: str = "data/bilibili/jsonl"
+    json_store_path: str = "data/bilibili/json"
+
+    def make_save_file_name(self, store_type: str) -> (str, str):
+        """
+        make save file name by store type
+        Args:
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns: jsonl file name and the legacy json file name exported at the end of run
+
+        """
+        file_name = f"{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}"
+        return (
+            f"{self.jsonl_store_path}/{file_name}.jsonl",
+            f"{self.json_store_path}/{file_name}_jsonl.json",
+        )
+
+    async def save_data_to_jsonl(self, save_item: Dict, store_type: str):
+        """
+        Append one item to the jsonl file, the writer buffers items and flushes them in batches.
+        Args:
+            save_item: save content dict info
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns:
+
+        """
+        save_file_name, legacy_json_file_name = self.make_save_file_name(store_type=store_type)
+        await jsonl_writer.get_writer(save_file_name, legacy_json_file_name).write(save_item)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content JSONL storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(content_item, "contents")
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment JSONL storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(comment_item, "comments")
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator JSONL storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(creator, "creators")
+
+    async def store_contact(self, contact_item: Dict):
+        """
+        creator contact JSONL storage implementation
+        Args:
+            contact_item: creator's contact item dict
+
+        Returns:
+
+        """
+
+        await self.save_data_to_jsonl(save_item=contact_item, store_type="contacts")
+
+    async def store_dynamic(self, dynamic_item: Dict):
+        """
+        creator dynamic JSONL storage implementation
+        Args:
+            dynamic_item: creator's contact item dict
+
+        Returns:
+
+        """
+
+        await self.save_data_to_jsonl(save_item=dynamic_item, store_type="dynamics")
+
+
+
+class BiliParquetStoreImplement(AbstractStore):
+    parquet_store_path: str = "data/bilibili/parquet"
+
+    def make_save_file_name(self, store_type: str) -> str:
+        """
+        make save file name by store type
+        Args:
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns: eg: data/bilibili/parquet/search_comments_20240114.parquet
+
+        """
+        return f"{self.parquet_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}.parquet"
+
+    async def save_data_to_parquet(self, save_item: Dict, store_type: str):
+        """
+        Add one item to the parquet file, the writer buffers items and writes them as a row group.
+        Args:
+            save_item: save content dict info
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns:
+
+        """
+        save_file_name = self.make_save_file_name(store_type=store_type)
+        await parquet_writer.get_writer(save_file_name).write(save_item)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_parquet(content_item, "contents")
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_parquet(comment_item, "comments")
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator Parquet storage implementation
+        Args:
+            creator:
+
+        Returns:
+
+        """
+        await self.save_data_to_parquet(creator, "creators")
+
+    async def store_contact(self, contact_item: Dict):
+        """
+        creator contact Parquet storage implementation
+        Args:
+            contact_item: creator's contact item dict
+
+        Returns:
+
+        """
+
+        await self.save_data_to_parquet(save_item=contact_item, store_type="contacts")
+
+    async def store_dynamic(self, dynamic_item: Dict):
+        """
+        creator dynamic Parquet storage implementation
+        Args:
+            dynamic_item: creator's contact item dict
+
+        Returns:
+
+        """
+
+        await self.save_data_to_parquet(save_item=dynamic_item, store_type="dynamics")
+
+
 class BiliSqliteStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
         """
@@ -365,6 +546,8 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_video", content_item):
+            return
         from .bilibili_store_sql import (add_new_content,
                                          query_content_by_content_id,
                                          update_content_by_content_id)
@@ -386,6 +569,8 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_video_comment", comment_item):
+            return
         from .bilibili_store_sql import (add_new_comment,
                                          query_comment_by_comment_id,
                                          update_comment_by_comment_id)
@@ -407,6 +592,8 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_up_info", creator):
+            return
         from .bilibili_store_sql import (add_new_creator,
                                          query_creator_by_creator_id,
                                          update_creator_by_creator_id)
@@ -428,6 +615,8 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_contact_info", contact_item):
+            return
         from .bilibili_store_sql import (add_new_contact,
                                          query_contact_by_up_and_fan,
                                          update_contact_by_id, )
@@ -452,6 +641,8 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("bilibili_up_dynamic", dynamic_item):
+            return
         from .bilibili_store_sql import (add_new_dynamic,
                                          query_dynamic_by_dynamic_id,
                                          update_dynamic_by_dynamic_id)
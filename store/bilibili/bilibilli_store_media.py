@@ -15,10 +15,9 @@
 import pathlib
 from typing import Dict
 
-import aiofiles
-
 from base.base_crawler import AbstractStoreImage, AbstractStoreVideo
 from tools import utils
+from tools.media_download import MediaContent, save_media
 
 
 class BilibiliVideo(AbstractStoreVideo):
@@ -49,13 +48,13 @@ class BilibiliVideo(AbstractStoreVideo):
         """
         return f"{self.video_store_path}/{aid}/{extension_file_name}"
 
-    async def save_video(self, aid: int, video_content: str, extension_file_name="mp4"):
+    async def save_video(self, aid: int, video_content: MediaContent, extension_file_name="mp4"):
         """
         save video to local
         
         Args:
             aid: aid
-            video_content: video content
+            video_content: video file path downloaded by the client, byte stream or bytes
             extension_file_name: video filename with extension
 
         Returns:
@@ -63,6 +62,5 @@ class BilibiliVideo(AbstractStoreVideo):
         """
         pathlib.Path(self.video_store_path + "/" + str(aid)).mkdir(parents=True, exist_ok=True)
         save_file_name = self.make_save_file_name(str(aid), extension_file_name)
-        async with aiofiles.open(save_file_name, 'wb') as f:
-            await f.write(video_content)
-            utils.logger.info(f"[BilibiliVideoImplement.save_video] save save_video {save_file_name} success ...")
+        await save_media(video_content, save_file_name)
+        utils.logger.info(f"[BilibiliVideoImplement.save_video] save save_video {save_file_name} success ...")
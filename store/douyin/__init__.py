@@ -15,6 +15,7 @@
 from typing import List
 
 import config
+from tools import seen_index
 from var import source_keyword_var
 
 from .douyin_store_impl import *
@@ -26,6 +27,8 @@ class DouyinStoreFactory:
         "csv": DouyinCsvStoreImplement,
         "db": DouyinDbStoreImplement,
         "json": DouyinJsonStoreImplement,
+        "jsonl": DouyinJsonlStoreImplement,
+        "parquet": DouyinParquetStoreImplement,
         "sqlite": DouyinSqliteStoreImplement,
     }
 
@@ -33,7 +36,7 @@ class DouyinStoreFactory:
     def create_store() -> AbstractStore:
         store_class = DouyinStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[DouyinStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+            raise ValueError("[DouyinStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or parquet or sqlite ...")
         return store_class()
 
 
@@ -173,6 +176,7 @@ async def update_douyin_aweme(aweme_item: Dict):
     }
     utils.logger.info(f"[store.douyin.update_douyin_aweme] douyin aweme id:{aweme_id}, title:{save_content_item.get('title')}")
     await DouyinStoreFactory.create_store().store_content(content_item=save_content_item)
+    await seen_index.mark_content_seen("dy", aweme_id)
 
 
 async def batch_update_dy_aweme_comments(aweme_id: str, comments: List[Dict]):
@@ -187,6 +191,9 @@ async def update_dy_aweme_comment(aweme_id: str, comment_item: Dict):
     if aweme_id != comment_aweme_id:
         utils.logger.error(f"[store.douyin.update_dy_aweme_comment] comment_aweme_id: {comment_aweme_id} != aweme_id: {aweme_id}")
         return
+    # 已经保存过的评论不再重复写入
+    if not await seen_index.is_new_comment("dy", comment_item.get("cid")):
+        return
     user_info = comment_item.get("user", {})
     comment_id = comment_item.get("cid")
     parent_comment_id = comment_item.get("reply_id", "0")
@@ -213,6 +220,7 @@ async def update_dy_aweme_comment(aweme_id: str, comment_item: Dict):
     utils.logger.info(f"[store.douyin.update_dy_aweme_comment] douyin aweme comment: {comment_id}, content: {save_comment_item.get('content')}")
 
     await DouyinStoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    await seen_index.mark_comment_seen("dy", comment_id)
 
 
 async def save_creator(user_id: str, creator: Dict):
@@ -16,6 +16,7 @@
 from typing import List
 
 import config
+from tools import seen_index
 from var import source_keyword_var
 
 from .kuaishou_store_impl import *
@@ -26,6 +27,8 @@ class KuaishouStoreFactory:
         "csv": KuaishouCsvStoreImplement,
         "db": KuaishouDbStoreImplement,
         "json": KuaishouJsonStoreImplement,
+        "jsonl": KuaishouJsonlStoreImplement,
+        "parquet": KuaishouParquetStoreImplement,
         "sqlite": KuaishouSqliteStoreImplement
     }
 
@@ -34,7 +37,7 @@ class KuaishouStoreFactory:
         store_class = KuaishouStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[KuaishouStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+                "[KuaishouStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or parquet or sqlite ...")
         return store_class()
 
 
@@ -64,6 +67,7 @@ async def update_kuaishou_video(video_item: Dict):
     utils.logger.info(
         f"[store.kuaishou.update_kuaishou_video] Kuaishou video id:{video_id}, title:{save_content_item.get('title')}")
     await KuaishouStoreFactory.create_store().store_content(content_item=save_content_item)
+    await seen_index.mark_content_seen("ks", video_id)
 
 
 async def batch_update_ks_video_comments(video_id: str, comments: List[Dict]):
@@ -76,6 +80,9 @@ async def batch_update_ks_video_comments(video_id: str, comments: List[Dict]):
 
 async def update_ks_video_comment(video_id: str, comment_item: Dict):
     comment_id = comment_item.get("commentId")
+    # 已经保存过的评论不再重复写入
+    if not await seen_index.is_new_comment("ks", comment_id):
+        return
     save_comment_item = {
         "comment_id": comment_id,
         "create_time": comment_item.get("timestamp"),
@@ -90,6 +97,7 @@ async def update_ks_video_comment(video_id: str, comment_item: Dict):
     utils.logger.info(
         f"[store.kuaishou.update_ks_video_comment] Kuaishou video comment: {comment_id}, content: {save_comment_item.get('content')}")
     await KuaishouStoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    await seen_index.mark_comment_seen("ks", comment_id)
 
 async def save_creator(user_id: str, creator: Dict):
     ownerCount = creator.get('ownerCount', {})
@@ -14,7 +14,6 @@
 # @Time    : 2024/1/14 20:03
 # @Desc    : 快手存储实现类
 import asyncio
-import csv
 import json
 import os
 import pathlib
@@ -23,8 +22,9 @@ from typing import Dict
 import aiofiles
 
 import config
+from async_db_buffer import enqueue_item
 from base.base_crawler import AbstractStore
-from tools import utils, words
+from tools import csv_writer, jsonl_writer, parquet_writer, utils, words
 from var import crawler_type_var
 
 
@@ -71,13 +71,9 @@ class KuaishouCsvStoreImplement(AbstractStore):
         Returns: no returns
 
         """
-        pathlib.Path(self.csv_store_path).mkdir(parents=True, exist_ok=True)
         save_file_name = self.make_save_file_name(store_type=store_type)
-        async with aiofiles.open(save_file_name, mode='a+', encoding="utf-8-sig", newline="") as f:
-            writer = csv.writer(f)
-            if await f.tell() == 0:
-                await writer.writerow(save_item.keys())
-            await writer.writerow(save_item.values())
+        # 同一个文件共用一个写入器，保持文件句柄打开并批量写入
+        await csv_writer.get_writer(save_file_name).write(save_item)
 
     async def store_content(self, content_item: Dict):
         """
@@ -116,6 +112,8 @@ class KuaishouDbStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("kuaishou_video", content_item):
+            return
         from .kuaishou_store_sql import (add_new_content,
                                          query_content_by_content_id,
                                          update_content_by_content_id)
@@ -136,6 +134,8 @@ class KuaishouDbStoreImplement(AbstractStore):
         Returns:
 
         """
+        if await enqueue_item("kuaishou_video_comment", comment_item):
+            return
         from .kuaishou_store_sql import (add_new_comment,
                                          query_comment_by_comment_id,
                                          update_comment_by_comment_id)
@@ -153,7 +153,6 @@ class KuaishouJsonStoreImplement(AbstractStore):
     words_store_path: str = "data/kuaishou/words"
     lock = asyncio.Lock()
     file_count:int=calculate_number_of_files(json_store_path)
-    WordCloud = words.AsyncWordCloudGenerator()
 
 
 
@@ -198,9 +197,9 @@ class KuaishouJsonStoreImplement(AbstractStore):
 
             if config.ENABLE_GET_COMMENTS and config.ENABLE_GET_WORDCLOUD:
                 try:
-                    await self.WordCloud.generate_word_frequency_and_cloud(save_data, words_file_name_prefix)
-                except:
-                    pass
+                    await words.get_word_cloud_generator().add_item(save_item, words_file_name_prefix)
+                except Exception as e:
+                    utils.logger.error(f"[{self.__class__.__name__}.save_data_to_json] word frequency error: {e}")
 
     async def store_content(self, content_item: Dict):
         """
@@ -236,6 +235,134 @@ class KuaishouJsonStoreImplement(AbstractStore):
         await self.save_data_to_json(creator, "creator")
 
 
+class KuaishouJsonlStoreImplement(AbstractStore):
+    jsonl_store_path: str = "data/kuaishou/jsonl"
+    json_store_path: str = "data/kuaishou/json"
+
+    def make_save_file_name(self, store_type: str) -> (str, str):
+        """
+        make save file name by store type
+        Args:
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns: jsonl file name and the legacy json file name exported at the end of run
+
+        """
+        file_name = f"{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}"
+        return (
+            f"{self.jsonl_store_path}/{file_name}.jsonl",
+            f"{self.json_store_path}/{file_name}_jsonl.json",
+        )
+
+    async def save_data_to_jsonl(self, save_item: Dict, store_type: str):
+        """
+        Append one item to the jsonl file, the writer buffers items and flushes them in batches.
+        Args:
+            save_item: save content dict info
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns:
+
+        """
+        save_file_name, legacy_json_file_name = self.make_save_file_name(store_type=store_type)
+        await jsonl_writer.get_writer(save_file_name, legacy_json_file_name).write(save_item)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content JSONL storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(content_item, "contents")
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment JSONL storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(comment_item, "comments")
+
+    async def store_creator(self, creator: Dict):
+        """
+        Kuaishou content JSONL storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(creator, "creator")
+
+
+
+class KuaishouParquetStoreImplement(AbstractStore):
+    parquet_store_path: str = "data/kuaishou/parquet"
+
+    def make_save_file_name(self, store_type: str) -> str:
+        """
+        make save file name by store type
+        Args:
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns: eg: data/kuaishou/parquet/search_comments_20240114.parquet
+
+        """
+        return f"{self.parquet_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}.parquet"
+
+    async def save_data_to_parquet(self, save_item: Dict, store_type: str):
+        """
+        Add one item to the parquet file, the writer buffers items and writes them as a row group.
+        Args:
+            save_item: save content dict info
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns:
+
+        """
+        save_file_name = self.make_save_file_name(store_type=store_type)
+        await parquet_writer.get_writer(save_file_name).write(save_item)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_parquet(content_item, "contents")
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_parquet(comment_item, "comments")
+
+    async def store_creator(self, creator: Dict):
+        """
+        Kuaishou content Parquet storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.save_data_to_parquet(creator, "creator")
+
+
 class KuaishouSqliteStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
         """
@@ -247,6 +374,8 @@ class KuaishouSqliteStoreImplement(AbstractStore):
 
         """
 
+        if await enqueue_item("kuaishou_video", content_item):
+            return
         from .kuaishou_store_sql import (add_new_content,
                                          query_content_by_content_id,
                                          update_content_by_content_id)
@@ -267,6 +396,8 @@ class KuaishouSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
+        if await enqueue_item("kuaishou_video_comment", comment_item):
+            return
         from .kuaishou_store_sql import (add_new_comment,
                                          query_comment_by_comment_id,
                                          update_comment_by_comment_id)
@@ -13,6 +13,7 @@
 from typing import List
 
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
+from tools import seen_index
 from var import source_keyword_var
 
 from . import tieba_store_impl
@@ -24,6 +25,8 @@ class TieBaStoreFactory:
         "csv": TieBaCsvStoreImplement,
         "db": TieBaDbStoreImplement,
         "json": TieBaJsonStoreImplement,
+        "jsonl": TieBaJsonlStoreImplement,
+        "parquet": TieBaParquetStoreImplement,
         "sqlite": TieBaSqliteStoreImplement
     }
 
@@ -32,7 +35,7 @@ class TieBaStoreFactory:
         store_class = TieBaStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[TieBaStoreFactory.create_store] Invalid save option only supported csv or db or json ...")
+                "[TieBaStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or parquet or sqlite ...")
         return store_class()
 
 
@@ -66,6 +69,7 @@ async def update_tieba_note(note_item: TiebaNote):
     utils.logger.info(f"[store.tieba.update_tieba_note] tieba note: {save_note_item}")
 
     await TieBaStoreFactory.create_store().store_content(save_note_item)
+    await seen_index.mark_content_seen("tieba", note_item.note_id)
 
 
 async def batch_update_tieba_note_comments(note_id: str, comments: List[TiebaComment]):
@@ -94,10 +98,14 @@ async def update_tieba_note_comment(note_id: str, comment_item: TiebaComment):
     Returns:
 
     """
+    # 已经保存过的评论不再重复写入
+    if not await seen_index.is_new_comment("tieba", comment_item.comment_id):
+        return
     save_comment_item = comment_item.model_dump()
     save_comment_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.tieba.update_tieba_note_comment] tieba note id: {note_id} comment:{save_comment_item}")
     await TieBaStoreFactory.create_store().store_comment(save_comment_item)
+    await seen_index.mark_comment_seen("tieba", comment_item.comment_id)
 
 
 async def save_creator(user_info: TiebaCreator):
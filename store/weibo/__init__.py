@@ -16,6 +16,7 @@
 import re
 from typing import List
 
+from tools import seen_index
 from var import source_keyword_var
 
 from .weibo_store_media import *
@@ -27,6 +28,8 @@ class WeibostoreFactory:
         "csv": WeiboCsvStoreImplement,
         "db": WeiboDbStoreImplement,
         "json": WeiboJsonStoreImplement,
+        "jsonl": WeiboJsonlStoreImplement,
+        "parquet": WeiboParquetStoreImplement,
         "sqlite": WeiboSqliteStoreImplement,
     }
 
@@ -34,7 +37,7 @@ class WeibostoreFactory:
     def create_store() -> AbstractStore:
         store_class = WeibostoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+            raise ValueError("[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or parquet or sqlite ...")
         return store_class()
 
 
@@ -93,6 +96,7 @@ async def update_weibo_note(note_item: Dict):
     }
     utils.logger.info(f"[store.weibo.update_weibo_note] weibo note id:{note_id}, title:{save_content_item.get('content')[:24]} ...")
     await WeibostoreFactory.create_store().store_content(content_item=save_content_item)
+    await seen_index.mark_content_seen("wb", note_id)
 
 
 async def batch_update_weibo_note_comments(note_id: str, comments: List[Dict]):
@@ -121,6 +125,9 @@ async def update_weibo_note_comment(note_id: str, comment_item: Dict):
     Returns:
 
     """
+    # 已经保存过的评论不再重复写入
+    if not await seen_index.is_new_comment("wb", comment_item.get("id")):
+        return
     if not comment_item or not note_id:
         return
     comment_id = str(comment_item.get("id"))
@@ -148,6 +155,7 @@ async def update_weibo_note_comment(note_id: str, comment_item: Dict):
     }
     utils.logger.info(f"[store.weibo.update_weibo_note_comment] Weibo note comment: {comment_id}, content: {save_comment_item.get('content', '')[:24]} ...")
     await WeibostoreFactory.create_store().store_comment(comment_item=save_comment_item)
+    await seen_index.mark_comment_seen("wb", comment_id)
 
 
 async def update_weibo_note_image(picid: str, pic_content, extension_file_name):
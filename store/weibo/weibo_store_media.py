@@ -15,10 +15,9 @@
 import pathlib
 from typing import Dict
 
-import aiofiles
-
 from base.base_crawler import AbstractStoreImage, AbstractStoreVideo
 from tools import utils
+from tools.media_download import MediaContent, save_media
 
 
 class WeiboStoreImage(AbstractStoreImage):
@@ -49,13 +48,13 @@ class WeiboStoreImage(AbstractStoreImage):
         """
         return f"{self.image_store_path}/{picid}.{extension_file_name}"
 
-    async def save_image(self, picid: str, pic_content: str, extension_file_name="jpg"):
+    async def save_image(self, picid: str, pic_content: MediaContent, extension_file_name="jpg"):
         """
         save image to local
         
         Args:
             picid: image id
-            pic_content: image content
+            pic_content: image file path downloaded by the client, byte stream or bytes
             extension_file_name: image filename with extension
 
         Returns:
@@ -63,6 +62,5 @@ class WeiboStoreImage(AbstractStoreImage):
         """
         pathlib.Path(self.image_store_path).mkdir(parents=True, exist_ok=True)
         save_file_name = self.make_save_file_name(picid, extension_file_name)
-        async with aiofiles.open(save_file_name, 'wb') as f:
-            await f.write(pic_content)
-            utils.logger.info(f"[WeiboImageStoreImplement.save_image] save image {save_file_name} success ...")
+        await save_media(pic_content, save_file_name)
+        utils.logger.info(f"[WeiboImageStoreImplement.save_image] save image {save_file_name} success ...")
@@ -15,6 +15,7 @@
 from typing import List
 
 import config
+from tools import seen_index
 from var import source_keyword_var
 
 from . import xhs_store_impl
@@ -27,6 +28,8 @@ class XhsStoreFactory:
         "csv": XhsCsvStoreImplement,
         "db": XhsDbStoreImplement,
         "json": XhsJsonStoreImplement,
+        "jsonl": XhsJsonlStoreImplement,
+        "parquet": XhsParquetStoreImplement,
         "sqlite": XhsSqliteStoreImplement,
     }
 
@@ -34,7 +37,7 @@ class XhsStoreFactory:
     def create_store() -> AbstractStore:
         store_class = XhsStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[XhsStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+            raise ValueError("[XhsStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or parquet or sqlite ...")
         return store_class()
 
 
@@ -111,6 +114,7 @@ async def update_xhs_note(note_item: Dict):
     }
     utils.logger.info(f"[store.xhs.update_xhs_note] xhs note: {local_db_item}")
     await XhsStoreFactory.create_store().store_content(local_db_item)
+    await seen_index.mark_content_seen("xhs", note_id)
 
 
 async def batch_update_xhs_note_comments(note_id: str, comments: List[Dict]):
@@ -139,6 +143,9 @@ async def update_xhs_note_comment(note_id: str, comment_item: Dict):
     Returns:
 
     """
+    # 已经保存过的评论不再重复写入
+    if not await seen_index.is_new_comment("xhs", comment_item.get("id")):
+        return
     user_info = comment_item.get("user_info", {})
     comment_id = comment_item.get("id")
     comment_pictures = [item.get("url_default", "") for item in comment_item.get("pictures", [])]
@@ -160,6 +167,7 @@ async def update_xhs_note_comment(note_id: str, comment_item: Dict):
     }
     utils.logger.info(f"[store.xhs.update_xhs_note_comment] xhs note comment:{local_db_item}")
     await XhsStoreFactory.create_store().store_comment(local_db_item)
+    await seen_index.mark_comment_seen("xhs", comment_id)
 
 
 async def save_creator(user_id: str, creator: Dict):
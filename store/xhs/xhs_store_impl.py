@@ -14,15 +14,15 @@
 # @Time    : 2024/1/14 16:58
 # @Desc    : 小红书存储实现类
 import asyncio
-import csv
 import json
 import os
 import pathlib
 from typing import Dict
 
 import config
+from async_db_buffer import enqueue_item
 from base.base_crawler import AbstractStore
-from tools import utils, words
+from tools import csv_writer, jsonl_writer, parquet_writer, utils, words
 from var import crawler_type_var
 
 
@@ -66,31 +66,9 @@ class XhsCsvStoreImplement(AbstractStore):
         Returns: no returns
 
         """
-        pathlib.Path(self.csv_store_path).mkdir(parents=True, exist_ok=True)
         save_file_name = self.make_save_file_name(store_type=store_type)
-        
-        # 使用同步方式写入CSV文件，避免权限问题
-        file_exists = os.path.exists(save_file_name) and os.path.getsize(save_file_name) > 0
-        
-        try:
-            with open(save_file_name, mode='a', encoding="utf-8-sig", newline="") as f:
-                writer = csv.writer(f)
-                # 如果文件不存在或为空，写入表头
-                if not file_exists:
-                    writer.writerow(save_item.keys())
-                # 写入数据行
-                writer.writerow(save_item.values())
-        except PermissionError as e:
-            # 如果遇到权限错误，尝试创建新的文件名
-            import time
-            timestamp = int(time.time())
-            new_file_name = save_file_name.replace('.csv', f'_{timestamp}.csv')
-            utils.logger.warning(f"Permission denied for {save_file_name}, creating new file: {new_file_name}")
-            
-            with open(new_file_name, mode='w', encoding="utf-8-sig", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(save_item.keys())
-                writer.writerow(save_item.values())
+        # 同一个文件共用一个写入器，保持文件句柄打开并批量写入
+        await csv_writer.get_writer(save_file_name).write(save_item)
 
     async def store_content(self, content_item: Dict):
         """
@@ -136,6 +114,8 @@ class XhsDbStoreImplement(AbstractStore):
         Returns:
 
         """
+        if await enqueue_item("xhs_note", content_item):
+            return
         from .xhs_store_sql import (add_new_content,
                                     query_content_by_content_id,
                                     update_content_by_content_id)
@@ -156,6 +136,8 @@ class XhsDbStoreImplement(AbstractStore):
         Returns:
 
         """
+        if await enqueue_item("xhs_note_comment", comment_item):
+            return
         from .xhs_store_sql import (add_new_comment,
                                     query_comment_by_comment_id,
                                     update_comment_by_comment_id)
@@ -176,6 +158,8 @@ class XhsDbStoreImplement(AbstractStore):
         Returns:
 
         """
+        if await enqueue_item("xhs_creator", creator):
+            return
         from .xhs_store_sql import (add_new_creator, query_creator_by_user_id,
                                     update_creator_by_user_id)
         user_id = creator.get("user_id")
@@ -192,7 +176,6 @@ class XhsJsonStoreImplement(AbstractStore):
     words_store_path: str = "data/xhs/words"
     lock = asyncio.Lock()
     file_count:int=calculate_number_of_files(json_store_path)
-    WordCloud = words.AsyncWordCloudGenerator()
 
     def make_save_file_name(self, store_type: str) -> (str,str):
         """
@@ -235,9 +218,9 @@ class XhsJsonStoreImplement(AbstractStore):
 
             if config.ENABLE_GET_COMMENTS and config.ENABLE_GET_WORDCLOUD:
                 try:
-                    await self.WordCloud.generate_word_frequency_and_cloud(save_data, words_file_name_prefix)
-                except:
-                    pass
+                    await words.get_word_cloud_generator().add_item(save_item, words_file_name_prefix)
+                except Exception as e:
+                    utils.logger.error(f"[{self.__class__.__name__}.save_data_to_json] word frequency error: {e}")
     async def store_content(self, content_item: Dict):
         """
         content JSON storage implementation
@@ -272,6 +255,133 @@ class XhsJsonStoreImplement(AbstractStore):
         await self.save_data_to_json(creator, "creator")
 
 
+class XhsJsonlStoreImplement(AbstractStore):
+    jsonl_store_path: str = "data/xhs/jsonl"
+    json_store_path: str = "data/xhs/json"
+
+    def make_save_file_name(self, store_type: str) -> (str, str):
+        """
+        make save file name by store type
+        Args:
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns: jsonl file name and the legacy json file name exported at the end of run
+
+        """
+        file_name = f"{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}"
+        return (
+            f"{self.jsonl_store_path}/{file_name}.jsonl",
+            f"{self.json_store_path}/{file_name}_jsonl.json",
+        )
+
+    async def save_data_to_jsonl(self, save_item: Dict, store_type: str):
+        """
+        Append one item to the jsonl file, the writer buffers items and flushes them in batches.
+        Args:
+            save_item: save content dict info
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns:
+
+        """
+        save_file_name, legacy_json_file_name = self.make_save_file_name(store_type=store_type)
+        await jsonl_writer.get_writer(save_file_name, legacy_json_file_name).write(save_item)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content JSONL storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(content_item, "contents")
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment JSONL storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(comment_item, "comments")
+
+    async def store_creator(self, creator: Dict):
+        """
+        Xiaohongshu content JSONL storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(creator, "creator")
+
+
+class XhsParquetStoreImplement(AbstractStore):
+    parquet_store_path: str = "data/xhs/parquet"
+
+    def make_save_file_name(self, store_type: str) -> str:
+        """
+        make save file name by store type
+        Args:
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns: eg: data/xhs/parquet/search_comments_20240114.parquet
+
+        """
+        return f"{self.parquet_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}.parquet"
+
+    async def save_data_to_parquet(self, save_item: Dict, store_type: str):
+        """
+        Add one item to the parquet file, the writer buffers items and writes them as a row group.
+        Args:
+            save_item: save content dict info
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns:
+
+        """
+        save_file_name = self.make_save_file_name(store_type=store_type)
+        await parquet_writer.get_writer(save_file_name).write(save_item)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content Parquet storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_parquet(content_item, "contents")
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment Parquet storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_parquet(comment_item, "comments")
+
+    async def store_creator(self, creator: Dict):
+        """
+        Xiaohongshu content Parquet storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.save_data_to_parquet(creator, "creator")
+
+
 class XhsSqliteStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
         """
@@ -282,6 +392,8 @@ class XhsSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
+        if await enqueue_item("xhs_note", content_item):
+            return
         from .xhs_store_sql import (add_new_content,
                                     query_content_by_content_id,
                                     update_content_by_content_id)
@@ -302,6 +414,8 @@ class XhsSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
+        if await enqueue_item("xhs_note_comment", comment_item):
+            return
         from .xhs_store_sql import (add_new_comment,
                                     query_comment_by_comment_id,
                                     update_comment_by_comment_id)
@@ -322,6 +436,8 @@ class XhsSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
+        if await enqueue_item("xhs_creator", creator):
+            return
         from .xhs_store_sql import (add_new_creator, query_creator_by_user_id,
                                     update_creator_by_user_id)
         user_id = creator.get("user_id")
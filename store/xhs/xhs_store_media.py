@@ -15,10 +15,9 @@
 import pathlib
 from typing import Dict
 
-import aiofiles
-
 from base.base_crawler import AbstractStoreImage, AbstractStoreVideo
 from tools import utils
+from tools.media_download import MediaContent, save_media
 
 
 class XiaoHongShuImage(AbstractStoreImage):
@@ -49,13 +48,13 @@ class XiaoHongShuImage(AbstractStoreImage):
         """
         return f"{self.image_store_path}/{notice_id}/{extension_file_name}"
 
-    async def save_image(self, notice_id: str, pic_content: str, extension_file_name):
+    async def save_image(self, notice_id: str, pic_content: MediaContent, extension_file_name):
         """
         save image to local
         
         Args:
             notice_id: notice id
-            pic_content: image content
+            pic_content: image file path downloaded by the client, byte stream or bytes
             extension_file_name: image filename with extension
 
         Returns:
@@ -63,9 +62,8 @@ class XiaoHongShuImage(AbstractStoreImage):
         """
         pathlib.Path(self.image_store_path + "/" + notice_id).mkdir(parents=True, exist_ok=True)
         save_file_name = self.make_save_file_name(notice_id, extension_file_name)
-        async with aiofiles.open(save_file_name, 'wb') as f:
-            await f.write(pic_content)
-            utils.logger.info(f"[XiaoHongShuImageStoreImplement.save_image] save image {save_file_name} success ...")
+        await save_media(pic_content, save_file_name)
+        utils.logger.info(f"[XiaoHongShuImageStoreImplement.save_image] save image {save_file_name} success ...")
 
 
 class XiaoHongShuVideo(AbstractStoreVideo):
@@ -96,13 +94,13 @@ class XiaoHongShuVideo(AbstractStoreVideo):
         """
         return f"{self.video_store_path}/{notice_id}/{extension_file_name}"
 
-    async def save_video(self, notice_id: str, video_content: str, extension_file_name):
+    async def save_video(self, notice_id: str, video_content: MediaContent, extension_file_name):
         """
         save video to local
         
         Args:
             notice_id: notice id
-            video_content: video content
+            video_content: video file path downloaded by the client, byte stream or bytes
             extension_file_name: video filename with extension
 
         Returns:
@@ -110,6 +108,5 @@ class XiaoHongShuVideo(AbstractStoreVideo):
         """
         pathlib.Path(self.video_store_path + "/" + notice_id).mkdir(parents=True, exist_ok=True)
         save_file_name = self.make_save_file_name(notice_id, extension_file_name)
-        async with aiofiles.open(save_file_name, 'wb') as f:
-            await f.write(video_content)
-            utils.logger.info(f"[XiaoHongShuVideoStoreImplement.save_video] save video {save_file_name} success ...")
+        await save_media(video_content, save_file_name)
+        utils.logger.info(f"[XiaoHongShuVideoStoreImplement.save_video] save video {save_file_name} success ...")
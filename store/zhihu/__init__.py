@@ -17,9 +17,11 @@ from base.base_crawler import AbstractStore
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
 from store.zhihu.zhihu_store_impl import (ZhihuCsvStoreImplement,
                                           ZhihuDbStoreImplement,
+                                          ZhihuJsonlStoreImplement,
                                           ZhihuJsonStoreImplement,
+                                          ZhihuParquetStoreImplement,
                                           ZhihuSqliteStoreImplement)
-from tools import utils
+from tools import seen_index, utils
 from var import source_keyword_var
 
 
@@ -28,6 +30,8 @@ class ZhihuStoreFactory:
         "csv": ZhihuCsvStoreImplement,
         "db": ZhihuDbStoreImplement,
         "json": ZhihuJsonStoreImplement,
+        "jsonl": ZhihuJsonlStoreImplement,
+        "parquet": ZhihuParquetStoreImplement,
         "sqlite": ZhihuSqliteStoreImplement
     }
 
@@ -35,7 +39,7 @@ class ZhihuStoreFactory:
     def create_store() -> AbstractStore:
         store_class = ZhihuStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[ZhihuStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+            raise ValueError("[ZhihuStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or parquet or sqlite ...")
         return store_class()
 
 async def batch_update_zhihu_contents(contents: List[ZhihuContent]):
@@ -67,6 +71,7 @@ async def update_zhihu_content(content_item: ZhihuContent):
     local_db_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.zhihu.update_zhihu_content] zhihu content: {local_db_item}")
     await ZhihuStoreFactory.create_store().store_content(local_db_item)
+    await seen_index.mark_content_seen("zhihu", content_item.content_id)
 
 
 
@@ -95,10 +100,14 @@ async def update_zhihu_content_comment(comment_item: ZhihuComment):
     Returns:
 
     """
+    # 已经保存过的评论不再重复写入
+    if not await seen_index.is_new_comment("zhihu", comment_item.comment_id):
+        return
     local_db_item = comment_item.model_dump()
     local_db_item.update({"last_modify_ts": utils.get_current_timestamp()})
     utils.logger.info(f"[store.zhihu.update_zhihu_note_comment] zhihu content comment:{local_db_item}")
     await ZhihuStoreFactory.create_store().store_comment(local_db_item)
+    await seen_index.mark_comment_seen("zhihu", comment_item.comment_id)
 
 
 async def save_creator(creator: ZhihuCreator):
@@ -0,0 +1,92 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from async_db_buffer import AsyncDbWriteBuffer, ensure_unique_keys
+from async_sqlite_db import AsyncSqliteDB
+
+
+class TestAsyncDbWriteBuffer(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.async_db = AsyncSqliteDB(os.path.join(self.tmp_dir.name, "test.db"))
+        schema_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "schema", "sqlite_tables.sql")
+        with open(schema_path, encoding="utf-8") as f:
+            await self.async_db.executescript(f.read())
+
+    @staticmethod
+    def make_comment(comment_id: str, content: str) -> dict:
+        return {
+            "comment_id": comment_id,
+            "user_id": "user_1",
+            "create_time": 1,
+            "note_id": "note_1",
+            "content": content,
+            "sub_comment_count": 0,
+            "last_modify_ts": 1,
+        }
+
+    async def test_flush_on_batch_size(self):
+        write_buffer = AsyncDbWriteBuffer(self.async_db, batch_size=2, flush_interval=3600)
+        await write_buffer.add("xhs_note_comment", self.make_comment("1", "a"))
+        self.assertEqual(await self.async_db.query("select * from xhs_note_comment"), [])
+        await write_buffer.add("xhs_note_comment", self.make_comment("2", "b"))
+        rows = await self.async_db.query("select * from xhs_note_comment")
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(write_buffer.pending_count(), 0)
+        await write_buffer.close()
+
+    async def test_upsert_keeps_add_ts(self):
+        write_buffer = AsyncDbWriteBuffer(self.async_db, batch_size=100, flush_interval=3600)
+        await write_buffer.add("xhs_note_comment", dict(self.make_comment("1", "old"), add_ts=100))
+        await write_buffer.flush()
+        await write_buffer.add("xhs_note_comment", dict(self.make_comment("1", "new"), add_ts=200))
+        await write_buffer.add("xhs_note_comment", self.make_comment("2", "b"))
+        await write_buffer.close()
+        rows = await self.async_db.query("select * from xhs_note_comment order by comment_id")
+        self.assertEqual([row["content"] for row in rows], ["new", "b"])
+        self.assertEqual(rows[0]["add_ts"], 100)
+
+    async def test_legacy_schema_fallback_and_migrate(self):
+        # 旧版建表语句只有普通索引
+        await self.async_db.execute("DROP INDEX idx_xhs_note_co_comment_8e8349")
+        await self.async_db.execute("CREATE INDEX idx_xhs_note_co_comment_8e8349 ON xhs_note_comment(comment_id)")
+        write_buffer = AsyncDbWriteBuffer(self.async_db, batch_size=100, flush_interval=3600)
+        self.assertFalse(await write_buffer.is_table_ready("xhs_note_comment"))
+        self.assertTrue(await write_buffer.is_table_ready("xhs_note"))
+
+        self.assertEqual(await ensure_unique_keys(self.async_db), [])
+        self.assertTrue(await AsyncDbWriteBuffer(self.async_db).is_table_ready("xhs_note_comment"))
+        await write_buffer.close()
+
+    async def test_requeue_on_write_error(self):
+        write_buffer = AsyncDbWriteBuffer(self.async_db, batch_size=100, flush_interval=3600)
+        await write_buffer.add("xhs_note_comment", self.make_comment("1", "old"))
+        await self.async_db.execute("ALTER TABLE xhs_note_comment RENAME TO xhs_note_comment_bak")
+        with self.assertRaises(Exception):
+            await write_buffer.flush()
+        self.assertEqual(write_buffer.pending_count("xhs_note_comment"), 1)
+
+        # 写入失败期间加入的新数据优先
+        await write_buffer.add("xhs_note_comment", self.make_comment("1", "new"))
+        await self.async_db.execute("ALTER TABLE xhs_note_comment_bak RENAME TO xhs_note_comment")
+        await write_buffer.close()
+        rows = await self.async_db.query("select * from xhs_note_comment")
+        self.assertEqual([row["content"] for row in rows], ["new"])
+
+    async def asyncTearDown(self):
+        await self.async_db.close()
+        self.tmp_dir.cleanup()
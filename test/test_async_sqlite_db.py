@@ -0,0 +1,48 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from async_sqlite_db import AsyncSqliteDB
+
+
+class TestAsyncSqliteDB(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.async_db = AsyncSqliteDB(os.path.join(self.tmp_dir.name, "test.db"))
+        await self.async_db.executescript(
+            "CREATE TABLE note (id INTEGER PRIMARY KEY AUTOINCREMENT, note_id TEXT NOT NULL, title TEXT);"
+        )
+
+    async def test_wal_mode(self):
+        row = await self.async_db.get_first("PRAGMA journal_mode")
+        self.assertEqual(row["journal_mode"], "wal")
+
+    async def test_insert_and_update(self):
+        await self.async_db.item_to_table("note", {"note_id": "1", "title": "a"})
+        await self.async_db.update_table("note", {"title": "b"}, "note_id", "1")
+        rows = await self.async_db.query("select note_id, title from note")
+        self.assertEqual(rows, [{"note_id": "1", "title": "b"}])
+
+    async def test_transaction_rollback(self):
+        with self.assertRaises(ValueError):
+            async with self.async_db.transaction():
+                await self.async_db.item_to_table("note", {"note_id": "1", "title": "a"})
+                raise ValueError("rollback")
+        self.assertEqual(await self.async_db.query("select * from note"), [])
+
+    async def asyncTearDown(self):
+        await self.async_db.close()
+        self.tmp_dir.cleanup()
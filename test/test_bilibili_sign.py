@@ -0,0 +1,62 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import unittest
+from unittest import IsolatedAsyncioTestCase, mock
+
+from cache.tiered_cache import close_shared_cache
+from media_platform.bilibili.client import BilibiliClient
+from media_platform.bilibili.help import BilibiliSign
+
+IMG_KEY = "7cd084941338484aae1ad9425b84077c"
+SUB_KEY = "4932caff0ff746eab6f01bf08b70ac45"
+
+
+class TestBilibiliSign(unittest.TestCase):
+
+    def test_salt(self):
+        self.assertEqual(BilibiliSign(IMG_KEY, SUB_KEY).get_salt(), "ea1db124af3c7062474693fa704f4ff8")
+
+    def test_sign(self):
+        # 参考 wbi 签名文档中的示例
+        with mock.patch("tools.utils.get_unix_timestamp", return_value=1702204169):
+            req_data = BilibiliSign(IMG_KEY, SUB_KEY).sign({"foo": "114", "bar": "514", "zab": 1919810})
+        self.assertEqual(req_data["w_rid"], "8f6f2b5b3d485fe1886cec6a0be8c5d4")
+        self.assertEqual(list(req_data.keys()), ["bar", "foo", "wts", "zab", "w_rid"])
+
+    def test_filter_chars(self):
+        req_data = BilibiliSign(IMG_KEY, SUB_KEY).sign({"keyword": "py(t)h!o'n*"})
+        self.assertEqual(req_data["keyword"], "python")
+
+
+class FakePage:
+
+    def __init__(self):
+        self.evaluate_count = 0
+
+    async def evaluate(self, expression):
+        self.evaluate_count += 1
+        return {"wbi_img_urls": f"https://i0.hdslb.com/bfs/wbi/{IMG_KEY}.png-https://i0.hdslb.com/bfs/wbi/{SUB_KEY}.png"}
+
+
+class TestBilibiliWbiKeysCache(IsolatedAsyncioTestCase):
+
+    async def asyncTearDown(self):
+        await close_shared_cache()
+
+    async def test_wbi_keys_cached(self):
+        page = FakePage()
+        client = BilibiliClient(headers={}, playwright_page=page, cookie_dict={})
+        for _ in range(3):
+            await client.pre_request_data({"aid": 1})
+        self.assertEqual(page.evaluate_count, 1)
+        self.assertEqual(client._wbi_sign.get_salt(), "ea1db124af3c7062474693fa704f4ff8")
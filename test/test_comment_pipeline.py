@@ -0,0 +1,89 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import config
+from tools.comment_pipeline import CommentPipeline
+
+
+class TestCommentPipeline(IsolatedAsyncioTestCase):
+
+    async def test_store_in_order_without_blocking_fetch(self):
+        stored = []
+
+        async def callback(note_id, comments):
+            await asyncio.sleep(0.05)
+            stored.append((note_id, comments))
+
+        start = time.monotonic()
+        async with CommentPipeline(callback, crawl_interval=0, queue_size=10) as pipeline:
+            for page in range(3):
+                await pipeline.store("note", [page])
+            # 保存是在后台进行的，放入队列不需要等待回调执行
+            self.assertLess(time.monotonic() - start, 0.05)
+        self.assertEqual(stored, [("note", [0]), ("note", [1]), ("note", [2])])
+
+    @patch.object(config, "ENABLE_RATE_LIMIT", False)
+    async def test_pace_keeps_interval(self):
+        pipeline = CommentPipeline(crawl_interval=0.05)
+        start = time.monotonic()
+        await asyncio.gather(*[pipeline.pace() for _ in range(3)])
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+    async def test_submit_collects_sub_results(self):
+        running = 0
+        max_running = 0
+
+        async def fetch_sub_comments(comment_id):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return [f"{comment_id}-sub"]
+
+        async with CommentPipeline(crawl_interval=0, sub_comment_concurrency=2) as pipeline:
+            for comment_id in range(5):
+                pipeline.submit(fetch_sub_comments(comment_id))
+        self.assertEqual(sorted(pipeline.sub_results), sorted(f"{i}-sub" for i in range(5)))
+        self.assertLessEqual(max_running, 2)
+
+    async def test_store_error_raised_on_exit(self):
+        async def callback(comments):
+            raise ValueError("store failed")
+
+        with self.assertRaises(ValueError):
+            async with CommentPipeline(callback, crawl_interval=0) as pipeline:
+                await pipeline.store(["comment"])
+
+    async def test_sub_task_error_cancels_others(self):
+        cancelled = []
+
+        async def fetch_sub_comments(comment_id):
+            if comment_id == 0:
+                raise ValueError("fetch failed")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(comment_id)
+                raise
+
+        with self.assertRaises(ValueError):
+            async with CommentPipeline(crawl_interval=0, sub_comment_concurrency=3) as pipeline:
+                for comment_id in range(3):
+                    pipeline.submit(fetch_sub_comments(comment_id))
+        self.assertEqual(sorted(cancelled), [1, 2])
+        self.assertTrue(all(task.done() for task in pipeline._tasks))
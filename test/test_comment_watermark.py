@@ -0,0 +1,102 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from typing import Dict, List
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import config
+from tools import seen_index
+from tools.comment_watermark import CommentWatermark
+
+
+def make_comments(start: int, stop: int) -> List[Dict]:
+    # 按时间倒序
+    return [{"id": f"c{i}", "create_time": i * 1000} for i in range(start, stop, -1)]
+
+
+class TestCommentWatermark(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.patchers = [
+            patch.object(config, "ENABLE_INCREMENTAL_COMMENTS", True),
+            patch.object(config, "SEEN_INDEX_DB_PATH", os.path.join(self.tmp_dir.name, "seen_index.db")),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    async def asyncTearDown(self):
+        await seen_index.close_seen_indexes()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.tmp_dir.cleanup()
+
+    async def new_watermark(self) -> CommentWatermark:
+        return await CommentWatermark(
+            "bili", "video_1", get_time=lambda comment: comment["create_time"], get_id=lambda comment: comment["id"]
+        ).load()
+
+    async def test_stop_at_stored_comments(self):
+        watermark = await self.new_watermark()
+        self.assertEqual(watermark.filter_page(make_comments(20, 10)), make_comments(20, 10))
+        self.assertEqual(watermark.filter_page(make_comments(10, 0)), make_comments(10, 0))
+        self.assertFalse(watermark.reached)
+        await watermark.save()
+
+        watermark = await self.new_watermark()
+        # 置顶的旧评论排在第一页最前面，不影响判断
+        pinned = make_comments(5, 4)
+        new_comments = watermark.filter_page(pinned + make_comments(30, 25))
+        self.assertEqual(new_comments, make_comments(30, 25))
+        self.assertFalse(watermark.reached)
+        new_comments = watermark.filter_page(make_comments(25, 15))
+        self.assertEqual(new_comments, make_comments(25, 20))
+        self.assertTrue(watermark.reached)
+        await watermark.save()
+
+        watermark = await self.new_watermark()
+        self.assertEqual(watermark.filter_page(make_comments(30, 20)), [])
+        self.assertTrue(watermark.reached)
+
+    async def test_not_saved_without_save(self):
+        watermark = await self.new_watermark()
+        watermark.filter_page(make_comments(20, 10))
+
+        watermark = await self.new_watermark()
+        self.assertEqual(watermark.filter_page(make_comments(20, 10)), make_comments(20, 10))
+        self.assertFalse(watermark.reached)
+
+    async def test_last_page(self):
+        watermark = await CommentWatermark("tieba", "note_1").load()
+        self.assertEqual(watermark.last_page, 0)
+        await watermark.save(last_page=3)
+        watermark = await CommentWatermark("tieba", "note_1").load()
+        self.assertEqual(watermark.last_page, 3)
+        await watermark.save(last_page=2)
+        watermark = await CommentWatermark("tieba", "note_1").load()
+        self.assertEqual(watermark.last_page, 3)
+
+    async def test_disabled(self):
+        with patch.object(config, "ENABLE_INCREMENTAL_COMMENTS", False):
+            watermark = await self.new_watermark()
+            await watermark.save()
+            watermark.filter_page(make_comments(20, 10))
+            await watermark.save()
+            watermark = await self.new_watermark()
+            self.assertEqual(watermark.filter_page(make_comments(20, 10)), make_comments(20, 10))
+            self.assertFalse(watermark.reached)
+            self.assertEqual(seen_index._seen_indexes, {})
@@ -0,0 +1,81 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from tools.crawl_scheduler import WorkerStage, run_producers
+
+
+class TestWorkerStage(IsolatedAsyncioTestCase):
+
+    async def test_chained_stages_drain(self):
+        comments = []
+        running = 0
+        max_running = 0
+
+        async def comment_handler(note_id):
+            comments.append(note_id)
+
+        async def detail_handler(keyword, note_id):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            await comment_stage.put(f"{keyword}-{note_id}")
+
+        comment_stage = WorkerStage("comment", comment_handler, concurrency=2)
+        detail_stage = WorkerStage("detail", detail_handler, concurrency=3)
+
+        async def produce(keyword):
+            for note_id in range(5):
+                await detail_stage.put(keyword, note_id)
+
+        async with comment_stage, detail_stage:
+            await asyncio.gather(*[produce(keyword) for keyword in ("a", "b")])
+
+        self.assertEqual(len(comments), 10)
+        self.assertLessEqual(max_running, 3)
+        self.assertEqual(detail_stage.processed_count, 10)
+
+    async def test_failed_task_does_not_stop_stage(self):
+        done = []
+
+        async def handler(value):
+            if value == 1:
+                raise ValueError("bad item")
+            done.append(value)
+
+        async with WorkerStage("test", handler, concurrency=1) as stage:
+            for value in range(3):
+                await stage.put(value)
+
+        self.assertEqual(done, [0, 2])
+        self.assertEqual(stage.failed_count, 1)
+
+    async def test_failed_producer_cancels_others(self):
+        async def handler(value):
+            await asyncio.sleep(10)
+
+        async def produce(value):
+            if value == 0:
+                await asyncio.sleep(0.01)
+                raise RuntimeError("search failed")
+            # 队列满后阻塞在 put 上
+            while True:
+                await stage.put(value)
+
+        stage = WorkerStage("test", handler, concurrency=1, queue_size=1)
+        with self.assertRaises(RuntimeError):
+            async with stage:
+                await asyncio.wait_for(run_producers([produce(value) for value in range(3)]), 1)
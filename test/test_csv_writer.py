@@ -0,0 +1,61 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import csv
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from tools.csv_writer import CsvWriter
+
+
+def read_rows(file_path):
+    with open(file_path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.reader(f))
+
+
+class TestCsvWriter(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp_dir.name, "xhs", "1_search_comments_2024-01-14.csv")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_buffer_and_header_once(self):
+        writer = CsvWriter(self.csv_path, flush_batch_size=2, flush_interval=3600)
+        await writer.write({"comment_id": "1", "content": "第一条"})
+        self.assertFalse(os.path.exists(self.csv_path))
+        await writer.write({"comment_id": "2", "content": "第二条"})
+        await writer.write({"comment_id": "3", "content": "第三条"})
+        await writer.close()
+        self.assertEqual(read_rows(self.csv_path), [
+            ["comment_id", "content"], ["1", "第一条"], ["2", "第二条"], ["3", "第三条"],
+        ])
+
+        # 再次运行追加到已有文件时不重复写表头
+        writer = CsvWriter(self.csv_path, flush_batch_size=1)
+        await writer.write({"comment_id": "4", "content": "第四条"})
+        await writer.close()
+        rows = read_rows(self.csv_path)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[-1], ["4", "第四条"])
+
+    async def test_rotate(self):
+        writer = CsvWriter(self.csv_path, flush_batch_size=1, max_file_bytes=1)
+        for i in range(3):
+            await writer.write({"comment_id": str(i)})
+        await writer.close()
+        self.assertEqual(len(writer.part_paths), 3)
+        for index, part_path in enumerate(writer.part_paths):
+            self.assertEqual(read_rows(part_path), [["comment_id"], [str(index)]])
@@ -0,0 +1,68 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import config
+from base.base_crawler import AbstractApiClient
+
+
+class FakeClient(AbstractApiClient):
+    platform = "xhs"
+
+    def __init__(self):
+        super().__init__()
+        self.request_count = 0
+
+    async def request(self, method, url, **kwargs):
+        self.request_count += 1
+        await asyncio.sleep(0.01)
+        # 模拟爬取频繁时返回空结果
+        return {} if url.startswith("empty") else {"note_id": url}
+
+    async def update_cookies(self, browser_context):
+        pass
+
+    async def get_note_by_id(self, note_id: str):
+        return await self.coalesce("detail", note_id, lambda: self.request("GET", note_id)) or dict()
+
+
+class TestFetchCoalesce(IsolatedAsyncioTestCase):
+
+    async def test_coalesce(self):
+        client = FakeClient()
+        results = await asyncio.gather(*[client.get_note_by_id(note_id) for note_id in ["1", "2", "1", "1"]])
+        self.assertEqual([result["note_id"] for result in results], ["1", "2", "1", "1"])
+        self.assertEqual(client.request_count, 2)
+
+        # 备忘期内不再请求，返回的字典可以修改
+        result = await client.get_note_by_id("1")
+        result["xsec_token"] = "token"
+        self.assertNotIn("xsec_token", await client.get_note_by_id("1"))
+        self.assertEqual(client.request_count, 2)
+
+    async def test_disabled(self):
+        client = FakeClient()
+        with patch.object(config, "DETAIL_FETCH_MEMO_SEC", 0):
+            await asyncio.gather(*[client.get_note_by_id("1") for _ in range(3)])
+        self.assertEqual(client.request_count, 3)
+
+    async def test_empty_not_memoized(self):
+        client = FakeClient()
+        results = await asyncio.gather(*[client.get_note_by_id("empty_1") for _ in range(3)])
+        self.assertEqual(results, [{}] * 3)
+        self.assertEqual(client.request_count, 1)
+        # 空结果不备忘，下次重新请求
+        self.assertEqual(await client.get_note_by_id("empty_1"), {})
+        self.assertEqual(client.request_count, 2)
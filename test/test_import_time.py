@@ -0,0 +1,61 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import unittest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动时不应该导入的重量级依赖，只在用到对应功能时再导入
+HEAVY_MODULES = ("pandas", "numpy", "cv2", "jieba", "matplotlib", "wordcloud", "execjs")
+
+# 导入 main 的耗时上限（微秒），留足余量避免在较慢的机器上误报
+IMPORT_MAIN_BUDGET_US = 1500 * 1000
+
+
+class TestImportTime(unittest.TestCase):
+
+    def import_main(self):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        # 每行格式: import time: self [us] | cumulative | imported package
+        import_times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            parts = line[len("import time:"):].split("|")
+            if len(parts) != 3 or not parts[1].strip().isdigit():
+                continue
+            import_times[parts[2].strip()] = int(parts[1].strip())
+        return import_times
+
+    def test_heavy_modules_not_imported(self):
+        import_times = self.import_main()
+        imported = [module for module in HEAVY_MODULES if module in import_times]
+        self.assertEqual(imported, [])
+
+    def test_import_main_budget(self):
+        import_times = self.import_main()
+        self.assertLess(import_times["main"], IMPORT_MAIN_BUDGET_US)
+
+    def test_create_crawler(self):
+        from main import CrawlerFactory
+        from media_platform.bilibili import BilibiliCrawler
+
+        self.assertIsInstance(CrawlerFactory.create_crawler("bili"), BilibiliCrawler)
+        with self.assertRaises(ValueError):
+            CrawlerFactory.create_crawler("unknown")
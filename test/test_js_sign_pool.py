@@ -0,0 +1,64 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import shutil
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+from media_platform.zhihu.help import ZHIHU_SIGN_JS_PATH, sign
+from tools.js_sign_pool import JsSignError, NodeSignPool
+
+
+@unittest.skipIf(shutil.which("node") is None, "node is not installed")
+class TestNodeSignPool(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.pool = NodeSignPool(ZHIHU_SIGN_JS_PATH, shutil.which("node"), pool_size=2)
+
+    async def test_concurrent_sign_same_as_execjs(self):
+        url = "/api/v4/search_v3?q=python&offset=0"
+        cookies = "d_c0=AbCdEfG"
+        results = await asyncio.gather(*[self.pool.call("get_sign", url, cookies) for _ in range(10)])
+        expected = sign(url, cookies)
+        # x-zse-96 带有随机数，只比较确定的部分
+        for result in results:
+            self.assertEqual(result["x-zst-81"], expected["x-zst-81"])
+            self.assertTrue(result["x-zse-96"].startswith("2.0_"))
+
+    async def test_restart_crashed_worker(self):
+        await self.pool.call("get_sign", "/api", "d_c0=1")
+        for worker in self.pool.workers:
+            if worker.alive:
+                worker._process.kill()
+                await worker._process.wait()
+        result = await self.pool.call("get_sign", "/api", "d_c0=1")
+        self.assertIn("x-zse-96", result)
+
+    async def test_not_alive_before_ready(self):
+        worker = self.pool.workers[0]
+        start_task = asyncio.create_task(worker.start())
+        while worker._process is None:
+            await asyncio.sleep(0)
+        # 进程已经创建但签名js还没有加载完成
+        self.assertFalse(worker.alive)
+        results = await asyncio.gather(*[worker.call("get_sign", "/api", "d_c0=1") for _ in range(3)])
+        await start_task
+        self.assertTrue(worker.alive)
+        self.assertTrue(all("x-zse-96" in result for result in results))
+
+    async def test_js_error(self):
+        with self.assertRaises(JsSignError):
+            await self.pool.call("not_exist_function")
+
+    async def asyncTearDown(self):
+        await self.pool.close()
@@ -0,0 +1,64 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from tools.jsonl_writer import JsonLinesWriter
+
+
+class TestJsonLinesWriter(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.jsonl_path = os.path.join(self.tmp_dir.name, "jsonl", "search_comments.jsonl")
+        self.json_path = os.path.join(self.tmp_dir.name, "json", "search_comments.json")
+
+    async def test_buffer_and_flush(self):
+        writer = JsonLinesWriter(self.jsonl_path, flush_batch_size=3, flush_interval=3600)
+        await writer.write({"comment_id": "1"})
+        await writer.write({"comment_id": "2"})
+        self.assertFalse(os.path.exists(self.jsonl_path))
+        await writer.write({"comment_id": "3"})
+        with open(self.jsonl_path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 3)
+        await writer.close()
+
+    async def test_rotate_and_export_legacy_json(self):
+        writer = JsonLinesWriter(self.jsonl_path, legacy_json_path=self.json_path, flush_batch_size=1, max_file_bytes=1)
+        for i in range(3):
+            await writer.write({"comment_id": str(i), "content": "评论"})
+        await writer.close()
+        self.assertEqual(len(writer.part_paths), 3)
+        with open(self.json_path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual([item["comment_id"] for item in data], ["0", "1", "2"])
+
+    async def test_resume_shards_from_earlier_run(self):
+        writer = JsonLinesWriter(self.jsonl_path, flush_batch_size=1, max_file_bytes=1)
+        for i in range(2):
+            await writer.write({"comment_id": str(i)})
+        await writer.close()
+
+        # 同一天再次运行，接着最后一个分片写入，导出包含之前运行写入的分片
+        writer = JsonLinesWriter(self.jsonl_path, legacy_json_path=self.json_path, flush_batch_size=1)
+        self.assertEqual(writer.current_path, os.path.join(self.tmp_dir.name, "jsonl", "search_comments.1.jsonl"))
+        await writer.write({"comment_id": "2"})
+        await writer.close()
+        with open(self.json_path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual([item["comment_id"] for item in data], ["0", "1", "2"])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
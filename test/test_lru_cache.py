@@ -0,0 +1,83 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import time
+import unittest
+from unittest.mock import patch
+
+from cache.cache_factory import CacheFactory
+from cache.lru_cache import LruExpiringCache, glob_literal_prefix
+
+
+class TestLruExpiringCache(unittest.TestCase):
+
+    def test_set_and_get(self):
+        cache = LruExpiringCache()
+        cache.set('key', 'value', 10)
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertIsNone(cache.get('other'))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_expired_key(self):
+        cache = LruExpiringCache()
+        now = time.time()
+        cache.set('key1', 'value1', 1)
+        cache.set('key2', 'value2', 10)
+        cache.set('key1', 'value1', 20)
+        cache.set('key3', 'value3', 1)
+        with patch.object(time, 'time', return_value=now + 5):
+            self.assertIsNone(cache.get('key3'))
+            self.assertEqual(cache.get('key1'), 'value1')
+            self.assertEqual(len(cache), 2)
+        with patch.object(time, 'time', return_value=now + 15):
+            self.assertEqual(cache.keys('*'), ['key1'])
+        self.assertEqual(cache.stats()["expirations"], 2)
+
+    def test_lru_eviction(self):
+        cache = LruExpiringCache(max_entries=2)
+        cache.set('a', 1, 10)
+        cache.set('b', 2, 10)
+        cache.get('a')
+        cache.set('c', 3, 10)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_max_bytes(self):
+        cache = LruExpiringCache(max_entries=0, max_bytes=10)
+        cache.set('a', b'12345', 10)
+        cache.set('b', b'12345', 10)
+        cache.set('c', b'123', 10)
+        self.assertEqual(cache.keys('*'), ['b', 'c'])
+        self.assertEqual(cache.stats()["bytes"], 8)
+
+    def test_keys_glob(self):
+        cache = LruExpiringCache()
+        for key in ['ip_1', 'ip_2', 'ip_10', 'ipx', 'proxy_1', 'a*b', 'ab']:
+            cache.set(key, 1, 10)
+        self.assertEqual(cache.keys('ip_*'), ['ip_1', 'ip_10', 'ip_2'])
+        self.assertEqual(cache.keys('ip_?'), ['ip_1', 'ip_2'])
+        self.assertEqual(cache.keys('ip_[^1]'), ['ip_2'])
+        self.assertEqual(cache.keys('*_1'), ['ip_1', 'proxy_1'])
+        self.assertEqual(cache.keys('a\\*b'), ['a*b'])
+        self.assertEqual(cache.keys('ipx'), ['ipx'])
+        self.assertEqual(glob_literal_prefix('ip_[12]*'), 'ip_')
+
+    def test_factory(self):
+        cache = CacheFactory.create_cache('memory', max_entries=5)
+        self.assertIsInstance(cache, LruExpiringCache)
+        self.assertEqual(cache.max_entries, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
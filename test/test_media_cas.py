@@ -0,0 +1,126 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+
+import config
+from tools.media_cas import MediaBlobStore
+from tools.media_download import save_media
+from tools.media_queue import MediaDownloadPool, MediaJob, MediaJobQueue
+
+ETAG = '"v1"'
+
+
+class TestMediaBlobStore(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.blob_store = MediaBlobStore(os.path.join(self.tmp_dir.name, "blobs"),
+                                         os.path.join(self.tmp_dir.name, "blobs", "index.db"))
+
+    async def asyncTearDown(self):
+        await self.blob_store.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_file(self, name: str, content: bytes) -> str:
+        file_path = os.path.join(self.tmp_dir.name, name)
+        with open(file_path, "wb") as f:
+            f.write(content)
+        return file_path
+
+    async def test_dedup_and_link(self):
+        blob1 = await self.blob_store.ingest("https://cdn1.example.com/a.jpg", self.write_file("a", b"same image"))
+        blob2 = await self.blob_store.ingest("https://cdn2.example.com/b.jpg", self.write_file("b", b"same image"))
+        self.assertEqual(blob1, blob2)
+        self.assertEqual(len(os.listdir(os.path.dirname(blob1.path))), 1)
+
+        note1_file = os.path.join(self.tmp_dir.name, "xhs", "images", "note_1", "0.jpg")
+        note2_file = os.path.join(self.tmp_dir.name, "douyin", "images", "aweme_1", "000.jpeg")
+        await save_media(blob1, note1_file)
+        await save_media(blob2, note2_file)
+        # 重复保存时原子替换
+        await save_media(blob2, note2_file)
+        self.assertTrue(os.path.samefile(note1_file, note2_file))
+        with open(note2_file, "rb") as f:
+            self.assertEqual(f.read(), b"same image")
+
+        record = await self.blob_store.lookup("https://cdn2.example.com/b.jpg")
+        self.assertEqual(record.blob, blob1)
+        self.assertIsNone(await self.blob_store.lookup("https://cdn3.example.com/c.jpg"))
+        os.remove(blob1.path)
+        self.assertIsNone(await self.blob_store.lookup("https://cdn1.example.com/a.jpg"))
+
+
+class TestMediaDownloadPoolDedup(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_download_patch = patch.object(config, "MEDIA_DOWNLOAD_TMP_DIR", os.path.join(self.tmp_dir.name, "tmp"))
+        self.tmp_download_patch.start()
+        self.requests = []
+        self.stored = {}
+
+    def tearDown(self):
+        self.tmp_download_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == ETAG:
+            return httpx.Response(304)
+        return httpx.Response(200, content=b"video bytes", headers={"ETag": ETAG})
+
+    async def store_handler(self, job: MediaJob, content):
+        save_file_name = os.path.join(self.tmp_dir.name, job.platform, job.owner_id, job.extension_file_name)
+        await save_media(content, save_file_name)
+        self.stored[(job.platform, job.owner_id)] = save_file_name
+
+    async def run_pool(self, revalidate: bool, owner_id: str):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        pool = MediaDownloadPool(
+            MediaJobQueue(os.path.join(self.tmp_dir.name, "media_queue.db")), self.store_handler, client=client,
+            poll_interval=0.05, revalidate=revalidate,
+            blob_store=MediaBlobStore(os.path.join(self.tmp_dir.name, "blobs"),
+                                      os.path.join(self.tmp_dir.name, "blobs", "index.db")),
+        )
+        pool.start()
+        await pool.put(MediaJob(platform="bili", media_type="video", owner_id=owner_id, extension_file_name="video.mp4",
+                                url="https://cdn.example.com/video.mp4"))
+        await pool.close()
+        await client.aclose()
+        return pool
+
+    async def test_skip_downloaded_url(self):
+        pool = await self.run_pool(revalidate=False, owner_id="1")
+        self.assertEqual(pool.downloaded_count, 1)
+        # 视频先探测是否支持Range请求，不支持时单连接下载
+        self.assertEqual(len(self.requests), 2)
+        pool = await self.run_pool(revalidate=False, owner_id="2")
+        self.assertEqual(pool.skipped_count, 1)
+        self.assertEqual(len(self.requests), 2)
+        self.assertTrue(os.path.samefile(self.stored[("bili", "1")], self.stored[("bili", "2")]))
+
+    async def test_revalidate_not_modified(self):
+        await self.run_pool(revalidate=True, owner_id="1")
+        pool = await self.run_pool(revalidate=True, owner_id="2")
+        self.assertEqual(pool.skipped_count, 1)
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(self.requests[2].headers.get("If-None-Match"), ETAG)
+        with open(self.stored[("bili", "2")], "rb") as f:
+            self.assertEqual(f.read(), b"video bytes")
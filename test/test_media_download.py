@@ -0,0 +1,164 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import re
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+
+import config
+from tools.media_download import MediaDownloadError, download_ranged, download_to_file, save_media
+
+VIDEO_BYTES = os.urandom(300 * 1024)
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/video.mp4":
+        return httpx.Response(200, content=VIDEO_BYTES)
+    if request.url.path == "/empty.mp4":
+        return httpx.Response(204)
+    return httpx.Response(404)
+
+
+class TestMediaDownload(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_download_to_tmp_file_and_move(self):
+        tmp_download_dir = os.path.join(self.tmp_dir.name, ".media_tmp")
+        with patch.object(config, "MEDIA_DOWNLOAD_TMP_DIR", tmp_download_dir):
+            result = await download_to_file(self.client, "https://example.com/video.mp4", chunk_size=64 * 1024)
+        self.assertEqual(result.size, len(VIDEO_BYTES))
+        self.assertGreater(result.bytes_per_sec, 0)
+
+        save_file_name = os.path.join(self.tmp_dir.name, "xhs", "videos", "note_id", "0.mp4")
+        await save_media(result.file_path, save_file_name)
+        with open(save_file_name, "rb") as f:
+            self.assertEqual(f.read(), VIDEO_BYTES)
+        self.assertEqual(os.listdir(tmp_download_dir), [])
+
+    async def test_download_error_leaves_no_file(self):
+        save_file_name = os.path.join(self.tmp_dir.name, "missing.mp4")
+        with self.assertRaises(httpx.HTTPStatusError):
+            await download_to_file(self.client, "https://example.com/missing.mp4", save_file_name)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    async def test_unexpected_status_code(self):
+        # 2xx但不是200/206的响应没有文件内容
+        save_file_name = os.path.join(self.tmp_dir.name, "empty.mp4")
+        with self.assertRaises(MediaDownloadError):
+            await download_to_file(self.client, "https://example.com/empty.mp4", save_file_name)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    async def test_save_media_from_stream_and_bytes(self):
+        async def chunks():
+            yield b"part1-"
+            yield b"part2"
+
+        stream_file_name = os.path.join(self.tmp_dir.name, "images", "0.jpg")
+        await save_media(chunks(), stream_file_name)
+        bytes_file_name = os.path.join(self.tmp_dir.name, "images", "1.jpg")
+        await save_media(b"image", bytes_file_name)
+        with open(stream_file_name, "rb") as f:
+            self.assertEqual(f.read(), b"part1-part2")
+        with open(bytes_file_name, "rb") as f:
+            self.assertEqual(f.read(), b"image")
+        self.assertEqual(sorted(os.listdir(os.path.dirname(stream_file_name))), ["0.jpg", "1.jpg"])
+
+
+class RangeServer:
+    """
+    支持 Range 请求的模拟CDN，fail_offsets 中的起始位置第一次请求时返回500
+    """
+
+    def __init__(self, content: bytes, support_range: bool = True, fail_offsets=()):
+        self.content = content
+        self.support_range = support_range
+        self.fail_offsets = set(fail_offsets)
+        self.ranges = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        match = re.match(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+        if not self.support_range or not match:
+            return httpx.Response(200, content=self.content)
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(self.content) - 1
+        self.ranges.append((start, end))
+        if start in self.fail_offsets:
+            self.fail_offsets.remove(start)
+            return httpx.Response(500)
+        return httpx.Response(206, content=self.content[start:end + 1], headers={
+            "Content-Range": f"bytes {start}-{end}/{len(self.content)}", "ETag": '"v1"',
+        })
+
+
+class TestRangedDownload(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.save_file_name = os.path.join(self.tmp_dir.name, "video.mp4")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def download(self, server: RangeServer, **kwargs):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(server.handler)) as client:
+            return await download_ranged(client, "https://cdn.example.com/video.mp4", self.save_file_name,
+                                         segment_count=4, min_size=0, chunk_size=16 * 1024, **kwargs)
+
+    def assert_downloaded(self):
+        with open(self.save_file_name, "rb") as f:
+            self.assertEqual(f.read(), VIDEO_BYTES)
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["video.mp4"])
+
+    async def test_parallel_segments(self):
+        server = RangeServer(VIDEO_BYTES)
+        result = await self.download(server)
+        self.assertEqual(result.size, len(VIDEO_BYTES))
+        # 1个探测请求 + 4个分段
+        self.assertEqual(len(server.ranges), 5)
+        self.assert_downloaded()
+
+    async def test_resume_from_progress_file(self):
+        segment_size = len(VIDEO_BYTES) // 4
+        server = RangeServer(VIDEO_BYTES, fail_offsets=[segment_size * 2])
+        with self.assertRaises(httpx.HTTPStatusError):
+            await self.download(server, segment_retries=0)
+        self.assertTrue(os.path.exists(f"{self.save_file_name}.progress"))
+
+        server.ranges.clear()
+        result = await self.download(server, segment_retries=0)
+        self.assertEqual(result.resumed_from, len(VIDEO_BYTES) - segment_size)
+        # 只重新下载失败的分段
+        self.assertEqual(server.ranges[1:], [(segment_size * 2, segment_size * 3 - 1)])
+        self.assert_downloaded()
+
+    async def test_segment_retry(self):
+        server = RangeServer(VIDEO_BYTES, fail_offsets=[len(VIDEO_BYTES) // 4])
+        await self.download(server, segment_retries=1)
+        self.assert_downloaded()
+
+    async def test_fallback_without_range_support(self):
+        result = await self.download(RangeServer(VIDEO_BYTES, support_range=False))
+        self.assertEqual(result.size, len(VIDEO_BYTES))
+        self.assert_downloaded()
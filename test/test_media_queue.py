@@ -0,0 +1,266 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+import config
+from base.base_crawler import AbstractApiClient
+from tools import rate_limiter
+from tools.media_download import download_to_file
+from tools.media_queue import (JOB_STATUS_DONE, JOB_STATUS_FAILED, JOB_STATUS_PENDING, MediaDownloadPool, MediaJob,
+                               MediaJobQueue, enqueue_media)
+
+VIDEO_BYTES = bytes(range(256)) * 1024
+
+
+def range_handler(request: httpx.Request) -> httpx.Response:
+    range_header = request.headers.get("Range")
+    if range_header:
+        start = int(range_header[len("bytes="):-1])
+        return httpx.Response(206, content=VIDEO_BYTES[start:])
+    return httpx.Response(200, content=VIDEO_BYTES)
+
+
+class FakeApiClient(AbstractApiClient):
+    platform = "wb"
+
+    def __init__(self, transport: httpx.MockTransport):
+        super().__init__()
+        self.proxy = "http://127.0.0.1:8888"
+        self.headers = {"User-Agent": "ua", "Referer": "https://m.weibo.cn", "Cookie": "SUB=1"}
+        self.transport = transport
+        self.proxies = []
+
+    def get_http_client(self, proxy=None):
+        self.proxies.append(proxy)
+        client = self._http_clients.get(proxy)
+        if client is None:
+            client = self._http_clients[proxy] = httpx.AsyncClient(transport=self.transport)
+        return client
+
+    async def request(self, method, url, **kwargs):
+        pass
+
+    async def update_cookies(self, browser_context):
+        pass
+
+
+class TestMediaJobQueue(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "media_queue.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_persist_and_dedup(self):
+        queue = MediaJobQueue(self.db_path)
+        job = MediaJob(platform="xhs", media_type="image", owner_id="note_1", extension_file_name="0.jpg",
+                       url="https://cdn.example.com/0.jpg", headers={"Referer": "https://www.xiaohongshu.com"})
+        self.assertTrue(await queue.put(job))
+        self.assertFalse(await queue.put(job))
+        await queue.close()
+
+        # 重启后未完成的任务仍在队列中
+        queue = MediaJobQueue(self.db_path)
+        claimed = await queue.claim()
+        self.assertEqual(claimed.job_id, job.job_id)
+        self.assertEqual(claimed.headers, job.headers)
+        self.assertIsNone(await queue.claim())
+        await queue.mark_done(claimed)
+        self.assertFalse(await queue.put(job))
+        self.assertEqual(await queue.count(JOB_STATUS_DONE), 1)
+        await queue.close()
+
+    async def test_retry_backoff_and_failed(self):
+        queue = MediaJobQueue(self.db_path)
+        job = MediaJob(platform="dy", media_type="video", owner_id="1", extension_file_name="video.mp4",
+                       url="https://cdn.example.com/1.mp4")
+        await queue.put(job)
+        claimed = await queue.claim()
+        await queue.mark_failed(claimed, "timeout", max_retries=1, retry_backoff=3600)
+        self.assertEqual(await queue.count(JOB_STATUS_PENDING), 1)
+        self.assertIsNone(await queue.claim())
+
+        claimed.attempts = 1
+        await queue.mark_failed(claimed, "timeout", max_retries=1, retry_backoff=3600)
+        self.assertEqual(await queue.count(JOB_STATUS_FAILED), 1)
+        # 失败的任务再次入队时重新下载
+        self.assertTrue(await queue.put(job))
+        self.assertEqual((await queue.claim()).attempts, 0)
+        await queue.close()
+
+    async def test_requeue_done_job(self):
+        queue = MediaJobQueue(self.db_path)
+        job = MediaJob(platform="xhs", media_type="image", owner_id="note_1", extension_file_name="0.jpg",
+                       url="https://cdn.example.com/old.jpg")
+        await queue.put(job)
+        await queue.mark_done(await queue.claim())
+
+        # 同一个位置的图片换了URL，重新下载新的URL
+        job.url = "https://cdn.example.com/new.jpg"
+        self.assertTrue(await queue.put(job))
+        claimed = await queue.claim()
+        self.assertEqual(claimed.url, "https://cdn.example.com/new.jpg")
+        await queue.mark_done(claimed)
+
+        self.assertFalse(await queue.put(job))
+        # 本地文件被删除或需要重新校验时，URL没有变化也重新入队
+        self.assertTrue(await queue.put(job, requeue_done=True))
+        self.assertEqual(await queue.count(JOB_STATUS_PENDING), 1)
+        await queue.close()
+
+    async def test_migrate_old_queue_file(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE media_job (job_id TEXT PRIMARY KEY, platform TEXT NOT NULL, "
+                     "media_type TEXT NOT NULL, owner_id TEXT NOT NULL, extension_file_name TEXT NOT NULL, "
+                     "url TEXT NOT NULL, headers TEXT NOT NULL DEFAULT '{}', status TEXT NOT NULL DEFAULT 'pending', "
+                     "attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT NOT NULL DEFAULT '', "
+                     "next_run_at REAL NOT NULL DEFAULT 0, claimed_at REAL NOT NULL DEFAULT 0, "
+                     "created_at REAL NOT NULL DEFAULT 0)")
+        conn.commit()
+        conn.close()
+
+        queue = MediaJobQueue(self.db_path)
+        await queue.put(MediaJob(platform="wb", media_type="image", owner_id="pid", extension_file_name="jpg",
+                                 url="https://cdn.example.com/pid.jpg", proxy="http://127.0.0.1:8888"))
+        self.assertEqual((await queue.claim()).proxy, "http://127.0.0.1:8888")
+        await queue.close()
+
+    async def test_expired_lease_reclaimed(self):
+        queue = MediaJobQueue(self.db_path, lease_sec=-1)
+        await queue.put(MediaJob(platform="wb", media_type="image", owner_id="pid", extension_file_name="jpg",
+                                 url="https://cdn.example.com/pid.jpg"))
+        self.assertIsNotNone(await queue.claim())
+        self.assertIsNotNone(await queue.claim())
+        await queue.close()
+
+
+class TestMediaDownloadPool(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "media_queue.db")
+        self.tmp_download_patch = patch.object(config, "MEDIA_DOWNLOAD_TMP_DIR", os.path.join(self.tmp_dir.name, "tmp"))
+        self.tmp_download_patch.start()
+
+    def tearDown(self):
+        self.tmp_download_patch.stop()
+        self.tmp_dir.cleanup()
+
+    async def test_download_with_retry(self):
+        request_count = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            request_count[path] = request_count.get(path, 0) + 1
+            if path == "/flaky.jpg" and request_count[path] == 1:
+                return httpx.Response(503)
+            return httpx.Response(200, content=path.encode("utf-8"))
+
+        stored = {}
+
+        async def store_handler(job: MediaJob, file_path: str):
+            with open(file_path, "rb") as f:
+                stored[job.extension_file_name] = f.read()
+            os.remove(file_path)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        pool = MediaDownloadPool(MediaJobQueue(self.db_path), store_handler, concurrency=2, retry_backoff=0,
+                                 client=client, poll_interval=0.05)
+        pool.start()
+        for name in ["0.jpg", "1.jpg", "flaky.jpg"]:
+            await pool.put(MediaJob(platform="xhs", media_type="image", owner_id="note", extension_file_name=name,
+                                    url=f"https://cdn.example.com/{name}"))
+        await pool.close()
+        await client.aclose()
+
+        self.assertEqual(stored, {"0.jpg": b"/0.jpg", "1.jpg": b"/1.jpg", "flaky.jpg": b"/flaky.jpg"})
+        self.assertEqual(request_count["/flaky.jpg"], 2)
+        self.assertEqual(pool.downloaded_count, 3)
+        self.assertEqual(pool.failed_count, 1)
+
+    async def test_resume_download(self):
+        save_file_name = os.path.join(self.tmp_dir.name, "video.download")
+        with open(f"{save_file_name}.part", "wb") as f:
+            f.write(VIDEO_BYTES[:1000])
+        async with httpx.AsyncClient(transport=httpx.MockTransport(range_handler)) as client:
+            result = await download_to_file(client, "https://cdn.example.com/video.mp4", save_file_name, resume=True)
+        self.assertEqual(result.resumed_from, 1000)
+        self.assertEqual(result.size, len(VIDEO_BYTES))
+        with open(save_file_name, "rb") as f:
+            self.assertEqual(f.read(), VIDEO_BYTES)
+        self.assertFalse(os.path.exists(f"{save_file_name}.part"))
+
+    async def test_redownload_deleted_file(self):
+        target_dir = os.path.join(self.tmp_dir.name, "images")
+        request_count = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal request_count
+            request_count += 1
+            return httpx.Response(200, content=b"image")
+
+        async def store_handler(job: MediaJob, file_path: str):
+            os.makedirs(target_dir, exist_ok=True)
+            os.replace(file_path, os.path.join(target_dir, job.extension_file_name))
+
+        job = MediaJob(platform="xhs", media_type="image", owner_id="note", extension_file_name="0.jpg",
+                       url="https://cdn.example.com/0.jpg")
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            for _ in range(3):
+                pool = MediaDownloadPool(MediaJobQueue(self.db_path), store_handler, client=client, poll_interval=0.05,
+                                         path_handler=lambda j: os.path.join(target_dir, j.extension_file_name))
+                pool.start()
+                await pool.put(job)
+                await pool.close()
+                if request_count == 1:
+                    # 文件还在时不重新下载，删除后再次爬取时重新下载
+                    os.remove(os.path.join(target_dir, "0.jpg"))
+        self.assertEqual(request_count, 2)
+
+    async def test_download_through_api_client(self):
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, content=b"image")
+
+        async def store_handler(job: MediaJob, file_path: str):
+            os.remove(file_path)
+
+        api_client = FakeApiClient(httpx.MockTransport(handler))
+        pool = MediaDownloadPool(MediaJobQueue(self.db_path), store_handler, poll_interval=0.05)
+        job = MediaJob(platform="wb", media_type="image", owner_id="pid", extension_file_name="jpg",
+                       url="https://cdn.example.com/pid.jpg")
+        with patch("tools.media_queue.get_media_pool", return_value=pool), \
+                patch.object(rate_limiter, "acquire", AsyncMock()) as acquire:
+            pool.start()
+            await enqueue_media(job, api_client)
+            await pool.close()
+        await api_client.close()
+
+        # 使用API客户端的代理和连接池，带上UA和Referer，不带cookie，下载前等待平台的限速
+        self.assertEqual(api_client.proxies, ["http://127.0.0.1:8888"])
+        self.assertEqual(requests[0].headers["Referer"], "https://m.weibo.cn")
+        self.assertEqual(requests[0].headers["User-Agent"], "ua")
+        self.assertNotIn("Cookie", requests[0].headers)
+        acquire.assert_awaited_once_with("wb", job.url, proxy="http://127.0.0.1:8888",
+                                         endpoint_class=rate_limiter.ENDPOINT_CLASS_MEDIA)
+        self.assertEqual(pool.downloaded_count, 1)
@@ -0,0 +1,85 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from tools.parquet_writer import ParquetFileWriter, is_int_column, parse_int
+
+
+class TestParquetColumnTypes(TestCase):
+
+    def test_parse_int(self):
+        self.assertEqual(parse_int(12), 12)
+        self.assertEqual(parse_int("1024"), 1024)
+        self.assertEqual(parse_int("1.2万"), 12000)
+        self.assertEqual(parse_int("10万+"), 100000)
+        self.assertEqual(parse_int("1,234"), 1234)
+        self.assertIsNone(parse_int(""))
+        self.assertIsNone(parse_int("未知"))
+
+    def test_is_int_column(self):
+        self.assertTrue(is_int_column("liked_count"))
+        self.assertTrue(is_int_column("create_time"))
+        self.assertTrue(is_int_column("last_modify_ts"))
+        self.assertFalse(is_int_column("note_id"))
+
+
+@unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "pyarrow is not installed")
+class TestParquetFileWriter(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.parquet_path = os.path.join(self.tmp_dir.name, "parquet", "search_contents_2024-01-14.parquet")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_typed_row_groups(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = ParquetFileWriter(self.parquet_path, row_group_size=2)
+        for i in range(5):
+            await writer.write({"note_id": str(i), "liked_count": f"{i}万", "ip_location": "上海"})
+        await writer.close()
+
+        parquet_file = pq.ParquetFile(self.parquet_path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        table = parquet_file.read()
+        self.assertEqual(table.schema.field("liked_count").type, pa.int64())
+        self.assertEqual(table.schema.field("note_id").type, pa.string())
+        self.assertEqual(table.column("liked_count").to_pylist(), [0, 10000, 20000, 30000, 40000])
+
+    async def test_new_columns_switch_part_file(self):
+        writer = ParquetFileWriter(self.parquet_path, row_group_size=1)
+        await writer.write({"note_id": "1"})
+        await writer.write({"note_id": "2", "comment_count": "3"})
+        await writer.close()
+        self.assertEqual(len(writer.part_paths), 2)
+
+    async def test_non_integer_value_widens_column(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = ParquetFileWriter(self.parquet_path, row_group_size=1)
+        for liked_count in ["1", "10万+", "未知", "2"]:
+            await writer.write({"note_id": "1", "liked_count": liked_count})
+        await writer.close()
+        self.assertEqual(len(writer.part_paths), 2)
+        first, second = [pq.read_table(path) for path in writer.part_paths]
+        self.assertEqual(first.column("liked_count").to_pylist(), [1, 100000])
+        self.assertEqual(second.schema.field("liked_count").type, pa.string())
+        self.assertEqual(second.column("liked_count").to_pylist(), ["未知", "2"])
@@ -0,0 +1,57 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from tools.rate_limiter import RateLimiter, TokenBucket, classify_endpoint
+
+
+class TestTokenBucket(IsolatedAsyncioTestCase):
+
+    async def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=20, burst=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertGreater(bucket.reserve(), 0)
+
+    async def test_concurrent_acquire_is_paced(self):
+        bucket = TokenBucket(rate=20, burst=1)
+        start = time.monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(4)])
+        # 第一个令牌立即可用，之后每个间隔 1/20 秒
+        self.assertGreaterEqual(time.monotonic() - start, 0.14)
+
+
+class TestRateLimiter(TestCase):
+
+    def test_buckets_keyed_by_platform_endpoint_account_proxy(self):
+        limiter = RateLimiter(default_qps=1, default_burst=1)
+        bucket = limiter.get_bucket("xhs", "comment", "a1=1", "http://127.0.0.1:1")
+        self.assertIs(bucket, limiter.get_bucket("xhs", "comment", "a1=1", "http://127.0.0.1:1"))
+        self.assertIsNot(bucket, limiter.get_bucket("xhs", "comment", "a1=2", "http://127.0.0.1:1"))
+        self.assertIsNot(bucket, limiter.get_bucket("xhs", "comment", "a1=1", ""))
+        self.assertIsNot(bucket, limiter.get_bucket("xhs", "search", "a1=1", "http://127.0.0.1:1"))
+        self.assertIsNot(bucket, limiter.get_bucket("dy", "comment", "a1=1", "http://127.0.0.1:1"))
+
+    def test_rule_priority(self):
+        limiter = RateLimiter(default_qps=1, default_burst=1, rules={"xhs": (2, 2), "xhs:search": (0.5, 1)})
+        self.assertEqual(limiter.get_rule("xhs", "search"), (0.5, 1))
+        self.assertEqual(limiter.get_rule("xhs", "comment"), (2, 2))
+        self.assertEqual(limiter.get_rule("dy", "search"), (1, 1))
+
+    def test_classify_endpoint(self):
+        self.assertEqual(classify_endpoint("https://edith.xiaohongshu.com/api/sns/web/v2/comment/page?note_id=1"), "comment")
+        self.assertEqual(classify_endpoint("/api/sns/web/v1/search/notes"), "search")
+        self.assertEqual(classify_endpoint("/api/sns/web/v1/user_posted"), "creator")
+        self.assertEqual(classify_endpoint("/api/sns/web/v1/feed"), "default")
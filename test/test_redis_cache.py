@@ -17,8 +17,9 @@
 
 import time
 import unittest
+from unittest import IsolatedAsyncioTestCase
 
-from cache.redis_cache import RedisCache
+from cache.redis_cache import AsyncRedisCache, RedisCache
 
 
 class TestRedisCache(unittest.TestCase):
@@ -42,10 +43,32 @@ class TestRedisCache(unittest.TestCase):
         self.assertIn('key1', keys)
         self.assertIn('key2', keys)
 
+    def test_mget_and_mset(self):
+        self.redis_cache.mset({'key1': {'a': 1}, 'key2': [1, 2]}, 10)
+        self.assertEqual(self.redis_cache.mget(['key1', 'key2', 'missing']), [{'a': 1}, [1, 2], None])
+
     def tearDown(self):
         # self.redis_cache._redis_client.flushdb()  # 清空redis数据库
         pass
 
 
+class TestAsyncRedisCache(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis_cache = AsyncRedisCache()
+
+    async def asyncTearDown(self):
+        await self.redis_cache.close()
+
+    async def test_set_and_get(self):
+        await self.redis_cache.set('async_key', 'value', 10)
+        self.assertEqual(await self.redis_cache.get('async_key'), 'value')
+
+    async def test_load(self):
+        await self.redis_cache.mset({'async_ip_1': 'a', 'async_ip_2': 'b'}, 10)
+        await self.redis_cache.set('async_other', 'c', 10)
+        self.assertEqual(await self.redis_cache.load('async_ip_*'), {'async_ip_1': 'a', 'async_ip_2': 'b'})
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,99 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import config
+from cache.response_cache import (ENDPOINT_DETAIL, ResponseCache,
+                                  bypass_response_cache, get_response_cache,
+                                  normalize_request)
+from cache.tiered_cache import TieredCache, get_shared_cache
+
+
+class TestNormalizeRequest(unittest.TestCase):
+
+    def test_drop_volatile_params(self):
+        self.assertEqual(
+            normalize_request("https://API.bilibili.com/x/space/wbi/acc/info?wts=1&mid=2&w_rid=abc"),
+            normalize_request("https://api.bilibili.com/x/space/wbi/acc/info", {"mid": 2, "wts": 3, "w_rid": "def"}),
+        )
+        self.assertNotEqual(
+            normalize_request("https://www.xiaohongshu.com/explore/1?xsec_token=a"),
+            normalize_request("https://www.xiaohongshu.com/explore/2?xsec_token=a"),
+        )
+        self.assertEqual(
+            normalize_request("https://edith.xiaohongshu.com/api/sns/web/v1/feed", {"source_note_id": "1", "xsec_token": "a"}),
+            normalize_request("https://edith.xiaohongshu.com/api/sns/web/v1/feed", {"xsec_token": "b", "source_note_id": "1"}),
+        )
+
+
+class TestResponseCache(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.response_cache = ResponseCache(TieredCache(), {"detail": 60, "xhs:creator": 0})
+        self.fetch_count = 0
+
+    async def fetch(self):
+        self.fetch_count += 1
+        await asyncio.sleep(0.01)
+        return {"note_id": "1", "title": "标题"}
+
+    async def test_cache_hit(self):
+        results = await asyncio.gather(*[
+            self.response_cache.fetch("xhs", ENDPOINT_DETAIL, f"https://edith.xiaohongshu.com/feed?xsec_token={i}", None,
+                                      self.fetch)
+            for i in range(3)
+        ])
+        self.assertEqual(results, [{"note_id": "1", "title": "标题"}] * 3)
+        self.assertEqual(self.fetch_count, 1)
+        self.assertEqual(await self.response_cache.fetch("xhs", ENDPOINT_DETAIL, "https://edith.xiaohongshu.com/feed",
+                                                         None, self.fetch), {"note_id": "1", "title": "标题"})
+        self.assertEqual(self.fetch_count, 1)
+        self.assertEqual(self.response_cache.hits, 3)
+
+    async def test_bypass_and_disabled(self):
+        url = "https://edith.xiaohongshu.com/feed"
+        await self.response_cache.fetch("xhs", ENDPOINT_DETAIL, url, None, self.fetch)
+        with bypass_response_cache():
+            await self.response_cache.fetch("xhs", ENDPOINT_DETAIL, url, None, self.fetch)
+        self.assertEqual(self.fetch_count, 2)
+        # ttl为0的接口不缓存
+        for _ in range(2):
+            await self.response_cache.fetch("xhs", "creator", url, None, self.fetch)
+        self.assertEqual(self.fetch_count, 4)
+
+    async def test_empty_not_cached(self):
+        async def fetch_empty():
+            self.fetch_count += 1
+            return {}
+
+        for _ in range(2):
+            self.assertEqual(await self.response_cache.fetch("xhs", ENDPOINT_DETAIL, "https://a.com/1", None, fetch_empty), {})
+        self.assertEqual(self.fetch_count, 2)
+
+    async def test_separate_from_shared_cache(self):
+        with patch.object(config, "ENABLE_RESPONSE_CACHE", True), \
+                patch.object(config, "RESPONSE_CACHE_L1_MAX_MB", 1):
+            response_cache = get_response_cache()
+        shared_cache = get_shared_cache()
+        await shared_cache.set("ip_1", "proxy", 60)
+        self.addAsyncCleanup(shared_cache.delete, "ip_1")
+        self.assertIsNot(response_cache.backend, shared_cache)
+        self.assertEqual(response_cache.backend.l1.max_bytes, 1024 * 1024)
+
+        # 大量详情响应只会挤掉响应缓存自己的条目
+        for i in range(config.SHARED_CACHE_L1_MAX_ENTRIES + 1):
+            await response_cache.fetch("xhs", ENDPOINT_DETAIL, f"https://a.com/{i}", None, self.fetch)
+        self.assertEqual(await shared_cache.get("ip_1"), "proxy")
@@ -0,0 +1,123 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import time
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import config
+from tools import seen_index
+from tools.seen_index import BloomFilter, SeenIndex
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negative(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"note_{i}")
+        for i in range(1000):
+            self.assertIn(f"note_{i}", bloom)
+
+    def test_error_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"note_{i}")
+        false_positives = sum(f"other_{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TestSeenIndex(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "seen_index.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def new_run(self, freshness_sec: float = 3600) -> SeenIndex:
+        index = SeenIndex(self.db_path, "xhs", freshness_sec, bloom_capacity=100)
+        await index.open()
+        return index
+
+    async def test_content_fresh_across_runs(self):
+        index = await self.new_run()
+        self.assertFalse(await index.is_content_fresh("note_1"))
+        await index.mark_content_seen("note_1")
+        # 本次运行中保存的内容不影响本次的爬取
+        self.assertFalse(await index.is_content_fresh("note_1"))
+        await index.close()
+
+        index = await self.new_run()
+        self.assertTrue(await index.is_content_fresh("note_1"))
+        self.assertFalse(await index.is_content_fresh("note_2"))
+        await index.close()
+
+        # 新鲜期为0时不跳过
+        index = await self.new_run(freshness_sec=0)
+        self.assertFalse(await index.is_content_fresh("note_1"))
+        await index.close()
+
+    async def test_content_expired(self):
+        index = await self.new_run()
+        with patch.object(time, "time", return_value=time.time() - 7200):
+            await index.mark_content_seen("note_1")
+        await index.close()
+
+        index = await self.new_run()
+        self.assertFalse(await index.is_content_fresh("note_1"))
+        # 过期的内容重新保存后刷新爬取时间
+        await index.mark_content_seen("note_1")
+        await index.close()
+        index = await self.new_run()
+        self.assertTrue(await index.is_content_fresh("note_1"))
+        await index.close()
+
+    async def test_content_fresh_requires_comments(self):
+        index = await self.new_run()
+        await index.mark_content_seen("note_1")
+        await index.mark_content_seen("note_2")
+        # 只有note_2的评论爬取完成
+        await index.mark_comments_done("note_2")
+        await index.close()
+
+        index = await self.new_run()
+        self.assertTrue(await index.is_content_fresh("note_1"))
+        self.assertFalse(await index.is_content_fresh("note_1", require_comments=True))
+        self.assertTrue(await index.is_content_fresh("note_2", require_comments=True))
+        await index.close()
+
+    async def test_comment_dedup(self):
+        index = await self.new_run()
+        self.assertFalse(await index.is_comment_seen("comment_1"))
+        # 保存成功前不记录评论id
+        self.assertFalse(await index.is_comment_seen("comment_1"))
+        await index.mark_comment_seen("comment_1")
+        self.assertTrue(await index.is_comment_seen("comment_1"))
+        await index.close()
+
+        index = await self.new_run()
+        self.assertTrue(await index.is_comment_seen("comment_1"))
+        self.assertFalse(await index.is_comment_seen("comment_2"))
+        await index.close()
+
+    async def test_disabled(self):
+        with patch.object(config, "ENABLE_SEEN_INDEX", False):
+            self.assertIsNone(seen_index.get_seen_index("xhs"))
+            self.assertFalse(await seen_index.is_content_fresh("xhs", "note_1"))
+            self.assertTrue(await seen_index.is_new_comment("xhs", "comment_1"))
+            await seen_index.mark_comment_seen("xhs", "comment_1")
+            self.assertTrue(await seen_index.is_new_comment("xhs", "comment_1"))
@@ -0,0 +1,117 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import Any, List, Optional
+from unittest import IsolatedAsyncioTestCase
+
+from cache.abs_cache import AbstractAsyncCache
+from cache.lru_cache import LruExpiringCache
+from cache.tiered_cache import TieredCache
+
+
+class FakeRemoteCache(AbstractAsyncCache):
+    """模拟redis，记录访问次数"""
+
+    def __init__(self):
+        self.cache = LruExpiringCache()
+        self.get_count = 0
+        self.mget_count = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        self.get_count += 1
+        await asyncio.sleep(0.01)
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: Any, expire_time: int) -> None:
+        self.cache.set(key, value, expire_time)
+
+    async def keys(self, pattern: str) -> List[str]:
+        return self.cache.keys(pattern)
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        self.mget_count += 1
+        return self.cache.mget(keys)
+
+    async def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+
+class TestTieredCache(IsolatedAsyncioTestCase):
+
+    async def test_read_through_single_flight(self):
+        remote = FakeRemoteCache()
+        cache = TieredCache(remote)
+        load_count = 0
+
+        async def loader():
+            nonlocal load_count
+            load_count += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*[cache.get_or_load("key", loader, 60) for _ in range(10)])
+        self.assertEqual(results, ["value"] * 10)
+        self.assertEqual(load_count, 1)
+        # 并发未命中时只访问一次L2，加载前再确认一次
+        self.assertEqual(remote.get_count, 2)
+        self.assertEqual(await remote.get("key"), "value")
+
+        # 其他进程通过L2共享结果
+        other = TieredCache(remote)
+        self.assertEqual(await other.get_or_load("key", loader, 60), "value")
+        self.assertEqual(load_count, 1)
+        # L1命中后不再访问L2
+        get_count = remote.get_count
+        self.assertEqual(await other.get("key"), "value")
+        self.assertEqual(remote.get_count, get_count)
+
+    async def test_negative_cache(self):
+        cache = TieredCache(FakeRemoteCache())
+        load_count = 0
+
+        async def loader():
+            nonlocal load_count
+            load_count += 1
+            return None
+
+        self.assertIsNone(await cache.get_or_load("key", loader, 60, negative_expire_time=60))
+        self.assertIsNone(await cache.get_or_load("key", loader, 60, negative_expire_time=60))
+        self.assertIsNone(await cache.get("key"))
+        self.assertEqual(load_count, 1)
+
+        self.assertIsNone(await cache.get_or_load("other", loader, 60))
+        self.assertIsNone(await cache.get_or_load("other", loader, 60))
+        self.assertEqual(load_count, 3)
+
+    async def test_loader_error(self):
+        cache = TieredCache()
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise ValueError("load error")
+
+        results = await asyncio.gather(*[cache.get_or_load("key", loader, 60) for _ in range(3)],
+                                       return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(cache._inflight, {})
+
+    async def test_mget_and_delete(self):
+        remote = FakeRemoteCache()
+        cache = TieredCache(remote)
+        await remote.set("ip_1", "a", 60)
+        await cache.set("ip_2", "b", 60)
+        self.assertEqual(await cache.keys("ip_*"), ["ip_1", "ip_2"])
+        self.assertEqual(await cache.mget(["ip_1", "ip_2", "ip_3"]), ["a", "b", None])
+        self.assertEqual(remote.mget_count, 1)
+        await cache.delete("ip_2")
+        self.assertIsNone(await cache.get("ip_2"))
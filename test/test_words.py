@@ -0,0 +1,64 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import config
+from tools.words import AsyncWordCloudGenerator
+
+
+class TestAsyncWordCloudGenerator(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.tmp_dir.name, "search_comments_2024-01-14")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_word_freq(self, prefix):
+        with open(f"{prefix}_word_freq.json", encoding="utf-8") as f:
+            return json.load(f)
+
+    async def test_incremental_count(self):
+        generator = AsyncWordCloudGenerator(save_interval=3600)
+        with patch("jieba.lcut", side_effect=lambda text: text.split(" ")) as lcut:
+            await generator.add_item({"content": "编程 副业"}, self.prefix)
+            await generator.add_item({"content": "编程 兼职"}, self.prefix)
+            await generator.add_item({"comment_id": "3"}, self.prefix)
+        # 每条评论只分词一次
+        self.assertEqual(lcut.call_count, 2)
+        self.assertEqual(generator.word_freqs[self.prefix]["编程"], 2)
+        self.assertEqual(generator.word_freqs[self.prefix]["兼职"], 1)
+        self.assertFalse(os.path.exists(f"{self.prefix}_word_freq.json"))
+
+    async def test_save_word_frequency_by_prefix(self):
+        other_prefix = os.path.join(self.tmp_dir.name, "search_contents_2024-01-14")
+        generator = AsyncWordCloudGenerator(save_interval=0)
+        await generator.add_item({"content": "编程副业编程"}, self.prefix)
+        await generator.add_item({"content": "兼职"}, other_prefix)
+        self.assertEqual(self.read_word_freq(self.prefix), dict(generator.word_freqs[self.prefix]))
+        self.assertEqual(self.read_word_freq(other_prefix), dict(generator.word_freqs[other_prefix]))
+        self.assertNotIn("兼职", self.read_word_freq(self.prefix))
+
+    @patch.object(config, "FONT_PATH", None)
+    async def test_close_render_word_cloud(self):
+        generator = AsyncWordCloudGenerator(save_interval=3600)
+        await generator.add_item({"content": "编程副业，编程兼职，程序员兼职接单"}, self.prefix)
+        await generator.close()
+        self.assertTrue(os.path.exists(f"{self.prefix}_word_freq.json"))
+        self.assertTrue(os.path.getsize(f"{self.prefix}_word_cloud.png") > 0)
+        self.assertIsNone(generator._executor)
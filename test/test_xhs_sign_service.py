@@ -0,0 +1,72 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from media_platform.xhs.exception import DataFetchError
+from media_platform.xhs.help import XhsSignService
+
+
+class FakePage:
+    """模拟 page.evaluate，记录调用次数"""
+
+    def __init__(self, drop_signs: int = 0):
+        self.calls = []
+        self.drop_signs = drop_signs
+
+    async def evaluate(self, expression, arg):
+        items, need_b1 = arg
+        self.calls.append((len(items), need_b1))
+        await asyncio.sleep(0)
+        return {
+            "signs": [{"X-s": f"XYW_{url}_" + "x" * 64, "X-t": 1700000000000} for url, _ in items][self.drop_signs:],
+            "b1": "b1-value" if need_b1 else None,
+        }
+
+
+class TestXhsSignService(IsolatedAsyncioTestCase):
+
+    async def test_batch_concurrent_sign(self):
+        page = FakePage()
+        sign_service = XhsSignService(page)
+        results = await asyncio.gather(*[sign_service.sign_headers(f"/api/{i}", a1="a1") for i in range(5)])
+        self.assertEqual(page.calls, [(5, True)])
+        self.assertEqual([r["X-S"] for r in results], [f"XYW_/api/{i}_" + "x" * 64 for i in range(5)])
+
+    async def test_b1_cached_until_invalidate(self):
+        page = FakePage()
+        sign_service = XhsSignService(page)
+        await sign_service.sign_headers("/api/1")
+        await sign_service.sign_headers("/api/2")
+        sign_service.invalidate()
+        await sign_service.sign_headers("/api/3")
+        self.assertEqual([need_b1 for _, need_b1 in page.calls], [True, False, True])
+
+    async def test_missing_signs_fail_all(self):
+        sign_service = XhsSignService(FakePage(drop_signs=1))
+        results = await asyncio.wait_for(
+            asyncio.gather(*[sign_service.sign_headers(f"/api/{i}") for i in range(3)], return_exceptions=True), 1
+        )
+        self.assertTrue(all(isinstance(result, DataFetchError) for result in results))
+
+    async def test_invalidate_during_batch(self):
+        page = FakePage()
+        sign_service = XhsSignService(page)
+        task = asyncio.create_task(sign_service.sign_headers("/api/1"))
+        while not page.calls:
+            await asyncio.sleep(0)
+        sign_service.invalidate()
+        await task
+        # 签名期间 invalidate 了，批次读取到的 b1 不写回缓存
+        await sign_service.sign_headers("/api/2")
+        self.assertEqual([need_b1 for _, need_b1 in page.calls], [True, True])
@@ -0,0 +1,151 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 评论爬取流水线，请求下一页评论的同时由独立的存储协程处理已经拿到的评论
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+import config
+from tools import utils
+
+
+class CommentPipeline:
+    """
+    评论爬取流水线
+    - 拉取到的评论放入有界队列，由单独的存储协程依次调用 callback 保存，队列满时拉取方等待
+    - 二级评论的展开通过 submit 提交，以有限的并发数在后台执行，不阻塞下一页一级评论的请求
+    - pace 控制每次对外请求之间的间隔，同一条流水线内的所有请求共用这个间隔
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[..., Awaitable[Any]]] = None,
+        crawl_interval: float = 1.0,
+        queue_size: int = 0,
+        sub_comment_concurrency: int = 0,
+    ):
+        """
+        Args:
+            callback: 保存评论的回调函数
+            crawl_interval: 两次请求之间的最小间隔（秒）
+            queue_size: 待保存队列的最大长度，0表示使用配置
+            sub_comment_concurrency: 二级评论展开的最大并发数，0表示使用配置
+        """
+        self.callback = callback
+        self.crawl_interval = crawl_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or config.COMMENT_PIPELINE_QUEUE_SIZE)
+        self._semaphore = asyncio.Semaphore(sub_comment_concurrency or config.SUB_COMMENT_CONCURRENCY_NUM)
+        self._pace_lock = asyncio.Lock()
+        self._last_request_time: Optional[float] = None
+        self._tasks: List[asyncio.Task] = []
+        self._worker: Optional[asyncio.Task] = None
+        self._store_error: Optional[BaseException] = None
+        self.sub_results: List[Any] = []
+
+    async def __aenter__(self) -> "CommentPipeline":
+        self._worker = asyncio.create_task(self._store_worker())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        error: Optional[BaseException] = None
+        try:
+            if exc_type is None:
+                # 等待所有二级评论展开完成，再等待存储队列清空
+                error = await self._wait_sub_tasks()
+            else:
+                await self._cancel_sub_tasks()
+            await self._queue.join()
+        finally:
+            # 出错或被取消时不留下仍在运行的二级评论任务
+            await self._cancel_sub_tasks()
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+        if exc_type is None and error is not None:
+            raise error
+        if exc_type is None and self._store_error is not None:
+            raise self._store_error
+
+    async def _wait_sub_tasks(self) -> Optional[BaseException]:
+        # 任意一个二级评论任务失败时取消其余任务，返回第一个错误
+        if not self._tasks:
+            return None
+        await asyncio.wait(self._tasks, return_when=asyncio.FIRST_EXCEPTION)
+        await self._cancel_sub_tasks()
+        for task in self._tasks:
+            if task.cancelled():
+                continue
+            if task.exception() is not None:
+                return task.exception()
+            if task.result():
+                self.sub_results.extend(task.result())
+        return None
+
+    async def _cancel_sub_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _store_worker(self):
+        while True:
+            args = await self._queue.get()
+            try:
+                await self.callback(*args)
+            except Exception as e:
+                utils.logger.error(f"[CommentPipeline._store_worker] store comments error: {e}")
+                if self._store_error is None:
+                    self._store_error = e
+            finally:
+                self._queue.task_done()
+
+    async def pace(self):
+        """
+        在每次对外请求前调用，保证与上一次请求的间隔不小于 crawl_interval
+        开启全局限速时请求节奏由令牌桶控制，这里不再额外等待
+        Returns:
+
+        """
+        if config.ENABLE_RATE_LIMIT:
+            return
+        async with self._pace_lock:
+            if self._last_request_time is not None:
+                wait_time = self._last_request_time + self.crawl_interval - time.monotonic()
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+            self._last_request_time = time.monotonic()
+
+    async def store(self, *args: Any):
+        """
+        将评论放入待保存队列，参数与 callback 的参数一致
+        Returns:
+
+        """
+        if self.callback is None:
+            return
+        await self._queue.put(args)
+
+    def submit(self, coro: Awaitable[Optional[List]]):
+        """
+        提交一个二级评论展开任务，返回值（列表）会合并到 sub_results 中
+        Args:
+            coro: 二级评论展开的协程
+
+        Returns:
+
+        """
+
+        async def run():
+            async with self._semaphore:
+                return await coro
+
+        self._tasks.append(asyncio.create_task(run()))
@@ -0,0 +1,124 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 增量爬取评论的水位线，记录每个内容上一次爬到的最新评论，
+#            再次爬取时遇到已经保存过的评论就停止翻页
+
+from typing import Any, Callable, List, Optional
+
+import config
+from tools import seen_index, utils
+
+
+class CommentWatermark:
+    """
+    单个内容的评论水位线，只适用于按时间倒序返回评论的接口
+    - 一页评论的最后一条已经不晚于水位线时，说明后面的都是上一次保存过的评论，停止翻页
+      （只看最后一条，是为了兼容排在第一页最前面的置顶评论）
+    - 每页中早于水位线的评论被过滤掉，只保存新评论，已保存评论下新增的二级评论不会再爬取
+    - 爬取正常结束后才更新水位线，中途出错时下一次仍从上一次的水位线开始
+    - 按页码正序翻页的平台（贴吧）通过 last_page 记录爬到的页码，下一次从这一页继续
+    """
+
+    def __init__(
+        self,
+        platform: str,
+        content_id: str,
+        get_time: Optional[Callable[[Any], Any]] = None,
+        get_id: Optional[Callable[[Any], Any]] = None,
+    ):
+        """
+        Args:
+            platform: 平台
+            content_id: 内容id
+            get_time: 从一条评论中取出评论时间
+            get_id: 从一条评论中取出评论id
+        """
+        self.platform = platform
+        self.content_id = str(content_id)
+        self.get_time = get_time
+        self.get_id = get_id
+        self.enabled = config.ENABLE_INCREMENTAL_COMMENTS
+        self.reached = False
+        self.last_page = 0
+        self._time: Optional[float] = None
+        self._id = ""
+        self._newest_time: Optional[float] = None
+        self._newest_id = ""
+
+    async def load(self) -> "CommentWatermark":
+        if not self.enabled:
+            return self
+        row = await seen_index.open_seen_index(self.platform).get_comment_watermark(self.content_id)
+        if row:
+            self._time = row["comment_time"] if row["comment_time"] else None
+            self._id = row["comment_id"]
+            self.last_page = row["last_page"]
+        return self
+
+    def _comment_time(self, comment: Any) -> float:
+        try:
+            return float(self.get_time(comment) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def _is_stored(self, comment: Any) -> bool:
+        comment_time = self._comment_time(comment)
+        if comment_time != self._time:
+            return comment_time < self._time
+        return str(self.get_id(comment)) == self._id or not self._id
+
+    def filter_page(self, comments: List[Any]) -> List[Any]:
+        """
+        过滤一页评论中已经保存过的评论，并判断是否已经到达水位线
+        Args:
+            comments: 一页一级评论，按时间倒序
+
+        Returns:
+            需要保存的新评论
+        """
+        if not self.enabled or not comments:
+            return comments
+        for comment in comments:
+            comment_time = self._comment_time(comment)
+            if self._newest_time is None or comment_time > self._newest_time:
+                self._newest_time = comment_time
+                self._newest_id = str(self.get_id(comment))
+        if self._time is None:
+            return comments
+        new_comments = [comment for comment in comments if not self._is_stored(comment)]
+        if self._is_stored(comments[-1]):
+            self.reached = True
+            utils.logger.info(
+                f"[CommentWatermark.filter_page] {self.platform} content {self.content_id} reached comment watermark, "
+                f"{len(new_comments)} new comments in last page"
+            )
+        return new_comments
+
+    async def save(self, last_page: int = 0):
+        """
+        爬取正常结束后保存水位线
+        Args:
+            last_page: 按页码正序翻页的平台爬取到的最后一页
+
+        Returns:
+
+        """
+        if not self.enabled:
+            return
+        if self._newest_time is None or (self._time is not None and self._newest_time < self._time):
+            newest_time, newest_id = self._time or 0, self._id
+        else:
+            newest_time, newest_id = self._newest_time, self._newest_id
+        await seen_index.open_seen_index(self.platform).save_comment_watermark(
+            self.content_id, newest_time, newest_id, max(last_page, self.last_page)
+        )
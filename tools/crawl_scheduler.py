@@ -0,0 +1,119 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 多阶段工作队列调度：搜索页 -> 详情 -> 评论，每个阶段一个队列和固定数量的worker
+
+import asyncio
+from typing import Any, Awaitable, Callable, List
+
+from tools import utils
+
+
+class WorkerStage:
+    """
+    一个处理阶段：有界队列 + 固定数量的worker协程
+    - 上游通过 put 提交任务，队列满时等待，形成背压
+    - 单个任务失败只记录日志，不影响同阶段的其他任务
+    - 作为异步上下文管理器使用，正常退出时等待队列清空后再停止worker
+      多个阶段嵌套时要把下游阶段写在外层，保证上游先清空：
+      async with comment_stage, detail_stage: ...
+    """
+
+    def __init__(self, name: str, handler: Callable[..., Awaitable[Any]], concurrency: int = 1, queue_size: int = 0):
+        """
+        Args:
+            name: 阶段名称，用于日志
+            handler: 处理单个任务的协程函数，参数为 put 时传入的参数
+            concurrency: worker数量，即该阶段的最大并发数
+            queue_size: 队列长度，0表示 worker数量的2倍
+        """
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(concurrency, 1)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or self.concurrency * 2)
+        self._workers: List[asyncio.Task] = []
+        self.processed_count = 0
+        self.failed_count = 0
+
+    async def __aenter__(self) -> "WorkerStage":
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                await self.join()
+        finally:
+            await self.close()
+
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def put(self, *args: Any):
+        """
+        提交一个任务，参数会原样传给 handler
+        """
+        await self._queue.put(args)
+
+    async def join(self):
+        """
+        等待已提交的任务全部处理完成
+        """
+        await self._queue.join()
+        utils.logger.info(
+            f"[WorkerStage.join] stage {self.name} drained, processed: {self.processed_count}, failed: {self.failed_count}"
+        )
+
+    async def close(self):
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _worker(self):
+        while True:
+            args = await self._queue.get()
+            try:
+                await self.handler(*args)
+                self.processed_count += 1
+            except Exception as e:
+                self.failed_count += 1
+                utils.logger.error(f"[WorkerStage._worker] stage {self.name} task {args} error: {e}")
+            finally:
+                self._queue.task_done()
+
+
+async def run_producers(coros: List[Awaitable[Any]]) -> List[Any]:
+    """
+    并发运行向阶段提交任务的生产者，任意一个失败时取消其余生产者后再抛出第一个错误
+    生产者要在阶段的 async with 内运行，避免阶段关闭后其余生产者阻塞在 put 上
+    Args:
+        coros: 生产者协程列表
+
+    Returns:
+        各生产者的返回值
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    if not tasks:
+        return []
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
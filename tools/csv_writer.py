@@ -0,0 +1,183 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : CSV 缓冲写入工具，每个文件保持一个打开的句柄，数据批量追加，避免每条数据都打开/关闭一次文件
+
+import asyncio
+import csv
+import io
+import os
+import pathlib
+import time
+from typing import Dict, Iterable, List, Optional
+
+import aiofiles
+
+import config
+from tools import utils
+
+
+class CsvWriter:
+    """
+    带缓冲的 CSV 追加写入器，一个文件对应一个写入器实例
+    - 第一次写入空文件时写入表头（取第一条数据的字段名），之后只追加数据行
+    - 数据先写入内存缓冲，条数或时间间隔达到阈值后批量追加到文件
+    - 文件超过指定大小后切换到新的分片文件 xxx.1.csv, xxx.2.csv ...，每个分片都带表头
+    - 文件被占用（例如被Excel打开）没有写权限时，改为写入带时间戳的新文件
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        flush_batch_size: int = 100,
+        flush_interval: float = 5.0,
+        max_file_bytes: int = 0,
+    ):
+        """
+        Args:
+            file_path: csv文件路径
+            flush_batch_size: 缓冲条数达到该值时写入磁盘
+            flush_interval: 距上次写入磁盘超过该秒数时写入磁盘
+            max_file_bytes: 单个文件的最大字节数，0表示不切分
+        """
+        self.file_path = file_path
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.part_paths: List[str] = [file_path]
+        self._header: Optional[List[str]] = None
+        self._buffer: List[Iterable] = []
+        self._file = None
+        self._file_bytes = 0
+        self._last_flush_time = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def current_path(self) -> str:
+        return self.part_paths[-1]
+
+    def _make_part_path(self, part_index: int) -> str:
+        root, ext = os.path.splitext(self.file_path)
+        return f"{root}.{part_index}{ext}"
+
+    async def _open(self):
+        pathlib.Path(self.current_path).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._file = await aiofiles.open(self.current_path, mode="a", encoding="utf-8-sig", newline="")
+        except PermissionError:
+            root, ext = os.path.splitext(self.current_path)
+            new_path = f"{root}_{int(time.time())}{ext}"
+            utils.logger.warning(f"[CsvWriter._open] Permission denied for {self.current_path}, creating new file: {new_path}")
+            self.part_paths[-1] = new_path
+            self._file = await aiofiles.open(new_path, mode="a", encoding="utf-8-sig", newline="")
+        self._file_bytes = os.path.getsize(self.current_path)
+
+    async def _close_file(self):
+        if self._file is None:
+            return
+        await self._file.flush()
+        await asyncio.get_running_loop().run_in_executor(None, os.fsync, self._file.fileno())
+        await self._file.close()
+        self._file = None
+
+    async def _rotate(self):
+        await self._close_file()
+        self.part_paths.append(self._make_part_path(len(self.part_paths)))
+        await self._open()
+
+    async def write(self, item: Dict):
+        """
+        写入一条数据，满足刷盘条件时批量写入文件
+        Args:
+            item: 需要保存的数据
+
+        Returns:
+
+        """
+        if self._header is None:
+            self._header = list(item.keys())
+        self._buffer.append(list(item.values()))
+        if len(self._buffer) >= self.flush_batch_size or time.monotonic() - self._last_flush_time >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self):
+        """
+        将缓冲区的数据追加写入文件
+        Returns:
+
+        """
+        async with self._lock:
+            self._last_flush_time = time.monotonic()
+            if not self._buffer:
+                return
+            rows, self._buffer = self._buffer, []
+            if self._file is None:
+                await self._open()
+            if self.max_file_bytes and self._file_bytes >= self.max_file_bytes:
+                await self._rotate()
+            output = io.StringIO()
+            writer = csv.writer(output)
+            if self._file_bytes == 0:
+                writer.writerow(self._header)
+            writer.writerows(rows)
+            data = output.getvalue()
+            await self._file.write(data)
+            await self._file.flush()
+            self._file_bytes += len(data.encode("utf-8"))
+
+    async def close(self):
+        """
+        刷盘并关闭文件
+        Returns:
+
+        """
+        await self.flush()
+        async with self._lock:
+            await self._close_file()
+
+
+_writers: Dict[str, CsvWriter] = {}
+
+
+def get_writer(file_path: str) -> CsvWriter:
+    """
+    获取文件对应的写入器，同一个文件在整个运行期间共用一个写入器
+    Args:
+        file_path: csv文件路径
+
+    Returns:
+
+    """
+    writer = _writers.get(file_path)
+    if writer is None:
+        writer = CsvWriter(
+            file_path,
+            flush_batch_size=config.CSV_FLUSH_BATCH_SIZE,
+            flush_interval=config.CSV_FLUSH_INTERVAL_SEC,
+            max_file_bytes=config.CSV_MAX_FILE_SIZE_MB * 1024 * 1024,
+        )
+        _writers[file_path] = writer
+    return writer
+
+
+async def close_all_writers():
+    """
+    关闭所有写入器，在爬虫运行结束时调用
+    Returns:
+
+    """
+    while _writers:
+        _, writer = _writers.popitem()
+        try:
+            await writer.close()
+        except Exception as e:
+            utils.logger.error(f"[close_all_writers] close csv writer {writer.file_path} error: {e}")
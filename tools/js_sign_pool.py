@@ -0,0 +1,246 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 常驻Node进程池执行js签名，避免execjs每次调用都启动node进程并重新解析js文件
+
+import asyncio
+import itertools
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+import config
+from tools import utils
+
+SIGN_WORKER_JS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "libs", "sign_worker.js")
+
+
+class JsSignError(Exception):
+    pass
+
+
+class NodeSignWorker:
+    """
+    一个常驻的node签名进程，启动时加载一次签名js文件，通过stdin/stdout按行收发JSON
+    同一个进程上的多个签名请求按id区分，可以并发提交
+    """
+
+    def __init__(self, js_path: str, node_path: str, timeout: float = 5.0):
+        """
+        Args:
+            js_path: 签名js文件路径
+            node_path: node可执行文件路径
+            timeout: 单次签名调用的超时时间（秒）
+        """
+        self.js_path = js_path
+        self.node_path = node_path
+        self.timeout = timeout
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._start_lock = asyncio.Lock()
+        # 收到签名js加载完成的ready消息后才接受签名请求
+        self._ready = False
+
+    @property
+    def alive(self) -> bool:
+        return self._ready and self._process is not None and self._process.returncode is None
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        """
+        启动node进程，等待签名js文件加载完成
+        Returns:
+
+        """
+        async with self._start_lock:
+            if self.alive:
+                return
+            # 旧进程已经退出：先让它上面未完成的请求失败，并解除引用，避免旧进程的读取协程结束时误伤新进程的请求
+            self._process = None
+            self._ready = False
+            self._fail_pending(JsSignError(f"node sign worker exited, js: {self.js_path}"))
+            ready: asyncio.Future = asyncio.get_running_loop().create_future()
+            self._pending = {0: ready}
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    self.node_path, SIGN_WORKER_JS, self.js_path,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                    limit=1024 * 1024,
+                )
+                self._reader_task = asyncio.create_task(self._read_responses(self._process))
+                await asyncio.wait_for(ready, self.timeout)
+            except (OSError, asyncio.TimeoutError, JsSignError) as e:
+                await self.close()
+                raise JsSignError(f"start node sign worker failed, js: {self.js_path}, error: {e}")
+            self._ready = True
+            utils.logger.info(f"[NodeSignWorker.start] node sign worker started, pid: {self._process.pid}, js: {self.js_path}")
+
+    async def _read_responses(self, process: asyncio.subprocess.Process):
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    response = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                future = self._pending.pop(response.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(JsSignError(response["error"]))
+                else:
+                    future.set_result(response.get("result"))
+        finally:
+            # 进程退出，未完成的请求全部失败，下次调用时重新启动进程
+            if process is self._process:
+                self._fail_pending(JsSignError(f"node sign worker exited, js: {self.js_path}"))
+
+    def _fail_pending(self, error: Exception):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def call(self, fn_name: str, *args: Any) -> Any:
+        """
+        调用签名js中的函数
+        Args:
+            fn_name: js函数名
+            *args: 函数参数，需要可以被json序列化
+
+        Returns:
+            js函数的返回值
+        """
+        if not self.alive:
+            await self.start()
+        request_id = next(self._ids)
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._process.stdin.write((json.dumps({"id": request_id, "fn": fn_name, "args": args}) + "\n").encode("utf-8"))
+            await self._process.stdin.drain()
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            # 超时的进程可能已经卡死，直接重启
+            utils.logger.warning(f"[NodeSignWorker.call] call {fn_name} timeout, restart node sign worker")
+            await self.close()
+            raise JsSignError(f"call {fn_name} timeout")
+        except (BrokenPipeError, ConnectionResetError) as e:
+            await self.close()
+            raise JsSignError(f"node sign worker broken: {e}")
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self):
+        """
+        关闭node进程
+        Returns:
+
+        """
+        process, self._process = self._process, None
+        self._ready = False
+        if process is None:
+            return
+        self._fail_pending(JsSignError(f"node sign worker closed, js: {self.js_path}"))
+        if process.returncode is None:
+            try:
+                process.stdin.close()
+                await asyncio.wait_for(process.wait(), 1)
+            except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError):
+                process.kill()
+                await process.wait()
+        if self._reader_task:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+
+
+class NodeSignPool:
+    """
+    同一个签名js文件的node进程池，每次调用选择未完成请求最少的进程
+    """
+
+    def __init__(self, js_path: str, node_path: str, pool_size: int = 2, timeout: float = 5.0):
+        self.js_path = js_path
+        self.workers: List[NodeSignWorker] = [
+            NodeSignWorker(js_path, node_path, timeout=timeout) for _ in range(max(pool_size, 1))
+        ]
+
+    async def call(self, fn_name: str, *args: Any) -> Any:
+        """
+        调用签名js中的函数，进程崩溃时自动重启并重试一次
+        Args:
+            fn_name: js函数名
+            *args: 函数参数
+
+        Returns:
+
+        """
+        worker = min(self.workers, key=lambda w: (not w.alive, w.pending_count))
+        try:
+            return await worker.call(fn_name, *args)
+        except JsSignError:
+            if worker.alive:
+                raise
+            return await worker.call(fn_name, *args)
+
+    async def close(self):
+        await asyncio.gather(*[worker.close() for worker in self.workers], return_exceptions=True)
+
+
+_pools: Dict[str, NodeSignPool] = {}
+
+
+def get_pool(js_path: str) -> Optional[NodeSignPool]:
+    """
+    获取签名js文件对应的node进程池
+    Args:
+        js_path: 签名js文件路径
+
+    Returns:
+        未开启或者没有找到node时返回None，调用方需要回退到execjs
+    """
+    if not config.ENABLE_NODE_SIGN_WORKER:
+        return None
+    pool = _pools.get(js_path)
+    if pool is None:
+        node_path = shutil.which("node")
+        if not node_path:
+            return None
+        pool = NodeSignPool(
+            js_path,
+            node_path,
+            pool_size=config.NODE_SIGN_WORKER_POOL_SIZE,
+            timeout=config.NODE_SIGN_WORKER_TIMEOUT_SEC,
+        )
+        _pools[js_path] = pool
+    return pool
+
+
+async def close_all_pools():
+    """
+    关闭所有node签名进程，在爬虫运行结束时调用
+    Returns:
+
+    """
+    while _pools:
+        _, pool = _pools.popitem()
+        await pool.close()
@@ -0,0 +1,226 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : JSON Lines 追加写入工具，数据逐行追加到文件，避免每条数据都读取并重写整个JSON文件
+
+import asyncio
+import json
+import os
+import pathlib
+import re
+import time
+from typing import Dict, List, Optional
+
+import aiofiles
+
+import config
+from tools import utils
+
+
+class JsonLinesWriter:
+    """
+    带缓冲的 JSON Lines 追加写入器，一个文件对应一个写入器实例
+    - 数据先写入内存缓冲，条数或时间间隔达到阈值后批量追加到文件
+    - 文件超过指定大小后切换到新的分片文件 xxx.1.jsonl, xxx.2.jsonl ...
+    - 同一天多次运行时接着磁盘上已有的最后一个分片继续写入
+    - 关闭时刷盘并fsync，可选将磁盘上的全部分片导出为旧版的JSON数组文件
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        legacy_json_path: Optional[str] = None,
+        flush_batch_size: int = 100,
+        flush_interval: float = 5.0,
+        max_file_bytes: int = 0,
+    ):
+        """
+        Args:
+            file_path: jsonl文件路径
+            legacy_json_path: 关闭时导出的JSON数组文件路径，为None时不导出
+            flush_batch_size: 缓冲条数达到该值时写入磁盘
+            flush_interval: 距上次写入磁盘超过该秒数时写入磁盘
+            max_file_bytes: 单个文件的最大字节数，0表示不切分
+        """
+        self.file_path = file_path
+        self.legacy_json_path = legacy_json_path
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.part_paths: List[str] = discover_part_paths(file_path)
+        self._buffer: List[str] = []
+        self._file = None
+        self._file_bytes = 0
+        self._last_flush_time = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def current_path(self) -> str:
+        return self.part_paths[-1]
+
+    def _make_part_path(self, part_index: int) -> str:
+        root, ext = os.path.splitext(self.file_path)
+        return f"{root}.{part_index}{ext}"
+
+    async def _open(self):
+        pathlib.Path(self.current_path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = await aiofiles.open(self.current_path, mode="a", encoding="utf-8")
+        self._file_bytes = os.path.getsize(self.current_path)
+
+    async def _close_file(self):
+        if self._file is None:
+            return
+        await self._file.flush()
+        await asyncio.get_running_loop().run_in_executor(None, os.fsync, self._file.fileno())
+        await self._file.close()
+        self._file = None
+
+    async def _rotate(self):
+        await self._close_file()
+        self.part_paths.append(self._make_part_path(len(self.part_paths)))
+        await self._open()
+
+    async def write(self, item: Dict):
+        """
+        写入一条数据，满足刷盘条件时批量写入文件
+        Args:
+            item: 需要保存的数据
+
+        Returns:
+
+        """
+        self._buffer.append(json.dumps(item, ensure_ascii=False) + "\n")
+        if len(self._buffer) >= self.flush_batch_size or time.monotonic() - self._last_flush_time >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self):
+        """
+        将缓冲区的数据追加写入文件
+        Returns:
+
+        """
+        async with self._lock:
+            self._last_flush_time = time.monotonic()
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            if self._file is None:
+                await self._open()
+            if self.max_file_bytes and self._file_bytes >= self.max_file_bytes:
+                await self._rotate()
+            data = "".join(lines)
+            await self._file.write(data)
+            await self._file.flush()
+            self._file_bytes += len(data.encode("utf-8"))
+
+    async def close(self):
+        """
+        刷盘并关闭文件，配置了legacy_json_path时导出JSON数组文件
+        Returns:
+
+        """
+        await self.flush()
+        async with self._lock:
+            await self._close_file()
+        if self.legacy_json_path:
+            await convert_jsonl_to_json(self.part_paths, self.legacy_json_path)
+
+
+def discover_part_paths(file_path: str) -> List[str]:
+    """
+    查找磁盘上已有的分片文件（包括之前的运行写入的分片），按分片序号排序
+    Args:
+        file_path: jsonl文件路径
+
+    Returns: 以file_path开头的分片文件路径列表
+
+    """
+    directory, file_name = os.path.split(file_path)
+    root, ext = os.path.splitext(file_name)
+    part_pattern = re.compile(rf"^{re.escape(root)}\.(\d+){re.escape(ext)}$")
+    part_indexes = []
+    if os.path.isdir(directory or "."):
+        for name in os.listdir(directory or "."):
+            match = part_pattern.match(name)
+            if match:
+                part_indexes.append(int(match.group(1)))
+    return [file_path] + [os.path.join(directory, f"{root}.{index}{ext}") for index in sorted(part_indexes)]
+
+
+async def convert_jsonl_to_json(jsonl_paths: List[str], json_path: str):
+    """
+    将一个或多个jsonl分片文件合并转换为JSON数组文件，兼容旧版的json存储格式
+    Args:
+        jsonl_paths: jsonl文件路径列表，按顺序合并
+        json_path: 输出的JSON文件路径
+
+    Returns:
+
+    """
+    pathlib.Path(json_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{json_path}.tmp"
+    first = True
+    async with aiofiles.open(tmp_path, mode="w", encoding="utf-8") as out_file:
+        await out_file.write("[")
+        for jsonl_path in jsonl_paths:
+            if not os.path.exists(jsonl_path):
+                continue
+            async with aiofiles.open(jsonl_path, mode="r", encoding="utf-8") as in_file:
+                async for line in in_file:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    await out_file.write(("\n" if first else ",\n") + line)
+                    first = False
+        await out_file.write("\n]" if not first else "]")
+    os.replace(tmp_path, json_path)
+    utils.logger.info(f"[convert_jsonl_to_json] export {jsonl_paths} to {json_path}")
+
+
+_writers: Dict[str, JsonLinesWriter] = {}
+
+
+def get_writer(file_path: str, legacy_json_path: Optional[str] = None) -> JsonLinesWriter:
+    """
+    获取文件对应的写入器，同一个文件在整个运行期间共用一个写入器
+    Args:
+        file_path: jsonl文件路径
+        legacy_json_path: 关闭时导出的JSON数组文件路径
+
+    Returns:
+
+    """
+    writer = _writers.get(file_path)
+    if writer is None:
+        writer = JsonLinesWriter(
+            file_path,
+            legacy_json_path=legacy_json_path if config.JSONL_EXPORT_JSON_ON_CLOSE else None,
+            flush_batch_size=config.JSONL_FLUSH_BATCH_SIZE,
+            flush_interval=config.JSONL_FLUSH_INTERVAL_SEC,
+            max_file_bytes=config.JSONL_MAX_FILE_SIZE_MB * 1024 * 1024,
+        )
+        _writers[file_path] = writer
+    return writer
+
+
+async def close_all_writers():
+    """
+    关闭所有写入器，在爬虫运行结束时调用
+    Returns:
+
+    """
+    while _writers:
+        _, writer = _writers.popitem()
+        try:
+            await writer.close()
+        except Exception as e:
+            utils.logger.error(f"[close_all_writers] close jsonl writer {writer.file_path} error: {e}")
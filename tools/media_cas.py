@@ -0,0 +1,205 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 按内容寻址的媒体文件存储
+#            媒体文件按 sha256 保存一份，各笔记目录下的文件是指向它的硬链接（或软链接），跨笔记、跨平台去重；
+#            URL -> sha256 的索引保存在SQLite中，已经下载过的URL不再发起请求
+
+import asyncio
+import hashlib
+import os
+import pathlib
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+import config
+from async_sqlite_db import AsyncSqliteDB
+from tools import utils
+
+LINK_TYPE_HARDLINK = "hardlink"
+LINK_TYPE_SYMLINK = "symlink"
+
+MEDIA_URL_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS media_url (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    etag TEXT NOT NULL DEFAULT '',
+    last_modified TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_media_url_sha256 ON media_url (sha256);
+"""
+
+
+@dataclass
+class MediaBlob:
+    """
+    按内容保存的媒体文件
+    """
+    sha256: str
+    path: str
+
+
+@dataclass
+class MediaUrlRecord:
+    """
+    URL索引中的一条记录
+    """
+    url: str
+    blob: MediaBlob
+    size: int
+    etag: str
+    last_modified: str
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def link_file(src: str, dst: str, link_type: str = LINK_TYPE_HARDLINK):
+    """
+    在 dst 创建指向 src 的链接，已存在的 dst 会被原子替换
+    硬链接失败时（例如跨磁盘、文件系统不支持）依次退化为软链接、复制
+    Args:
+        src: 源文件
+        dst: 目标路径
+        link_type: hardlink | symlink
+
+    Returns:
+
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    pathlib.Path(dst).parent.mkdir(parents=True, exist_ok=True)
+    tmp_dst = f"{dst}.{uuid.uuid4().hex}.link"
+    try:
+        linked = False
+        if link_type == LINK_TYPE_HARDLINK:
+            try:
+                os.link(src, tmp_dst)
+                linked = True
+            except OSError:
+                pass
+        if not linked:
+            try:
+                os.symlink(os.path.abspath(src), tmp_dst)
+            except OSError:
+                shutil.copyfile(src, tmp_dst)
+        os.replace(tmp_dst, dst)
+    except BaseException:
+        if os.path.lexists(tmp_dst):
+            os.remove(tmp_dst)
+        raise
+
+
+class MediaBlobStore:
+    """
+    按内容寻址的媒体存储
+    - 文件保存为 {blob_dir}/{sha256前两位}/{sha256}，内容相同的文件只保存一份
+    - URL索引记录每个URL对应的sha256以及响应的ETag/Last-Modified，用于跳过下载或者发起条件请求
+    """
+
+    def __init__(self, blob_dir: str, index_db_path: str):
+        """
+        Args:
+            blob_dir: 媒体文件保存目录
+            index_db_path: URL索引文件路径
+        """
+        self.blob_dir = blob_dir
+        self.index_db_path = index_db_path
+        self._db: Optional[AsyncSqliteDB] = None
+
+    async def open(self):
+        if self._db is not None:
+            return
+        pathlib.Path(self.index_db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = AsyncSqliteDB(self.index_db_path)
+        await self._db.executescript(MEDIA_URL_TABLE_SQL)
+
+    async def close(self):
+        db, self._db = self._db, None
+        if db is not None:
+            await db.close()
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], sha256)
+
+    async def lookup(self, url: str) -> Optional[MediaUrlRecord]:
+        """
+        查询URL是否已经下载过
+        Args:
+            url: 媒体文件地址
+
+        Returns:
+            没有下载过或者文件已经被删除时返回None
+        """
+        await self.open()
+        row = await self._db.get_first("SELECT * FROM media_url WHERE url=?", url)
+        if row is None:
+            return None
+        blob = MediaBlob(sha256=row["sha256"], path=self.blob_path(row["sha256"]))
+        if not os.path.exists(blob.path):
+            return None
+        return MediaUrlRecord(url=url, blob=blob, size=row["size"], etag=row["etag"], last_modified=row["last_modified"])
+
+    async def ingest(self, url: str, file_path: str, etag: str = "", last_modified: str = "") -> MediaBlob:
+        """
+        将下载好的文件移动到按内容寻址的目录下，并记录URL索引
+        Args:
+            url: 媒体文件地址
+            file_path: 下载好的文件
+            etag: 响应头中的ETag
+            last_modified: 响应头中的Last-Modified
+
+        Returns:
+
+        """
+        await self.open()
+        loop = asyncio.get_running_loop()
+        sha256 = await loop.run_in_executor(None, file_sha256, file_path)
+        blob = MediaBlob(sha256=sha256, path=self.blob_path(sha256))
+        size = os.path.getsize(file_path)
+        if os.path.exists(blob.path):
+            # 内容相同的文件已经保存过，例如同一张图片出现在多篇笔记里
+            os.remove(file_path)
+            utils.logger.info(f"[MediaBlobStore.ingest] duplicate media {url}, sha256: {sha256}")
+        else:
+            pathlib.Path(blob.path).parent.mkdir(parents=True, exist_ok=True)
+            await loop.run_in_executor(None, shutil.move, file_path, blob.path)
+        await self._db.execute(
+            "INSERT INTO media_url (url, sha256, size, etag, last_modified, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET sha256=excluded.sha256, size=excluded.size, etag=excluded.etag, "
+            "last_modified=excluded.last_modified, updated_at=excluded.updated_at",
+            url, sha256, size, etag or "", last_modified or "", time.time(),
+        )
+        return blob
+
+
+async def link_blob(blob: MediaBlob, save_file_name: str):
+    """
+    存储层保存 MediaBlob 时调用，在笔记目录下按 config.MEDIA_LINK_TYPE 创建指向媒体文件的链接
+    Args:
+        blob: 媒体文件
+        save_file_name: 笔记目录下的文件路径
+
+    Returns:
+
+    """
+    await asyncio.get_running_loop().run_in_executor(None, link_file, blob.path, save_file_name, config.MEDIA_LINK_TYPE)
@@ -0,0 +1,374 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 媒体文件流式下载，边下载边写入临时文件，完成后fsync并原子重命名，不在内存中缓存整个视频
+
+import asyncio
+import json
+import os
+import re
+import pathlib
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import AsyncIterable, Dict, List, Optional, Tuple, Union
+
+import aiofiles
+import httpx
+
+import config
+from tools import utils
+from tools.media_cas import MediaBlob, link_blob
+
+# 保存媒体文件时可以传入的内容：按内容保存的媒体文件、下载好的文件路径、字节流(异步迭代器)，或者兼容旧调用方式的bytes
+MediaContent = Union[MediaBlob, str, os.PathLike, bytes, AsyncIterable[bytes]]
+
+
+class MediaDownloadError(Exception):
+    pass
+
+
+@dataclass
+class DownloadResult:
+    file_path: str
+    size: int
+    elapsed: float
+    # 断点续传时已经下载好的字节数
+    resumed_from: int = 0
+    # 条件请求返回304，文件没有变化，没有下载任何内容
+    not_modified: bool = False
+    etag: str = ""
+    last_modified: str = ""
+
+    @property
+    def bytes_per_sec(self) -> float:
+        downloaded = self.size - self.resumed_from
+        return downloaded / self.elapsed if self.elapsed > 0 else float(downloaded)
+
+
+async def _write_chunks(chunks: AsyncIterable[bytes], save_file_name: str, part_file_name: Optional[str] = None,
+                        append: bool = False) -> int:
+    """
+    将字节流写入临时文件，fsync后原子重命名为目标文件
+    Args:
+        chunks: 字节流
+        save_file_name: 目标文件路径
+        part_file_name: 临时文件路径，为None时在目标目录下新建，写入失败时删除；
+                        指定时写入失败会保留已写入的部分，用于断点续传
+        append: 是否追加写入临时文件
+
+    Returns:
+        本次写入的字节数
+    """
+    save_dir = os.path.dirname(save_file_name) or "."
+    pathlib.Path(save_dir).mkdir(parents=True, exist_ok=True)
+    keep_part_file = part_file_name is not None
+    if part_file_name is None:
+        fd, part_file_name = tempfile.mkstemp(dir=save_dir, prefix=f".{os.path.basename(save_file_name)}.", suffix=".part")
+        os.close(fd)
+    size = 0
+    try:
+        async with aiofiles.open(part_file_name, "ab" if append else "wb") as f:
+            async for chunk in chunks:
+                await f.write(chunk)
+                size += len(chunk)
+            await f.flush()
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, f.fileno())
+        os.replace(part_file_name, save_file_name)
+    except BaseException:
+        if not keep_part_file and os.path.exists(part_file_name):
+            os.remove(part_file_name)
+        raise
+    return size
+
+
+async def download_to_file(
+    client: httpx.AsyncClient,
+    url: str,
+    save_file_name: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    resume: bool = False,
+    etag: str = "",
+    last_modified: str = "",
+    **kwargs,
+) -> DownloadResult:
+    """
+    流式下载媒体文件，响应体按块写入磁盘
+    Args:
+        client: httpx客户端
+        url: 媒体文件地址
+        save_file_name: 保存路径，为None时保存到 config.MEDIA_DOWNLOAD_TMP_DIR 下的临时文件，由存储层再移动到最终位置
+        chunk_size: 每次读取的字节数
+        resume: 是否断点续传，需要指定 save_file_name。下载中断时保留 {save_file_name}.part，
+                下次下载时通过 Range 请求从已下载的位置继续，服务端不支持 Range 时重新下载
+        etag: 上次下载时的ETag，传入时发起条件请求
+        last_modified: 上次下载时的Last-Modified，传入时发起条件请求
+        **kwargs: 透传给 client.stream 的参数，例如 headers、timeout
+
+    Returns:
+        下载结果，包含文件路径、大小和耗时；文件没有变化时 not_modified 为True，不会写入文件
+    Raises:
+        httpx.HTTPError: 网络错误或者状态码不是2xx
+        MediaDownloadError: 状态码不是200/206
+    """
+    is_tmp_file = save_file_name is None
+    if is_tmp_file:
+        pathlib.Path(config.MEDIA_DOWNLOAD_TMP_DIR).mkdir(parents=True, exist_ok=True)
+        fd, save_file_name = tempfile.mkstemp(dir=config.MEDIA_DOWNLOAD_TMP_DIR, suffix=".download")
+        os.close(fd)
+    part_file_name = f"{save_file_name}.part" if resume and not is_tmp_file else None
+    resumed_from = os.path.getsize(part_file_name) if part_file_name and os.path.exists(part_file_name) else 0
+    headers = dict(kwargs.pop("headers", None) or {})
+    if resumed_from:
+        headers["Range"] = f"bytes={resumed_from}-"
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    start_time = time.monotonic()
+    try:
+        async with client.stream("GET", url, headers=headers or None, **kwargs) as response:
+            if response.status_code == 304 and (etag or last_modified):
+                if is_tmp_file:
+                    os.remove(save_file_name)
+                if part_file_name and os.path.exists(part_file_name):
+                    os.remove(part_file_name)
+                utils.logger.info(f"[download_to_file] {url} not modified")
+                return DownloadResult(
+                    file_path="", size=0, elapsed=time.monotonic() - start_time, not_modified=True,
+                    etag=etag, last_modified=last_modified,
+                )
+            if response.status_code == 416 and resumed_from:
+                # 已下载的部分与服务端文件对不上，删除后由调用方重试
+                os.remove(part_file_name)
+                raise MediaDownloadError(f"download {url} failed, range not satisfiable, restart download")
+            response.raise_for_status()
+            if response.status_code == 200:
+                resumed_from = 0
+            elif not (response.status_code == 206 and resumed_from):
+                raise MediaDownloadError(f"download {url} failed, status code: {response.status_code}")
+            size = await _write_chunks(
+                response.aiter_bytes(chunk_size or config.MEDIA_DOWNLOAD_CHUNK_SIZE), save_file_name,
+                part_file_name=part_file_name, append=bool(resumed_from),
+            )
+    except BaseException:
+        if is_tmp_file and os.path.exists(save_file_name):
+            os.remove(save_file_name)
+        raise
+    result = DownloadResult(
+        file_path=save_file_name, size=resumed_from + size, elapsed=time.monotonic() - start_time,
+        resumed_from=resumed_from,
+        etag=response.headers.get("ETag", ""),
+        last_modified=response.headers.get("Last-Modified", ""),
+    )
+    utils.logger.info(
+        f"[download_to_file] downloaded {url}, size: {result.size} bytes, resumed from: {result.resumed_from}, "
+        f"speed: {result.bytes_per_sec / 1024:.1f} KB/s"
+    )
+    return result
+
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+)")
+
+
+async def probe_range_support(client: httpx.AsyncClient, url: str, **kwargs) -> Tuple[int, str]:
+    """
+    请求第一个字节，探测文件大小以及服务端是否支持 Range 请求
+    Args:
+        client: httpx客户端
+        url: 媒体文件地址
+        **kwargs: 透传给 client.stream 的参数
+
+    Returns:
+        (文件大小, ETag)，不支持 Range 请求或者无法获取文件大小时文件大小为0
+    """
+    headers = {**(kwargs.pop("headers", None) or {}), "Range": "bytes=0-0"}
+    async with client.stream("GET", url, headers=headers, **kwargs) as response:
+        # 不读取响应体直接关闭，服务端不支持 Range 时返回的是整个文件
+        response.raise_for_status()
+        match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+        if response.status_code != 206 or not match:
+            return 0, ""
+        return int(match.group(3)), response.headers.get("ETag", "")
+
+
+def _split_segments(size: int, segment_count: int) -> List[List[int]]:
+    # 每个分段为 [起始位置, 结束位置(包含), 已下载字节数]
+    segment_size = -(-size // segment_count)
+    return [[start, min(start + segment_size, size) - 1, 0] for start in range(0, size, segment_size)]
+
+
+def _load_progress(progress_file_name: str, url: str, size: int, etag: str) -> Optional[List[List[int]]]:
+    if not os.path.exists(progress_file_name):
+        return None
+    try:
+        with open(progress_file_name, "r", encoding="utf-8") as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # 文件大小或者ETag变化说明服务端的文件已经换了，已下载的部分不能用
+    if progress.get("url") != url or progress.get("size") != size or progress.get("etag", "") != etag:
+        return None
+    return progress.get("segments")
+
+
+def _save_progress(progress_file_name: str, progress: Dict):
+    tmp_file_name = f"{progress_file_name}.tmp"
+    with open(tmp_file_name, "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+    os.replace(tmp_file_name, progress_file_name)
+
+
+async def download_ranged(
+    client: httpx.AsyncClient,
+    url: str,
+    save_file_name: str,
+    segment_count: Optional[int] = None,
+    min_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    segment_retries: Optional[int] = None,
+    **kwargs,
+) -> DownloadResult:
+    """
+    分段并发下载大文件
+    - 先请求第一个字节探测文件大小和 Range 支持，不支持或者文件小于 min_size 时退回单连接的 download_to_file
+    - 预先分配 {save_file_name}.part 的大小，N个分段并发下载后按偏移写入
+    - 各分段的下载进度保存在 {save_file_name}.progress 中，中断后再次调用时从各分段已下载的位置继续
+    - 全部分段完成并校验文件大小后，fsync并原子重命名为目标文件
+    Args:
+        client: httpx客户端
+        url: 媒体文件地址
+        save_file_name: 保存路径
+        segment_count: 分段数，即并发连接数
+        min_size: 小于该字节数的文件不分段下载
+        chunk_size: 每次读取的字节数
+        segment_retries: 单个分段失败后的重试次数，重试时从该分段已下载的位置继续
+        **kwargs: 透传给 client.stream 的参数，例如 headers、timeout
+
+    Returns:
+        下载结果
+    Raises:
+        httpx.HTTPError: 网络错误或者状态码不是2xx
+        MediaDownloadError: 分段下载失败或者文件大小校验失败
+    """
+    segment_count = segment_count or config.MEDIA_RANGED_DOWNLOAD_SEGMENTS
+    min_size = config.MEDIA_RANGED_DOWNLOAD_MIN_SIZE if min_size is None else min_size
+    chunk_size = chunk_size or config.MEDIA_DOWNLOAD_CHUNK_SIZE
+    segment_retries = config.MEDIA_RANGED_SEGMENT_RETRIES if segment_retries is None else segment_retries
+    headers = dict(kwargs.pop("headers", None) or {})
+
+    size, etag = await probe_range_support(client, url, headers=headers, **kwargs)
+    if segment_count <= 1 or size <= 0 or size < min_size:
+        return await download_to_file(client, url, save_file_name, chunk_size=chunk_size, resume=True,
+                                      headers=headers, **kwargs)
+
+    part_file_name = f"{save_file_name}.part"
+    progress_file_name = f"{save_file_name}.progress"
+    loop = asyncio.get_running_loop()
+    segments = await loop.run_in_executor(None, _load_progress, progress_file_name, url, size, etag)
+    if segments is None or not os.path.exists(part_file_name) or os.path.getsize(part_file_name) != size:
+        segments = _split_segments(size, segment_count)
+        pathlib.Path(part_file_name).parent.mkdir(parents=True, exist_ok=True)
+        with open(part_file_name, "wb") as f:
+            f.truncate(size)
+    progress = {"url": url, "size": size, "etag": etag, "segments": segments}
+    resumed_from = sum(segment[2] for segment in segments)
+    start_time = time.monotonic()
+    last_save_time = start_time
+
+    async def _save_progress_periodically(force: bool = False):
+        nonlocal last_save_time
+        if force or time.monotonic() - last_save_time >= 1:
+            last_save_time = time.monotonic()
+            await loop.run_in_executor(None, _save_progress, progress_file_name, progress)
+
+    async def _download_segment(segment: List[int]):
+        start, end = segment[0], segment[1]
+        for attempt in range(segment_retries + 1):
+            if start + segment[2] > end:
+                return
+            range_headers = {**headers, "Range": f"bytes={start + segment[2]}-{end}"}
+            if etag:
+                range_headers["If-Range"] = etag
+            try:
+                async with client.stream("GET", url, headers=range_headers, **kwargs) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise MediaDownloadError(f"download {url} failed, range request returned {response.status_code}")
+                    # 不使用缓冲，写入的数据立即交给操作系统，保存的进度不会超前于已写入的数据
+                    async with aiofiles.open(part_file_name, "r+b", buffering=0) as f:
+                        await f.seek(start + segment[2])
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            chunk = chunk[:end + 1 - start - segment[2]]
+                            await f.write(chunk)
+                            segment[2] += len(chunk)
+                            await _save_progress_periodically()
+                if start + segment[2] <= end:
+                    raise MediaDownloadError(f"download {url} failed, segment {start}-{end} incomplete")
+                return
+            except (httpx.HTTPError, MediaDownloadError) as e:
+                if attempt >= segment_retries:
+                    raise
+                utils.logger.warning(
+                    f"[download_ranged] segment {start}-{end} of {url} failed, retry from {start + segment[2]}: {e}"
+                )
+
+    try:
+        # 等待所有分段结束后再处理失败，其他分段已下载的部分也能记录到进度中
+        results = await asyncio.gather(*[_download_segment(segment) for segment in segments], return_exceptions=True)
+    finally:
+        # 失败时保留已下载的进度，下次调用时继续
+        await _save_progress_periodically(force=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+    if os.path.getsize(part_file_name) != size or any(s[0] + s[2] != s[1] + 1 for s in segments):
+        raise MediaDownloadError(f"download {url} failed, size mismatch, expected {size}")
+    with open(part_file_name, "rb+") as f:
+        await loop.run_in_executor(None, os.fsync, f.fileno())
+    os.replace(part_file_name, save_file_name)
+    os.remove(progress_file_name)
+    result = DownloadResult(
+        file_path=save_file_name, size=size, elapsed=time.monotonic() - start_time, resumed_from=resumed_from, etag=etag,
+    )
+    utils.logger.info(
+        f"[download_ranged] downloaded {url} in {len(segments)} segments, size: {result.size} bytes, "
+        f"resumed from: {result.resumed_from}, speed: {result.bytes_per_sec / 1024:.1f} KB/s"
+    )
+    return result
+
+
+async def save_media(content: MediaContent, save_file_name: str) -> str:
+    """
+    将媒体内容保存到目标路径
+    Args:
+        content: 按内容保存的媒体文件（创建链接）、已下载的文件路径（移动到目标路径）、字节流或bytes
+        save_file_name: 目标文件路径
+
+    Returns:
+        目标文件路径
+    """
+    if isinstance(content, MediaBlob):
+        await link_blob(content, save_file_name)
+    elif isinstance(content, (str, os.PathLike)):
+        pathlib.Path(save_file_name).parent.mkdir(parents=True, exist_ok=True)
+        # 同一文件系统下是原子重命名，跨文件系统时退化为复制后删除
+        await asyncio.get_running_loop().run_in_executor(None, shutil.move, os.fspath(content), save_file_name)
+    elif isinstance(content, (bytes, bytearray)):
+        async def _single_chunk():
+            yield bytes(content)
+        await _write_chunks(_single_chunk(), save_file_name)
+    else:
+        await _write_chunks(content, save_file_name)
+    return save_file_name
@@ -0,0 +1,518 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 媒体下载任务队列和下载worker池
+#            爬取详情时只把图片/视频下载任务写入持久化队列(SQLite)，由独立的worker池并发下载，
+#            未完成的任务在重启后继续下载，也可以用 --media_only 单独启动一个只下载媒体的进程
+
+import asyncio
+import hashlib
+import json
+import os
+import pathlib
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+import config
+from async_sqlite_db import AsyncSqliteDB
+from tools import rate_limiter, utils
+from tools.media_cas import MediaBlobStore
+from tools.media_download import MediaContent, download_ranged, download_to_file
+from tools.rate_limiter import ENDPOINT_CLASS_MEDIA, TokenBucket
+
+if TYPE_CHECKING:
+    from base.base_crawler import AbstractApiClient
+
+JOB_STATUS_PENDING = "pending"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_DONE = "done"
+JOB_STATUS_FAILED = "failed"
+
+MEDIA_JOB_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS media_job (
+    job_id TEXT PRIMARY KEY,
+    platform TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    owner_id TEXT NOT NULL,
+    extension_file_name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    headers TEXT NOT NULL DEFAULT '{}',
+    proxy TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT NOT NULL DEFAULT '',
+    next_run_at REAL NOT NULL DEFAULT 0,
+    claimed_at REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_media_job_status ON media_job (status, next_run_at);
+"""
+
+
+@dataclass
+class MediaJob:
+    """
+    一个媒体文件下载任务，下载完成后交给 store.store_media 按平台和媒体类型保存
+    """
+    platform: str
+    media_type: str  # image | video
+    owner_id: str  # 笔记/视频/图片id，决定保存目录
+    extension_file_name: str
+    url: str
+    # 下载时需要携带的请求头，例如防盗链的Referer，不要放入cookie等登录态
+    headers: Dict[str, str] = field(default_factory=dict)
+    # 下载使用的httpx代理地址，与爬取该内容的API客户端一致，空字符串表示直连
+    proxy: str = ""
+    attempts: int = 0
+
+    @property
+    def job_id(self) -> str:
+        # 同一个媒体文件重复入队时只下载一次
+        return hashlib.md5(
+            f"{self.platform}:{self.media_type}:{self.owner_id}:{self.extension_file_name}".encode("utf-8")
+        ).hexdigest()
+
+
+class MediaJobQueue:
+    """
+    持久化在SQLite中的下载任务队列，多个进程可以共用同一个队列文件
+    - 任务领取后标记为 running 并记录领取时间，领取超过 lease_sec 仍未完成的任务（进程崩溃）可以被重新领取
+    - 下载失败的任务按指数退避重新排队，超过最大重试次数后标记为 failed，再次入队时重置
+    - 已经完成的任务在URL变化后再次入队时重新下载，requeue_done 为True时无论URL是否变化都重新下载
+    """
+
+    def __init__(self, db_path: str, lease_sec: float = 600):
+        """
+        Args:
+            db_path: 队列文件路径
+            lease_sec: 任务领取后的租期（秒）
+        """
+        self.db_path = db_path
+        self.lease_sec = lease_sec
+        self._db: Optional[AsyncSqliteDB] = None
+
+    async def open(self):
+        if self._db is not None:
+            return
+        pathlib.Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = AsyncSqliteDB(self.db_path)
+        await self._db.executescript(MEDIA_JOB_TABLE_SQL)
+        columns = {row["name"] for row in await self._db.query("PRAGMA table_info(media_job)")}
+        if "proxy" not in columns:
+            # 旧版本的队列文件没有proxy列
+            await self._db.execute("ALTER TABLE media_job ADD COLUMN proxy TEXT NOT NULL DEFAULT ''")
+
+    async def close(self):
+        db, self._db = self._db, None
+        if db is not None:
+            await db.close()
+
+    async def put(self, job: MediaJob, requeue_done: bool = False) -> bool:
+        """
+        任务入队，正在下载的任务和URL没有变化的已完成任务不会重复入队
+        Args:
+            job: 下载任务
+            requeue_done: URL没有变化的已完成任务是否也重新入队，例如本地文件已被删除或需要重新校验
+
+        Returns:
+            是否新加入了队列
+        """
+        await self.open()
+        now = time.time()
+        rowcount = await self._db.execute(
+            "INSERT INTO media_job (job_id, platform, media_type, owner_id, extension_file_name, url, headers, "
+            "proxy, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET url=excluded.url, headers=excluded.headers, proxy=excluded.proxy, "
+            "status=excluded.status, attempts=0, last_error='', next_run_at=0 "
+            "WHERE media_job.status=? OR (media_job.status IN (?, ?) AND media_job.url<>excluded.url) "
+            "OR (media_job.status=? AND ?)",
+            job.job_id, job.platform, job.media_type, job.owner_id, job.extension_file_name, job.url,
+            json.dumps(job.headers), job.proxy, JOB_STATUS_PENDING, now,
+            JOB_STATUS_FAILED, JOB_STATUS_PENDING, JOB_STATUS_DONE, JOB_STATUS_DONE, int(requeue_done),
+        )
+        return rowcount > 0
+
+    async def claim(self) -> Optional[MediaJob]:
+        """
+        领取一个可以执行的任务
+        Returns:
+            没有可执行的任务时返回None
+        """
+        await self.open()
+        while True:
+            now = time.time()
+            row = await self._db.get_first(
+                "SELECT * FROM media_job WHERE (status=? AND next_run_at<=?) OR (status=? AND claimed_at<?) "
+                "ORDER BY created_at LIMIT 1",
+                JOB_STATUS_PENDING, now, JOB_STATUS_RUNNING, now - self.lease_sec,
+            )
+            if row is None:
+                return None
+            # 条件更新，其他进程已经领取了同一个任务时重新查询
+            rowcount = await self._db.execute(
+                "UPDATE media_job SET status=?, claimed_at=? WHERE job_id=? AND status=? AND claimed_at=?",
+                JOB_STATUS_RUNNING, now, row["job_id"], row["status"], row["claimed_at"],
+            )
+            if rowcount == 1:
+                return MediaJob(
+                    platform=row["platform"],
+                    media_type=row["media_type"],
+                    owner_id=row["owner_id"],
+                    extension_file_name=row["extension_file_name"],
+                    url=row["url"],
+                    headers=json.loads(row["headers"]),
+                    proxy=row["proxy"],
+                    attempts=row["attempts"],
+                )
+
+    async def mark_done(self, job: MediaJob):
+        await self._db.execute("UPDATE media_job SET status=?, last_error='' WHERE job_id=?", JOB_STATUS_DONE, job.job_id)
+
+    async def mark_failed(self, job: MediaJob, error: str, max_retries: int, retry_backoff: float):
+        """
+        记录失败，未超过最大重试次数时按指数退避重新排队
+        Args:
+            job: 下载任务
+            error: 错误信息
+            max_retries: 最大重试次数
+            retry_backoff: 第一次重试的等待秒数，之后每次翻倍
+
+        Returns:
+
+        """
+        attempts = job.attempts + 1
+        if attempts > max_retries:
+            status, next_run_at = JOB_STATUS_FAILED, 0
+        else:
+            status, next_run_at = JOB_STATUS_PENDING, time.time() + retry_backoff * (2 ** (attempts - 1))
+        await self._db.execute(
+            "UPDATE media_job SET status=?, attempts=?, last_error=?, next_run_at=? WHERE job_id=?",
+            status, attempts, error[:500], next_run_at, job.job_id,
+        )
+
+    async def count(self, *statuses: str) -> int:
+        await self.open()
+        placeholders = ",".join(["?"] * len(statuses))
+        row = await self._db.get_first(f"SELECT COUNT(*) AS cnt FROM media_job WHERE status IN ({placeholders})", *statuses)
+        return row["cnt"]
+
+    async def next_run_delay(self) -> Optional[float]:
+        """
+        最近一个排队中的任务还需要等待的秒数，没有排队中的任务时返回None
+        """
+        await self.open()
+        row = await self._db.get_first(
+            "SELECT MIN(next_run_at) AS next_run_at FROM media_job WHERE status=?", JOB_STATUS_PENDING
+        )
+        if row is None or row["next_run_at"] is None:
+            return None
+        return max(row["next_run_at"] - time.time(), 0)
+
+
+class MediaDownloadPool:
+    """
+    媒体下载worker池
+    - 与元数据、评论的爬取解耦，详情阶段只负责入队，下载不再阻塞爬取
+    - 固定数量的worker并发下载，下载前等待平台的全局限速，每个CDN域名再用一个令牌桶单独限速
+    - 按任务记录的代理下载，绑定了爬虫的API客户端时复用它按代理缓存的连接池
+    - 下载中断后保留 .part 文件，重试时断点续传
+    - 传入 blob_store 时按内容去重：已经下载过的URL不再请求，下载的文件按sha256保存，笔记目录下只创建链接
+    - 再次爬取到已完成的任务时，本地文件被删除或者开启了 revalidate 的任务重新入队
+    """
+
+    def __init__(
+        self,
+        queue: MediaJobQueue,
+        store_handler: Callable[[MediaJob, MediaContent], Awaitable[None]],
+        concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 5.0,
+        cdn_qps: float = 5.0,
+        cdn_burst: int = 5,
+        client: Optional[httpx.AsyncClient] = None,
+        poll_interval: float = 1.0,
+        blob_store: Optional[MediaBlobStore] = None,
+        revalidate: bool = False,
+        path_handler: Optional[Callable[[MediaJob], Optional[str]]] = None,
+    ):
+        """
+        Args:
+            queue: 持久化的任务队列
+            store_handler: 下载完成后保存文件的协程函数，参数为 (任务, 下载好的文件路径或者MediaBlob)
+            concurrency: worker数量
+            max_retries: 单个任务的最大重试次数
+            retry_backoff: 第一次重试的等待秒数，之后每次翻倍
+            cdn_qps: 每个CDN域名的每秒请求数，0表示不限速
+            cdn_burst: 每个CDN域名的突发请求数
+            client: 下载使用的httpx客户端，为None时按任务的代理获取
+            poll_interval: 队列为空时检查新任务的间隔（秒）
+            blob_store: 按内容寻址的媒体存储，为None时不去重
+            revalidate: 已经下载过的URL是否通过ETag/Last-Modified条件请求确认文件没有变化，False时直接跳过
+            path_handler: 返回任务保存到本地的文件路径，用来判断已完成任务的文件是否被删除
+        """
+        self.queue = queue
+        self.store_handler = store_handler
+        self.concurrency = max(concurrency, 1)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.cdn_qps = cdn_qps
+        self.cdn_burst = cdn_burst
+        self.poll_interval = poll_interval
+        self.blob_store = blob_store
+        self.revalidate = revalidate
+        self.path_handler = path_handler
+        self.downloaded_count = 0
+        # 已经下载过，没有发起请求或者条件请求返回304的任务数
+        self.skipped_count = 0
+        self.failed_count = 0
+        self._client = client
+        # 爬虫的API客户端，下载通过它的 get_http_client 复用同一个代理的连接池
+        self.api_client: Optional["AbstractApiClient"] = None
+        # 没有绑定API客户端时（例如 --media_only）按代理创建的客户端，关闭时一起关闭
+        self._own_clients: Dict[Optional[str], httpx.AsyncClient] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._workers: List[asyncio.Task] = []
+        self._running_count = 0
+        self._new_job_event = asyncio.Event()
+
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def put(self, job: MediaJob):
+        """
+        提交下载任务，写入持久化队列后立即返回
+        """
+        if await self.queue.put(job, requeue_done=self.revalidate or self._is_file_missing(job)):
+            self._new_job_event.set()
+
+    async def join(self):
+        """
+        等待队列中的任务全部完成（包括等待重试的任务）
+        """
+        while True:
+            if self._running_count == 0 and await self.queue.count(JOB_STATUS_PENDING) == 0:
+                break
+            await asyncio.sleep(self.poll_interval)
+        utils.logger.info(
+            f"[MediaDownloadPool.join] media queue drained, downloaded: {self.downloaded_count}, "
+            f"skipped: {self.skipped_count}, failed: {self.failed_count}"
+        )
+
+    async def close(self, drain: bool = True):
+        """
+        停止worker，drain为True时先等待队列中的任务下载完成，否则未完成的任务留在队列中下次继续
+        """
+        try:
+            if drain and self._workers:
+                await self.join()
+        finally:
+            workers, self._workers = self._workers, []
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            own_clients, self._own_clients = self._own_clients, {}
+            for client in own_clients.values():
+                await client.aclose()
+            await self.queue.close()
+            if self.blob_store is not None:
+                await self.blob_store.close()
+
+    def bind_api_client(self, api_client: "AbstractApiClient"):
+        """
+        绑定爬虫的API客户端，之后的下载复用它的httpx连接池，API客户端需要在下载池关闭之后再关闭
+        """
+        self.api_client = api_client
+
+    def _get_client(self, proxy: Optional[str]) -> httpx.AsyncClient:
+        if self._client is not None:
+            return self._client
+        if self.api_client is not None:
+            return self.api_client.get_http_client(proxy)
+        client = self._own_clients.get(proxy)
+        if client is None:
+            client = httpx.AsyncClient(proxy=proxy)
+            self._own_clients[proxy] = client
+        return client
+
+    def _is_file_missing(self, job: MediaJob) -> bool:
+        if self.path_handler is None:
+            return False
+        file_path = self.path_handler(job)
+        return file_path is not None and not os.path.exists(file_path)
+
+    def _get_bucket(self, url: str) -> Optional[TokenBucket]:
+        if self.cdn_qps <= 0:
+            return None
+        host = urlparse(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self.cdn_qps, self.cdn_burst)
+            self._buckets[host] = bucket
+        return bucket
+
+    def _download_file_name(self, job: MediaJob) -> str:
+        # 同一个任务每次重试使用相同的临时文件，中断的下载可以续传
+        return os.path.join(config.MEDIA_DOWNLOAD_TMP_DIR, f"{job.job_id}.download")
+
+    async def _wait_new_job(self):
+        delay = await self.queue.next_run_delay()
+        timeout = self.poll_interval if delay is None else min(max(delay, 0.01), self.poll_interval)
+        try:
+            await asyncio.wait_for(self._new_job_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._new_job_event.clear()
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.claim()
+            if job is None:
+                await self._wait_new_job()
+                continue
+            self._running_count += 1
+            try:
+                await self._download(job)
+            finally:
+                self._running_count -= 1
+
+    async def _download(self, job: MediaJob):
+        try:
+            record = await self.blob_store.lookup(job.url) if self.blob_store is not None else None
+            if record is not None and not self.revalidate:
+                await self.store_handler(job, record.blob)
+                self.skipped_count += 1
+                await self.queue.mark_done(job)
+                return
+            proxy = job.proxy or None
+            await rate_limiter.acquire(job.platform, job.url, proxy=proxy, endpoint_class=ENDPOINT_CLASS_MEDIA)
+            bucket = self._get_bucket(job.url)
+            if bucket is not None:
+                await bucket.acquire()
+            client = self._get_client(proxy)
+            request_kwargs = dict(
+                headers=job.headers or None, timeout=config.MEDIA_DOWNLOAD_TIMEOUT_SEC, follow_redirects=True,
+            )
+            if record is None and job.media_type == "video":
+                # 大视频分段并发下载，中断后各分段从已下载的位置继续
+                result = await download_ranged(client, job.url, self._download_file_name(job), **request_kwargs)
+            else:
+                result = await download_to_file(
+                    client, job.url, self._download_file_name(job), resume=True,
+                    etag=record.etag if record else "", last_modified=record.last_modified if record else "",
+                    **request_kwargs,
+                )
+            if result.not_modified:
+                content = record.blob
+                self.skipped_count += 1
+            elif self.blob_store is not None:
+                content = await self.blob_store.ingest(job.url, result.file_path, result.etag, result.last_modified)
+                self.downloaded_count += 1
+            else:
+                content = result.file_path
+                self.downloaded_count += 1
+            await self.store_handler(job, content)
+        except Exception as e:
+            self.failed_count += 1
+            utils.logger.error(
+                f"[MediaDownloadPool._download] download {job.platform} {job.media_type} {job.owner_id}/"
+                f"{job.extension_file_name} error, attempts: {job.attempts + 1}, error: {e}"
+            )
+            await self.queue.mark_failed(job, f"{e.__class__.__name__}: {e}", self.max_retries, self.retry_backoff)
+            if job.attempts + 1 > self.max_retries:
+                # 不再重试，删除续传用的临时文件
+                for suffix in (".part", ".progress"):
+                    tmp_file_name = f"{self._download_file_name(job)}{suffix}"
+                    if os.path.exists(tmp_file_name):
+                        os.remove(tmp_file_name)
+            return
+        await self.queue.mark_done(job)
+
+
+_media_pool: Optional[MediaDownloadPool] = None
+
+
+def get_media_pool() -> MediaDownloadPool:
+    """
+    获取全局的媒体下载池，第一次调用时创建
+    config.MEDIA_DOWNLOAD_IN_PROCESS 为 False 时只入队不启动worker，由 --media_only 进程下载
+    Returns:
+
+    """
+    global _media_pool
+    if _media_pool is None:
+        import store
+
+        _media_pool = MediaDownloadPool(
+            MediaJobQueue(config.MEDIA_QUEUE_DB_PATH, lease_sec=config.MEDIA_JOB_LEASE_SEC),
+            store_handler=store.store_media,
+            path_handler=store.media_file_path,
+            concurrency=config.MEDIA_DOWNLOAD_CONCURRENCY,
+            max_retries=config.MEDIA_DOWNLOAD_MAX_RETRIES,
+            retry_backoff=config.MEDIA_DOWNLOAD_RETRY_BACKOFF_SEC,
+            cdn_qps=config.MEDIA_DOWNLOAD_CDN_QPS,
+            cdn_burst=config.MEDIA_DOWNLOAD_CDN_BURST,
+            blob_store=MediaBlobStore(config.MEDIA_BLOB_DIR, config.MEDIA_INDEX_DB_PATH) if config.ENABLE_MEDIA_DEDUP else None,
+            revalidate=config.MEDIA_REVALIDATE,
+        )
+    if config.MEDIA_DOWNLOAD_IN_PROCESS:
+        _media_pool.start()
+    return _media_pool
+
+
+async def enqueue_media(job: MediaJob, api_client: Optional["AbstractApiClient"] = None):
+    """
+    提交一个媒体下载任务
+    Args:
+        job: 下载任务
+        api_client: 爬取该内容的API客户端，下载使用它的代理、连接池以及UA和防盗链Referer请求头
+
+    Returns:
+
+    """
+    pool = get_media_pool()
+    if api_client is not None:
+        job.proxy = job.proxy or api_client.proxy or ""
+        job.headers = {**api_client.get_media_headers(), **job.headers}
+        pool.bind_api_client(api_client)
+    await pool.put(job)
+
+
+async def close_media_pool():
+    """
+    爬虫结束时调用，等待本进程中的下载任务完成后关闭
+    Returns:
+
+    """
+    global _media_pool
+    if _media_pool is None:
+        return
+    pool, _media_pool = _media_pool, None
+    await pool.close(drain=config.MEDIA_DOWNLOAD_IN_PROCESS)
+
+
+async def run_media_only():
+    """
+    只下载媒体模式：下载持久化队列中所有未完成的任务后退出
+    Returns:
+
+    """
+    config.MEDIA_DOWNLOAD_IN_PROCESS = True
+    pool = get_media_pool()
+    pending_count = await pool.queue.count(JOB_STATUS_PENDING, JOB_STATUS_RUNNING)
+    utils.logger.info(f"[run_media_only] start downloading media, pending jobs: {pending_count}")
+    await close_media_pool()
@@ -0,0 +1,241 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : Parquet 列式存储写入工具，数据按行组(row group)批量写入，数值字段保存为整数列
+
+import asyncio
+import json
+import os
+import pathlib
+from typing import Any, Dict, List, Optional, Set
+
+import config
+from tools import utils
+
+# 按整数列保存的字段：字段名在 INT_COLUMNS 中或以 INT_COLUMN_SUFFIXES 结尾
+INT_COLUMNS: Set[str] = {
+    "time", "create_time", "created_time", "updated_time", "last_update_time",
+    "fans", "follows", "interaction", "gender", "user_rank", "is_official",
+}
+INT_COLUMN_SUFFIXES = ("_count", "_ts", "_num")
+
+# 带中文单位的计数，例如 "1.2万"、"10万+"
+_COUNT_UNITS = {"万": 10000, "千": 1000, "亿": 100000000}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("SAVE_DATA_OPTION 为 parquet 时需要安装 pyarrow: pip install -r requirements.txt")
+    return pyarrow, pyarrow.parquet
+
+
+def is_int_column(column: str) -> bool:
+    return column in INT_COLUMNS or column.endswith(INT_COLUMN_SUFFIXES)
+
+
+def parse_int(value: Any) -> Optional[int]:
+    """
+    将数值字段转换为整数，支持数字字符串和带中文单位的计数
+    Args:
+        value: 原始值
+
+    Returns:
+        无法转换时返回None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().replace(",", "").rstrip("+")
+    if not text:
+        return None
+    multiple = 1
+    if text[-1] in _COUNT_UNITS:
+        multiple = _COUNT_UNITS[text[-1]]
+        text = text[:-1]
+    try:
+        return int(float(text) * multiple)
+    except ValueError:
+        return None
+
+
+def to_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class ParquetFileWriter:
+    """
+    Parquet 写入器，一个输出文件对应一个写入器实例
+    - 数据先缓存在内存中，条数达到 row_group_size 后转换为 Arrow 表写入一个行组
+    - 列类型按行组推断：数值字段且取值都能转换为整数的保存为 int64，其余保存为字符串
+    - 后续数据出现新的字段，或整数列出现无法转换为整数的值时，切换到新的分片文件 xxx.1.parquet ...
+      新分片中该列放宽为字符串，不会把无法转换的值写成空值
+    - Parquet 文件不支持追加，文件已存在时同样写入新的分片文件
+    """
+
+    def __init__(self, file_path: str, row_group_size: int = 5000, compression: str = "zstd"):
+        """
+        Args:
+            file_path: parquet文件路径
+            row_group_size: 每个行组的数据条数
+            compression: 压缩算法，zstd | snappy | gzip | none
+        """
+        self.file_path = file_path
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.part_paths: List[str] = []
+        self._rows: List[Dict] = []
+        self._columns: List[str] = []
+        self._schema = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    def _next_part_path(self) -> str:
+        root, ext = os.path.splitext(self.file_path)
+        part_index = 0
+        path = self.file_path
+        while os.path.exists(path) or path in self.part_paths:
+            part_index += 1
+            path = f"{root}.{part_index}{ext}"
+        return path
+
+    async def write(self, item: Dict):
+        """
+        写入一条数据，缓存的条数达到行组大小时写入文件
+        Args:
+            item: 需要保存的数据
+
+        Returns:
+
+        """
+        self._rows.append(item)
+        if len(self._rows) >= self.row_group_size:
+            await self.flush()
+
+    async def flush(self):
+        """
+        将缓存的数据写入一个行组，转换和压缩在线程池中执行，不阻塞事件循环
+        Returns:
+
+        """
+        async with self._lock:
+            if not self._rows:
+                return
+            rows, self._rows = self._rows, []
+            await asyncio.get_running_loop().run_in_executor(None, self._write_row_group, rows)
+
+    def _write_row_group(self, rows: List[Dict]):
+        pa, pq = _import_pyarrow()
+        columns = list(self._columns)
+        known_columns = set(columns)
+        for row in rows:
+            for column in row:
+                if column not in known_columns:
+                    known_columns.add(column)
+                    columns.append(column)
+        schema = pa.schema([(column, self._infer_type(pa, column, rows)) for column in columns])
+        if self._writer is not None and not schema.equals(self._schema):
+            utils.logger.info(
+                f"[ParquetFileWriter._write_row_group] new columns or non-integer values found, "
+                f"switch to a new part file of {self.file_path}"
+            )
+            self._close_writer()
+        if self._writer is None:
+            self._columns = columns
+            self._schema = schema
+            path = self._next_part_path()
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(path, self._schema, compression=self.compression)
+            self.part_paths.append(path)
+
+        arrays = []
+        for field in self._schema:
+            if pa.types.is_integer(field.type):
+                values = [parse_int(row.get(field.name)) for row in rows]
+            else:
+                values = [to_text(row.get(field.name)) for row in rows]
+            arrays.append(pa.array(values, type=field.type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def _infer_type(self, pa, column: str, rows: List[Dict]):
+        if not is_int_column(column):
+            return pa.string()
+        # 已经放宽为字符串的列不再改回整数，避免频繁切换分片
+        if self._schema is not None and column in self._schema.names \
+                and pa.types.is_string(self._schema.field(column).type):
+            return pa.string()
+        for row in rows:
+            value = row.get(column)
+            if value not in (None, "") and parse_int(value) is None:
+                return pa.string()
+        return pa.int64()
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def close(self):
+        """
+        写入剩余数据并关闭文件，Parquet 文件在关闭时才写入文件尾的元数据
+        Returns:
+
+        """
+        await self.flush()
+        async with self._lock:
+            await asyncio.get_running_loop().run_in_executor(None, self._close_writer)
+
+
+_writers: Dict[str, ParquetFileWriter] = {}
+
+
+def get_writer(file_path: str) -> ParquetFileWriter:
+    """
+    获取文件对应的写入器，同一个文件在整个运行期间共用一个写入器
+    Args:
+        file_path: parquet文件路径
+
+    Returns:
+
+    """
+    writer = _writers.get(file_path)
+    if writer is None:
+        # 没有安装pyarrow时在第一次保存数据时就报错，而不是等到写入行组时
+        _import_pyarrow()
+        writer = ParquetFileWriter(
+            file_path,
+            row_group_size=config.PARQUET_ROW_GROUP_SIZE,
+            compression=config.PARQUET_COMPRESSION,
+        )
+        _writers[file_path] = writer
+    return writer
+
+
+async def close_all_writers():
+    """
+    关闭所有写入器，在爬虫运行结束时调用
+    Returns:
+
+    """
+    while _writers:
+        _, writer = _writers.popitem()
+        try:
+            await writer.close()
+        except Exception as e:
+            utils.logger.error(f"[close_all_writers] close parquet writer {writer.file_path} error: {e}")
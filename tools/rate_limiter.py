@@ -0,0 +1,206 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 全局令牌桶限速，按 (平台, 接口类别, 账号cookie, 代理IP) 分桶，替代各处零散的随机sleep
+
+import asyncio
+import hashlib
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import config
+
+# 接口类别：按URL路径中的关键字归类，先匹配到的优先
+ENDPOINT_CLASS_KEYWORDS: Tuple[Tuple[str, str], ...] = (
+    ("comment", "comment"),
+    ("search", "search"),
+    ("creator", "creator"),
+    ("user", "creator"),
+    ("space", "creator"),
+    ("profile", "creator"),
+)
+ENDPOINT_CLASS_DEFAULT = "default"
+ENDPOINT_CLASS_MEDIA = "media"
+
+BucketKey = Tuple[str, str, str, str]
+
+
+class TokenBucket:
+    """
+    令牌桶，以 rate 的速度补充令牌，最多积攒 burst 个
+    令牌不足时按预约的方式扣减（允许为负数），调用方按先后顺序依次等待，不会出现饥饿
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: 每秒补充的令牌数，即平均QPS
+            burst: 桶容量，允许的突发请求数
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        取出一个令牌
+        Returns:
+            需要等待的秒数，0表示可以立即请求
+        """
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0
+        return -self._tokens / self.rate
+
+    async def acquire(self):
+        wait_time = self.reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+
+class RateLimiter:
+    """
+    令牌桶集合，每个 (平台, 接口类别, 账号cookie, 代理IP) 一个桶
+    QPS和突发容量按 RATE_LIMIT_RULES 中 "平台:接口类别" > "平台" > 默认值 的顺序取值
+    """
+
+    def __init__(self, default_qps: float = 1.0, default_burst: int = 1,
+                 rules: Optional[Dict[str, Tuple[float, int]]] = None):
+        """
+        Args:
+            default_qps: 没有匹配到规则时的每秒请求数
+            default_burst: 没有匹配到规则时的突发容量
+            rules: 限速规则，key 为 "平台" 或 "平台:接口类别"，value 为 (每秒请求数, 突发容量)
+        """
+        self.default_qps = default_qps
+        self.default_burst = default_burst
+        self.rules = rules or {}
+        self._buckets: Dict[BucketKey, TokenBucket] = {}
+
+    def get_rule(self, platform: str, endpoint_class: str) -> Tuple[float, int]:
+        rule = self.rules.get(f"{platform}:{endpoint_class}") or self.rules.get(platform)
+        if rule:
+            return rule
+        return self.default_qps, self.default_burst
+
+    def get_bucket(self, platform: str, endpoint_class: str, cookie: str = "", proxy: str = "") -> TokenBucket:
+        """
+        获取对应的令牌桶，不存在时按规则创建
+        Args:
+            platform: 平台名称
+            endpoint_class: 接口类别
+            cookie: 账号的cookie，不同账号单独限速
+            proxy: 代理地址，不同出口IP单独限速
+
+        Returns:
+
+        """
+        key = (platform, endpoint_class, _cookie_identity(cookie), proxy or "")
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = self.get_rule(platform, endpoint_class)
+            bucket = TokenBucket(rate, burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    async def acquire(self, platform: str, url: str, cookie: str = "", proxy: Optional[str] = None,
+                      endpoint_class: Optional[str] = None):
+        """
+        请求前调用，令牌不足时等待
+        Args:
+            platform: 平台名称
+            url: 请求的URL，用于归类接口
+            cookie: 账号的cookie
+            proxy: 代理地址
+            endpoint_class: 指定接口类别，为None时根据URL归类
+
+        Returns:
+
+        """
+        endpoint_class = endpoint_class or classify_endpoint(url)
+        await self.get_bucket(platform, endpoint_class, cookie, proxy or "").acquire()
+
+
+def classify_endpoint(url: str) -> str:
+    """
+    根据URL路径归类接口，同一类接口共用一个令牌桶
+    Args:
+        url: 请求的URL或者URI
+
+    Returns:
+        接口类别
+    """
+    path = urlparse(url).path.lower()
+    for keyword, endpoint_class in ENDPOINT_CLASS_KEYWORDS:
+        if keyword in path:
+            return endpoint_class
+    return ENDPOINT_CLASS_DEFAULT
+
+
+def _cookie_identity(cookie: str) -> str:
+    # 不直接用cookie字符串做key，避免日志或调试输出中泄露登录态
+    if not cookie:
+        return ""
+    return hashlib.md5(cookie.encode("utf-8")).hexdigest()[:16]
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """
+    获取全局限速器
+    Returns:
+        未开启限速时返回None
+    """
+    global _rate_limiter
+    if not config.ENABLE_RATE_LIMIT:
+        return None
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            default_qps=config.RATE_LIMIT_DEFAULT_QPS,
+            default_burst=config.RATE_LIMIT_DEFAULT_BURST,
+            rules=config.RATE_LIMIT_RULES,
+        )
+    return _rate_limiter
+
+
+async def acquire(platform: str, url: str, cookie: str = "", proxy: Optional[str] = None,
+                  endpoint_class: Optional[str] = None):
+    """
+    通过全局限速器等待令牌，未开启限速时直接返回
+    """
+    rate_limiter = get_rate_limiter()
+    if rate_limiter is None:
+        return
+    await rate_limiter.acquire(platform, url, cookie=cookie, proxy=proxy, endpoint_class=endpoint_class)
+
+
+async def crawl_sleep(seconds: float):
+    """
+    替代原来各处的请求间隔sleep：开启全局限速时请求节奏由令牌桶控制，不再额外sleep
+    Args:
+        seconds: 未开启全局限速时sleep的秒数
+
+    Returns:
+
+    """
+    if config.ENABLE_RATE_LIMIT or seconds <= 0:
+        return
+    await asyncio.sleep(seconds)
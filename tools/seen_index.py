@@ -0,0 +1,403 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 跨运行的已爬取索引，记录各平台已经保存过的内容id和评论id
+#            内存中的布隆过滤器挡掉绝大多数没见过的id，命中时再查SQLite确认，
+#            用于跳过最近爬取过的内容的详情和评论请求，以及丢弃重复的评论
+#            同一个文件中还保存每个内容的评论水位线，供增量爬取评论使用
+
+import hashlib
+import math
+import pathlib
+import time
+from typing import Any, Dict, Optional
+
+import config
+from async_sqlite_db import AsyncSqliteDB
+from tools import utils
+
+KIND_CONTENT = "content"
+KIND_COMMENT = "comment"
+# 内容的评论已经完整爬取
+KIND_COMMENTS_DONE = "comments_done"
+
+SEEN_ITEM_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS seen_item (
+    platform TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    seen_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (platform, kind, item_id)
+);
+CREATE TABLE IF NOT EXISTS comment_watermark (
+    platform TEXT NOT NULL,
+    content_id TEXT NOT NULL,
+    comment_time REAL NOT NULL DEFAULT 0,
+    comment_id TEXT NOT NULL DEFAULT '',
+    last_page INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (platform, content_id)
+);
+"""
+
+
+class BloomFilter:
+    """
+    布隆过滤器，判断为不存在时一定不存在，判断为存在时有 error_rate 的概率误判
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        Args:
+            capacity: 预计保存的元素个数，超过后误判率会升高
+            error_rate: 误判率
+        """
+        capacity = max(capacity, 1)
+        self.bit_count = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.bit_count / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.bit_count + 7) // 8)
+
+    def _positions(self, item: str):
+        # 双重哈希: h1 + i * h2，只需要计算一次摘要
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.bit_count
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class SeenIndex:
+    """
+    单个平台的已爬取索引
+    - 启动时把SQLite中的id全部加载到布隆过滤器，之后查询没见过的id不访问磁盘
+    - 内容只有在上一次运行中、并且在新鲜期内爬取过时才算“新鲜”，本次运行中保存的内容不影响本次的详情和评论爬取
+    - 保存详情和爬完评论分别记录，需要爬取评论时两者都在新鲜期内才算新鲜，评论中途失败的内容下一次会重新爬取
+    - 新鲜期内的内容再次保存时不更新爬取时间，新鲜期从上一次完整爬取（详情和评论）时开始计算
+    - 评论保存成功后才记录评论id，保存失败的评论下一次仍会保存
+    """
+
+    def __init__(self, db_path: str, platform: str, freshness_sec: float, bloom_capacity: int = 1000000,
+                 bloom_error_rate: float = 0.001):
+        """
+        Args:
+            db_path: 索引文件路径
+            platform: 平台
+            freshness_sec: 新鲜期（秒），新鲜期内爬取过的内容跳过详情和评论，0表示不跳过
+            bloom_capacity: 每类id的布隆过滤器容量
+            bloom_error_rate: 布隆过滤器误判率
+        """
+        self.db_path = db_path
+        self.platform = platform
+        self.freshness_sec = freshness_sec
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.started_at = time.time()
+        self._blooms: Dict[str, BloomFilter] = {}
+        self._db: Optional[AsyncSqliteDB] = None
+
+    async def open(self):
+        if self._db is not None:
+            return
+        pathlib.Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        db = AsyncSqliteDB(self.db_path)
+        await db.executescript(SEEN_ITEM_TABLE_SQL)
+        rows = await db.query("SELECT kind, item_id FROM seen_item WHERE platform=?", self.platform)
+        kind_counts: Dict[str, int] = {}
+        for row in rows:
+            kind_counts[row["kind"]] = kind_counts.get(row["kind"], 0) + 1
+        for kind in (KIND_CONTENT, KIND_COMMENT, KIND_COMMENTS_DONE):
+            # 已有的id超过容量时按两倍的数量分配，避免误判率过高
+            capacity = max(self.bloom_capacity, kind_counts.get(kind, 0) * 2)
+            self._blooms[kind] = BloomFilter(capacity, self.bloom_error_rate)
+        for row in rows:
+            self._blooms[row["kind"]].add(row["item_id"])
+        self._db = db
+        utils.logger.info(f"[SeenIndex.open] loaded seen index of {self.platform}: {kind_counts}")
+
+    async def close(self):
+        db, self._db = self._db, None
+        if db is not None:
+            await db.close()
+
+    @property
+    def fresh_after(self) -> float:
+        return self.started_at - self.freshness_sec
+
+    async def _get_seen_at(self, kind: str, item_id: str) -> Optional[float]:
+        await self.open()
+        if item_id not in self._blooms[kind]:
+            return None
+        row = await self._db.get_first(
+            "SELECT seen_at FROM seen_item WHERE platform=? AND kind=? AND item_id=?", self.platform, kind, item_id
+        )
+        return row["seen_at"] if row else None
+
+    async def _is_fresh(self, kind: str, item_id: str) -> bool:
+        seen_at = await self._get_seen_at(kind, item_id)
+        return seen_at is not None and self.fresh_after <= seen_at < self.started_at
+
+    async def is_content_fresh(self, content_id: str, require_comments: bool = False) -> bool:
+        """
+        内容是否在上一次运行中、新鲜期内爬取过
+        Args:
+            content_id: 内容id
+            require_comments: 是否还要求评论也在新鲜期内完整爬取过
+
+        Returns:
+
+        """
+        if self.freshness_sec <= 0 or not content_id:
+            return False
+        content_id = str(content_id)
+        if not await self._is_fresh(KIND_CONTENT, content_id):
+            return False
+        return not require_comments or await self._is_fresh(KIND_COMMENTS_DONE, content_id)
+
+    async def _mark_fresh(self, kind: str, item_id: str):
+        if not item_id:
+            return
+        await self.open()
+        item_id = str(item_id)
+        await self._db.execute(
+            "INSERT INTO seen_item (platform, kind, item_id, seen_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(platform, kind, item_id) DO UPDATE SET seen_at=excluded.seen_at WHERE seen_item.seen_at<?",
+            self.platform, kind, item_id, time.time(), self.fresh_after,
+        )
+        self._blooms[kind].add(item_id)
+
+    async def mark_content_seen(self, content_id: str):
+        """
+        记录内容已经保存，新鲜期内的记录不更新爬取时间
+        Args:
+            content_id: 内容id
+
+        Returns:
+
+        """
+        await self._mark_fresh(KIND_CONTENT, content_id)
+
+    async def mark_comments_done(self, content_id: str):
+        """
+        记录内容的评论已经完整爬取，新鲜期内的记录不更新爬取时间
+        Args:
+            content_id: 内容id
+
+        Returns:
+
+        """
+        await self._mark_fresh(KIND_COMMENTS_DONE, content_id)
+
+    async def is_comment_seen(self, comment_id: str) -> bool:
+        """
+        评论是否已经保存过
+        Args:
+            comment_id: 评论id
+
+        Returns:
+
+        """
+        if not comment_id:
+            return False
+        return await self._get_seen_at(KIND_COMMENT, str(comment_id)) is not None
+
+    async def mark_comment_seen(self, comment_id: str):
+        """
+        记录评论已经保存，在评论保存成功后调用
+        Args:
+            comment_id: 评论id
+
+        Returns:
+
+        """
+        if not comment_id:
+            return
+        await self.open()
+        comment_id = str(comment_id)
+        await self._db.execute(
+            "INSERT INTO seen_item (platform, kind, item_id, seen_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(platform, kind, item_id) DO NOTHING",
+            self.platform, KIND_COMMENT, comment_id, time.time(),
+        )
+        self._blooms[KIND_COMMENT].add(comment_id)
+
+    async def get_comment_watermark(self, content_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取内容上一次爬取评论时的水位线
+        Args:
+            content_id: 内容id
+
+        Returns:
+            包含 comment_time、comment_id、last_page 的字典，没有爬取过时返回None
+        """
+        await self.open()
+        return await self._db.get_first(
+            "SELECT comment_time, comment_id, last_page FROM comment_watermark WHERE platform=? AND content_id=?",
+            self.platform, str(content_id),
+        )
+
+    async def save_comment_watermark(self, content_id: str, comment_time: float, comment_id: str, last_page: int):
+        """
+        保存内容的评论水位线
+        Args:
+            content_id: 内容id
+            comment_time: 最新一条评论的时间
+            comment_id: 最新一条评论的id
+            last_page: 按页码升序翻页的平台爬取到的最后一页
+
+        Returns:
+
+        """
+        await self.open()
+        await self._db.execute(
+            "INSERT INTO comment_watermark (platform, content_id, comment_time, comment_id, last_page, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(platform, content_id) DO UPDATE SET "
+            "comment_time=excluded.comment_time, comment_id=excluded.comment_id, "
+            "last_page=excluded.last_page, updated_at=excluded.updated_at",
+            self.platform, str(content_id), comment_time, comment_id or "", last_page, time.time(),
+        )
+
+
+_seen_indexes: Dict[str, SeenIndex] = {}
+
+
+def open_seen_index(platform: str) -> SeenIndex:
+    """
+    获取平台的索引文件，不检查 config.ENABLE_SEEN_INDEX，评论水位线也保存在这里
+    Args:
+        platform: 平台
+
+    Returns:
+
+    """
+    seen_index = _seen_indexes.get(platform)
+    if seen_index is None:
+        seen_index = SeenIndex(
+            config.SEEN_INDEX_DB_PATH,
+            platform,
+            freshness_sec=config.SEEN_CONTENT_FRESHNESS_SEC,
+            bloom_capacity=config.SEEN_INDEX_BLOOM_CAPACITY,
+            bloom_error_rate=config.SEEN_INDEX_BLOOM_ERROR_RATE,
+        )
+        _seen_indexes[platform] = seen_index
+    return seen_index
+
+
+def get_seen_index(platform: str) -> Optional[SeenIndex]:
+    """
+    获取平台的已爬取索引，没有开启 config.ENABLE_SEEN_INDEX 时返回None
+    Args:
+        platform: 平台
+
+    Returns:
+
+    """
+    if not config.ENABLE_SEEN_INDEX:
+        return None
+    return open_seen_index(platform)
+
+
+async def is_content_fresh(platform: str, content_id: str) -> bool:
+    """
+    爬取详情和评论前调用，新鲜期内爬取过的内容返回True，调用方跳过请求
+    Args:
+        platform: 平台
+        content_id: 内容id
+
+    Returns:
+
+    """
+    seen_index = get_seen_index(platform)
+    if seen_index is None:
+        return False
+    if await seen_index.is_content_fresh(content_id, require_comments=config.ENABLE_GET_COMMENTS):
+        utils.logger.info(f"[seen_index.is_content_fresh] {platform} content {content_id} was crawled recently, skip")
+        return True
+    return False
+
+
+async def mark_content_seen(platform: str, content_id: str):
+    """
+    存储层保存内容时调用
+    Args:
+        platform: 平台
+        content_id: 内容id
+
+    Returns:
+
+    """
+    seen_index = get_seen_index(platform)
+    if seen_index is not None:
+        await seen_index.mark_content_seen(content_id)
+
+
+async def mark_comments_done(platform: str, content_id: str):
+    """
+    爬虫完整爬取一个内容的评论后调用，中途失败时不调用
+    Args:
+        platform: 平台
+        content_id: 内容id
+
+    Returns:
+
+    """
+    seen_index = get_seen_index(platform)
+    if seen_index is not None:
+        await seen_index.mark_comments_done(content_id)
+
+
+async def is_new_comment(platform: str, comment_id: str) -> bool:
+    """
+    存储层保存评论前调用，已经保存过的评论返回False，调用方丢弃
+    Args:
+        platform: 平台
+        comment_id: 评论id
+
+    Returns:
+
+    """
+    seen_index = get_seen_index(platform)
+    if seen_index is None:
+        return True
+    return not await seen_index.is_comment_seen(comment_id)
+
+
+async def mark_comment_seen(platform: str, comment_id: str):
+    """
+    存储层保存评论成功后调用
+    Args:
+        platform: 平台
+        comment_id: 评论id
+
+    Returns:
+
+    """
+    seen_index = get_seen_index(platform)
+    if seen_index is not None:
+        await seen_index.mark_comment_seen(comment_id)
+
+
+async def close_seen_indexes():
+    """
+    爬虫结束时调用，关闭索引文件
+    Returns:
+
+    """
+    while _seen_indexes:
+        _, seen_index = _seen_indexes.popitem()
+        await seen_index.close()
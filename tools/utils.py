@@ -13,9 +13,18 @@ import argparse
 import logging
 
 from .crawler_util import *
-from .slider_util import *
 from .time_util import *
 
+# 滑块验证码工具依赖 opencv/numpy，导入较慢，只有抖音登录遇到滑块时才需要，第一次访问时再导入
+_SLIDER_UTIL_NAMES = ("Slide", "get_tracks", "get_track_simple")
+
+
+def __getattr__(name):
+    if name in _SLIDER_UTIL_NAMES:
+        from . import slider_util
+        return getattr(slider_util, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def init_loging_config():
     level = logging.INFO
@@ -12,72 +12,200 @@
 import asyncio
 import json
 import logging
+import os
+import time
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
 
 import aiofiles
-import jieba
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
 
 import config
 from tools import utils
 
-plot_lock = asyncio.Lock()
+
+def render_word_cloud(word_freq: Dict[str, int], save_words_prefix: str, font_path: str, stop_words: Set[str]):
+    """
+    根据词频渲染词云图，在进程池中执行，避免matplotlib绘图阻塞事件循环
+    Args:
+        word_freq: 词频
+        save_words_prefix: 输出文件前缀，图片保存为 {prefix}_word_cloud.png
+        font_path: 中文字体文件路径
+        stop_words: 停用词
+
+    Returns:
+
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from wordcloud import WordCloud
+
+    top_20_word_freq = {word: freq for word, freq in
+                        sorted(word_freq.items(), key=lambda item: item[1], reverse=True)[:20]}
+    wordcloud = WordCloud(
+        font_path=font_path,
+        width=800,
+        height=400,
+        background_color='white',
+        max_words=200,
+        stopwords=stop_words,
+        colormap='viridis',
+        contour_color='steelblue',
+        contour_width=1
+    ).generate_from_frequencies(top_20_word_freq)
+
+    # Save word cloud image
+    plt.figure(figsize=(10, 5), facecolor='white')
+    plt.imshow(wordcloud, interpolation='bilinear')
+
+    plt.axis('off')
+    plt.tight_layout(pad=0)
+    plt.savefig(f"{save_words_prefix}_word_cloud.png", format='png', dpi=300)
+    plt.close()
+
 
 class AsyncWordCloudGenerator:
-    def __init__(self):
+    """
+    增量词频统计与词云生成
+    - 每条评论只分词一次，按输出前缀（平台/爬取类型/日期）累计到各自的 Counter 中
+    - 词频文件定时写入磁盘，词云图在爬虫结束时（或调用 render 时）在进程池中生成一次
+    """
+
+    def __init__(self, save_interval: float = 30.0):
+        """
+        Args:
+            save_interval: 词频文件写入磁盘的最小间隔（秒）
+        """
+        # jieba导入时会加载词典相关模块，只在开启词云时才导入
+        import jieba
+
         logging.getLogger('jieba').setLevel(logging.WARNING)
         self.stop_words_file = config.STOP_WORDS_FILE
-        self.lock = asyncio.Lock()
+        self.save_interval = save_interval
         self.stop_words = self.load_stop_words()
         self.custom_words = config.CUSTOM_WORDS
         for word, group in self.custom_words.items():
             jieba.add_word(word)
+        self.word_freqs: Dict[str, Counter] = {}
+        self._dirty_prefixes: Set[str] = set()
+        self._last_save_time = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
 
     def load_stop_words(self):
         with open(self.stop_words_file, 'r', encoding='utf-8') as f:
             return set(f.read().strip().split('\n'))
 
-    async def generate_word_frequency_and_cloud(self, data, save_words_prefix):
-        all_text = ' '.join(item['content'] for item in data)
-        words = [word for word in jieba.lcut(all_text) if word not in self.stop_words and len(word.strip()) > 0]
-        word_freq = Counter(words)
+    def cut_words(self, text: str) -> List[str]:
+        import jieba
+
+        return [word for word in jieba.lcut(text) if word not in self.stop_words and len(word.strip()) > 0]
+
+    async def add_items(self, items: Iterable[Dict], save_words_prefix: str):
+        """
+        统计新保存数据的词频，只处理传入的数据，不会重新统计之前的数据
+        Args:
+            items: 新保存的数据，取其中的 content 字段
+            save_words_prefix: 输出文件前缀
+
+        Returns:
+
+        """
+        word_freq = self.word_freqs.setdefault(save_words_prefix, Counter())
+        for item in items:
+            content = item.get('content')
+            if content:
+                word_freq.update(self.cut_words(content))
+        self._dirty_prefixes.add(save_words_prefix)
+        if time.monotonic() - self._last_save_time >= self.save_interval:
+            await self.save_word_frequency()
 
-        # Save word frequency to file
-        freq_file = f"{save_words_prefix}_word_freq.json"
-        async with aiofiles.open(freq_file, 'w', encoding='utf-8') as file:
-            await file.write(json.dumps(word_freq, ensure_ascii=False, indent=4))
+    async def add_item(self, item: Dict, save_words_prefix: str):
+        await self.add_items([item], save_words_prefix)
 
-        # Try to acquire the plot lock without waiting
-        if plot_lock.locked():
-            utils.logger.info("Skipping word cloud generation as the lock is held.")
+    async def save_word_frequency(self):
+        """
+        将有变化的词频写入 {prefix}_word_freq.json
+        Returns:
+
+        """
+        async with self._lock:
+            self._last_save_time = time.monotonic()
+            prefixes, self._dirty_prefixes = self._dirty_prefixes, set()
+            for save_words_prefix in prefixes:
+                freq_file = f"{save_words_prefix}_word_freq.json"
+                tmp_file = f"{freq_file}.tmp"
+                async with aiofiles.open(tmp_file, 'w', encoding='utf-8') as file:
+                    await file.write(json.dumps(self.word_freqs[save_words_prefix], ensure_ascii=False, indent=4))
+                os.replace(tmp_file, freq_file)
+
+    async def render(self, save_words_prefix: Optional[str] = None):
+        """
+        写入词频文件并在进程池中生成词云图
+        Args:
+            save_words_prefix: 只生成指定前缀的词云图，为None时生成全部
+
+        Returns:
+
+        """
+        await self.save_word_frequency()
+        prefixes = [save_words_prefix] if save_words_prefix else list(self.word_freqs.keys())
+        prefixes = [prefix for prefix in prefixes if self.word_freqs.get(prefix)]
+        if not prefixes:
             return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=config.WORDCLOUD_RENDER_PROCESS_NUM)
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(
+                self._executor, render_word_cloud,
+                dict(self.word_freqs[prefix]), prefix, config.FONT_PATH, self.stop_words,
+            ) for prefix in prefixes
+        ], return_exceptions=True)
+        for prefix, result in zip(prefixes, results):
+            if isinstance(result, Exception):
+                utils.logger.error(f"[AsyncWordCloudGenerator.render] render word cloud {prefix} error: {result}")
+            else:
+                utils.logger.info(f"[AsyncWordCloudGenerator.render] word cloud saved: {prefix}_word_cloud.png")
+
+    async def close(self):
+        """
+        爬虫结束时调用：写入词频文件，生成词云图，关闭进程池
+        Returns:
+
+        """
+        try:
+            await self.render()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+_generator: Optional[AsyncWordCloudGenerator] = None
+
+
+def get_word_cloud_generator() -> AsyncWordCloudGenerator:
+    """
+    获取全局的词云生成器，所有平台共用，按输出前缀分别统计
+    Returns:
+
+    """
+    global _generator
+    if _generator is None:
+        _generator = AsyncWordCloudGenerator(save_interval=config.WORDCLOUD_SAVE_INTERVAL_SEC)
+    return _generator
+
+
+async def close_word_cloud_generator():
+    """
+    爬虫结束时调用，生成词云图
+    Returns:
 
-        await self.generate_word_cloud(word_freq, save_words_prefix)
-
-    async def generate_word_cloud(self, word_freq, save_words_prefix):
-        await plot_lock.acquire()
-        top_20_word_freq = {word: freq for word, freq in
-                            sorted(word_freq.items(), key=lambda item: item[1], reverse=True)[:20]}
-        wordcloud = WordCloud(
-            font_path=config.FONT_PATH,
-            width=800,
-            height=400,
-            background_color='white',
-            max_words=200,
-            stopwords=self.stop_words,
-            colormap='viridis',
-            contour_color='steelblue',
-            contour_width=1
-        ).generate_from_frequencies(top_20_word_freq)
-
-        # Save word cloud image
-        plt.figure(figsize=(10, 5), facecolor='white')
-        plt.imshow(wordcloud, interpolation='bilinear')
-
-        plt.axis('off')
-        plt.tight_layout(pad=0)
-        plt.savefig(f"{save_words_prefix}_word_cloud.png", format='png', dpi=300)
-        plt.close()
-
-        plot_lock.release()
\ No newline at end of file
+    """
+    global _generator
+    if _generator is None:
+        return
+    generator, _generator = _generator, None
+    await generator.close()
@@ -11,15 +11,19 @@
 
 from asyncio.tasks import Task
 from contextvars import ContextVar
-from typing import List
+from typing import TYPE_CHECKING, List, Optional
 
 import aiomysql
 
 from async_db import AsyncMysqlDB
 
+if TYPE_CHECKING:
+    from async_db_buffer import AsyncDbWriteBuffer
+
 request_keyword_var: ContextVar[str] = ContextVar("request_keyword", default="")
 crawler_type_var: ContextVar[str] = ContextVar("crawler_type", default="")
 comment_tasks_var: ContextVar[List[Task]] = ContextVar("comment_tasks", default=[])
 media_crawler_db_var: ContextVar[AsyncMysqlDB] = ContextVar("media_crawler_db_var")
 db_conn_pool_var: ContextVar[aiomysql.Pool] = ContextVar("db_conn_pool_var")
+db_write_buffer_var: ContextVar[Optional["AsyncDbWriteBuffer"]] = ContextVar("db_write_buffer_var", default=None)
 source_keyword_var: ContextVar[str] = ContextVar("source_keyword", default="")
\ No newline at end of file
@@ -25,6 +25,7 @@ import glob
 # 导入原有的爬虫模块
 import config
 import db
+import store
 from main import CrawlerFactory
 from base.base_crawler import AbstractCrawler
 
@@ -61,7 +62,9 @@ CRAWLER_TYPE_OPTIONS = {
 # 数据保存方式配置
 SAVE_DATA_OPTIONS = {
     'json': 'JSON文件',
+    'jsonl': 'JSON Lines文件',
     'csv': 'CSV文件',
+    'parquet': 'Parquet文件',
     'sqlite': 'SQLite数据库',
     'db': 'MySQL数据库'
 }
@@ -162,6 +165,12 @@ async def execute_crawler_task(task_id: str, crawler_config: Dict[str, Any]):
             except Exception as e:
                 print(f"Error closing crawler: {e}")
         
+        # 写入缓冲的数据并关闭存储文件
+        try:
+            await store.close_all_stores()
+        except Exception as e:
+            print(f"Error closing stores: {e}")
+
         # 关闭数据库连接
         if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
             try: